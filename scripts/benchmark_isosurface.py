@@ -0,0 +1,87 @@
+import argparse
+import json
+import sys
+import time
+from pathlib import Path
+
+import numpy as np
+from vedo import Volume
+
+PROJECT_ROOT = Path(__file__).resolve().parent.parent
+sys.path.append(str(PROJECT_ROOT))
+
+from src.common.isosurface import default_workers, parallel_isosurface, shutdown_pool
+
+ATLAS_SHAPE = (528, 320, 456)
+
+def synthetic_volume(shape=ATLAS_SHAPE, n_blobs=40, seed=0):
+    """Projection-like test volume: smooth blobs plus low-level noise, 25um spacing."""
+    rng = np.random.default_rng(seed)
+    grids = np.ogrid[tuple(slice(0, n) for n in shape)]
+    data = rng.random(shape, dtype=np.float32) * 0.02
+    for _ in range(n_blobs):
+        center = [rng.uniform(0, n) for n in shape]
+        width = rng.uniform(5, 30)
+        dist2 = sum((g - c) ** 2 for g, c in zip(grids, center))
+        data += np.exp(-dist2 / (2 * width ** 2)).astype(np.float32) * rng.uniform(0.2, 1.0)
+    return Volume(data, spacing=(25, 25, 25), origin=(0, 0, 0))
+
+def worker_counts(max_workers):
+    counts, n = [], 2
+    while n < max_workers:
+        counts.append(n)
+        n *= 2
+    return counts + [max_workers] if max_workers > 1 else []
+
+def _timed(extract, repeats):
+    t0 = time.perf_counter()
+    for _ in range(repeats):
+        mesh = extract()
+    return mesh, (time.perf_counter() - t0) / repeats
+
+def run_benchmark(vol, threshold_fraction=0.05, max_workers=None, repeats=1, serial_slabs=4):
+    """
+    Times vedo's contour filter (what the pipeline uses) and its flying-edges pass (what
+    the slabs reproduce) against the slab path: serial slabs (overhead alone) and 2..N
+    workers. matches: same point and triangle count as the flying-edges pass.
+    """
+    threshold = vol.scalar_range()[1] * threshold_fraction
+    rows = []
+
+    contour, contour_s = _timed(lambda: vol.isosurface(value=threshold), repeats)
+    ref, baseline = _timed(lambda: vol.isosurface(value=threshold, flying_edges=True), repeats)
+    for method, mesh, seconds in (("vedo contour", contour, contour_s), ("vedo flying edges", ref, baseline)):
+        rows.append({"method": method, "workers": 1, "seconds": round(seconds, 3), "speedup": round(baseline / seconds, 2),
+                     "points": int(mesh.npoints), "triangles": int(mesh.ncells)})
+
+    runs = [("serial slabs", 1, serial_slabs)] + [("parallel slabs", w, None) for w in worker_counts(max_workers or default_workers())]
+    for method, workers, n_slabs in runs:
+        mesh, elapsed = _timed(lambda: parallel_isosurface(vol, threshold, workers=workers, n_slabs=n_slabs), repeats)
+        rows.append({"method": method, "workers": workers, "seconds": round(elapsed, 3),
+                     "speedup": round(baseline / elapsed, 2), "points": int(mesh.npoints), "triangles": int(mesh.ncells),
+                     "matches": (mesh.npoints, mesh.ncells) == (ref.npoints, ref.ncells)})
+    shutdown_pool()
+    return rows
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmarks the slab-parallel isosurface against vedo's single-core one.")
+    parser.add_argument("--input", type=Path, default=None, help="Volume file (default: synthetic atlas-sized volume)")
+    parser.add_argument("--threshold", type=float, default=0.05, help="Isosurface threshold (fraction of max)")
+    parser.add_argument("--max-workers", type=int, default=None, help="Largest worker count to test (default: all cores)")
+    parser.add_argument("--repeats", type=int, default=1)
+    parser.add_argument("--json", type=Path, default=None, help="Write the results to this JSON file")
+    args = parser.parse_args()
+
+    print("Preparing volume...")
+    vol = Volume(str(args.input)) if args.input else synthetic_volume()
+    print(f"Volume: {tuple(vol.dimensions())}, {default_workers()} cores available")
+
+    rows = run_benchmark(vol, args.threshold, args.max_workers, args.repeats)
+    print(f"\n{'method':<18} {'workers':>7} {'seconds':>9} {'speedup':>8} {'points':>10} {'triangles':>11} {'matches':>8}")
+    for r in rows:
+        print(f"{r['method']:<18} {r['workers']:>7} {r['seconds']:>9.3f} {r['speedup']:>7.2f}x "
+              f"{r['points']:>10} {r['triangles']:>11} {str(r.get('matches', '')):>8}")
+
+    if args.json:
+        args.json.write_text(json.dumps(rows, indent=2))
+        print(f"Results saved to {args.json}")
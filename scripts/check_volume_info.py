@@ -1,21 +1,160 @@
+import argparse
+import json
+import os
 import sys
-from vedo import Volume
+import time
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
 
-def check_volume(path):
-    print(f"--- Volume Info: {path} ---")
+PROJECT_ROOT = Path(__file__).resolve().parent.parent
+sys.path.append(str(PROJECT_ROOT))
+
+from src.common.volume_header import read_volume_header, scalar_range
+
+VOLUME_SUFFIXES = (".nrrd", ".nhdr", ".mhd", ".mha")
+STATS_CACHE = ".volume_stats.json"
+
+# Allen Mouse CCFv3 25um, in file axis order as filter_tracts.py expects it (= atlas.annotation.shape)
+ATLAS_SHAPE = (528, 320, 456)
+ATLAS_SPACING = (25.0, 25.0, 25.0)
+ATLAS_ORIGIN = (0.0, 0.0, 0.0)
+
+# --- Scalar Range Cache ---
+
+class StatsCache:
+    """Scalar ranges per file, keyed by name and invalidated on size/mtime change."""
+    def __init__(self, directory: Path):
+        self.path = Path(directory) / STATS_CACHE
+        try:
+            self.entries = json.loads(self.path.read_text())
+        except Exception:
+            self.entries = {}
+        self.dirty = False
+
+    def scalar_range(self, header):
+        st = header.path.stat()
+        key = header.path.name
+        entry = self.entries.get(key)
+        if entry and (entry["size"], entry["mtime_ns"]) == (st.st_size, st.st_mtime_ns):
+            return tuple(entry["range"])
+        value = scalar_range(header)
+        self.entries[key] = {"size": st.st_size, "mtime_ns": st.st_mtime_ns, "range": list(value)}
+        self.dirty = True
+        return value
+
+    def save(self):
+        if self.dirty:
+            self.path.write_text(json.dumps(self.entries, indent=2))
+            self.dirty = False
+
+# --- Checks ---
+
+def _close(a, b, tol=1e-3):
+    return len(a) == len(b) and all(abs(x - y) <= tol for x, y in zip(a, b))
+
+def check_geometry(header, shape=ATLAS_SHAPE, spacing=ATLAS_SPACING, origin=ATLAS_ORIGIN):
+    """Returns a list of issues (empty when the volume lines up with the atlas)."""
+    issues = []
+    if tuple(header.sizes) != tuple(shape):
+        if sorted(header.sizes) == sorted(shape):
+            issues.append(f"axes permuted: {header.sizes} vs atlas {tuple(shape)}")
+        else:
+            issues.append(f"shape {header.sizes} incompatible with atlas {tuple(shape)}")
+    if not _close(header.spacing, spacing):
+        issues.append(f"spacing {header.spacing} != {tuple(spacing)}")
+    if not _close(header.origin, origin):
+        issues.append(f"origin {header.origin} != {tuple(origin)}")
+    return issues
+
+def inspect(path, stats=False, cache: StatsCache = None):
+    """Header info (plus scalar range if requested) for one file, as a JSON-ready dict."""
+    path = Path(path)
+    t0 = time.perf_counter()
     try:
-        vol = Volume(path)
-        print(f"Dimensions:   {vol.dimensions()}")
-        print(f"Spacing:      {vol.spacing()}")
-        print(f"Origin:       {vol.origin()}")
-        print(f"Bounds:       {vol.bounds()}")
-        print(f"Scalar Range: {vol.scalar_range()}")
-        print("-----------------------------")
+        header = read_volume_header(path)
     except Exception as e:
-        print(f"Error loading volume: {e}")
+        return {"file": path.name, "error": str(e)}
+
+    info = {
+        "file": path.name,
+        "dimensions": list(header.sizes),
+        "spacing": list(header.spacing),
+        "origin": list(header.origin),
+        "bounds": list(header.bounds),
+        "dtype": header.dtype.name,
+        "encoding": header.encoding,
+        "issues": check_geometry(header),
+    }
+    if stats:
+        try:
+            info["scalar_range"] = list(cache.scalar_range(header) if cache else scalar_range(header))
+        except Exception as e:
+            info["scalar_range_error"] = str(e)
+    info["seconds"] = round(time.perf_counter() - t0, 4)
+    return info
+
+def check_volume(path, stats=False):
+    print(f"--- Volume Info: {path} ---")
+    cache = StatsCache(Path(path).parent) if stats else None
+    info = inspect(path, stats=stats, cache=cache)
+    if cache:
+        cache.save()
+    if "error" in info:
+        print(f"Error reading header: {info['error']}")
+        return info
+    print(f"Dimensions:   {info['dimensions']}")
+    print(f"Spacing:      {info['spacing']}")
+    print(f"Origin:       {info['origin']}")
+    print(f"Bounds:       {info['bounds']}")
+    print(f"Data Type:    {info['dtype']} ({info['encoding']})")
+    if "scalar_range" in info:
+        print(f"Scalar Range: {info['scalar_range']}")
+    for issue in info["issues"]:
+        print(f"[WARN] {issue}")
+    print("-----------------------------")
+    return info
+
+# --- Bulk Inventory ---
+
+def inventory(directory, stats=False, workers=None):
+    """Inspects every volume in a directory in parallel. Returns one dict per file."""
+    directory = Path(directory)
+    files = sorted(p for p in directory.iterdir() if p.suffix.lower() in VOLUME_SUFFIXES)
+    cache = StatsCache(directory) if stats else None
+    workers = workers or min(32, (os.cpu_count() or 1) * 4) # Header reads are I/O bound
+
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        rows = list(pool.map(lambda p: inspect(p, stats, cache), files))
+    if cache:
+        cache.save()
+    return rows
+
+def print_inventory(rows, elapsed):
+    flagged = [r for r in rows if r.get("error") or r.get("issues")]
+    for r in rows:
+        status = "ERROR" if r.get("error") else ("WARN" if r.get("issues") else "OK")
+        detail = r.get("error") or "; ".join(r.get("issues", []))
+        dims = "x".join(str(d) for d in r.get("dimensions", []))
+        rng = f" range={r['scalar_range']}" if "scalar_range" in r else ""
+        print(f"[{status:5}] {r['file']:<40} {dims:<14}{rng} {detail}")
+    print(f"\n{len(rows)} volumes inspected in {elapsed:.2f}s, {len(flagged)} flagged.")
 
 if __name__ == "__main__":
-    if len(sys.argv) < 2:
-        print("Usage: python check_volume_info.py <path_to_nrrd>")
+    parser = argparse.ArgumentParser(description="Prints volume geometry from the file header (no voxel data is read).")
+    parser.add_argument("path", help="Volume file (.nrrd/.mhd) or a directory to inventory")
+    parser.add_argument("--stats", action="store_true", help="Also compute the scalar range (reads voxels; cached per file)")
+    parser.add_argument("--workers", type=int, default=None, help="Parallel readers for directory mode")
+    parser.add_argument("--json", type=Path, default=None, help="Write the inventory report to this JSON file")
+    args = parser.parse_args()
+
+    target = Path(args.path)
+    if target.is_dir():
+        t0 = time.perf_counter()
+        rows = inventory(target, stats=args.stats, workers=args.workers)
+        print_inventory(rows, time.perf_counter() - t0)
     else:
-        check_volume(sys.argv[1])
+        rows = [check_volume(target, stats=args.stats)]
+
+    if args.json:
+        args.json.write_text(json.dumps(rows, indent=2))
+        print(f"Report saved to {args.json}")
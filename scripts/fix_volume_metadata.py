@@ -1,41 +1,232 @@
+import argparse
+import glob
+import json
+import os
 import sys
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from pathlib import Path
 from vedo import Volume
 
-def fix_volume(path, target_spacing=(25, 25, 25)):
+PROJECT_ROOT = Path(__file__).resolve().parent.parent
+sys.path.append(str(PROJECT_ROOT))
+
+from src.common.tract_catalog import TractCatalog, file_sha256
+from src.common.volume_header import read_volume_header
+
+VOLUME_SUFFIXES = (".nrrd", ".mhd")
+STAMPS_NAME = ".fix_volume_stamps.json"
+DEFAULT_SPACING = (25, 25, 25)
+DEFAULT_THRESHOLD = 0.05 # Fraction of the max density
+# Peak memory of one job relative to the voxel payload: tonumpy copy, re-wrapped
+# vtkImageData, marching-cubes scratch and the output mesh
+MEMORY_FACTOR = 4
+
+def output_path_for(path) -> Path:
+    path = Path(path)
+    return path.with_name(f"{path.stem}_fixed.vtk")
+
+def fix_volume(path, target_spacing=DEFAULT_SPACING, threshold_fraction=DEFAULT_THRESHOLD, stats=None):
+    """
+    Rebuilds the volume with explicit spacing/origin and saves its isosurface as
+    {stem}_fixed.vtk. Returns the output path (None on error); timings and the triangle
+    count are written into the optional stats dict.
+    """
     print(f"--- Fixing Volume & Converting to Mesh: {path} ---")
+    stats = stats if stats is not None else {}
     try:
         # 1. Load Data
-        vol = Volume(path)
+        t0 = time.perf_counter()
+        vol = Volume(str(path))
         print(f"Original Spacing: {vol.spacing()}")
-        
+
         # 2. Force Metadata (Reconstruct to be safe like filter_tracts.py)
         data = vol.tonumpy()
         # Create new volume with explicit spacing/origin
         new_vol = Volume(data, spacing=target_spacing, origin=(0, 0, 0))
-        
+        stats["load_s"] = round(time.perf_counter() - t0, 3)
+
         print(f"New Spacing:      {new_vol.spacing()}")
         print(f"New Origin:       {new_vol.origin()}")
-        
+
         # 3. Generate Isosurface (Mesh)
         # This aligns the workflow with 'Filtered' mode which works.
+        t0 = time.perf_counter()
         dmax = new_vol.scalar_range()[1]
-        threshold = dmax * 0.05
+        threshold = dmax * threshold_fraction
         print(f"Generating Isosurface (Threshold={threshold:.4f})...")
-        
+
         mesh = new_vol.isosurface(value=threshold)
-        
+        stats["isosurface_s"] = round(time.perf_counter() - t0, 3)
+        stats["triangles"] = int(mesh.ncells)
+
         # 4. Save as VTK
-        output_path = path.replace(".nrrd", "_fixed.vtk")
+        t0 = time.perf_counter()
+        output_path = output_path_for(path)
         print(f"Saving Mesh to: {output_path}")
-        mesh.write(output_path)
+        mesh.write(str(output_path))
+        stats["write_s"] = round(time.perf_counter() - t0, 3)
+        try:
+            TractCatalog(output_path.parent).register(
+                output_path, kind="fixed", shape=data.shape, spacing=target_spacing)
+        except Exception as e:
+            print(f"Warning: could not update tract catalog: {e}")
         print("Done.")
         return output_path
     except Exception as e:
         print(f"Error fixing volume: {e}")
+        stats["error"] = str(e)
         return None
 
+# --- Batch Mode ---
+
+def collect_inputs(patterns):
+    """Expands files, directories (their .nrrd/.mhd files) and glob patterns."""
+    found = []
+    for pattern in patterns:
+        p = Path(pattern)
+        if p.is_dir():
+            found.extend(sorted(x for x in p.iterdir() if x.suffix in VOLUME_SUFFIXES))
+        elif p.exists():
+            found.append(p)
+        else:
+            found.extend(Path(x) for x in sorted(glob.glob(pattern)) if Path(x).suffix in VOLUME_SUFFIXES)
+    return list(dict.fromkeys(x.resolve() for x in found))
+
+def input_stamp(path: Path, params: dict, use_hash=False) -> dict:
+    st = path.stat()
+    stamp = {"size": st.st_size, "mtime_ns": st.st_mtime_ns, "params": params}
+    if use_hash:
+        stamp["sha256"] = file_sha256(path)
+    return stamp
+
+def is_up_to_date(path: Path, params: dict, stamps: dict, use_hash=False, default_params=None) -> bool:
+    """
+    The output is current if it exists and was built from this input with these params.
+    Inputs are compared by size+mtime, or by content hash with use_hash (survives touch/copy).
+    Outputs without a stamp (older runs) count as current if newer than the input and
+    the params are the defaults.
+    """
+    output = output_path_for(path)
+    if not output.exists():
+        return False
+    stamp = stamps.get(path.name)
+    if stamp is None:
+        return params == default_params and output.stat().st_mtime_ns >= path.stat().st_mtime_ns
+    if stamp.get("params") != params:
+        return False
+    st = path.stat()
+    if (stamp["size"], stamp["mtime_ns"]) == (st.st_size, st.st_mtime_ns):
+        return True
+    return use_hash and stamp.get("sha256") is not None and stamp["sha256"] == file_sha256(path)
+
+def available_memory() -> int:
+    """Bytes of available RAM (MemAvailable on Linux, total physical memory elsewhere)."""
+    try:
+        with open("/proc/meminfo") as f:
+            for line in f:
+                if line.startswith("MemAvailable:"):
+                    return int(line.split()[1]) * 1024
+    except OSError:
+        pass
+    try:
+        return os.sysconf("SC_PAGE_SIZE") * os.sysconf("SC_PHYS_PAGES")
+    except (ValueError, OSError, AttributeError):
+        return 8 << 30
+
+def estimate_job_memory(path: Path) -> int:
+    try:
+        header = read_volume_header(path)
+        return header.n_voxels * max(header.dtype.itemsize, 4) * MEMORY_FACTOR
+    except Exception:
+        return path.stat().st_size * MEMORY_FACTOR
+
+def plan_workers(paths, max_workers=None, memory_budget=None) -> int:
+    """Process count limited by cores and by how many of the largest jobs fit in RAM."""
+    if not paths:
+        return 0
+    cores = max_workers or os.cpu_count() or 1
+    budget = memory_budget if memory_budget is not None else int(available_memory() * 0.7)
+    peak = max(estimate_job_memory(p) for p in paths)
+    return max(1, min(cores, len(paths), budget // max(peak, 1)))
+
+def _run_job(path, target_spacing, threshold_fraction):
+    stats = {}
+    t0 = time.perf_counter()
+    output = fix_volume(path, target_spacing, threshold_fraction, stats)
+    stats["total_s"] = round(time.perf_counter() - t0, 3)
+    stats["output"] = str(output) if output else None
+    return stats
+
+def run_batch(patterns, target_spacing=DEFAULT_SPACING, threshold_fraction=DEFAULT_THRESHOLD,
+              workers=None, force=False, use_hash=False, summary_path=None):
+    """Fixes every input whose output is out of date. Returns the per-file summary rows."""
+    paths = collect_inputs(patterns)
+    params = {"spacing": [float(x) for x in target_spacing], "threshold": float(threshold_fraction)}
+    default_params = {"spacing": [float(x) for x in DEFAULT_SPACING], "threshold": DEFAULT_THRESHOLD}
+
+    stamps_by_dir = {}
+    def stamps_for(path):
+        if path.parent not in stamps_by_dir:
+            try:
+                stamps_by_dir[path.parent] = json.loads((path.parent / STAMPS_NAME).read_text())
+            except Exception:
+                stamps_by_dir[path.parent] = {}
+        return stamps_by_dir[path.parent]
+
+    rows, todo = [], []
+    for path in paths:
+        if not force and is_up_to_date(path, params, stamps_for(path), use_hash, default_params):
+            rows.append({"file": path.name, "status": "up-to-date"})
+        else:
+            todo.append(path)
+
+    n_workers = plan_workers(todo, workers)
+    print(f"[BATCH] {len(paths)} volumes: {len(paths) - len(todo)} up to date, {len(todo)} to fix on {n_workers} process(es)")
+
+    t0 = time.perf_counter()
+    if todo:
+        with ProcessPoolExecutor(max_workers=n_workers) as pool:
+            futures = {pool.submit(_run_job, p, target_spacing, threshold_fraction): p for p in todo}
+            for future in as_completed(futures):
+                path = futures[future]
+                try:
+                    stats = future.result()
+                except Exception as e: # Worker crashed (e.g. killed by the OOM killer)
+                    stats = {"error": str(e)}
+                row = {"file": path.name, "status": "failed" if stats.get("error") else "fixed", **stats}
+                rows.append(row)
+                if row["status"] == "fixed":
+                    stamps_for(path)[path.name] = input_stamp(path, params, use_hash)
+                print(f"[BATCH] {row['status']:<6} {path.name} ({stats.get('total_s', 0)}s, {stats.get('triangles', 0)} triangles)")
+
+    for directory, stamps in stamps_by_dir.items():
+        if stamps:
+            (directory / STAMPS_NAME).write_text(json.dumps(stamps, indent=2))
+
+    summary = {
+        "params": params,
+        "workers": n_workers,
+        "elapsed_s": round(time.perf_counter() - t0, 3),
+        "counts": {s: sum(r["status"] == s for r in rows) for s in ("fixed", "up-to-date", "failed")},
+        "files": sorted(rows, key=lambda r: r["file"]),
+    }
+    if summary_path:
+        Path(summary_path).write_text(json.dumps(summary, indent=2))
+        print(f"[BATCH] Summary saved to {summary_path}")
+    print(f"[BATCH] Done in {summary['elapsed_s']}s: {summary['counts']}")
+    return summary
+
 if __name__ == "__main__":
-    if len(sys.argv) < 2:
-        print("Usage: python fix_volume_metadata.py <path_to_nrrd>")
-    else:
-        fix_volume(sys.argv[1])
+    parser = argparse.ArgumentParser(description="Fixes volume spacing/origin and converts volumes to _fixed.vtk meshes.")
+    parser.add_argument("inputs", nargs="+", help="Volume files, directories or glob patterns")
+    parser.add_argument("--spacing", type=float, nargs=3, default=DEFAULT_SPACING, help="Target spacing in microns")
+    parser.add_argument("--threshold", type=float, default=DEFAULT_THRESHOLD, help="Isosurface threshold (fraction of max)")
+    parser.add_argument("--workers", type=int, default=None, help="Max processes (also limited by available memory)")
+    parser.add_argument("--force", action="store_true", help="Rebuild outputs even if up to date")
+    parser.add_argument("--hash", action="store_true", help="Compare inputs by content hash instead of mtime")
+    parser.add_argument("--summary", type=Path, default=None, help="Write the timing/triangle summary to this JSON file")
+    args = parser.parse_args()
+
+    run_batch(args.inputs, tuple(args.spacing), args.threshold, workers=args.workers,
+              force=args.force, use_hash=args.hash, summary_path=args.summary)
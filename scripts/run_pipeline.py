@@ -0,0 +1,120 @@
+"""
+Runs the mining -> tracts -> mesh workflow as a DAG, rebuilding only what is out of date.
+
+    experiments --> connectivity            (data/processed/{seed}_connectivity.csv)
+         \\
+          `----> tracts --> fixed           ({id}_density_fixed.vtk)
+                      \\
+                       `--> filtered        (filtered_density.vtk)
+
+Usage:
+    python scripts/run_pipeline.py                 # build everything that is stale
+    python scripts/run_pipeline.py filtered        # only what 'filtered' needs
+    python scripts/run_pipeline.py --dry-run       # show what would rebuild
+    python scripts/run_pipeline.py --force tracts  # rebuild a node even if current
+"""
+import argparse
+import sys
+from pathlib import Path
+
+import pandas as pd
+import yaml
+
+PROJECT_ROOT = Path(__file__).resolve().parent.parent
+sys.path.append(str(PROJECT_ROOT))
+sys.path.append(str(PROJECT_ROOT / "src" / "miner")) # aggregate.py imports 'fetch' as a top-level module
+sys.path.append(str(PROJECT_ROOT / "scripts"))
+
+from src.common.pipeline import Node, Pipeline
+
+CONFIG_PATH = PROJECT_ROOT / "configs" / "mining_config.yaml"
+DATA_RAW_PATH = PROJECT_ROOT / "data" / "raw"
+DATA_PROCESSED = PROJECT_ROOT / "data" / "processed"
+TRACTS_DIR = DATA_PROCESSED / "tracts"
+PIPELINE_DIR = DATA_PROCESSED / "pipeline"
+STATE_PATH = PIPELINE_DIR / "pipeline_state.json"
+
+def build_pipeline(config: dict, max_workers: int = 4) -> Pipeline:
+    seed = config["experiment"]["seed_acronym"]
+    experiments_csv = PIPELINE_DIR / f"{seed}_experiments.csv"
+    connectivity_csv = DATA_PROCESSED / f"{seed}_connectivity.csv"
+    metric = "density"
+
+    def best_id():
+        # Imports stay inside the node functions: AllenSDK/VTK load only when a node runs
+        from aggregate import select_best_experiment
+        best = select_best_experiment(pd.read_csv(experiments_csv))
+        if best is None:
+            raise RuntimeError(f"No experiments found for seed {seed}")
+        return best
+
+    def raw_volume():
+        return TRACTS_DIR / f"{best_id()}_{metric}.nrrd"
+
+    # --- Node functions ---
+    def fetch_experiments():
+        from fetch import get_experiments
+        DATA_RAW_PATH.mkdir(parents=True, exist_ok=True)
+        experiments, _ = get_experiments(seed, DATA_RAW_PATH)
+        PIPELINE_DIR.mkdir(parents=True, exist_ok=True)
+        experiments.to_csv(experiments_csv, index=False)
+
+    def aggregate_connectivity():
+        from allensdk.core.mouse_connectivity_cache import MouseConnectivityCache
+        from aggregate import download_and_aggregate
+        mcc = MouseConnectivityCache(manifest_file=str(DATA_RAW_PATH / "manifest.json"), resolution=25)
+        final_df = download_and_aggregate(pd.read_csv(experiments_csv), mcc, config, fetch_tracts=False)
+        connectivity_csv.parent.mkdir(parents=True, exist_ok=True)
+        final_df.to_csv(connectivity_csv, index=False)
+
+    def extract_tracts():
+        from src.miner.extract_tracts import fetch_and_process_tracts
+        if not fetch_and_process_tracts(best_id()):
+            raise RuntimeError(f"Tract download failed for {best_id()}")
+
+    def fix_raw_volume():
+        from fix_volume_metadata import fix_volume
+        if fix_volume(str(raw_volume())) is None:
+            raise RuntimeError(f"fix_volume failed for {raw_volume().name}")
+
+    def filter_tracts():
+        from src.viewer.filter_tracts import run_filter
+        if run_filter(input_path=raw_volume(), output_path=TRACTS_DIR / f"filtered_{metric}.vtk") is None:
+            raise RuntimeError("run_filter failed")
+
+    # --- DAG ---
+    pipeline = Pipeline(STATE_PATH, max_workers=max_workers)
+    pipeline.add(Node("experiments", fetch_experiments, [experiments_csv], params={"seed": seed}))
+    pipeline.add(Node("connectivity", aggregate_connectivity, [connectivity_csv], deps=["experiments"],
+                      params=config.get("processing", {})))
+    pipeline.add(Node("tracts", extract_tracts, lambda: [raw_volume()], deps=["experiments"],
+                      params={"metric": metric}))
+    pipeline.add(Node("fixed", fix_raw_volume, lambda: [raw_volume().with_name(f"{raw_volume().stem}_fixed.vtk")],
+                      deps=["tracts"], params={"spacing": [25, 25, 25], "threshold": 0.05}))
+    pipeline.add(Node("filtered", filter_tracts, [TRACTS_DIR / f"filtered_{metric}.vtk"], deps=["tracts"],
+                      params={"targets": config.get("selection", {}).get("custom_targets", [])}))
+    return pipeline
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Make-style runner for the miner/tracts/mesh workflow.")
+    parser.add_argument("targets", nargs="*", help="Nodes to build (default: all)")
+    parser.add_argument("--dry-run", action="store_true", help="Only report which nodes are stale")
+    parser.add_argument("--force", nargs="+", default=[], metavar="NODE", help="Rebuild these nodes anyway")
+    parser.add_argument("--workers", type=int, default=4, help="Nodes run in parallel")
+    args = parser.parse_args()
+
+    with open(CONFIG_PATH, "r") as f:
+        config = yaml.safe_load(f)
+
+    pipeline = build_pipeline(config, max_workers=args.workers)
+    targets = args.targets or None
+
+    if args.dry_run:
+        for name, state in pipeline.plan(targets).items():
+            print(f"  {name:<14} {state}")
+    else:
+        result = pipeline.run(targets, force=args.force)
+        print("\n--- PIPELINE SUMMARY ---")
+        for name, state in result.items():
+            print(f"  {name:<14} {state}")
+        sys.exit(0 if all(s in ("built", "up-to-date") for s in result.values()) else 1)
@@ -0,0 +1,149 @@
+"""
+Bootstrap confidence intervals of per-region projection metrics across experiments
+(inter-animal variability): mean, standard deviation and coefficient of variation of
+each region, with percentile intervals from resampling the experiments.
+
+Resamples are never looped over in Python. A block of b resamples is drawn as a
+(b, n_experiments) index matrix and turned into a count matrix C (how many times each
+experiment was drawn); for the region x experiment matrix X, the sums behind every
+statistic of every region in every resample are three matrix products:
+    S = X @ C.T,  Q = X**2 @ C.T,  K = present @ C.T
+(missing values count as absent from the resample). Blocks run on a thread pool, since
+the products release the GIL, and each block has its own child seed of the root seed:
+the result only depends on the seed, not on the number of workers.
+
+Usage:
+    python src/analysis/bootstrap.py analysis/data/DR_full_analysis.csv --n-boot 5000 --seed 0
+"""
+import argparse
+import sys
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+# Add src to path
+sys.path.append(str(Path(__file__).resolve().parent.parent.parent))
+
+from src.analysis.data import DEFAULT_METRIC, HEMISPHERES, experiment_matrix, load_analysis
+from src.common.isosurface import default_workers
+
+BLOCK_SIZE = 256 # Resamples per block (fixed: part of what makes results reproducible)
+STATISTICS = ("mean", "std", "cv")
+
+def resample_counts(rng: np.random.Generator, n: int, b: int) -> np.ndarray:
+    """(b, n) times each of n items is drawn in each of b resamples with replacement."""
+    idx = rng.integers(0, n, size=(b, n))
+    idx += n * np.arange(b)[:, None]
+    return np.bincount(idx.ravel(), minlength=b * n).reshape(b, n).astype(float)
+
+def _statistics(S, Q, K):
+    """mean, std (ddof=1) and CV from sums, sums of squares and counts; NaN where undefined."""
+    with np.errstate(invalid="ignore", divide="ignore"):
+        mean = S / K
+        var = (Q - S * mean) / (K - 1)
+        std = np.sqrt(np.maximum(var, 0.0))
+        std[K < 2] = np.nan
+        cv = std / mean
+    return mean, std, cv
+
+def _nan_percentiles(values: np.ndarray, q) -> np.ndarray:
+    """
+    Percentiles (linear interpolation, as np.nanpercentile) of each row ignoring NaN,
+    vectorized over rows. Returns (len(q), rows).
+    """
+    ordered = np.sort(values, axis=1) # NaN sorted last
+    valid = (~np.isnan(ordered)).sum(axis=1)
+    out = np.full((len(q), len(values)), np.nan)
+    rows = np.flatnonzero(valid)
+    if len(rows) == 0:
+        return out
+    ordered, last = ordered[rows], valid[rows] - 1
+    for i, p in enumerate(q):
+        pos = last * (p / 100.0)
+        lo = np.floor(pos).astype(np.int64)
+        hi = np.minimum(lo + 1, last)
+        frac = pos - lo
+        a = np.take_along_axis(ordered, lo[:, None], axis=1)[:, 0]
+        b = np.take_along_axis(ordered, hi[:, None], axis=1)[:, 0]
+        out[i, rows] = a + (b - a) * frac
+    return out
+
+def bootstrap(X: np.ndarray, n_boot: int = 2000, ci: float = 95.0, seed: int = 0, workers: int = None,
+              block_size: int = BLOCK_SIZE) -> dict:
+    """
+    X: regions x experiments, NaN where a region has no value for an experiment.
+    Returns, for each statistic, the estimate on the data and the bounds of its
+    percentile interval: {"mean": (estimate, low, high), "std": ..., "cv": ...} plus
+    "n" (experiments per region). Regions with fewer than 2 experiments get NaN bounds.
+    """
+    X = np.asarray(X, dtype=float)
+    present = ~np.isnan(X)
+    X0 = np.where(present, X, 0.0)
+    X2 = X0 * X0
+    P = present.astype(float)
+    n_regions, n = X.shape
+
+    estimate = _statistics(X0.sum(axis=1), X2.sum(axis=1), P.sum(axis=1))
+    draws = {name: np.empty((n_regions, n_boot), dtype=np.float32) for name in STATISTICS}
+
+    starts = list(range(0, n_boot, block_size))
+    seeds = np.random.SeedSequence(seed).spawn(len(starts))
+
+    def run(block):
+        start = starts[block]
+        b = min(block_size, n_boot - start)
+        C = resample_counts(np.random.default_rng(seeds[block]), n, b).T
+        for name, values in zip(STATISTICS, _statistics(X0 @ C, X2 @ C, P @ C)):
+            draws[name][:, start:start + b] = values
+
+    if n > 0 and n_boot > 0:
+        with ThreadPoolExecutor(max_workers=workers or default_workers()) as pool:
+            list(pool.map(run, range(len(starts))))
+
+    alpha = (100.0 - ci) / 2
+    counts = present.sum(axis=1)
+    result = {"n": counts}
+    for name, point in zip(STATISTICS, estimate):
+        low, high = _nan_percentiles(draws[name], (alpha, 100.0 - alpha))
+        low[counts < 2] = np.nan
+        high[counts < 2] = np.nan
+        result[name] = (point, low, high)
+    return result
+
+def bootstrap_table(df: pd.DataFrame, metric: str = DEFAULT_METRIC, hemisphere: str = "both",
+                    n_boot: int = 2000, ci: float = 95.0, seed: int = 0, workers: int = None) -> pd.DataFrame:
+    """
+    One row per region (acronym) of a full-analysis table: n_experiments, and for mean,
+    std and cv the estimate with its {stat}_low / {stat}_high interval bounds.
+    """
+    matrix = experiment_matrix(df, metric=metric, hemisphere=hemisphere)
+    result = bootstrap(matrix.to_numpy(dtype=float), n_boot=n_boot, ci=ci, seed=seed, workers=workers)
+    table = pd.DataFrame({"n_experiments": result["n"]}, index=matrix.index)
+    for name in STATISTICS:
+        point, low, high = result[name]
+        table[name], table[f"{name}_low"], table[f"{name}_high"] = point, low, high
+    return table.sort_values("mean", ascending=False)
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Bootstrap confidence intervals of per-region metrics.")
+    parser.add_argument("csv", type=Path, help="{seed}_full_analysis.csv written by miner_analysis.py")
+    parser.add_argument("--metric", default=DEFAULT_METRIC)
+    parser.add_argument("--hemisphere", default="both", choices=list(HEMISPHERES))
+    parser.add_argument("--n-boot", type=int, default=2000)
+    parser.add_argument("--ci", type=float, default=95.0, help="Interval width in percent")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--workers", type=int, default=None)
+    parser.add_argument("--out", type=Path, default=None)
+    args = parser.parse_args(argv)
+
+    table = bootstrap_table(load_analysis(args.csv), metric=args.metric, hemisphere=args.hemisphere,
+                            n_boot=args.n_boot, ci=args.ci, seed=args.seed, workers=args.workers)
+    out = args.out or args.csv.with_name(f"{args.csv.stem}_bootstrap_{args.metric}.csv")
+    table.to_csv(out)
+    print(f"[BOOTSTRAP] {len(table)} regions, {args.n_boot} resamples ({args.ci:g}% CI) -> {out}")
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,163 @@
+"""
+Hierarchical clustering of target regions by their projection profile across
+experiments (the region x experiment density matrix of a {seed}_full_analysis.csv),
+to order and group regions instead of sorting hundreds of bars by mean density.
+
+Pairwise distances are computed in row blocks (a blocked Gram matrix), so memory
+beyond the condensed distance vector is bounded by BLOCK_BYTES. The dendrogram
+(scipy, average linkage by default) gets its optimal leaf ordering, so similar
+regions sit next to each other; clusters are numbered in that order.
+
+Cluster labels are written to analysis/data/{stem}_clusters.csv and, with
+--viewer-csv, as a "cluster" column of a viewer CSV, which the viewer then colors
+by cluster (logic.process_csv_data).
+
+Usage:
+    python src/analysis/clustering.py analysis/data/DR_full_analysis.csv --clusters 8 --log
+    python src/analysis/clustering.py analysis/data/DR_full_analysis.csv --viewer-csv data/processed/DR_demo_filtered.csv
+"""
+import argparse
+import sys
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+# Add src to path
+sys.path.append(str(Path(__file__).resolve().parent.parent.parent))
+
+from src.analysis.data import DEFAULT_METRIC, experiment_matrix, load_analysis
+
+DISTANCES = ("correlation", "cosine", "euclidean")
+LINKAGES = ("average", "complete", "single", "weighted", "ward")
+BLOCK_BYTES = 64 * 1024 ** 2 # Gram block size
+LOG_FLOOR = 1e-6 # Added before log10 (densities of 0)
+
+def pairwise_distances(X: np.ndarray, metric: str = "correlation", block_bytes: int = BLOCK_BYTES) -> np.ndarray:
+    """
+    Condensed distance vector (scipy.spatial.distance.pdist layout) between the rows
+    of X. correlation / cosine: 1 - r / 1 - cos (rows with no variance are at 1 from
+    everything); euclidean: from the Gram matrix.
+    """
+    if metric not in DISTANCES:
+        raise ValueError(f"Unknown distance '{metric}'. Options: {', '.join(DISTANCES)}")
+    X = np.asarray(X, dtype=float)
+    n = len(X)
+    if metric == "correlation":
+        X = X - X.mean(axis=1, keepdims=True)
+    if metric in ("correlation", "cosine"):
+        norms = np.linalg.norm(X, axis=1, keepdims=True)
+        X = np.divide(X, norms, out=np.zeros_like(X), where=norms > 0)
+    sq = (X * X).sum(axis=1)
+
+    out = np.empty(n * (n - 1) // 2)
+    block = max(1, block_bytes // (8 * max(n, 1)))
+    for a in range(0, n, block):
+        b = min(a + block, n)
+        gram = X[a:b] @ X[a:].T # Rows a..b against rows a..n: the upper triangle only
+        if metric == "euclidean":
+            dist = np.sqrt(np.maximum(sq[a:b, None] + sq[None, a:] - 2 * gram, 0.0))
+        else:
+            dist = np.clip(1.0 - gram, 0.0, 2.0)
+        for i in range(a, b):
+            start = i * n - i * (i + 1) // 2
+            out[start:start + n - i - 1] = dist[i - a, i - a + 1:]
+    return out
+
+def cluster_matrix(X: np.ndarray, n_clusters: int = None, threshold: float = None, metric: str = "correlation",
+                   method: str = "average", block_bytes: int = BLOCK_BYTES):
+    """
+    Clusters the rows of X: (labels, leaf_order, linkage). Labels start at 1 and are
+    numbered in leaf order; cut at n_clusters clusters, or at the distance threshold.
+    """
+    from scipy.cluster import hierarchy
+
+    if method not in LINKAGES:
+        raise ValueError(f"Unknown linkage '{method}'. Options: {', '.join(LINKAGES)}")
+    if (n_clusters is None) == (threshold is None):
+        raise ValueError("cluster_matrix() needs either n_clusters or threshold")
+    n = len(X)
+    if n < 2:
+        return np.ones(n, dtype=np.int64), np.arange(n), np.zeros((0, 4))
+    if method == "ward" and metric != "euclidean":
+        raise ValueError("ward linkage needs the euclidean distance")
+
+    distances = pairwise_distances(X, metric, block_bytes)
+    Z = hierarchy.optimal_leaf_ordering(hierarchy.linkage(distances, method=method), distances)
+    leaves = hierarchy.leaves_list(Z)
+    if n_clusters is not None:
+        raw = hierarchy.fcluster(Z, t=n_clusters, criterion="maxclust")
+    else:
+        raw = hierarchy.fcluster(Z, t=threshold, criterion="distance")
+    # Renumber clusters by their first leaf: cluster 1 is at the top of the ordering
+    _, first = np.unique(raw[leaves], return_index=True)
+    rank = np.empty(raw.max() + 1, dtype=np.int64)
+    rank[raw[leaves][np.sort(first)]] = np.arange(1, len(first) + 1)
+    return rank[raw], leaves, Z
+
+def cluster_regions(df: pd.DataFrame, n_clusters: int = 8, threshold: float = None, metric: str = "correlation",
+                    method: str = "average", value: str = DEFAULT_METRIC, log: bool = False,
+                    min_mean: float = 0.0) -> pd.DataFrame:
+    """
+    Clusters the regions of a full-analysis table by their values across experiments
+    (missing = 0; log10 of value + LOG_FLOOR with log). Regions whose mean is not above
+    min_mean are left out. Returns one row per region in leaf order: cluster,
+    leaf_order, mean, n_experiments.
+    """
+    matrix = experiment_matrix(df, metric=value)
+    n_experiments = matrix.notna().sum(axis=1)
+    matrix = matrix.fillna(0.0)
+    mean = matrix.mean(axis=1)
+    matrix = matrix[mean > min_mean]
+    X = matrix.to_numpy(dtype=float)
+    if log:
+        X = np.log10(X + LOG_FLOOR)
+
+    labels, leaves, _ = cluster_matrix(X, n_clusters=None if threshold is not None else n_clusters,
+                                       threshold=threshold, metric=metric, method=method)
+    result = pd.DataFrame({"cluster": labels, "leaf_order": np.argsort(leaves), "mean": mean[matrix.index],
+                           "n_experiments": n_experiments[matrix.index]}, index=matrix.index)
+    return result.sort_values("leaf_order")
+
+def add_cluster_column(viewer_csv, clusters: pd.DataFrame, out=None) -> Path:
+    """
+    Writes the cluster of each region (by acronym) as the "cluster" column of a viewer
+    CSV (acronym, value, is_seed, ...). Regions that were not clustered are left empty.
+    """
+    viewer_csv = Path(viewer_csv)
+    out = Path(out) if out else viewer_csv
+    df = pd.read_csv(viewer_csv)
+    df["cluster"] = df["acronym"].map(clusters["cluster"]).astype("Int64")
+    tmp = out.with_name(f".{out.name}.tmp")
+    df.to_csv(tmp, index=False)
+    tmp.replace(out)
+    return out
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Hierarchical clustering of regions by projection profile.")
+    parser.add_argument("csv", type=Path, help="{seed}_full_analysis.csv written by miner_analysis.py")
+    cut = parser.add_mutually_exclusive_group()
+    cut.add_argument("--clusters", type=int, default=8, help="Number of clusters")
+    cut.add_argument("--threshold", type=float, default=None, help="Cut the dendrogram at this distance instead")
+    parser.add_argument("--metric", default=DEFAULT_METRIC, help="Column of the analysis table")
+    parser.add_argument("--distance", default="correlation", choices=DISTANCES)
+    parser.add_argument("--linkage", default="average", choices=LINKAGES)
+    parser.add_argument("--log", action="store_true", help="Cluster log10 values (densities span decades)")
+    parser.add_argument("--min-mean", type=float, default=0.0, help="Skip regions with a mean at or below this")
+    parser.add_argument("--out", type=Path, default=None)
+    parser.add_argument("--viewer-csv", type=Path, default=None, help="Viewer CSV to add the cluster column to")
+    args = parser.parse_args(argv)
+
+    clusters = cluster_regions(load_analysis(args.csv), n_clusters=args.clusters, threshold=args.threshold,
+                               metric=args.distance, method=args.linkage, value=args.metric, log=args.log,
+                               min_mean=args.min_mean)
+    out = args.out or args.csv.with_name(f"{args.csv.stem}_clusters.csv")
+    clusters.to_csv(out)
+    print(f"[CLUSTER] {len(clusters)} regions in {clusters['cluster'].nunique()} clusters -> {out}")
+    if args.viewer_csv:
+        path = add_cluster_column(args.viewer_csv, clusters)
+        print(f"[CLUSTER] Added the cluster column to {path}")
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
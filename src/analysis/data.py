@@ -0,0 +1,53 @@
+"""
+Loading the full-analysis table written by src/miner/miner_analysis.py
+({seed}_full_analysis.csv: one row per experiment, structure and hemisphere) into the
+region x experiment matrices the analysis modules work on.
+"""
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+PROJECT_ROOT = Path(__file__).resolve().parent.parent.parent
+ANALYSIS_DIR = PROJECT_ROOT / "analysis" / "data"
+DEFAULT_METRIC = "projection_density"
+# Rows kept for each hemisphere option (Allen hemisphere_id: 1 Left, 2 Right, 3 both)
+HEMISPHERES = {
+    "both": ("hemisphere_id", 3),
+    "ipsi": ("lateralization", "Ipsilateral"),
+    "contra": ("lateralization", "Contralateral"),
+}
+EXPERIMENT_COLUMNS = ["gender", "strain", "injection_volume"]
+
+def load_analysis(path) -> pd.DataFrame:
+    return pd.read_csv(path)
+
+def select_rows(df: pd.DataFrame, hemisphere: str = "both", include_injection: bool = False) -> pd.DataFrame:
+    """Rows of one hemisphere option, without the injection-site rows by default."""
+    if hemisphere not in HEMISPHERES:
+        raise ValueError(f"Unknown hemisphere '{hemisphere}'. Options: {', '.join(HEMISPHERES)}")
+    if not include_injection and "is_injection" in df.columns:
+        df = df[~df["is_injection"].astype(bool)]
+    column, value = HEMISPHERES[hemisphere]
+    if column in df.columns:
+        df = df[df[column] == value]
+    return df
+
+def experiment_matrix(df: pd.DataFrame, metric: str = DEFAULT_METRIC, hemisphere: str = "both",
+                      include_injection: bool = False) -> pd.DataFrame:
+    """
+    Regions (rows, acronym) x experiments (columns, experiment_id) of one metric.
+    Structures an experiment has no row for are NaN.
+    """
+    rows = select_rows(df, hemisphere, include_injection)
+    matrix = rows.pivot_table(index="acronym", columns="experiment_id", values=metric, aggfunc="mean")
+    matrix.columns.name = "experiment_id"
+    return matrix.sort_index()
+
+def experiment_info(df: pd.DataFrame) -> pd.DataFrame:
+    """One row per experiment_id with its metadata columns (gender, strain, injection_volume)."""
+    columns = [c for c in EXPERIMENT_COLUMNS if c in df.columns]
+    return df.groupby("experiment_id")[columns].first().sort_index()
+
+def as_array(matrix: pd.DataFrame) -> np.ndarray:
+    return matrix.to_numpy(dtype=float)
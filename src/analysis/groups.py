@@ -0,0 +1,263 @@
+"""
+Group comparisons of per-region metrics (males vs females, strain vs strain, ipsi vs
+contralateral hemisphere): permutation tests and effect sizes for every region at
+once, Benjamini-Hochberg FDR, and a ranked region table.
+
+Independent groups (gender, strain): the test statistic is Welch's t. A block of
+permutations is a (b, n_experiments) 0/1 membership matrix of group A; the group sums
+of every region under every relabelling are matrix products with the region x
+experiment matrix, as in bootstrap.py. Hemispheres are paired within an experiment:
+the statistic is the paired t of ipsi - contra and permutations flip the sign of each
+experiment's differences.
+
+When all distinct relabellings (or sign flips) fit in the permutation budget they are
+enumerated instead of sampled, giving the exact permutation p-value (with 10
+experiments, 4 F vs 6 M only has 210).
+
+Usage:
+    python src/analysis/groups.py analysis/data/DR_full_analysis.csv --by gender --n-perm 10000
+    python src/analysis/groups.py analysis/data/DR_full_analysis.csv --by hemisphere
+"""
+import argparse
+import itertools
+import math
+import sys
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+# Add src to path
+sys.path.append(str(Path(__file__).resolve().parent.parent.parent))
+
+from src.analysis.data import DEFAULT_METRIC, experiment_info, experiment_matrix, load_analysis
+from src.common.isosurface import default_workers
+
+BLOCK_SIZE = 512 # Permutations per block
+GROUPINGS = ("gender", "strain", "hemisphere")
+TIE_TOLERANCE = 1e-9 # Relative: permuted statistics this close to the observed one count as ties
+
+def _welch_t(S, Q, K, S_total, Q_total, K_total):
+    """Welch's t of group A (sums S, Q, K) against the rest; also the group means and variances."""
+    Sb, Qb, Kb = S_total - S, Q_total - Q, K_total - K
+    with np.errstate(invalid="ignore", divide="ignore"):
+        ma, mb = S / K, Sb / Kb
+        va = np.maximum(Q - S * ma, 0.0) / (K - 1)
+        vb = np.maximum(Qb - Sb * mb, 0.0) / (Kb - 1)
+        diff = ma - mb
+        t = diff / np.sqrt(va / K + vb / Kb)
+    t[(diff == 0) & np.isnan(t)] = 0.0 # Constant regions (e.g. all zero): no difference
+    t[(K < 2) | (Kb < 2)] = np.nan
+    return t, ma, mb, va, vb
+
+def _paired_t(S, Q, K):
+    """Paired t from the sum, sum of squares and count of the differences."""
+    with np.errstate(invalid="ignore", divide="ignore"):
+        mean = S / K
+        sd = np.sqrt(np.maximum(Q - S * mean, 0.0) / (K - 1))
+        t = mean / (sd / np.sqrt(K))
+    t[(mean == 0) & np.isnan(t)] = 0.0
+    t[np.broadcast_to(K < 2, t.shape)] = np.nan
+    return t, mean, sd
+
+def fdr_bh(p_values) -> np.ndarray:
+    """Benjamini-Hochberg adjusted p-values (q-values); NaN entries are left out of the count."""
+    p = np.asarray(p_values, dtype=float)
+    q = np.full(p.shape, np.nan)
+    valid = np.flatnonzero(~np.isnan(p))
+    if len(valid) == 0:
+        return q
+    order = valid[np.argsort(p[valid])]
+    m = len(order)
+    scaled = p[order] * m / np.arange(1, m + 1)
+    q[order] = np.minimum(np.minimum.accumulate(scaled[::-1])[::-1], 1.0)
+    return q
+
+def hedges_correction(df) -> np.ndarray:
+    """Small-sample bias correction J of Cohen's d for the given degrees of freedom."""
+    with np.errstate(invalid="ignore", divide="ignore"):
+        return 1.0 - 3.0 / (4.0 * np.asarray(df, dtype=float) - 1.0)
+
+def _label_blocks(labels: np.ndarray, n_perm: int, seed: int, block_size: int):
+    """
+    Blocks of permuted 0/1 labels. Exact (every distinct relabelling, the observed one
+    included) when there are at most n_perm of them; otherwise n_perm random shuffles.
+    """
+    n, k = len(labels), int(labels.sum())
+    if math.comb(n, k) <= n_perm:
+        combos = np.array(list(itertools.combinations(range(n), k)), dtype=np.int64).reshape(-1, k)
+        members = np.zeros((len(combos), n))
+        members[np.arange(len(combos))[:, None], combos] = 1.0
+        return True, [lambda s=s: members[s:s + block_size] for s in range(0, len(members), block_size)]
+    starts = list(range(0, n_perm, block_size))
+    seeds = np.random.SeedSequence(seed).spawn(len(starts))
+
+    def draw(start, block_seed):
+        b = min(block_size, n_perm - start)
+        return np.random.default_rng(block_seed).permuted(np.tile(labels, (b, 1)), axis=1)
+    return False, [lambda s=s, q=q: draw(s, q) for s, q in zip(starts, seeds)]
+
+def _sign_blocks(n: int, n_perm: int, seed: int, block_size: int):
+    """Blocks of +-1 sign flips, exhaustive (2^n) when that fits in n_perm."""
+    if 2 ** n <= n_perm:
+        signs = 1.0 - 2.0 * ((np.arange(2 ** n)[:, None] >> np.arange(n)) & 1)
+        return True, [lambda s=s: signs[s:s + block_size] for s in range(0, len(signs), block_size)]
+    starts = list(range(0, n_perm, block_size))
+    seeds = np.random.SeedSequence(seed).spawn(len(starts))
+
+    def draw(start, block_seed):
+        b = min(block_size, n_perm - start)
+        return np.random.default_rng(block_seed).choice([-1.0, 1.0], size=(b, n))
+    return False, [lambda s=s, q=q: draw(s, q) for s, q in zip(starts, seeds)]
+
+def _permutation_p(observed, blocks, statistic, exact: bool, workers: int):
+    """Two-sided p-values: share of permutations at least as extreme as the observed statistic."""
+    threshold = np.abs(observed) * (1 - TIE_TOLERANCE)
+    counts = np.zeros((len(blocks), 2, len(observed)), dtype=np.int64)
+
+    def run(i):
+        t = np.abs(statistic(blocks[i]()))
+        counts[i, 0] = (t >= threshold[:, None]).sum(axis=1)
+        counts[i, 1] = (~np.isnan(t)).sum(axis=1)
+
+    with ThreadPoolExecutor(max_workers=workers or default_workers()) as pool:
+        list(pool.map(run, range(len(blocks))))
+    extreme, valid = counts.sum(axis=0)
+    with np.errstate(invalid="ignore", divide="ignore"):
+        # Sampled permutations leave out the observed labelling: count it once (Phipson & Smyth)
+        p = extreme / valid if exact else (extreme + 1) / (valid + 1)
+    p[np.isnan(observed) | (valid == 0)] = np.nan
+    return np.minimum(p, 1.0)
+
+def compare_groups(X: np.ndarray, labels, n_perm: int = 10000, seed: int = 0, workers: int = None,
+                   block_size: int = BLOCK_SIZE) -> dict:
+    """
+    X: regions x experiments (NaN where missing); labels: True for the experiments of
+    group A. Welch's t, Hedges' g (A - B, pooled SD) and permutation p-values per region.
+    """
+    X = np.asarray(X, dtype=float)
+    labels = np.asarray(labels, dtype=float)
+    present = ~np.isnan(X)
+    X0 = np.where(present, X, 0.0)
+    X2 = X0 * X0
+    P = present.astype(float)
+    S_total, Q_total, K_total = X0.sum(axis=1), X2.sum(axis=1), P.sum(axis=1)
+
+    K = P @ labels
+    t, ma, mb, va, vb = _welch_t(X0 @ labels, X2 @ labels, K, S_total, Q_total, K_total)
+    Kb = K_total - K
+    with np.errstate(invalid="ignore", divide="ignore"):
+        pooled = np.sqrt(((K - 1) * va + (Kb - 1) * vb) / (K + Kb - 2))
+        g = (ma - mb) / pooled * hedges_correction(K + Kb - 2)
+    g[(ma == mb) & np.isnan(g)] = 0.0
+
+    def statistic(members):
+        C = members.T
+        return _welch_t(X0 @ C, X2 @ C, P @ C, S_total[:, None], Q_total[:, None], K_total[:, None])[0]
+
+    exact, blocks = _label_blocks(labels, n_perm, seed, block_size)
+    p = _permutation_p(t, blocks, statistic, exact, workers)
+    return {"n_a": K, "n_b": Kb, "mean_a": ma, "mean_b": mb, "effect_size": g, "t": t, "p_value": p,
+            "exact": exact}
+
+def compare_paired(A: np.ndarray, B: np.ndarray, n_perm: int = 10000, seed: int = 0, workers: int = None,
+                   block_size: int = BLOCK_SIZE) -> dict:
+    """
+    A, B: regions x experiments of the two conditions of the same experiments (e.g. ipsi
+    and contra). Paired t, Hedges-corrected d_z and sign-flip permutation p-values.
+    """
+    A, B = np.asarray(A, dtype=float), np.asarray(B, dtype=float)
+    D = A - B
+    present = ~np.isnan(D)
+    D0 = np.where(present, D, 0.0)
+    Q, K = (D0 * D0).sum(axis=1), present.sum(axis=1).astype(float)
+    t, mean, sd = _paired_t(D0.sum(axis=1), Q, K)
+    with np.errstate(invalid="ignore", divide="ignore"):
+        g = mean / sd * hedges_correction(K - 1)
+    g[(mean == 0) & np.isnan(g)] = 0.0
+
+    def statistic(signs):
+        return _paired_t(D0 @ signs.T, Q[:, None], K[:, None])[0]
+
+    exact, blocks = _sign_blocks(D.shape[1], n_perm, seed, block_size)
+    p = _permutation_p(t, blocks, statistic, exact, workers)
+    with np.errstate(invalid="ignore", divide="ignore"):
+        mean_a = np.where(present, A, 0.0).sum(axis=1) / K
+        mean_b = np.where(present, B, 0.0).sum(axis=1) / K
+    return {"n_a": K, "n_b": K, "mean_a": mean_a, "mean_b": mean_b, "effect_size": g, "t": t, "p_value": p,
+            "exact": exact}
+
+def group_table(df: pd.DataFrame, by: str = "gender", groups=None, metric: str = DEFAULT_METRIC,
+                hemisphere: str = "both", n_perm: int = 10000, alpha: float = 0.05, seed: int = 0,
+                workers: int = None) -> pd.DataFrame:
+    """
+    Ranked region table of a full-analysis CSV: one row per region with group sizes,
+    group means, difference, effect size (Hedges' g), t, p_value, q_value (BH FDR) and
+    significant (q < alpha), most significant first.
+
+    by: "gender" / "strain" (groups: the two values to compare, default the two values
+    present) or "hemisphere" (ipsi vs contra of each experiment, paired).
+    """
+    if by == "hemisphere":
+        names = ("Ipsilateral", "Contralateral")
+        ipsi = experiment_matrix(df, metric=metric, hemisphere="ipsi")
+        contra = experiment_matrix(df, metric=metric, hemisphere="contra")
+        ipsi, contra = ipsi.align(contra, join="outer")
+        index = ipsi.index
+        result = compare_paired(ipsi.to_numpy(float), contra.to_numpy(float), n_perm=n_perm, seed=seed,
+                                workers=workers)
+    else:
+        info = experiment_info(df)
+        if by not in info.columns:
+            raise ValueError(f"No '{by}' column in the analysis table")
+        values = info[by].dropna()
+        names = tuple(groups) if groups else tuple(sorted(values.unique()))
+        if len(names) != 2:
+            raise ValueError(f"Need exactly two '{by}' groups, found {list(names)}")
+        experiments = values.index[values.isin(names)]
+        matrix = experiment_matrix(df, metric=metric, hemisphere=hemisphere)
+        matrix = matrix.reindex(columns=experiments)
+        index = matrix.index
+        labels = (values.loc[experiments] == names[0]).to_numpy()
+        result = compare_groups(matrix.to_numpy(float), labels, n_perm=n_perm, seed=seed, workers=workers)
+
+    print(f"[GROUPS] {by}: {names[0]} vs {names[1]}, "
+          f"{'exact' if result['exact'] else f'{n_perm} random'} permutations")
+    table = pd.DataFrame({k: v for k, v in result.items() if k != "exact"}, index=index)
+    table.insert(0, "group_a", names[0])
+    table.insert(1, "group_b", names[1])
+    table.insert(6, "difference", table["mean_a"] - table["mean_b"])
+    table["q_value"] = fdr_bh(table["p_value"].to_numpy())
+    table["significant"] = table["q_value"] < alpha
+    table["abs_effect"] = table["effect_size"].abs()
+    table = table.sort_values(["q_value", "p_value", "abs_effect"], ascending=[True, True, False])
+    table = table.drop(columns="abs_effect")
+    table.insert(0, "rank", np.arange(1, len(table) + 1))
+    return table
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Permutation tests of per-region metrics between two groups.")
+    parser.add_argument("csv", type=Path, help="{seed}_full_analysis.csv written by miner_analysis.py")
+    parser.add_argument("--by", default="gender", choices=GROUPINGS)
+    parser.add_argument("--groups", nargs=2, default=None, help="The two values of --by to compare (e.g. M F)")
+    parser.add_argument("--metric", default=DEFAULT_METRIC)
+    parser.add_argument("--hemisphere", default="both", choices=["both", "ipsi", "contra"],
+                        help="Rows used for gender/strain comparisons")
+    parser.add_argument("--n-perm", type=int, default=10000)
+    parser.add_argument("--alpha", type=float, default=0.05, help="FDR level")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--workers", type=int, default=None)
+    parser.add_argument("--out", type=Path, default=None)
+    args = parser.parse_args(argv)
+
+    table = group_table(load_analysis(args.csv), by=args.by, groups=args.groups, metric=args.metric,
+                        hemisphere=args.hemisphere, n_perm=args.n_perm, alpha=args.alpha, seed=args.seed,
+                        workers=args.workers)
+    out = args.out or args.csv.with_name(f"{args.csv.stem}_{args.by}_{args.metric}.csv")
+    table.to_csv(out)
+    print(f"[GROUPS] {int(table['significant'].sum())}/{len(table)} regions with q < {args.alpha:g} -> {out}")
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
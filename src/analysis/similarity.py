@@ -0,0 +1,292 @@
+"""
+Projection-profile similarity between experiments: "which other injections project
+most like this one?"
+
+Every experiment of every mined seed ({seed}_full_analysis.csv in analysis/data) is a
+vector over the union of target regions (hemisphere "both", injection rows left out,
+missing regions 0). Vectors are normalized once, so similarity is a dot product:
+    cosine       v / |v|
+    correlation  (v - mean(v)) / |v - mean(v)|   (Pearson r)
+Exact search is a blocked matrix product with a running top-k. Above EXACT_LIMIT
+experiments an LSH index (random-hyperplane signatures, several tables, Hamming-1
+probing) picks candidates that are then ranked exactly.
+
+The index is cached in analysis/data/similarity_index_{metric}_{similarity}.npz and
+rebuilt when the CSVs change.
+
+Usage:
+    python src/analysis/similarity.py --experiment 114155190 -k 10
+    python src/analysis/similarity.py --seed DR --similarity correlation
+"""
+import argparse
+import sys
+from pathlib import Path
+from typing import Dict
+
+import numpy as np
+import pandas as pd
+
+# Add src to path
+sys.path.append(str(Path(__file__).resolve().parent.parent.parent))
+
+from src.analysis.data import ANALYSIS_DIR, DEFAULT_METRIC, experiment_matrix, load_analysis
+
+SIMILARITIES = ("cosine", "correlation")
+METHODS = ("auto", "exact", "lsh")
+EXACT_LIMIT = 50000 # Experiments above which "auto" switches to LSH
+BLOCK_ROWS = 8192   # Index vectors per block of the exact search
+INDEX_VERSION = 1
+ANALYSIS_SUFFIX = "_full_analysis.csv"
+
+def normalize(vectors: np.ndarray, similarity: str = "cosine") -> np.ndarray:
+    """Rows scaled (and centered for correlation) so that dot products are similarities; zero rows stay zero."""
+    if similarity not in SIMILARITIES:
+        raise ValueError(f"Unknown similarity '{similarity}'. Options: {', '.join(SIMILARITIES)}")
+    vectors = np.asarray(vectors, dtype=np.float32)
+    if similarity == "correlation":
+        vectors = vectors - vectors.mean(axis=1, keepdims=True)
+    norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+    return np.divide(vectors, norms, out=np.zeros_like(vectors), where=norms > 0)
+
+def exact_search(queries: np.ndarray, vectors: np.ndarray, k: int, exclude=None, block_rows: int = BLOCK_ROWS):
+    """
+    Top-k rows of vectors by dot product with each query: (indices, scores), both
+    (n_queries, k), best first. exclude: rows never returned (e.g. the query itself).
+    """
+    queries = np.atleast_2d(queries)
+    n_queries, n = len(queries), len(vectors)
+    k = min(k, n)
+    best_idx = np.zeros((n_queries, 0), dtype=np.int64)
+    best = np.zeros((n_queries, 0), dtype=np.float32)
+    excluded = np.zeros(n, dtype=bool)
+    if exclude is not None:
+        excluded[np.asarray(list(exclude), dtype=np.int64)] = True
+    for start in range(0, n, block_rows):
+        scores = queries @ vectors[start:start + block_rows].T
+        scores[:, excluded[start:start + block_rows]] = -np.inf
+        idx = np.broadcast_to(np.arange(start, start + scores.shape[1]), scores.shape)
+        scores, idx = np.hstack([best, scores]), np.hstack([best_idx, idx])
+        if scores.shape[1] > k:
+            keep = np.argpartition(-scores, k - 1, axis=1)[:, :k]
+            scores, idx = np.take_along_axis(scores, keep, 1), np.take_along_axis(idx, keep, 1)
+        best, best_idx = scores, idx
+    order = np.argsort(-best, axis=1, kind="stable")
+    best, best_idx = np.take_along_axis(best, order, 1), np.take_along_axis(best_idx, order, 1)
+    valid = np.isfinite(best)
+    return np.where(valid, best_idx, -1), np.where(valid, best, np.nan)
+
+class LSHIndex:
+    """
+    Random-hyperplane LSH for cosine similarity: each table hashes a vector to the sign
+    pattern of n_bits projections. A query's candidates are the vectors sharing its
+    bucket, or a bucket one bit away, in any table.
+    """
+    def __init__(self, vectors: np.ndarray, n_tables: int = 8, n_bits: int = 16, seed: int = 0):
+        self.vectors = vectors
+        self.n_bits = n_bits
+        rng = np.random.default_rng(seed)
+        self.planes = rng.standard_normal((n_tables, n_bits, vectors.shape[1])).astype(np.float32)
+        self.weights = (1 << np.arange(n_bits)).astype(np.int64)
+        codes = self.hash(vectors)                      # (n_tables, n)
+        self.order = np.argsort(codes, axis=1, kind="stable")
+        self.sorted_codes = np.take_along_axis(codes, self.order, 1)
+
+    def hash(self, vectors: np.ndarray) -> np.ndarray:
+        bits = np.einsum("tbd,nd->tnb", self.planes, np.atleast_2d(vectors)) > 0
+        return bits.astype(np.int64) @ self.weights
+
+    def candidates(self, query: np.ndarray) -> np.ndarray:
+        codes = self.hash(query)[:, 0]                  # (n_tables,)
+        probes = np.concatenate([codes[:, None], codes[:, None] ^ self.weights[None, :]], axis=1)
+        found = []
+        for table, table_probes in enumerate(probes):
+            lo = np.searchsorted(self.sorted_codes[table], table_probes, side="left")
+            hi = np.searchsorted(self.sorted_codes[table], table_probes, side="right")
+            for a, b in zip(lo, hi):
+                if b > a:
+                    found.append(self.order[table, a:b])
+        return np.unique(np.concatenate(found)) if found else np.zeros(0, dtype=np.int64)
+
+    def search(self, queries: np.ndarray, k: int, exclude=None):
+        """Same output as exact_search, over each query's candidates only."""
+        queries = np.atleast_2d(queries)
+        idx = np.full((len(queries), k), -1, dtype=np.int64)
+        scores = np.full((len(queries), k), np.nan, dtype=np.float32)
+        skip = set(int(i) for i in exclude) if exclude is not None else set()
+        for q, query in enumerate(queries):
+            rows = np.array([r for r in self.candidates(query) if int(r) not in skip], dtype=np.int64)
+            if len(rows) == 0:
+                continue
+            top, top_scores = exact_search(query, self.vectors[rows], k)
+            found = top[0] >= 0
+            idx[q, :found.sum()] = rows[top[0][found]]
+            scores[q, :found.sum()] = top_scores[0][found]
+        return idx, scores
+
+class SimilarityIndex:
+    def __init__(self, vectors, experiment_ids, seeds, acronyms, similarity="cosine", metric=DEFAULT_METRIC,
+                 sources=None):
+        self.vectors = np.asarray(vectors, dtype=np.float32) # Normalized
+        self.experiment_ids = np.asarray(experiment_ids, dtype=np.int64)
+        self.seeds = np.asarray(seeds).astype(str)
+        self.acronyms = np.asarray(acronyms).astype(str)
+        self.similarity = similarity
+        self.metric = metric
+        self.sources = np.asarray(sources if sources is not None else [], dtype=str) # Signature of the input CSVs
+        self._rows = {int(e): row for row, e in enumerate(self.experiment_ids)}
+        self._lsh = None
+
+    def __len__(self):
+        return len(self.experiment_ids)
+
+    # --- Building ---
+
+    @classmethod
+    def from_tables(cls, tables: Dict[str, pd.DataFrame], metric: str = DEFAULT_METRIC, similarity: str = "cosine",
+                    sources=None):
+        """tables: seed -> full-analysis DataFrame. An experiment found under several seeds is kept once."""
+        matrices, seeds = [], []
+        for seed, df in tables.items():
+            matrix = experiment_matrix(df, metric=metric)
+            matrices.append(matrix)
+            seeds += [seed] * matrix.shape[1]
+        if not matrices:
+            raise ValueError("No analysis tables to index")
+        combined = pd.concat(matrices, axis=1).fillna(0.0)
+        keep = ~combined.columns.duplicated()
+        combined = combined.loc[:, keep]
+        return cls(normalize(combined.to_numpy().T, similarity), combined.columns.to_numpy(),
+                   np.asarray(seeds)[keep], combined.index.to_numpy(), similarity, metric, sources)
+
+    @classmethod
+    def from_directory(cls, analysis_dir: Path = ANALYSIS_DIR, metric: str = DEFAULT_METRIC,
+                       similarity: str = "cosine"):
+        paths = analysis_files(analysis_dir)
+        if not paths:
+            raise ValueError(f"No *{ANALYSIS_SUFFIX} in {analysis_dir}: run miner_analysis.py first")
+        tables = {p.name[:-len(ANALYSIS_SUFFIX)]: load_analysis(p) for p in paths}
+        return cls.from_tables(tables, metric=metric, similarity=similarity, sources=source_signature(paths))
+
+    # --- Persistence ---
+
+    def save(self, path):
+        path = Path(path)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        tmp = path.with_name(f".{path.stem}.tmp.npz")
+        np.savez(tmp, version=INDEX_VERSION, vectors=self.vectors, experiment_ids=self.experiment_ids,
+                 seeds=self.seeds, acronyms=self.acronyms, similarity=self.similarity, metric=self.metric,
+                 sources=self.sources)
+        tmp.replace(path)
+
+    @classmethod
+    def load(cls, path):
+        with np.load(path) as npz:
+            if int(npz["version"]) != INDEX_VERSION:
+                raise ValueError(f"similarity index version {int(npz['version'])}")
+            return cls(npz["vectors"], npz["experiment_ids"], npz["seeds"], npz["acronyms"],
+                       str(npz["similarity"]), str(npz["metric"]), npz["sources"])
+
+    # --- Queries ---
+
+    def search(self, queries: np.ndarray, k: int = 10, exclude=None, method: str = "auto"):
+        """Top-k (rows, scores) of already normalized query vectors."""
+        if method not in METHODS:
+            raise ValueError(f"Unknown method '{method}'. Options: {', '.join(METHODS)}")
+        if method == "lsh" or (method == "auto" and len(self) > EXACT_LIMIT):
+            if self._lsh is None:
+                self._lsh = LSHIndex(self.vectors)
+            return self._lsh.search(queries, k, exclude)
+        return exact_search(queries, self.vectors, k, exclude)
+
+    def _result(self, rows, scores) -> pd.DataFrame:
+        found = rows >= 0
+        rows = rows[found]
+        return pd.DataFrame({"rank": np.arange(1, len(rows) + 1), "experiment_id": self.experiment_ids[rows],
+                             "seed": self.seeds[rows], "similarity": scores[found].astype(float)})
+
+    def neighbors(self, experiment_id: int, k: int = 10, method: str = "auto") -> pd.DataFrame:
+        """The k experiments most similar to one experiment (itself left out)."""
+        row = self._rows.get(int(experiment_id))
+        if row is None:
+            raise KeyError(f"Experiment {experiment_id} is not in the similarity index")
+        rows, scores = self.search(self.vectors[row], k, exclude=[row], method=method)
+        return self._result(rows[0], scores[0])
+
+    def seed_neighbors(self, seed: str, k: int = 10, method: str = "auto") -> pd.DataFrame:
+        """
+        The k experiments of other seeds most similar to a seed's mean profile (the
+        normalized average of its experiments' vectors).
+        """
+        own = np.flatnonzero(self.seeds == seed)
+        if len(own) == 0:
+            raise KeyError(f"Seed '{seed}' is not in the similarity index")
+        profile = normalize(self.vectors[own].mean(axis=0, keepdims=True), "cosine")
+        rows, scores = self.search(profile, k, exclude=own, method=method)
+        return self._result(rows[0], scores[0])
+
+    def query(self, key, k: int = 10, method: str = "auto") -> pd.DataFrame:
+        """By experiment ID (an integer or a string of digits) or by seed acronym."""
+        if isinstance(key, (int, np.integer)) or str(key).strip().isdigit():
+            return self.neighbors(int(key), k, method)
+        return self.seed_neighbors(str(key).strip(), k, method)
+
+def analysis_files(analysis_dir: Path = ANALYSIS_DIR):
+    return sorted(Path(analysis_dir).glob(f"*{ANALYSIS_SUFFIX}"))
+
+def source_signature(paths) -> list:
+    return [f"{p.name}:{p.stat().st_size}:{p.stat().st_mtime_ns}" for p in paths]
+
+def cache_path_for(metric: str, similarity: str, analysis_dir: Path = ANALYSIS_DIR) -> Path:
+    return Path(analysis_dir) / f"similarity_index_{metric}_{similarity}.npz"
+
+def load_similarity_index(analysis_dir: Path = ANALYSIS_DIR, metric: str = DEFAULT_METRIC,
+                          similarity: str = "cosine", rebuild: bool = False) -> SimilarityIndex:
+    """Index of every {seed}_full_analysis.csv of analysis_dir, from the cache if the CSVs did not change."""
+    path = cache_path_for(metric, similarity, analysis_dir)
+    signature = source_signature(analysis_files(analysis_dir))
+    if path.exists() and not rebuild:
+        try:
+            index = SimilarityIndex.load(path)
+            if index.sources.tolist() == signature:
+                return index
+            print(f"[SIMILARITY] Analysis files changed: rebuilding {path.name}")
+        except Exception as e:
+            print(f"[SIMILARITY] Ignoring unreadable cache {path.name}: {e}")
+
+    index = SimilarityIndex.from_directory(analysis_dir, metric=metric, similarity=similarity)
+    try:
+        index.save(path)
+        print(f"[SIMILARITY] Indexed {len(index)} experiments x {len(index.acronyms)} regions -> {path.name}")
+    except OSError as e:
+        print(f"[SIMILARITY] Could not write cache: {e}")
+    return index
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Find the experiments with the most similar projection profiles.")
+    query = parser.add_mutually_exclusive_group(required=True)
+    query.add_argument("--experiment", type=int, help="Experiment ID")
+    query.add_argument("--seed", help="Seed acronym: compares its mean profile with the other seeds' experiments")
+    parser.add_argument("-k", type=int, default=10, help="Number of neighbors")
+    parser.add_argument("--metric", default=DEFAULT_METRIC)
+    parser.add_argument("--similarity", default="cosine", choices=SIMILARITIES)
+    parser.add_argument("--method", default="auto", choices=METHODS)
+    parser.add_argument("--analysis-dir", type=Path, default=ANALYSIS_DIR)
+    parser.add_argument("--rebuild", action="store_true", help="Ignore the cached index")
+    args = parser.parse_args(argv)
+
+    key = args.experiment if args.experiment is not None else args.seed
+    try:
+        index = load_similarity_index(args.analysis_dir, args.metric, args.similarity, rebuild=args.rebuild)
+        result = index.query(key, k=args.k, method=args.method)
+    except (KeyError, ValueError) as e:
+        print(f"[ERROR] {e.args[0]}")
+        return 1
+    if result.empty:
+        print(f"[SIMILARITY] No other experiments to compare {key} with.")
+        return 0
+    print(f"[SIMILARITY] {args.similarity} neighbors of {key} ({len(index)} experiments indexed):")
+    print(result.to_string(index=False))
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
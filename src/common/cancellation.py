@@ -0,0 +1,10 @@
+"""
+Cancellation shared by the pipeline modules and the viewer's job system.
+
+Long-running work (e.g. filter_tracts.run_filter) raises a Cancelled subclass when its
+caller asks it to stop; the viewer's JobManager reports any Cancelled as a cancelled
+job rather than an error.
+"""
+
+class Cancelled(Exception):
+    pass
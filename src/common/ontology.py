@@ -0,0 +1,220 @@
+"""
+Structure ontology as flat arrays, and a vectorized roll-up of region values to every
+ancestor.
+
+The tree is a parent-index array (row of each structure's parent, -1 for the root).
+From it, every (structure, ancestor) pair is listed once, deepest first, so rolling a
+table up the hierarchy is a single scatter-add (bincount / maximum.at) of the table's
+values into the ancestor rows, whatever the number of rows or the depth of the tree.
+
+Structures come from BrainGlobeAtlas.structures, the allensdk structure tree
+(st.nodes()) or a structures CSV (id, acronym, name, parent_id) saved with save_csv().
+"""
+from typing import Sequence
+
+import numpy as np
+import pandas as pd
+
+class Ontology:
+    def __init__(self, ids, acronyms, parent, names=None):
+        self.ids = np.asarray(ids, dtype=np.int64)
+        self.acronyms = np.asarray(acronyms).astype(str)
+        self.parent = np.asarray(parent, dtype=np.int64)
+        self.names = np.asarray(names).astype(str) if names is not None else self.acronyms
+        self._index = pd.Index(self.acronyms)
+        self._id_index = pd.Index(self.ids)
+        self._pairs = None
+
+    def __len__(self):
+        return len(self.ids)
+
+    # --- Construction ---
+
+    @classmethod
+    def from_structures(cls, structures):
+        """From structure dicts with "id", "acronym" and "structure_id_path" (list or "/997/8/..." string)."""
+        if hasattr(structures, "values"):
+            structures = structures.values()
+        table = sorted({int(s["id"]): s for s in structures}.values(), key=lambda s: int(s["id"]))
+        ids = [int(s["id"]) for s in table]
+        rows = {sid: row for row, sid in enumerate(ids)}
+        parent = []
+        for s in table:
+            path = s.get("structure_id_path") or [s["id"]]
+            if isinstance(path, str):
+                path = [p for p in path.split("/") if p]
+            parent.append(rows.get(int(path[-2]), -1) if len(path) > 1 else -1)
+        return cls(ids, [s["acronym"] for s in table], parent, [s.get("name", s["acronym"]) for s in table])
+
+    @classmethod
+    def from_atlas(cls, atlas):
+        """From a BrainGlobeAtlas."""
+        return cls.from_structures(atlas.structures)
+
+    @classmethod
+    def from_csv(cls, path):
+        df = pd.read_csv(path)
+        rows = pd.Index(df["id"]).get_indexer(df["parent_id"].fillna(-1).astype(np.int64))
+        return cls(df["id"], df["acronym"], rows, df["name"] if "name" in df else None)
+
+    def save_csv(self, path):
+        parent_id = np.where(self.parent >= 0, self.ids[self.parent], -1)
+        pd.DataFrame({"id": self.ids, "acronym": self.acronyms, "name": self.names,
+                      "parent_id": parent_id}).to_csv(path, index=False)
+
+    # --- Lookups ---
+
+    def rows(self, acronyms) -> np.ndarray:
+        """Rows of acronyms (or integer structure IDs); -1 where unknown."""
+        keys = pd.Index(np.asarray(acronyms).ravel())
+        if keys.inferred_type == "integer":
+            return self._id_index.get_indexer(keys)
+        return self._index.get_indexer(keys.astype(str))
+
+    def row(self, key) -> int:
+        row = int(self.rows([key])[0])
+        if row < 0:
+            raise KeyError(key)
+        return row
+
+    def ancestor_pairs(self):
+        """
+        (structure, ancestor) rows for every structure and each of its ancestors, itself
+        included: grouped by structure, deepest ancestor first. Also returns the offsets
+        of each structure's group (CSR layout).
+        """
+        if self._pairs is None:
+            desc, anc = [], []
+            current = np.arange(len(self))
+            rows = np.arange(len(self))
+            while len(rows):
+                desc.append(rows)
+                anc.append(current)
+                up = self.parent[current]
+                rows, current = rows[up >= 0], up[up >= 0]
+            desc, anc = np.concatenate(desc), np.concatenate(anc)
+            order = np.argsort(desc, kind="stable") # Stable: each group stays self, parent, grandparent...
+            desc, anc = desc[order], anc[order]
+            offsets = np.concatenate([[0], np.cumsum(np.bincount(desc, minlength=len(self)))])
+            self._pairs = (desc, anc, offsets)
+        return self._pairs
+
+    @property
+    def depth(self) -> np.ndarray:
+        """0 for the root."""
+        return np.diff(self.ancestor_pairs()[2]) - 1
+
+    def subtree(self, key) -> np.ndarray:
+        """Rows of a structure and all its descendants."""
+        desc, anc, _ = self.ancestor_pairs()
+        return desc[anc == self.row(key)]
+
+    def _expand(self, rows: np.ndarray):
+        """For each entry row: (entry index, ancestor row) pairs, deepest first within an entry."""
+        _, anc, offsets = self.ancestor_pairs()
+        counts = offsets[rows + 1] - offsets[rows]
+        entry = np.repeat(np.arange(len(rows)), counts)
+        within = np.arange(counts.sum()) - np.repeat(np.cumsum(counts) - counts, counts)
+        return entry, anc[np.repeat(offsets[rows], counts) + within]
+
+    def scatter_up(self, values: np.ndarray) -> np.ndarray:
+        """Per-structure values (first axis: rows) summed over each structure's subtree."""
+        desc, anc, _ = self.ancestor_pairs()
+        out = np.zeros_like(values)
+        np.add.at(out, anc, values[desc])
+        return out
+
+    # --- Cutting the tree ---
+
+    def cut(self, acronyms, depth: int = None, areas: Sequence[str] = None) -> np.ndarray:
+        """
+        Group of each acronym: its ancestor at the given depth, or the most specific of
+        the given areas that contains it (itself included). None where there is no such
+        group (shallower than depth, outside every area, unknown acronym).
+        """
+        if (depth is None) == (areas is None):
+            raise ValueError("cut() needs either depth or areas")
+        rows = self.rows(acronyms)
+        groups = np.full(len(rows), None, dtype=object)
+        known = np.flatnonzero(rows >= 0)
+        entry, anc = self._expand(rows[known])
+        if depth is not None:
+            hit = self.depth[anc] == depth
+        else:
+            is_area = np.zeros(len(self), dtype=bool)
+            area_rows = self.rows(list(areas))
+            is_area[area_rows[area_rows >= 0]] = True
+            hit = is_area[anc]
+        # First hit of each entry = deepest matching ancestor
+        entries, first = np.unique(entry[hit], return_index=True)
+        groups[known[entries]] = self.acronyms[anc[hit][first]]
+        return groups
+
+    # --- Roll-up ---
+
+    def roll_up(self, table: pd.DataFrame, value: str = "value", weight: str = None, by: str = None,
+                depth: int = None, areas: Sequence[str] = None, acronym: str = "acronym") -> pd.DataFrame:
+        """
+        Aggregates an acronym/value table to every ancestor of its regions: sum, mean
+        (weighted by the weight column, e.g. the structure volume, if given), max and n
+        (number of table rows behind each value). With by, each group of that column
+        (e.g. experiment_id) is rolled up separately.
+
+        Tables that mix parents and children (Allen unionizes list both) are not double
+        counted: a row only feeds the ancestors below its closest ancestor that is
+        itself in the table (parents in the table already cover their children).
+
+        depth / areas keep only the rows of that cut of the tree (see cut()).
+        Returns one row per (group,) structure reached, indexed by acronym.
+        """
+        values = pd.to_numeric(table[value], errors="coerce").to_numpy(dtype=float)
+        rows = self.rows(table[acronym])
+        weights = table[weight].to_numpy(dtype=float) if weight else np.ones(len(table))
+        if by:
+            codes, labels = pd.factorize(table[by])
+        else:
+            codes, labels = np.zeros(len(table), dtype=np.int64), pd.Index([None])
+
+        valid = (rows >= 0) & ~np.isnan(values) & ~np.isnan(weights) & (codes >= 0)
+        if (rows < 0).any():
+            print(f"[ONTOLOGY] {int((rows < 0).sum())} rows with acronyms not in the ontology skipped")
+        rows, values, weights, codes = rows[valid], values[valid], weights[valid], codes[valid]
+
+        n = len(self)
+        entry, anc = self._expand(rows)
+        depth_of = self.depth
+        # Closest proper ancestor of each row that is in the same group's table
+        present = np.zeros(len(labels) * n, dtype=bool)
+        present[codes * n + rows] = True
+        shadow = (anc != rows[entry]) & present[codes[entry] * n + anc]
+        cut_depth = np.full(len(rows), -1)
+        np.maximum.at(cut_depth, entry[shadow], depth_of[anc[shadow]])
+        keep = depth_of[anc] > cut_depth[entry]
+        entry, anc = entry[keep], anc[keep]
+
+        key = codes[entry] * n + anc
+        size = len(labels) * n
+        v, w = values[entry], weights[entry]
+        total = np.bincount(key, weights=v, minlength=size)
+        wsum = np.bincount(key, weights=w, minlength=size)
+        wv = np.bincount(key, weights=w * v, minlength=size)
+        count = np.bincount(key, minlength=size)
+        peak = np.full(size, -np.inf)
+        np.maximum.at(peak, key, v)
+
+        reached = np.flatnonzero(count)
+        node = reached % n
+        with np.errstate(invalid="ignore", divide="ignore"):
+            mean = wv[reached] / wsum[reached]
+        result = pd.DataFrame({
+            "sum": total[reached], "mean": mean, "max": peak[reached], "n": count[reached],
+            "depth": depth_of[node],
+        }, index=pd.Index(self.acronyms[node], name=acronym))
+        if by:
+            result.insert(0, by, labels[reached // n])
+
+        if depth is not None:
+            result = result[result["depth"] == depth]
+        elif areas is not None:
+            result = result[result.index.isin(list(areas))]
+        return result
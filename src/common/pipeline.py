@@ -0,0 +1,195 @@
+"""
+Make-style pipeline runner: nodes produce files, and a node is rebuilt only when its
+fingerprint changes.
+
+A node's fingerprint hashes its name, its params, the content of its external input
+files and the content of its dependencies' outputs. Content hashes are cached by
+(size, mtime), so unchanged multi-GB volumes are not re-read. A dependency rebuilt to
+identical bytes does not invalidate its dependents (early cut-off), and an output
+modified outside the pipeline (e.g. a filtered mesh overwritten by a manual run)
+makes its node stale.
+
+Ready nodes run in parallel on a thread pool; the stages mostly wait on the network,
+the disk or VTK.
+"""
+import hashlib
+import json
+import threading
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Callable, Dict, Iterable, List, Optional, Union
+
+from src.common.tract_catalog import file_sha256
+
+BUILT, UP_TO_DATE, FAILED, SKIPPED, STALE = "built", "up-to-date", "failed", "skipped", "stale"
+
+@dataclass
+class Node:
+    name: str
+    fn: Callable[[], object]
+    # Paths, or a callable returning them when they depend on upstream results
+    outputs: Union[List[Path], Callable[[], List[Path]]]
+    deps: List[str] = field(default_factory=list)
+    params: dict = field(default_factory=dict)
+    inputs: List[Path] = field(default_factory=list) # External files (e.g. config)
+
+    def output_paths(self) -> List[Path]:
+        outputs = self.outputs() if callable(self.outputs) else self.outputs
+        return [Path(p) for p in outputs]
+
+class PipelineError(Exception):
+    pass
+
+class Pipeline:
+    def __init__(self, state_path: Path, max_workers: int = 4):
+        self.state_path = Path(state_path)
+        self.max_workers = max_workers
+        self.nodes: Dict[str, Node] = {}
+        self._lock = threading.Lock()
+        try:
+            state = json.loads(self.state_path.read_text())
+        except Exception:
+            state = {}
+        self._nodes_state: Dict[str, dict] = state.get("nodes", {})
+        self._hashes: Dict[str, list] = state.get("hashes", {}) # path -> [size, mtime_ns, sha256]
+
+    def add(self, node: Node) -> Node:
+        if node.name in self.nodes:
+            raise PipelineError(f"Duplicate node '{node.name}'")
+        for dep in node.deps:
+            if dep not in self.nodes:
+                raise PipelineError(f"Node '{node.name}' depends on unknown node '{dep}' (add it first)")
+        self.nodes[node.name] = node
+        return node
+
+    # --- Fingerprints ---
+    def file_hash(self, path: Path) -> Optional[str]:
+        """sha256 of a file, recomputed only if its size or mtime changed. None if missing."""
+        path = Path(path)
+        try:
+            st = path.stat()
+        except OSError:
+            return None
+        key = str(path.resolve())
+        with self._lock:
+            cached = self._hashes.get(key)
+        if cached and cached[:2] == [st.st_size, st.st_mtime_ns]:
+            return cached[2]
+        digest = file_sha256(path)
+        with self._lock:
+            self._hashes[key] = [st.st_size, st.st_mtime_ns, digest]
+        return digest
+
+    def _output_hashes(self, node: Node) -> Optional[Dict[str, str]]:
+        try:
+            paths = node.output_paths()
+        except Exception:
+            return None # Upstream result needed to name the outputs is missing
+        hashes = {str(p): self.file_hash(p) for p in paths}
+        return None if any(h is None for h in hashes.values()) else hashes
+
+    def fingerprint(self, name: str) -> str:
+        node = self.nodes[name]
+        h = hashlib.sha256()
+        h.update(name.encode())
+        h.update(json.dumps(node.params, sort_keys=True, default=str).encode())
+        for path in node.inputs:
+            h.update(f"{path}:{self.file_hash(path)}".encode())
+        for dep in node.deps:
+            recorded = self._nodes_state.get(dep, {}).get("outputs", {})
+            h.update(f"{dep}:{json.dumps(recorded, sort_keys=True)}".encode())
+        return h.hexdigest()
+
+    def is_up_to_date(self, name: str) -> bool:
+        node = self.nodes[name]
+        recorded = self._nodes_state.get(name)
+        if not recorded or recorded.get("fingerprint") != self.fingerprint(name):
+            return False
+        return self._output_hashes(node) == recorded.get("outputs")
+
+    # --- Graph ---
+    def _closure(self, targets: Optional[Iterable[str]]) -> List[str]:
+        """Targets plus all their ancestors, in insertion (= topological) order."""
+        if targets is None:
+            return list(self.nodes)
+        needed, stack = set(), list(targets)
+        while stack:
+            name = stack.pop()
+            if name not in self.nodes:
+                raise PipelineError(f"Unknown node '{name}'")
+            if name not in needed:
+                needed.add(name)
+                stack.extend(self.nodes[name].deps)
+        return [n for n in self.nodes if n in needed]
+
+    def plan(self, targets=None) -> Dict[str, str]:
+        """Dry run: which nodes would rebuild (anything downstream of a stale node counts as stale)."""
+        status = {}
+        for name in self._closure(targets):
+            node = self.nodes[name]
+            upstream_stale = any(status[d] == STALE for d in node.deps)
+            status[name] = STALE if upstream_stale or not self.is_up_to_date(name) else UP_TO_DATE
+        return status
+
+    # --- Execution ---
+    def _run_node(self, name: str, force: bool) -> str:
+        if not force and self.is_up_to_date(name):
+            print(f"[PIPELINE] {name}: up to date")
+            return UP_TO_DATE
+        print(f"[PIPELINE] {name}: building...")
+        t0 = time.perf_counter()
+        self.nodes[name].fn()
+        outputs = self._output_hashes(self.nodes[name])
+        if outputs is None:
+            raise PipelineError(f"Node '{name}' finished without writing all its outputs")
+        with self._lock:
+            self._nodes_state[name] = {
+                "fingerprint": self.fingerprint(name),
+                "outputs": outputs,
+                "seconds": round(time.perf_counter() - t0, 3),
+            }
+        print(f"[PIPELINE] {name}: built in {time.perf_counter() - t0:.1f}s")
+        return BUILT
+
+    def run(self, targets=None, force: Iterable[str] = ()) -> Dict[str, str]:
+        """Builds the targets (default: all nodes). Returns the status of every node involved."""
+        order = self._closure(targets)
+        force = set(force)
+        status: Dict[str, str] = {}
+        pending = list(order)
+        running = {}
+
+        with ThreadPoolExecutor(max_workers=self.max_workers) as pool:
+            while pending or running:
+                for name in list(pending):
+                    deps = self.nodes[name].deps
+                    if any(status.get(d) in (FAILED, SKIPPED) for d in deps):
+                        status[name] = SKIPPED
+                        pending.remove(name)
+                        print(f"[PIPELINE] {name}: skipped (upstream failure)")
+                    elif all(d in status for d in deps):
+                        pending.remove(name)
+                        running[pool.submit(self._run_node, name, name in force)] = name
+
+                if not running:
+                    break
+                done, _ = wait(running, return_when=FIRST_COMPLETED)
+                for future in done:
+                    name = running.pop(future)
+                    try:
+                        status[name] = future.result()
+                    except Exception as e:
+                        status[name] = FAILED
+                        print(f"[PIPELINE] {name}: FAILED: {e}")
+                self.save()
+        return status
+
+    def save(self):
+        self.state_path.parent.mkdir(parents=True, exist_ok=True)
+        with self._lock:
+            state = {"nodes": self._nodes_state, "hashes": self._hashes}
+            tmp = self.state_path.with_suffix(".tmp")
+            tmp.write_text(json.dumps(state, indent=2))
+            tmp.replace(self.state_path)
@@ -0,0 +1,225 @@
+"""
+Region geometry index of an atlas: voxel count, volume, centroid and bounding box of
+every structure, computed once from the annotation volume and cached on disk.
+
+The annotation is read in slabs of planes; each voxel's label is mapped to a row of
+the structure table (searchsorted) and three histograms are filled with bincount:
+voxels per (structure, AP plane), (structure, DV plane) and (structure, ML plane).
+Every statistic follows from those histograms, and since they add up, rolling a
+structure's voxels into all its ancestors is one scatter-add over the ontology's
+(structure, ancestor) pairs (see ontology.py). Parent structures therefore cover
+their whole subtree (e.g. "Isocortex" includes every layer of every area).
+
+Coordinates are in atlas microns (AP, DV, ML for the Allen atlases), voxel centers
+at (index + 0.5) * resolution.
+"""
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Dict, Iterable, Optional, Tuple
+
+import numpy as np
+
+from src.common.ontology import Ontology
+
+PROJECT_ROOT = Path(__file__).resolve().parent.parent.parent
+CACHE_DIR = PROJECT_ROOT / "data" / "processed" / "atlas"
+GEOMETRY_VERSION = 1
+SLAB_PLANES = 32 # Annotation planes per pass (32 x 320 x 456 voxels for allen_mouse_25um)
+
+@dataclass
+class RegionGeometry:
+    ids: np.ndarray            # (n,) structure IDs
+    acronyms: np.ndarray       # (n,)
+    parent: np.ndarray         # (n,) row of the parent structure, -1 for the root
+    own_voxels: np.ndarray     # (n,) voxels labelled with the structure itself
+    voxel_count: np.ndarray    # (n,) voxels of the structure and all its descendants
+    centroid: np.ndarray       # (n, 3) microns, NaN for empty structures
+    bbox_min: np.ndarray       # (n, 3) first voxel index (inclusive)
+    bbox_max: np.ndarray       # (n, 3) last voxel index + 1 (exclusive); equal to bbox_min if empty
+    resolution: np.ndarray     # (3,) microns
+    shape: Tuple[int, int, int]
+    _rows: Dict = field(init=False, repr=False)
+    _ontology: Optional[Ontology] = field(init=False, repr=False, default=None)
+
+    def __post_init__(self):
+        self._rows = {int(sid): row for row, sid in enumerate(self.ids)}
+        self._rows.update({str(acronym): row for row, acronym in enumerate(self.acronyms)})
+
+    def __len__(self):
+        return len(self.ids)
+
+    def __contains__(self, key):
+        return self._key(key) in self._rows
+
+    @staticmethod
+    def _key(key):
+        return key if isinstance(key, str) else int(key)
+
+    def row(self, key) -> int:
+        """Table row of a structure ID or acronym (KeyError if unknown)."""
+        return self._rows[self._key(key)]
+
+    # --- Per-structure queries ---
+
+    @property
+    def volume_mm3(self) -> np.ndarray:
+        return self.voxel_count * float(np.prod(self.resolution)) / 1e9
+
+    def get(self, key) -> dict:
+        """All the geometry of one structure."""
+        r = self.row(key)
+        return {
+            "id": int(self.ids[r]),
+            "acronym": str(self.acronyms[r]),
+            "voxel_count": int(self.voxel_count[r]),
+            "volume_mm3": float(self.volume_mm3[r]),
+            "centroid": self.centroid[r].tolist(),
+            "bounds": self.bounds(key),
+        }
+
+    def center(self, key) -> Optional[list]:
+        """Centroid in microns, or None for a structure with no voxels."""
+        r = self.row(key)
+        return None if self.voxel_count[r] == 0 else self.centroid[r].tolist()
+
+    def bounds(self, key) -> Optional[list]:
+        """[x0, x1, y0, y1, z0, z1] in microns (VTK bounds order), or None if empty."""
+        r = self.row(key)
+        if self.voxel_count[r] == 0:
+            return None
+        lo = self.bbox_min[r] * self.resolution
+        hi = self.bbox_max[r] * self.resolution
+        return [float(v) for pair in zip(lo, hi) for v in pair]
+
+    def slices(self, key) -> Tuple[slice, slice, slice]:
+        """Bounding box of a structure as annotation index slices."""
+        r = self.row(key)
+        return tuple(slice(int(a), int(b)) for a, b in zip(self.bbox_min[r], self.bbox_max[r]))
+
+    @property
+    def ontology(self) -> Ontology:
+        if self._ontology is None:
+            self._ontology = Ontology(self.ids, self.acronyms, self.parent)
+        return self._ontology
+
+    def subtree_ids(self, key) -> np.ndarray:
+        """IDs of a structure and all its descendants."""
+        return self.ids[self.ontology.subtree(self.ids[self.row(key)])]
+
+    def mask(self, annotation: np.ndarray, keys: Iterable) -> np.ndarray:
+        """
+        Boolean mask of the voxels of the given structures (and their descendants).
+        Only each structure's bounding box of the annotation is scanned.
+        """
+        result = np.zeros(annotation.shape, dtype=bool)
+        for key in keys:
+            try:
+                r = self.row(key)
+            except KeyError:
+                print(f"[GEOMETRY] Region '{key}' not found in atlas.")
+                continue
+            if self.voxel_count[r] == 0:
+                continue
+            box = self.slices(key)
+            result[box] |= np.isin(annotation[box], self.subtree_ids(key))
+        return result
+
+    # --- Building ---
+
+    @classmethod
+    def build(cls, annotation: np.ndarray, structures, resolution, slab_planes: int = SLAB_PLANES):
+        """
+        structures: the atlas' structure dict (ID -> {"id", "acronym", "structure_id_path"}),
+        as BrainGlobeAtlas.structures.
+        """
+        ontology = Ontology.from_structures(structures)
+        ids = ontology.ids
+        n = len(ids)
+        shape = annotation.shape
+        hist = [np.zeros((n + 1) * size, dtype=np.int64) for size in shape] # Row n: unknown labels
+        coords = [np.arange(size, dtype=np.int64) for size in shape]
+        for start in range(0, shape[0], slab_planes):
+            slab = np.asarray(annotation[start:start + slab_planes])
+            idx = np.searchsorted(ids, slab)
+            known = ids[np.minimum(idx, n - 1)] == slab
+            slab_rows = np.where(known, idx, n)
+            planes = slab.shape[0]
+            grids = (coords[0][start:start + planes, None, None], coords[1][None, :, None], coords[2][None, None, :])
+            for axis in range(3):
+                keys = slab_rows * shape[axis] + grids[axis]
+                hist[axis] += np.bincount(keys.ravel(), minlength=(n + 1) * shape[axis])
+        hist = [h.reshape(n + 1, size)[:n] for h, size in zip(hist, shape)]
+        own_voxels = hist[0].sum(axis=1)
+
+        hist = [ontology.scatter_up(h) for h in hist] # Each structure covers its subtree
+
+        return cls.from_histograms(ids, ontology.acronyms, ontology.parent, own_voxels, hist, resolution, shape)
+
+    @classmethod
+    def from_histograms(cls, ids, acronyms, parent, own_voxels, hist, resolution, shape):
+        resolution = np.asarray(resolution, dtype=float)
+        count = hist[0].sum(axis=1)
+        centroid = np.full((len(ids), 3), np.nan)
+        bbox_min = np.zeros((len(ids), 3), dtype=np.int64)
+        bbox_max = np.zeros((len(ids), 3), dtype=np.int64)
+        present = count > 0
+        for axis, h in enumerate(hist):
+            occupied = h[present] > 0
+            size = h.shape[1]
+            centroid[present, axis] = (h[present] @ np.arange(size) / count[present] + 0.5) * resolution[axis]
+            bbox_min[present, axis] = occupied.argmax(axis=1)
+            bbox_max[present, axis] = size - occupied[:, ::-1].argmax(axis=1)
+        return cls(ids, acronyms, parent, own_voxels, count, centroid, bbox_min, bbox_max, resolution, tuple(shape))
+
+    # --- Persistence ---
+
+    def save(self, path):
+        """Atomic write of an uncompressed .npz."""
+        path = Path(path)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        tmp = path.with_name(f".{path.stem}.tmp.npz")
+        np.savez(tmp, version=GEOMETRY_VERSION, ids=self.ids, acronyms=self.acronyms, parent=self.parent,
+                 own_voxels=self.own_voxels, voxel_count=self.voxel_count, centroid=self.centroid,
+                 bbox_min=self.bbox_min, bbox_max=self.bbox_max, resolution=self.resolution,
+                 shape=np.asarray(self.shape))
+        tmp.replace(path)
+
+    @classmethod
+    def load(cls, path):
+        with np.load(path) as npz:
+            if int(npz["version"]) != GEOMETRY_VERSION:
+                raise ValueError(f"geometry cache version {int(npz['version'])}")
+            return cls(npz["ids"], npz["acronyms"], npz["parent"], npz["own_voxels"], npz["voxel_count"],
+                       npz["centroid"], npz["bbox_min"], npz["bbox_max"], npz["resolution"],
+                       tuple(int(s) for s in npz["shape"]))
+
+def cache_path_for(atlas_name: str, cache_dir: Path = CACHE_DIR) -> Path:
+    return Path(cache_dir) / f"{atlas_name}_region_geometry.npz"
+
+def load_region_geometry(atlas, atlas_name: str = None, cache_dir: Path = CACHE_DIR) -> RegionGeometry:
+    """
+    Geometry index of a BrainGlobeAtlas, read from the cache or built (a few seconds for
+    allen_mouse_25um) and saved. The cache is rebuilt if the atlas shape, resolution or
+    structure count no longer match.
+    """
+    atlas_name = atlas_name or getattr(atlas, "atlas_name", "atlas")
+    path = cache_path_for(atlas_name, cache_dir)
+    if path.exists():
+        try:
+            geometry = RegionGeometry.load(path)
+            if (geometry.shape == tuple(atlas.annotation.shape)
+                    and np.allclose(geometry.resolution, atlas.resolution)
+                    and len(geometry) == len({int(s["id"]) for s in atlas.structures.values()})):
+                return geometry
+            print(f"[GEOMETRY] {path.name} does not match the atlas: rebuilding")
+        except Exception as e:
+            print(f"[GEOMETRY] Ignoring unreadable cache {path.name}: {e}")
+
+    print(f"[GEOMETRY] Indexing {atlas_name} region geometry...")
+    geometry = RegionGeometry.build(atlas.annotation, atlas.structures, atlas.resolution)
+    try:
+        geometry.save(path)
+        print(f"[GEOMETRY] Saved {len(geometry)} structures to {path}")
+    except OSError as e:
+        print(f"[GEOMETRY] Could not write cache: {e}")
+    return geometry
@@ -0,0 +1,229 @@
+"""
+Persistent catalog (SQLite) of the tract artifacts in data/processed/tracts.
+
+Producers (extract_tracts, filter_tracts, fix_volume_metadata) register files as
+they write them; the viewer resolves files with indexed lookups instead of probing
+filename conventions. sync() reconciles the catalog with the folder (one scandir)
+for files copied in by hand.
+
+Kinds:
+  raw          {id}_{metric}.nrrd / .mhd, legacy {id}.nrrd (density)
+  fixed        {id}_{metric}_fixed.vtk    (fix_volume_metadata.py)
+  filtered     {id}_{metric}_filtered.vtk or filtered_{metric}.vtk (filter_tracts.py)
+  streamlines  {id}_streamlines.json
+"""
+import hashlib
+import json
+import os
+import re
+import sqlite3
+from contextlib import contextmanager
+from datetime import datetime
+from pathlib import Path
+from typing import Dict, List, Optional, Sequence
+
+from src.common.volume_header import read_volume_header
+
+CATALOG_NAME = "catalog.sqlite"
+KINDS = ("raw", "fixed", "filtered", "streamlines")
+ARTIFACT_SUFFIXES = (".nrrd", ".mhd", ".vtk", ".json")
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS artifacts (
+    name TEXT PRIMARY KEY,
+    experiment_id INTEGER,
+    metric TEXT,
+    kind TEXT NOT NULL,
+    shape TEXT,       -- JSON, file axis order (NRRD 'sizes' / vedo dimensions)
+    spacing TEXT,     -- JSON, microns
+    sha256 TEXT,
+    size INTEGER,
+    mtime_ns INTEGER,
+    updated_at TEXT
+);
+CREATE INDEX IF NOT EXISTS idx_artifacts_lookup ON artifacts (experiment_id, metric, kind);
+CREATE INDEX IF NOT EXISTS idx_artifacts_kind_mtime ON artifacts (kind, mtime_ns);
+"""
+
+_PATTERNS = [
+    (re.compile(r"^(\d+)_streamlines\.json$"), "streamlines"),
+    (re.compile(r"^(\d+)_([a-z]+)_fixed\.vtk$"), "fixed"),
+    (re.compile(r"^(\d+)_([a-z]+)_filtered\.vtk$"), "filtered"),
+    (re.compile(r"^filtered_([a-z]+)\.vtk$"), "filtered"),
+    (re.compile(r"^(\d+)_([a-z]+)\.(?:nrrd|mhd)$"), "raw"),
+    (re.compile(r"^(\d+)\.(?:nrrd|mhd)$"), "raw"),
+]
+
+def parse_artifact_name(name: str) -> Optional[dict]:
+    """Infers experiment_id / metric / kind from a file name, or None if it is not a tract artifact."""
+    for pattern, kind in _PATTERNS:
+        m = pattern.match(name)
+        if not m:
+            continue
+        groups = m.groups()
+        if kind == "streamlines":
+            return {"experiment_id": int(groups[0]), "metric": None, "kind": kind}
+        if name.startswith("filtered_"):
+            return {"experiment_id": None, "metric": groups[0], "kind": kind}
+        metric = groups[1] if len(groups) > 1 else "density" # Legacy {id}.nrrd is density
+        return {"experiment_id": int(groups[0]), "metric": metric, "kind": kind}
+
+    # Any other volume still counts as raw input (e.g. files dropped in by hand)
+    if name.endswith((".nrrd", ".mhd")):
+        return {"experiment_id": None, "metric": None, "kind": "raw"}
+    return None
+
+def file_sha256(path: Path, chunk_size: int = 1 << 20) -> str:
+    h = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(chunk_size), b""):
+            h.update(chunk)
+    return h.hexdigest()
+
+class TractCatalog:
+    def __init__(self, root_dir: Path, db_name: str = CATALOG_NAME):
+        self.root_dir = Path(root_dir)
+        self.db_path = self.root_dir / db_name
+        self._schema_ready = False
+
+    @contextmanager
+    def _connect(self):
+        """Connection per operation (safe across threads/processes); commits on success."""
+        self.root_dir.mkdir(parents=True, exist_ok=True)
+        conn = sqlite3.connect(self.db_path, timeout=30)
+        conn.row_factory = sqlite3.Row
+        try:
+            if not self._schema_ready:
+                conn.executescript(SCHEMA)
+                self._schema_ready = True
+            with conn:
+                yield conn
+        finally:
+            conn.close()
+
+    def register(self, path, experiment_id=None, metric=None, kind=None, shape: Sequence[int] = None,
+                 spacing: Sequence[float] = None, compute_hash: bool = True) -> dict:
+        """
+        Adds or updates one artifact. Missing fields are inferred from the file name, and
+        for volumes shape/spacing come from the header (no voxel data is read).
+        """
+        path = Path(path)
+        st = path.stat()
+        inferred = parse_artifact_name(path.name) or {"experiment_id": None, "metric": None, "kind": "raw"}
+        if shape is None and path.suffix in (".nrrd", ".mhd"):
+            try:
+                header = read_volume_header(path)
+                shape, spacing = header.sizes, spacing or header.spacing
+            except Exception:
+                pass
+        row = {
+            "name": path.name,
+            "experiment_id": int(experiment_id) if experiment_id is not None else inferred["experiment_id"],
+            "metric": metric or inferred["metric"],
+            "kind": kind or inferred["kind"],
+            "shape": json.dumps([int(x) for x in shape]) if shape is not None else None,
+            "spacing": json.dumps([float(x) for x in spacing]) if spacing is not None else None,
+            "sha256": file_sha256(path) if compute_hash else None,
+            "size": st.st_size,
+            "mtime_ns": st.st_mtime_ns,
+            "updated_at": datetime.now().isoformat(timespec="seconds"),
+        }
+        if row["kind"] not in KINDS:
+            raise ValueError(f"Unknown artifact kind '{row['kind']}'. Options: {', '.join(KINDS)}")
+
+        with self._connect() as conn:
+            conn.execute(
+                "INSERT OR REPLACE INTO artifacts VALUES (:name, :experiment_id, :metric, :kind, :shape, :spacing, :sha256, :size, :mtime_ns, :updated_at)",
+                row,
+            )
+        return row
+
+    def sync(self) -> Dict[str, List[str]]:
+        """Reconciles the catalog with the folder. New or modified files are registered without hashing."""
+        on_disk = {}
+        if self.root_dir.exists():
+            with os.scandir(self.root_dir) as it:
+                for entry in it:
+                    if entry.is_file() and entry.name.endswith(ARTIFACT_SUFFIXES) and parse_artifact_name(entry.name):
+                        st = entry.stat()
+                        on_disk[entry.name] = (st.st_size, st.st_mtime_ns)
+
+        with self._connect() as conn:
+            known = {r["name"]: r for r in conn.execute("SELECT * FROM artifacts")}
+
+        added = sorted(n for n in on_disk if n not in known)
+        updated = sorted(n for n in on_disk if n in known and on_disk[n] != (known[n]["size"], known[n]["mtime_ns"]))
+        removed = sorted(n for n in known if n not in on_disk)
+
+        for name in added:
+            self.register(self.root_dir / name, compute_hash=False)
+        for name in updated:
+            # Keep what the producer recorded (e.g. the source experiment of filtered_{metric}.vtk)
+            row = known[name]
+            self.register(self.root_dir / name, row["experiment_id"], row["metric"], row["kind"], compute_hash=False)
+        if removed:
+            with self._connect() as conn:
+                conn.executemany("DELETE FROM artifacts WHERE name = ?", [(n,) for n in removed])
+        return {"added": added, "updated": updated, "removed": removed}
+
+    def _validate(self, row) -> Optional[Path]:
+        """Returns the path if the file still exists; refreshes or drops rows that drifted."""
+        path = self.root_dir / row["name"]
+        try:
+            st = path.stat()
+        except OSError:
+            with self._connect() as conn:
+                conn.execute("DELETE FROM artifacts WHERE name = ?", (row["name"],))
+            return None
+        if (st.st_size, st.st_mtime_ns) != (row["size"], row["mtime_ns"]):
+            self.register(path, row["experiment_id"], row["metric"], row["kind"], compute_hash=False)
+        return path
+
+    def lookup(self, experiment_id, metric: str = "density", kind: str = "raw") -> Optional[Path]:
+        """
+        Newest file of this kind for the experiment (metric is ignored for streamlines).
+        experiment_id=None matches artifacts of unknown origin only.
+        """
+        if experiment_id is None:
+            query = "SELECT * FROM artifacts WHERE experiment_id IS NULL AND kind = ?"
+            params = [kind]
+        else:
+            query = "SELECT * FROM artifacts WHERE experiment_id = ? AND kind = ?"
+            params = [int(experiment_id), kind]
+        if kind != "streamlines":
+            query += " AND metric = ?"
+            params.append(metric)
+        # Prefer the canonical {id}_{metric}.nrrd over legacy names, then the newest
+        query += " ORDER BY (name = ?) DESC, mtime_ns DESC"
+        params.append(f"{experiment_id}_{metric}.nrrd")
+
+        with self._connect() as conn:
+            rows = conn.execute(query, params).fetchall()
+        for row in rows:
+            path = self._validate(row)
+            if path:
+                return path
+        return None
+
+    def latest(self, kind: str = "raw") -> Optional[Path]:
+        with self._connect() as conn:
+            rows = conn.execute("SELECT * FROM artifacts WHERE kind = ? ORDER BY mtime_ns DESC", (kind,)).fetchall()
+        for row in rows:
+            path = self._validate(row)
+            if path:
+                return path
+        return None
+
+    def get(self, name: str) -> Optional[dict]:
+        with self._connect() as conn:
+            row = conn.execute("SELECT * FROM artifacts WHERE name = ?", (name,)).fetchone()
+        if row is None:
+            return None
+        entry = dict(row)
+        for key in ("shape", "spacing"):
+            entry[key] = json.loads(entry[key]) if entry[key] else None
+        return entry
+
+    def __len__(self):
+        with self._connect() as conn:
+            return conn.execute("SELECT COUNT(*) FROM artifacts").fetchone()[0]
@@ -0,0 +1,279 @@
+"""
+Header-only reader for NRRD (.nrrd/.nhdr) and MetaImage (.mhd/.mha) volumes.
+
+read_volume_header() parses only the text header, so geometry (sizes, spacing,
+origin, bounds) costs a few hundred bytes of I/O whatever the volume size.
+scalar_range() is the one operation that touches voxels: it streams the payload in
+chunks (memory-mapped when uncompressed) and is meant to be cached by the caller.
+"""
+import gzip
+import zlib
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Tuple
+
+import numpy as np
+
+HEADER_LIMIT = 1 << 16 # Headers are small; refuse to scan further
+CHUNK_BYTES = 1 << 24
+
+class VolumeHeaderError(ValueError):
+    pass
+
+@dataclass(frozen=True)
+class VolumeHeader:
+    path: Path
+    format: str             # "nrrd" or "mhd"
+    sizes: Tuple[int, ...]  # File axis order (fastest first)
+    spacing: Tuple[float, ...]
+    origin: Tuple[float, ...]
+    dtype: np.dtype
+    encoding: str           # "raw", "gzip" or "zlib" (anything else needs a full reader)
+    data_file: Path
+    data_offset: int        # Byte offset of the payload in data_file (-1: payload ends the file)
+    fields: dict = field(default_factory=dict, repr=False, compare=False)
+
+    @property
+    def n_voxels(self) -> int:
+        return int(np.prod(self.sizes))
+
+    @property
+    def bounds(self) -> Tuple[float, ...]:
+        """(xmin, xmax, ymin, ymax, zmin, zmax) as vedo reports it (voxel centers)."""
+        out = []
+        for o, s, n in zip(self.origin, self.spacing, self.sizes):
+            out.extend((o, o + s * (n - 1)))
+        return tuple(out)
+
+# --- Type tables ---
+
+_NRRD_TYPES = {
+    "i1": ("signed char", "int8", "int8_t"),
+    "u1": ("uchar", "unsigned char", "uint8", "uint8_t"),
+    "i2": ("short", "short int", "signed short", "signed short int", "int16", "int16_t"),
+    "u2": ("ushort", "unsigned short", "unsigned short int", "uint16", "uint16_t"),
+    "i4": ("int", "signed int", "int32", "int32_t"),
+    "u4": ("uint", "unsigned int", "uint32", "uint32_t"),
+    "i8": ("longlong", "long long", "long long int", "signed long long", "signed long long int", "int64", "int64_t"),
+    "u8": ("ulonglong", "unsigned long long", "unsigned long long int", "uint64", "uint64_t"),
+    "f4": ("float",),
+    "f8": ("double",),
+}
+NRRD_DTYPES = {alias: code for code, aliases in _NRRD_TYPES.items() for alias in aliases}
+
+MHD_DTYPES = {
+    "MET_CHAR": "i1", "MET_UCHAR": "u1", "MET_SHORT": "i2", "MET_USHORT": "u2",
+    "MET_INT": "i4", "MET_UINT": "u4", "MET_LONG": "i4", "MET_ULONG": "u4",
+    "MET_LONG_LONG": "i8", "MET_ULONG_LONG": "u8", "MET_FLOAT": "f4", "MET_DOUBLE": "f8",
+}
+
+def _floats(text: str) -> Tuple[float, ...]:
+    return tuple(float(x) for x in text.replace("(", " ").replace(")", " ").replace(",", " ").split())
+
+# --- NRRD ---
+
+def _read_nrrd(path: Path) -> VolumeHeader:
+    fields = {}
+    with open(path, "rb") as f:
+        magic = f.readline()
+        if not magic.startswith(b"NRRD"):
+            raise VolumeHeaderError(f"{path.name}: not a NRRD file")
+        while True:
+            line = f.readline()
+            if not line or line in (b"\n", b"\r\n"):
+                break
+            if f.tell() > HEADER_LIMIT:
+                raise VolumeHeaderError(f"{path.name}: header too long")
+            text = line.decode("latin-1").rstrip("\r\n")
+            if text.startswith("#"):
+                continue
+            if ":=" in text and (": " not in text or text.index(":=") < text.index(": ")):
+                continue # key:=value pairs are free-form metadata
+            key, sep, value = text.partition(": ")
+            if sep:
+                fields[key.strip().lower()] = value.strip()
+        header_end = f.tell()
+
+    sizes = tuple(int(x) for x in fields["sizes"].split())
+    ndim = len(sizes)
+
+    if "space directions" in fields:
+        spacing = []
+        for vec in fields["space directions"].split(")"):
+            vec = vec.strip()
+            if vec.startswith("none"):
+                vec = vec[4:].strip()
+                spacing.append(1.0) # Non-spatial axis (e.g. vector components)
+            if vec:
+                spacing.append(float(np.linalg.norm(_floats(vec))))
+        spacing = tuple(spacing)
+    elif "spacings" in fields:
+        spacing = tuple(1.0 if x.lower() == "nan" else float(x) for x in fields["spacings"].split())
+    else:
+        spacing = (1.0,) * ndim
+
+    origin = _floats(fields["space origin"]) if "space origin" in fields else (0.0,) * ndim
+
+    type_name = fields.get("type", "").lower()
+    if type_name not in NRRD_DTYPES:
+        raise VolumeHeaderError(f"{path.name}: unsupported NRRD type '{type_name}'")
+    dtype = np.dtype(NRRD_DTYPES[type_name])
+    if dtype.itemsize > 1:
+        dtype = dtype.newbyteorder(">" if fields.get("endian", "little") == "big" else "<")
+
+    encoding = fields.get("encoding", "raw").lower()
+    encoding = {"gz": "gzip", "txt": "text", "ascii": "text"}.get(encoding, encoding)
+
+    data_file = fields.get("data file") or fields.get("datafile")
+    if data_file:
+        data_path = (path.parent / data_file).resolve()
+        byte_skip = int(fields.get("byte skip", 0))
+        offset = -1 if byte_skip == -1 else byte_skip
+    else:
+        data_path = path
+        offset = header_end
+
+    return VolumeHeader(path, "nrrd", sizes, spacing, origin, dtype, encoding, data_path, offset, fields)
+
+# --- MetaImage ---
+
+def _read_mhd(path: Path) -> VolumeHeader:
+    fields = {}
+    with open(path, "rb") as f:
+        while True:
+            line = f.readline()
+            if not line:
+                break
+            if f.tell() > HEADER_LIMIT:
+                raise VolumeHeaderError(f"{path.name}: header too long")
+            key, sep, value = line.decode("latin-1").partition("=")
+            if not sep:
+                continue
+            fields[key.strip()] = value.strip()
+            if key.strip() == "ElementDataFile": # Always the last field
+                break
+        header_end = f.tell()
+
+    if "DimSize" not in fields:
+        raise VolumeHeaderError(f"{path.name}: not a MetaImage header")
+    sizes = tuple(int(x) for x in fields["DimSize"].split())
+    ndim = len(sizes)
+    spacing = _floats(fields.get("ElementSpacing", "")) or (1.0,) * ndim
+    origin = _floats(fields.get("Offset") or fields.get("Origin") or fields.get("Position") or "") or (0.0,) * ndim
+
+    type_name = fields.get("ElementType", "")
+    if type_name not in MHD_DTYPES:
+        raise VolumeHeaderError(f"{path.name}: unsupported ElementType '{type_name}'")
+    dtype = np.dtype(MHD_DTYPES[type_name])
+    msb = (fields.get("BinaryDataByteOrderMSB") or fields.get("ElementByteOrderMSB") or "False").lower() == "true"
+    if dtype.itemsize > 1:
+        dtype = dtype.newbyteorder(">" if msb else "<")
+
+    encoding = "zlib" if fields.get("CompressedData", "False").lower() == "true" else "raw"
+
+    data_file = fields.get("ElementDataFile", "LOCAL")
+    if data_file.upper() == "LOCAL":
+        data_path, offset = path, header_end
+    else:
+        data_path = (path.parent / data_file).resolve()
+        offset = int(fields.get("HeaderSize", 0))
+
+    return VolumeHeader(path, "mhd", sizes, spacing, origin, dtype, encoding, data_path, offset, fields)
+
+def read_volume_header(path) -> VolumeHeader:
+    """Parses the geometry of a .nrrd/.nhdr/.mhd/.mha file without reading voxel data."""
+    path = Path(path)
+    suffix = path.suffix.lower()
+    if suffix in (".nrrd", ".nhdr"):
+        return _read_nrrd(path)
+    if suffix in (".mhd", ".mha"):
+        return _read_mhd(path)
+    raise VolumeHeaderError(f"{path.name}: unsupported volume format '{suffix}'")
+
+# --- Voxel statistics ---
+
+def _update_range(current, chunk: np.ndarray):
+    if chunk.dtype.kind == "f":
+        chunk = chunk[np.isfinite(chunk)]
+    if chunk.size == 0:
+        return current
+    lo, hi = chunk.min(), chunk.max()
+    if current is None:
+        return lo, hi
+    return min(current[0], lo), max(current[1], hi)
+
+def _iter_decompressed(stream, decompress, itemsize: int):
+    """Yields decoded buffers whose length is a multiple of itemsize."""
+    leftover = b""
+    while True:
+        raw = stream.read(CHUNK_BYTES)
+        if not raw:
+            break
+        data = leftover + (decompress(raw) if decompress else raw)
+        cut = len(data) - len(data) % itemsize
+        leftover = data[cut:]
+        if cut:
+            yield data[:cut]
+
+def scalar_range(header: VolumeHeader) -> Tuple[float, float]:
+    """Min/max over all finite voxels, streamed chunk by chunk (raw, gzip and zlib payloads)."""
+    n = header.n_voxels
+    current = None
+
+    if header.encoding == "raw":
+        offset = header.data_offset
+        if offset == -1:
+            offset = header.data_file.stat().st_size - n * header.dtype.itemsize
+        data = np.memmap(header.data_file, dtype=header.dtype, mode="r", offset=offset, shape=(n,))
+        step = max(1, CHUNK_BYTES // header.dtype.itemsize)
+        for start in range(0, n, step):
+            current = _update_range(current, np.asarray(data[start:start + step]))
+        del data
+    elif header.encoding in ("gzip", "zlib"):
+        with open(header.data_file, "rb") as f:
+            f.seek(max(header.data_offset, 0))
+            if header.encoding == "gzip":
+                stream, decompress = gzip.GzipFile(fileobj=f), None
+            else:
+                stream, decompress = f, zlib.decompressobj().decompress
+            for buf in _iter_decompressed(stream, decompress, header.dtype.itemsize):
+                current = _update_range(current, np.frombuffer(buf, dtype=header.dtype))
+    else:
+        raise VolumeHeaderError(f"{header.path.name}: cannot stream '{header.encoding}' encoding")
+
+    if current is None:
+        return (float("nan"), float("nan"))
+    return float(current[0]), float(current[1])
+
+def read_volume_array(header: VolumeHeader, mmap: bool = True) -> np.ndarray:
+    """
+    Voxels as an (x, y, z) array (Fortran order, like vedo's tonumpy()). Uncompressed
+    payloads are memory-mapped read-only unless mmap=False; gzip/zlib ones are decoded.
+    """
+    n = header.n_voxels
+    if header.encoding == "raw":
+        offset = header.data_offset
+        if offset == -1:
+            offset = header.data_file.stat().st_size - n * header.dtype.itemsize
+        if mmap:
+            flat = np.memmap(header.data_file, dtype=header.dtype, mode="r", offset=offset, shape=(n,))
+        else:
+            flat = np.fromfile(header.data_file, dtype=header.dtype, count=n, offset=offset)
+    elif header.encoding in ("gzip", "zlib"):
+        flat = np.empty(n, dtype=header.dtype)
+        pos = 0
+        with open(header.data_file, "rb") as f:
+            f.seek(max(header.data_offset, 0))
+            if header.encoding == "gzip":
+                stream, decompress = gzip.GzipFile(fileobj=f), None
+            else:
+                stream, decompress = f, zlib.decompressobj().decompress
+            for buf in _iter_decompressed(stream, decompress, header.dtype.itemsize):
+                chunk = np.frombuffer(buf, dtype=header.dtype)[:n - pos]
+                flat[pos:pos + len(chunk)] = chunk
+                pos += len(chunk)
+        if pos != n:
+            raise VolumeHeaderError(f"{header.path.name}: payload has {pos} voxels, expected {n}")
+    else:
+        raise VolumeHeaderError(f"{header.path.name}: cannot read '{header.encoding}' encoding")
+    return flat.reshape(header.sizes, order="F")
@@ -13,9 +13,20 @@ def load_config():
     with open(CONFIG_PATH, "r") as f:
         return yaml.safe_load(f)
 
-def download_and_aggregate(experiments_df, mcc, config):
+def select_best_experiment(experiments_df):
+    """
+    Esperimento rappresentativo per la trattografia: volume di iniezione massimo.
+    Ritorna l'ID (int) oppure None se non ci sono esperimenti.
+    """
+    if experiments_df.empty:
+        return None
+    best_exp = experiments_df.sort_values(by="injection_volume", ascending=False).iloc[0]
+    return int(best_exp['id'])
+
+def download_and_aggregate(experiments_df, mcc, config, fetch_tracts=True):
     """
     Scarica dati numerici (CSV) e il volume 3D (Tracts) per il miglior esperimento.
+    Con fetch_tracts=False scarica solo i dati numerici (la pipeline scarica i tratti in un nodo separato).
     """
     experiment_ids = experiments_df['id'].tolist()
     metric = config["processing"]["metric"] 
@@ -23,20 +34,20 @@ def download_and_aggregate(experiments_df, mcc, config):
     
     # --- 1. Selezione "Best Experiment" per la Trattografia ---
     # Ordiniamo per volume di iniezione decrescente e prendiamo il primo.
-    if not experiments_df.empty:
-        best_exp = experiments_df.sort_values(by="injection_volume", ascending=False).iloc[0]
-        best_id = int(best_exp['id'])
+    best_id = select_best_experiment(experiments_df)
+    if best_id is None:
+        print("[WARNING] No experiments available for tractography.")
+    else:
+        best_vol = experiments_df.loc[experiments_df['id'] == best_id, 'injection_volume'].iloc[0]
         print(f"\n[MINER] Selected Representative Experiment: {best_id}")
-        print(f"        (Injection Vol: {best_exp['injection_volume']:.3f} mm3)")
-        
+        print(f"        (Injection Vol: {best_vol:.3f} mm3)")
+    if best_id is not None and fetch_tracts:
         # Scarichiamo il volume 3D
         success = fetch_and_process_tracts(best_id)
         if success:
             print(f"[MINER] Tractography volume secured for {best_id}")
         else:
             print(f"[WARNING] Could not download tracts for {best_id}")
-    else:
-        print("[WARNING] No experiments available for tractography.")
 
     # --- 2. Download Dati Numerici (Unionize) ---
     print(f"\n[MINER] Downloading unionize data for {len(experiment_ids)} experiments...")
@@ -88,7 +99,7 @@ def download_and_aggregate(experiments_df, mcc, config):
     
     # --- NUOVO: Salviamo l'ID del "Best Experiment" nel CSV ---
     # Aggiungiamo una colonna 'best_experiment_id' (lo ripetiamo su tutte le righe, è un metadato)
-    if not experiments_df.empty:
+    if best_id is not None:
         final_df['tract_experiment_id'] = best_id
     
     return final_df
@@ -1,10 +1,15 @@
 import shutil
+import sys
 from pathlib import Path
 from allensdk.core.mouse_connectivity_cache import MouseConnectivityCache
 import yaml
 
 # --- CONFIGURATION ---
 PROJECT_ROOT = Path(__file__).resolve().parent.parent.parent
+sys.path.append(str(PROJECT_ROOT))
+
+from src.common.tract_catalog import TractCatalog
+
 CONFIG_PATH = PROJECT_ROOT / "configs" / "mining_config.yaml"
 DATA_RAW_PATH = PROJECT_ROOT / "data" / "raw"
 DATA_PROCESSED_TRACTS = PROJECT_ROOT / "data" / "processed" / "tracts"
@@ -26,6 +31,7 @@ def fetch_and_process_tracts(experiment_id):
     mcc = MouseConnectivityCache(manifest_file=str(DATA_RAW_PATH / "manifest.json"))
     
     DATA_PROCESSED_TRACTS.mkdir(parents=True, exist_ok=True)
+    catalog = TractCatalog(DATA_PROCESSED_TRACTS)
 
     try:
         import SimpleITK as sitk
@@ -54,6 +60,8 @@ def fetch_and_process_tracts(experiment_id):
             img.SetOrigin(meta['space origin'])
             
         sitk.WriteImage(img, str(dest_path))
+        catalog.register(dest_path, experiment_id, "density", "raw",
+                         shape=img.GetSize(), spacing=img.GetSpacing())
         print(f"    [OK] Saved {dest_path.name}")
         success_count += 1
     except Exception as e:
@@ -71,6 +79,20 @@ def fetch_and_process_tracts(experiment_id):
         # mcc.api is usually a GridDataApi
         if hasattr(mcc, 'api') and hasattr(mcc.api, 'download_projection_energy'):
             mcc.api.download_projection_energy(experiment_id, str(dest_path))
+            catalog.register(dest_path, experiment_id, "energy", "raw")
+            print(f"    [OK] Saved {dest_path.name}")
+            success_count += 1
+        else:
+            print("    [SKIP] projection_energy download not available in this AllenSDK version.")
+    except Exception as e:
+        print(f"    [ERROR] Failed to fetch energy: {e}")
+
+    return success_count > 0
+
+if __name__ == "__main__":
+    from fetch import get_experiments
+
+    cfg = load_config()
     seed = cfg["experiment"]["seed_acronym"]
     print(f"Finding experiments for seed: {seed}")
     
@@ -0,0 +1,317 @@
+"""
+Gene expression miner: downloads the Allen Mouse Brain ISH 3D expression grids
+(energy / density / intensity, 200 um) of a list of genes into
+data/processed/gene_expression/{gene}/, and reduces the whole panel to one
+gene x structure expression matrix.
+
+Volumes are written as NRRD (gzip encoding by default) in the same axis convention
+as the tract volumes, so src/common/volume_header.py reads them back chunk by chunk;
+each one gets a metadata JSON next to it. Genes are fetched concurrently (the work
+is network-bound) and genes already on disk are not downloaded again.
+
+The matrix is a labelled reduction: the atlas annotation is sampled on the
+expression grid, voxels are sorted by structure once, and the sums of a block of
+genes over every structure are one np.add.reduceat over that order. Sums and voxel
+counts are then rolled up the ontology (src/common/ontology.py), so a parent's value
+is the mean over its whole subtree. Voxels without data (-1 in the Allen grids) are
+ignored.
+
+The Allen API is behind a small interface (find_datasets, download_grid, annotation)
+so the miner can run against a local fake.
+
+Usage:
+    python src/miner/gene_miner.py Tph2 Slc6a4 Fev --workers 8
+    python src/miner/gene_miner.py            # genes from configs/mining_config.yaml
+"""
+import argparse
+import gzip
+import json
+import sys
+import tempfile
+import zipfile
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+from datetime import datetime
+from pathlib import Path
+from typing import Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+import pandas as pd
+import yaml
+
+# --- CONFIGURATION ---
+PROJECT_ROOT = Path(__file__).resolve().parent.parent.parent
+sys.path.append(str(PROJECT_ROOT))
+
+from src.common.ontology import Ontology
+from src.common.volume_header import read_volume_array, read_volume_header
+
+CONFIG_PATH = PROJECT_ROOT / "configs" / "mining_config.yaml"
+DATA_RAW_PATH = PROJECT_ROOT / "data" / "raw"
+GENE_DIR = PROJECT_ROOT / "data" / "processed" / "gene_expression"
+VOLUME_TYPES = ("energy", "density", "intensity")
+PLANES = ("coronal", "sagittal")
+GRID_SPACING = (200.0, 200.0, 200.0) # Allen ISH expression grids (AP, DV, ML microns)
+ANNOTATION_RESOLUTION = 100 # Annotation sampled onto the expression grid
+GENE_BLOCK = 64 # Genes reduced together (bounds the sorted copy of the volumes)
+MATRIX_VERSION = 1
+
+# --- Gene API ---
+
+class AllenGeneApi:
+    """The Allen Brain Map API (allensdk): ISH section data sets and their expression grids."""
+
+    def __init__(self, manifest_dir: Path = DATA_RAW_PATH):
+        from allensdk.api.queries.grid_data_api import GridDataApi
+        from allensdk.api.queries.rma_api import RmaApi
+        self._grid_api = GridDataApi
+        self._rma_api = RmaApi
+        self.manifest_dir = Path(manifest_dir)
+
+    def find_datasets(self, gene: str) -> List[dict]:
+        """Passed ISH experiments of a gene: [{"id", "plane"}]."""
+        rows = self._rma_api().model_query(
+            "SectionDataSet",
+            criteria=f"[failed$eqfalse],products[abbreviation$eq'Mouse'],genes[acronym$eq'{gene}']",
+            include="genes,plane_of_section", num_rows="all")
+        return [{"id": int(r["id"]), "plane": r.get("plane_of_section", {}).get("name", "")} for r in rows]
+
+    def download_grid(self, dataset_id: int, volume_type: str) -> Tuple[np.ndarray, Tuple[float, ...]]:
+        """Expression grid as an (AP, DV, ML) float32 array, with its spacing."""
+        with tempfile.TemporaryDirectory() as tmp:
+            zip_path = Path(tmp) / f"{dataset_id}.zip"
+            self._grid_api().download_gene_expression_grid_data(dataset_id, include=[volume_type],
+                                                                 path=str(zip_path))
+            with zipfile.ZipFile(zip_path) as archive:
+                archive.extractall(tmp)
+            # The grid MetaImage has AP as its fastest (x) axis: DimSize 67 41 58 = (AP, DV, ML)
+            header = read_volume_header(next(Path(tmp).rglob(f"{volume_type}.mhd")))
+            volume = read_volume_array(header, mmap=False)
+            return np.ascontiguousarray(volume, dtype=np.float32), tuple(header.spacing)
+
+    def annotation(self) -> Tuple[np.ndarray, float, list]:
+        """CCFv3 annotation volume, its resolution (microns) and the structure list."""
+        from allensdk.core.mouse_connectivity_cache import MouseConnectivityCache
+        mcc = MouseConnectivityCache(manifest_file=str(self.manifest_dir / "manifest.json"),
+                                     resolution=ANNOTATION_RESOLUTION)
+        annotation, _ = mcc.get_annotation_volume()
+        return annotation, float(ANNOTATION_RESOLUTION), mcc.get_structure_tree().nodes()
+
+def choose_dataset(datasets: Sequence[dict], plane: str = "coronal") -> Optional[dict]:
+    """The data set of the preferred plane (coronal sections cover both hemispheres), else any."""
+    preferred = [d for d in datasets if d.get("plane") == plane]
+    candidates = preferred or list(datasets)
+    return max(candidates, key=lambda d: d["id"]) if candidates else None # Newest
+
+# --- Storage ---
+
+def gene_dir(gene: str, out_dir: Path = GENE_DIR) -> Path:
+    return Path(out_dir) / gene.lower()
+
+def volume_path(gene: str, volume_type: str, out_dir: Path = GENE_DIR) -> Path:
+    return gene_dir(gene, out_dir) / f"{gene}_{volume_type}.nrrd"
+
+def write_nrrd(path: Path, volume: np.ndarray, spacing: Sequence[float], encoding: str = "gzip"):
+    """
+    Writes an (AP, DV, ML) array as NRRD with ML as the fastest axis (the layout
+    SimpleITK gives the tract volumes). Atomic: written to a temporary name first.
+    """
+    volume = np.ascontiguousarray(volume, dtype="<f4")
+    steps = list(reversed(spacing)) # Fastest axis first
+    directions = " ".join("(" + ",".join(f"{step:g}" if i == j else "0" for j in range(3)) + ")"
+                          for i, step in enumerate(steps))
+    header = (
+        "NRRD0004\n"
+        "type: float\n"
+        "dimension: 3\n"
+        "space: left-posterior-superior\n"
+        f"sizes: {' '.join(str(s) for s in reversed(volume.shape))}\n"
+        f"space directions: {directions}\n"
+        "kinds: domain domain domain\n"
+        "endian: little\n"
+        f"encoding: {encoding}\n"
+        "space origin: (0,0,0)\n\n"
+    )
+    path = Path(path)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp = path.with_name(f".{path.name}.tmp")
+    with open(tmp, "wb") as f:
+        f.write(header.encode("ascii"))
+        f.write(gzip.compress(volume.tobytes(), compresslevel=6) if encoding == "gzip" else volume.tobytes())
+    tmp.replace(path)
+
+def read_gene_volume(path: Path) -> np.ndarray:
+    """(AP, DV, ML) array of a volume written by write_nrrd."""
+    return np.ascontiguousarray(read_volume_array(read_volume_header(path), mmap=False).T)
+
+# --- Fetching ---
+
+def fetch_gene(api, gene: str, volume_type: str = "energy", plane: str = "coronal", out_dir: Path = GENE_DIR,
+               force: bool = False, encoding: str = "gzip") -> dict:
+    """
+    Downloads one gene's expression grid (skipped if already on disk). Returns a record
+    with gene, status ("ok", "cached", "missing" or "error"), path and dataset_id.
+    """
+    path = volume_path(gene, volume_type, out_dir)
+    meta_path = path.with_suffix(".json")
+    if path.exists() and meta_path.exists() and not force:
+        meta = json.loads(meta_path.read_text())
+        return {"gene": gene, "status": "cached", "path": str(path), "dataset_id": meta.get("dataset_id")}
+    try:
+        dataset = choose_dataset(api.find_datasets(gene), plane)
+        if dataset is None:
+            print(f"[GENES] No ISH data set for {gene}")
+            return {"gene": gene, "status": "missing", "path": None, "dataset_id": None}
+        volume, spacing = api.download_grid(dataset["id"], volume_type)
+        write_nrrd(path, volume, spacing, encoding=encoding)
+        meta = {"gene": gene, "dataset_id": dataset["id"], "plane": dataset.get("plane"),
+                "volume_type": volume_type, "shape": list(volume.shape), "spacing": list(spacing),
+                "axes": ["AP", "DV", "ML"], "fetched": datetime.now().isoformat(timespec="seconds")}
+        meta_path.write_text(json.dumps(meta, indent=4))
+        print(f"[GENES] {gene}: data set {dataset['id']} ({dataset.get('plane')}) -> {path.name}")
+        return {"gene": gene, "status": "ok", "path": str(path), "dataset_id": dataset["id"]}
+    except Exception as e:
+        print(f"[GENES] {gene} failed: {e}")
+        return {"gene": gene, "status": "error", "path": None, "dataset_id": None, "error": str(e)}
+
+def fetch_genes(api, genes: Sequence[str], workers: int = 8, **kwargs) -> List[dict]:
+    """fetch_gene for every gene on a thread pool; records in the order of genes."""
+    genes = list(dict.fromkeys(genes)) # Drop duplicates, keep order
+    with ThreadPoolExecutor(max_workers=max(1, workers)) as pool:
+        return list(pool.map(lambda gene: fetch_gene(api, gene, **kwargs), genes))
+
+# --- Gene x structure matrix ---
+
+def sample_annotation(annotation: np.ndarray, resolution: float, grid_shape: Sequence[int],
+                      grid_spacing: Sequence[float] = GRID_SPACING) -> np.ndarray:
+    """Annotation label at the center of every voxel of the expression grid (0 outside the atlas)."""
+    index = [((np.arange(size) + 0.5) * spacing // resolution).astype(np.int64)
+             for size, spacing in zip(grid_shape, grid_spacing)]
+    sampled = annotation[np.ix_(*[np.minimum(i, n - 1) for i, n in zip(index, annotation.shape)])]
+    inside = [i < n for i, n in zip(index, annotation.shape)]
+    sampled[~(inside[0][:, None, None] & inside[1][None, :, None] & inside[2][None, None, :])] = 0
+    return sampled
+
+@dataclass
+class ExpressionMatrix:
+    genes: np.ndarray     # (g,)
+    ids: np.ndarray       # (s,) structure IDs
+    acronyms: np.ndarray  # (s,)
+    mean: np.ndarray      # (g, s) mean expression over each structure's subtree, NaN without data
+    voxels: np.ndarray    # (g, s) voxels with data behind each mean
+    volume_type: str = "energy"
+
+    def to_frame(self) -> pd.DataFrame:
+        """Genes (rows) x structure acronyms (columns)."""
+        return pd.DataFrame(self.mean, index=pd.Index(self.genes, name="gene"),
+                            columns=pd.Index(self.acronyms, name="acronym"))
+
+    def save(self, path):
+        path = Path(path)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        tmp = path.with_name(f".{path.stem}.tmp.npz")
+        np.savez_compressed(tmp, version=MATRIX_VERSION, genes=self.genes, ids=self.ids, acronyms=self.acronyms,
+                            mean=self.mean, voxels=self.voxels, volume_type=self.volume_type)
+        tmp.replace(path)
+
+    @classmethod
+    def load(cls, path):
+        with np.load(path) as npz:
+            if int(npz["version"]) != MATRIX_VERSION:
+                raise ValueError(f"expression matrix version {int(npz['version'])}")
+            return cls(npz["genes"], npz["ids"], npz["acronyms"], npz["mean"], npz["voxels"],
+                       str(npz["volume_type"]))
+
+def expression_matrix(volumes: Dict[str, np.ndarray], annotation: np.ndarray, ontology: Ontology,
+                      volume_type: str = "energy", gene_block: int = GENE_BLOCK) -> ExpressionMatrix:
+    """
+    volumes: gene -> (AP, DV, ML) grid; annotation: labels on the same grid. Mean
+    expression of every gene in every structure (its descendants included).
+    """
+    genes = list(volumes)
+    rows = ontology.rows(np.asarray(annotation).ravel())
+    inside = np.flatnonzero(rows >= 0)
+    order = inside[np.argsort(rows[inside], kind="stable")]
+    sorted_rows = rows[order]
+    starts = np.flatnonzero(np.r_[True, sorted_rows[1:] != sorted_rows[:-1]]) if len(order) else np.zeros(0, int)
+    present = sorted_rows[starts]
+
+    n = len(ontology)
+    sums = np.zeros((n, len(genes)))
+    counts = np.zeros((n, len(genes)))
+    for block in range(0, len(genes), gene_block):
+        names = genes[block:block + gene_block]
+        G = np.stack([np.asarray(volumes[g], dtype=np.float32).ravel()[order] for g in names])
+        valid = np.isfinite(G) & (G >= 0) # -1: no data
+        if len(starts):
+            sums[present, block:block + len(names)] = np.add.reduceat(np.where(valid, G, 0), starts, axis=1).T
+            counts[present, block:block + len(names)] = np.add.reduceat(valid, starts, axis=1, dtype=np.int64).T
+
+    sums, counts = ontology.scatter_up(sums), ontology.scatter_up(counts)
+    with np.errstate(invalid="ignore", divide="ignore"):
+        mean = np.where(counts > 0, sums / counts, np.nan)
+    return ExpressionMatrix(np.asarray(genes), ontology.ids, ontology.acronyms, mean.T,
+                            counts.T.astype(np.int64), volume_type)
+
+def matrix_path(volume_type: str, out_dir: Path = GENE_DIR) -> Path:
+    return Path(out_dir) / f"expression_matrix_{volume_type}.npz"
+
+def mine_genes(api, genes: Sequence[str], volume_type: str = "energy", plane: str = "coronal",
+               out_dir: Path = GENE_DIR, workers: int = 8, force: bool = False) -> Tuple[List[dict], Optional[ExpressionMatrix]]:
+    """Fetches a gene panel and writes its gene x structure matrix next to the volumes."""
+    if volume_type not in VOLUME_TYPES:
+        raise ValueError(f"Unknown volume type '{volume_type}'. Options: {', '.join(VOLUME_TYPES)}")
+    records = fetch_genes(api, genes, workers=workers, volume_type=volume_type, plane=plane, out_dir=out_dir,
+                          force=force)
+    fetched = [r for r in records if r["status"] in ("ok", "cached")]
+    if not fetched:
+        print("[GENES] No volumes to reduce.")
+        return records, None
+
+    volumes = {r["gene"]: read_gene_volume(Path(r["path"])) for r in fetched}
+    shape = next(iter(volumes.values())).shape
+    odd = [g for g, v in volumes.items() if v.shape != shape]
+    for gene in odd:
+        print(f"[GENES] {gene}: grid {volumes.pop(gene).shape} differs from {shape}, left out of the matrix")
+
+    spacing = tuple(reversed(read_volume_header(Path(fetched[0]["path"])).spacing)) # (AP, DV, ML)
+    annotation, resolution, structures = api.annotation()
+    grid = sample_annotation(np.asarray(annotation), resolution, shape, spacing)
+    matrix = expression_matrix(volumes, grid, Ontology.from_structures(structures), volume_type)
+    path = matrix_path(volume_type, out_dir)
+    matrix.save(path)
+    print(f"[GENES] {len(matrix.genes)} genes x {len(matrix.ids)} structures -> {path}")
+    return records, matrix
+
+def load_config():
+    with open(CONFIG_PATH, "r") as f:
+        return yaml.safe_load(f)
+
+def main(argv=None):
+    config = (load_config() or {}).get("gene_expression", {}) if CONFIG_PATH.exists() else {}
+    parser = argparse.ArgumentParser(description="Fetch Allen ISH expression grids and build a gene x structure matrix.")
+    parser.add_argument("genes", nargs="*", help="Gene symbols (default: gene_expression.genes of the config)")
+    parser.add_argument("--volume-type", default=config.get("volume_type", "energy"), choices=VOLUME_TYPES)
+    parser.add_argument("--plane", default=config.get("plane_of_section", "coronal"), choices=PLANES)
+    parser.add_argument("--workers", type=int, default=8, help="Concurrent downloads")
+    parser.add_argument("--out-dir", type=Path, default=GENE_DIR)
+    parser.add_argument("--force", action="store_true", help="Download genes already on disk again")
+    parser.add_argument("--csv", action="store_true", help="Also write the matrix as CSV")
+    args = parser.parse_args(argv)
+
+    genes = args.genes or config.get("genes") or []
+    if not genes:
+        parser.error("no genes given (pass them or set gene_expression.genes in the config)")
+    records, matrix = mine_genes(AllenGeneApi(), genes, volume_type=args.volume_type, plane=args.plane,
+                                 out_dir=args.out_dir, workers=args.workers, force=args.force)
+    if matrix is not None and args.csv:
+        csv_path = matrix_path(args.volume_type, args.out_dir).with_suffix(".csv")
+        matrix.to_frame().to_csv(csv_path)
+        print(f"[GENES] Matrix CSV: {csv_path}")
+
+    failed = [r["gene"] for r in records if r["status"] in ("missing", "error")]
+    print(f"\n[SUCCESS] {len(records) - len(failed)}/{len(records)} genes" + (f" (failed: {', '.join(failed)})" if failed else ""))
+    return 1 if failed else 0
+
+if __name__ == "__main__":
+    sys.exit(main())
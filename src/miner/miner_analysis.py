@@ -6,9 +6,11 @@ import sys
 
 # Fix import path
 sys.path.append(str(Path(__file__).resolve().parent))
+sys.path.append(str(Path(__file__).resolve().parent.parent.parent))
 
 # Import from existing miner
 from fetch import get_experiments, DATA_RAW_PATH, CONFIG_PATH
+from src.common.ontology import Ontology
 
 def load_config():
     with open(CONFIG_PATH, "r") as f:
@@ -107,6 +109,11 @@ def run_analysis_mining():
     
     final_df.to_csv(output_file, index=False)
     print(f"\n[SUCCESS] Full analysis data saved to: {output_file}")
+
+    # Structure tree, for the ontology roll-ups in the notebook (src/common/ontology.py)
+    structures_file = output_dir / "structures.csv"
+    Ontology.from_structures(st.nodes()).save_csv(structures_file)
+    print(f"[SUCCESS] Structure tree saved to: {structures_file}")
     print(final_df.head())
 
 if __name__ == "__main__":
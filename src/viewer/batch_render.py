@@ -0,0 +1,199 @@
+"""
+Headless batch rendering: renders CSV scenes from fixed views to PNG files without
+opening the interactive window. Each image is written next to a metadata JSON.
+
+Usage:
+    python src/viewer/batch_render.py data/processed/*.csv --views top side front --workers 4
+"""
+import argparse
+import json
+import multiprocessing as mp
+import os
+import sys
+import time
+import traceback
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from dataclasses import dataclass, asdict
+from datetime import datetime
+from pathlib import Path
+from typing import List, Optional
+
+import pandas as pd
+
+# Add src to path
+sys.path.append(str(Path(__file__).resolve().parent.parent.parent))
+
+from src.common.tract_catalog import TractCatalog
+from src.viewer import logic
+from src.viewer import threshold as thr
+
+PROJECT_ROOT = Path(__file__).resolve().parent.parent.parent
+TRACTS_DIR = PROJECT_ROOT / "data" / "processed" / "tracts"
+OUTPUT_DIR = PROJECT_ROOT / "scenes" / "batch"
+ATLAS_NAME = "allen_mouse_25um"
+VIEWS = ("top", "side", "front")
+DEFAULT_ALPHA = 0.8
+DEFAULT_VIZ_MODE = "Density (Raw)"
+
+@dataclass(frozen=True)
+class RenderJob:
+    csv_path: str
+    view: str
+    tract_id: Optional[int]
+    viz_mode: str
+    output_path: str
+
+def read_tract_id(csv_path) -> Optional[int]:
+    """Reads the linked tractography ID (first row of 'tract_experiment_id'), if any."""
+    try:
+        df = pd.read_csv(csv_path, usecols=lambda c: c == "tract_experiment_id", nrows=1)
+    except Exception as e:
+        print(f"[BATCH] Could not read {csv_path}: {e}")
+        return None
+    if "tract_experiment_id" not in df.columns or df.empty:
+        return None
+    return int(df["tract_experiment_id"].iloc[0])
+
+def plan_jobs(csv_paths: List[Path], views=VIEWS, viz_mode=DEFAULT_VIZ_MODE, output_dir: Path = OUTPUT_DIR) -> List[RenderJob]:
+    """Builds one job per (CSV, view). Output files are named {csv_stem}_{view}.png."""
+    jobs = []
+    for csv_path in csv_paths:
+        csv_path = Path(csv_path)
+        tract_id = read_tract_id(csv_path)
+        for view in views:
+            if view not in VIEWS:
+                raise ValueError(f"Unknown view '{view}'. Options: {', '.join(VIEWS)}")
+            output_path = Path(output_dir) / f"{csv_path.stem}_{view}.png"
+            jobs.append(RenderJob(str(csv_path), view, tract_id, viz_mode, str(output_path)))
+    return jobs
+
+def configure_offscreen(software: bool):
+    """Must run before vtk is imported in the process."""
+    if software:
+        # Mesa llvmpipe: CPU rasterizer for machines without a GPU
+        os.environ["LIBGL_ALWAYS_SOFTWARE"] = "1"
+        os.environ.setdefault("MESA_GL_VERSION_OVERRIDE", "3.2")
+        os.environ.setdefault("GALLIUM_DRIVER", "llvmpipe")
+
+# --- Worker State (one RenderEngine and catalog connection per process) ---
+_ENGINE = None
+_CATALOG = None
+
+def _init_worker(atlas_name: str, software: bool, tracts_dir: Path):
+    global _ENGINE, _CATALOG
+    configure_offscreen(software)
+    _CATALOG = TractCatalog(tracts_dir)
+
+    from src.viewer import rendering
+    rendering.settings.OFFSCREEN = True
+    _ENGINE = rendering.RenderEngine(atlas_name)
+
+def _run_job(job: RenderJob, alpha: float, tracts_dir: Path, threshold_fraction: float = thr.DEFAULT_FRACTION) -> dict:
+    t0 = time.perf_counter()
+    record = asdict(job)
+    record["status"] = "error"
+    try:
+        data, v_min, v_max = logic.process_csv_data(job.csv_path, colormap_name="viridis")
+        if not data:
+            raise ValueError("Could not read CSV or empty data.")
+
+        selection = [{"acronym": item["acronym"], "color": item["color"]} for item in data]
+        seed = next((item["acronym"] for item in data if item.get("is_seed")), "ManualSelection")
+        # Same lookup as the viewer: a filtered mesh only if it was made from this experiment
+        tract_path = logic.resolve_tract_file(tracts_dir, job.tract_id, job.viz_mode, catalog=_CATALOG,
+                                              threshold_fraction=threshold_fraction) if job.tract_id else None
+
+        _ENGINE.render_to_file(
+            selection,
+            output_path=Path(job.output_path),
+            view=job.view,
+            tract_file=tract_path,
+            alpha=alpha,
+            visualization_mode=job.viz_mode,
+            threshold_fraction=threshold_fraction,
+        )
+
+        record.update({
+            "status": "ok",
+            "experiment_seed": seed,
+            "timestamp": datetime.now().strftime("%Y-%m-%d_%H-%M-%S"),
+            "regions_count": len(selection),
+            "targets_rendered": [s["acronym"] for s in selection if s["acronym"] != seed],
+            "tract_file_used": tract_path.name if tract_path else "None",
+            "alpha_used": alpha,
+            "threshold_fraction": threshold_fraction,
+            "scalar_min": float(v_min),
+            "scalar_max": float(v_max),
+        })
+    except Exception as e:
+        record["error"] = str(e)
+        traceback.print_exc()
+
+    record["seconds"] = round(time.perf_counter() - t0, 3)
+    Path(job.output_path).parent.mkdir(parents=True, exist_ok=True)
+    with open(Path(job.output_path).with_suffix(".json"), "w") as f:
+        json.dump(record, f, indent=4)
+    return record
+
+def run_batch(jobs: List[RenderJob], workers: int = 1, atlas_name=ATLAS_NAME, software=False, alpha=DEFAULT_ALPHA, tracts_dir: Path = TRACTS_DIR,
+              threshold_fraction: float = thr.DEFAULT_FRACTION) -> List[dict]:
+    """Runs the jobs over a process pool and returns one metadata record per job."""
+    if not jobs:
+        return []
+
+    workers = max(1, min(workers, len(jobs)))
+    print(f"[BATCH] Rendering {len(jobs)} images with {workers} worker(s)...")
+    # One sync up front; the workers only read the catalog
+    catalog = TractCatalog(tracts_dir)
+    counts = {k: len(v) for k, v in catalog.sync().items()}
+    print(f"[BATCH] Tract catalog synced: {len(catalog)} artifacts {counts}")
+
+    # 'spawn' gives every worker a clean VTK/OpenGL state
+    ctx = mp.get_context("spawn")
+    records = []
+    with ProcessPoolExecutor(max_workers=workers, mp_context=ctx, initializer=_init_worker, initargs=(atlas_name, software, tracts_dir)) as pool:
+        futures = {pool.submit(_run_job, job, alpha, tracts_dir, threshold_fraction): job for job in jobs}
+        for future in as_completed(futures):
+            job = futures[future]
+            try:
+                record = future.result()
+            except Exception as e:
+                record = {**asdict(job), "status": "error", "error": str(e)}
+            records.append(record)
+            print(f"[BATCH] [{len(records)}/{len(jobs)}] {record['status'].upper()} {Path(job.output_path).name}")
+
+    return records
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Render CSV scenes offscreen to images.")
+    parser.add_argument("csv", nargs="+", type=Path, help="CSV files produced by the miner")
+    parser.add_argument("--views", nargs="+", default=list(VIEWS), choices=VIEWS)
+    parser.add_argument("--viz-mode", default=DEFAULT_VIZ_MODE,
+                        choices=["None", "Density (Raw)", "Density (Points)", "Density (Voxels)", "Density (Filtered)",
+                                 "Streamlines (Tubes)", "Streamlines (Filtered)"])
+    parser.add_argument("--output-dir", type=Path, default=OUTPUT_DIR)
+    parser.add_argument("--workers", type=int, default=max(1, (os.cpu_count() or 2) // 2))
+    parser.add_argument("--atlas", default=ATLAS_NAME)
+    parser.add_argument("--alpha", type=float, default=DEFAULT_ALPHA)
+    parser.add_argument("--threshold", type=float, default=thr.DEFAULT_FRACTION, help="Isosurface threshold (fraction of max)")
+    parser.add_argument("--software", action="store_true", help="Force software (Mesa) OpenGL, for machines without a GPU")
+    args = parser.parse_args(argv)
+
+    # Headless Linux box: no X server to host a GPU context, fall back to Mesa
+    software = args.software or (sys.platform.startswith("linux") and not os.environ.get("DISPLAY"))
+
+    jobs = plan_jobs(args.csv, views=args.views, viz_mode=args.viz_mode, output_dir=args.output_dir)
+    records = run_batch(jobs, workers=args.workers, atlas_name=args.atlas, software=software, alpha=args.alpha,
+                          threshold_fraction=args.threshold)
+
+    args.output_dir.mkdir(parents=True, exist_ok=True)
+    manifest_path = args.output_dir / "batch_manifest.json"
+    with open(manifest_path, "w") as f:
+        json.dump(sorted(records, key=lambda r: r["output_path"]), f, indent=4)
+
+    failed = [r for r in records if r["status"] != "ok"]
+    print(f"\n[SUCCESS] {len(records) - len(failed)}/{len(records)} images rendered. Manifest: {manifest_path}")
+    return 1 if failed else 0
+
+if __name__ == "__main__":
+    sys.exit(main())
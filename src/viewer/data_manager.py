@@ -0,0 +1,116 @@
+"""
+Data manager for the viewer CSVs in data/processed/.
+
+Each CSV is parsed once into a CsvData record (regions with colors, value range and
+linked tractography ID), cached until the file's mtime or size changes. poll() is
+cheap enough to call from the GUI loop: it rescans the folder at most every
+poll_interval seconds and reports added, changed and removed files.
+"""
+import os
+import time
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+
+import pandas as pd
+
+from src.viewer import logic
+
+@dataclass(frozen=True)
+class CsvData:
+    path: Path
+    mtime_ns: int
+    size: int
+    regions: List[dict] = field(repr=False)
+    v_min: float
+    v_max: float
+    tract_id: Optional[int]
+
+@dataclass
+class ScanChanges:
+    added: List[str] = field(default_factory=list)
+    changed: List[str] = field(default_factory=list)
+    removed: List[str] = field(default_factory=list)
+
+    def __bool__(self):
+        return bool(self.added or self.changed or self.removed)
+
+class DataManager:
+    def __init__(self, data_dir: Path, colormap_name="viridis", normalization="linear", poll_interval: float = 2.0):
+        self.data_dir = Path(data_dir)
+        self.colormap_name = colormap_name
+        self.normalization = normalization
+        self.poll_interval = poll_interval
+
+        self._cache: Dict[str, CsvData] = {}
+        self._stats: Dict[str, Tuple[int, int]] = {}
+        self._last_poll = 0.0
+
+    # --- Folder Watching ---
+    def _stat_folder(self) -> Dict[str, Tuple[int, int]]:
+        if not self.data_dir.exists():
+            return {}
+        stats = {}
+        with os.scandir(self.data_dir) as it:
+            for entry in it:
+                if entry.is_file() and entry.name.lower().endswith(".csv"):
+                    st = entry.stat()
+                    stats[entry.name] = (st.st_mtime_ns, st.st_size)
+        return stats
+
+    def scan(self) -> ScanChanges:
+        """Rescans the folder, drops stale cache entries and returns what changed."""
+        stats = self._stat_folder()
+        changes = ScanChanges(
+            added=sorted(n for n in stats if n not in self._stats),
+            changed=sorted(n for n in stats if n in self._stats and stats[n] != self._stats[n]),
+            removed=sorted(n for n in self._stats if n not in stats),
+        )
+        for name in changes.changed + changes.removed:
+            self._cache.pop(str(self.data_dir / name), None)
+        self._stats = stats
+        self._last_poll = time.monotonic()
+        return changes
+
+    def poll(self) -> Optional[ScanChanges]:
+        """Throttled scan(): returns the changes, or None if nothing changed or it is too early."""
+        if time.monotonic() - self._last_poll < self.poll_interval:
+            return None
+        changes = self.scan()
+        return changes or None
+
+    @property
+    def files(self) -> List[str]:
+        return sorted(self._stats)
+
+    # --- Loading ---
+    def load(self, path) -> Optional[CsvData]:
+        """Returns the parsed CSV, reading the file only if it is new or changed on disk."""
+        path = Path(path)
+        key = str(path)
+        try:
+            st = path.stat()
+        except OSError as e:
+            print(f"[DATA] Cannot stat {path}: {e}")
+            self._cache.pop(key, None)
+            return None
+
+        cached = self._cache.get(key)
+        if cached and (cached.mtime_ns, cached.size) == (st.st_mtime_ns, st.st_size):
+            return cached
+
+        try:
+            df = pd.read_csv(path)
+            regions, v_min, v_max = logic.process_csv_frame(df, colormap_name=self.colormap_name, normalization=self.normalization)
+        except Exception as e:
+            print(f"[DATA] CSV Load Error ({path.name}): {e}")
+            return None
+
+        # Look for the magic column added by the Miner
+        tract_id = None
+        if 'tract_experiment_id' in df.columns and df['tract_experiment_id'].notna().any():
+            tract_id = int(df['tract_experiment_id'].dropna().iloc[0])
+
+        data = CsvData(path, st.st_mtime_ns, st.st_size, regions, float(v_min), float(v_max), tract_id)
+        self._cache[key] = data
+        return data
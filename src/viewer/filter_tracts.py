@@ -1,3 +1,4 @@
+import sys
 import yaml
 import numpy as np
 from pathlib import Path
@@ -8,115 +9,13 @@ from vedo import Volume, merge, Mesh
 # Calculate root starting from src/viewer/filter_tracts.py
 # viewer -> src -> ROOT
 PROJECT_ROOT = Path(__file__).resolve().parent.parent.parent
-CONFIG_PATH = PROJECT_ROOT / "configs" / "mining_config.yaml"
-DATA_DIR = PROJECT_ROOT / "data" / "processed" / "tracts"
-OUTPUT_NAME = "filtered_tracts.vtk"
-ATLAS_NAME = "allen_mouse_25um"
-
-def load_targets_from_config():
-    if not CONFIG_PATH.exists():
-        raise FileNotFoundError(f"Config not found at {CONFIG_PATH}")
-    
-    with open(CONFIG_PATH, "r") as f:
-        cfg = yaml.safe_load(f)
-        
-    targets = cfg.get("selection", {}).get("custom_targets", [])
-    clean_targets = [t.split("#")[0].strip() for t in targets]
-    return clean_targets
+sys.path.append(str(PROJECT_ROOT))
 
-def get_latest_tract_file():
-    """Finds the most recent .nrrd file and returns the ABSOLUTE path."""
-    if not DATA_DIR.exists():
-        raise FileNotFoundError(f"Directory not found: {DATA_DIR}")
-    
-    files = list(DATA_DIR.glob("*.nrrd"))
-    if not files:
-        files = list(DATA_DIR.glob("*.mhd")) 
-    
-    if not files:
-        raise FileNotFoundError("No tractography files found in data/processed/tracts")
-    
-    files.sort(key=lambda x: x.stat().st_mtime, reverse=True)
-    
-    # IMPORTANT: Returns resolved absolute path
-    return files[0].resolve()
+from src.common.cancellation import Cancelled
+from src.common.isosurface import DEFAULT_FRACTION
+from src.common.region_geometry import load_region_geometry
+from src.common.tract_catalog import TractCatalog, parse_artifact_name
 
-def run_filter(input_path: Path = None, output_path: Path = None):
-    print(f"--- FILTERING TRACTS (VOXEL MODE) ---")
-    
-    # 1. Load Targets
-    try:
-        target_regions = load_targets_from_config()
-        print(f"Targets from Config: {target_regions}")
-    except Exception as e:
-        print(f"[ERROR] Config Error: {e}")
-        return None
-
-    if not target_regions:
-        print("[ERROR] No targets found in mining_config.yaml.")
-        return None
-
-    # 2. Find Input File
-    try:
-        if input_path:
-            input_file = input_path
-        else:
-            input_file = get_latest_tract_file()
-        print(f"Input Absolute Path: {input_file}")
-    except Exception as e:
-        print(f"[ERROR] File Error: {e}")
-        return None
-
-    if output_path is None:
-        output_path = DATA_DIR / OUTPUT_NAME
-    
-    # 3. Load Atlas
-    print(f"Loading Atlas: {ATLAS_NAME}...")
-    bg_atlas = BrainGlobeAtlas(ATLAS_NAME)
-    
-    # 4. Load Volume
-    print(f"Loading Volume...")
-    vol = Volume(str(input_file))
-    vol_data = vol.tonumpy()
-    
-    print(f"Volume Shape: {vol_data.shape}")
-    print(f"Atlas Shape: {bg_atlas.annotation.shape}")
-    
-    # Verify shapes match
-    if vol_data.shape != bg_atlas.annotation.shape:
-        print(f"[WARN] Shape mismatch! Volume: {vol_data.shape}, Atlas: {bg_atlas.annotation.shape}")
-        
-        # Try to transpose
-        if sorted(vol_data.shape) == sorted(bg_atlas.annotation.shape):
-            print("[INFO] Dimensions are permuted. Attempting to auto-transpose...")
-            
-            target_shape = bg_atlas.annotation.shape
-            current_shape = vol_data.shape
-            
-            perm = []
-            used_indices = set()
-            possible = True
-            
-            for dim in target_shape:
-                found = False
-                for i, cdim in enumerate(current_shape):
-                    if cdim == dim and i not in used_indices:
-                        perm.append(i)
-                        used_indices.add(i)
-                        found = True
-                        break
-                if not found:
-                    possible = False
-import yaml
-import numpy as np
-from pathlib import Path
-from brainglobe_atlasapi import BrainGlobeAtlas
-from vedo import Volume, merge, Mesh
-
-# --- PATH CONFIGURATION ---
-# Calculate root starting from src/viewer/filter_tracts.py
-# viewer -> src -> ROOT
-PROJECT_ROOT = Path(__file__).resolve().parent.parent.parent
 CONFIG_PATH = PROJECT_ROOT / "configs" / "mining_config.yaml"
 DATA_DIR = PROJECT_ROOT / "data" / "processed" / "tracts"
 OUTPUT_NAME = "filtered_tracts.vtk"
@@ -134,26 +33,42 @@ def load_targets_from_config():
     return clean_targets
 
 def get_latest_tract_file():
-    """Finds the most recent .nrrd file and returns the ABSOLUTE path."""
+    """Finds the most recent raw volume (via the tract catalog) and returns the ABSOLUTE path."""
     if not DATA_DIR.exists():
         raise FileNotFoundError(f"Directory not found: {DATA_DIR}")
     
-    files = list(DATA_DIR.glob("*.nrrd"))
-    if not files:
-        files = list(DATA_DIR.glob("*.mhd")) 
+    catalog = TractCatalog(DATA_DIR)
+    catalog.sync() # Picks up files copied in by hand
+    latest = catalog.latest(kind="raw")
     
-    if not files:
+    if latest is None:
         raise FileNotFoundError("No tractography files found in data/processed/tracts")
     
-    files.sort(key=lambda x: x.stat().st_mtime, reverse=True)
-    
     # IMPORTANT: Returns resolved absolute path
-    return files[0].resolve()
-
-def run_filter(input_path: Path = None, output_path: Path = None):
+    return latest.resolve()
+
+class FilterCancelled(Cancelled):
+    pass
+
+def run_filter(input_path: Path = None, output_path: Path = None, progress_callback=None, cancel_event=None,
+               threshold_fraction=DEFAULT_FRACTION):
+    """
+    Masks the tract volume with the config targets and saves the isosurface at
+    threshold_fraction of the masked maximum.
+    progress_callback(stage, fraction) is called at each stage; setting cancel_event
+    (threading.Event) aborts at the next stage boundary with FilterCancelled.
+    """
     print(f"--- FILTERING TRACTS (VOXEL MODE) ---")
-    
+
+    def report(stage, fraction):
+        if cancel_event is not None and cancel_event.is_set():
+            print(f"[CANCEL] Filter cancelled before: {stage}")
+            raise FilterCancelled(stage)
+        if progress_callback:
+            progress_callback(stage, fraction)
+
     # 1. Load Targets
+    report("Loading targets", 0.0)
     try:
         target_regions = load_targets_from_config()
         print(f"Targets from Config: {target_regions}")
@@ -178,12 +93,15 @@ def run_filter(input_path: Path = None, output_path: Path = None):
 
     if output_path is None:
         output_path = DATA_DIR / OUTPUT_NAME
+    output_path = Path(output_path)
     
     # 3. Load Atlas
+    report("Loading atlas", 0.1)
     print(f"Loading Atlas: {ATLAS_NAME}...")
     bg_atlas = BrainGlobeAtlas(ATLAS_NAME)
     
     # 4. Load Volume
+    report("Loading volume", 0.3)
     print(f"Loading Volume...")
     vol = Volume(str(input_file))
     vol_data = vol.tonumpy()
@@ -230,28 +148,22 @@ def run_filter(input_path: Path = None, output_path: Path = None):
             return None
 
     # 5. Create Voxel Mask
+    report("Indexing regions", 0.4)
     print("Generating Voxel Mask...")
-    # Start with empty mask
+    # Region bounding boxes (cached per atlas): each target only scans its own box
+    geometry = load_region_geometry(bg_atlas, ATLAS_NAME)
     full_mask = np.zeros(bg_atlas.annotation.shape, dtype=bool)
     
-    for region in target_regions:
+    for i, region in enumerate(target_regions):
+        report(f"Masking {region}", 0.4 + 0.3 * i / len(target_regions))
         try:
-            # Get ID for region
-            structure = bg_atlas.structures[region]
-            sid = structure['id']
-            
-            # Get mask for this structure (and descendants)
-            # BrainGlobe's get_structure_mask returns a binary volume
-            mask = bg_atlas.get_structure_mask(sid)
-            
-            # Combine
-            full_mask = np.logical_or(full_mask, mask)
-        except KeyError:
-            print(f"[WARN] Region '{region}' not found in atlas.")
+            # Structure and descendants, within its bounding box
+            full_mask |= geometry.mask(bg_atlas.annotation, [region])
         except Exception as e:
             print(f"[WARN] Error masking '{region}': {e}")
 
     # 6. Apply Mask
+    report("Applying mask", 0.7)
     print("Applying Mask to Volume...")
     # Set voxels outside mask to 0
     vol_data[~full_mask] = 0
@@ -293,14 +205,28 @@ def run_filter(input_path: Path = None, output_path: Path = None):
     masked_vol = Volume(vol_data, spacing=res, origin=(0,0,0))
     
     # 7. Isosurface & Save
+    report("Extracting isosurface", 0.8)
     print("Extracting Isosurface...")
     # Use a small threshold to capture the cloud
     dmax = masked_vol.scalar_range()[1]
-    threshold = dmax * 0.05 
+    threshold = dmax * threshold_fraction
     filtered_tracts = masked_vol.isosurface(value=threshold)
     
+    report("Saving mesh", 0.95)
     print(f"Saving to {output_path}...")
-    filtered_tracts.write(str(output_path))
+    # Write to a temp file first so an aborted run never leaves a partial mesh
+    tmp_path = output_path.with_name(f".{output_path.stem}.tmp{output_path.suffix}")
+    filtered_tracts.write(str(tmp_path))
+    tmp_path.replace(output_path)
+
+    # Record which experiment this mesh came from, so the viewer never shows a stale one
+    source = parse_artifact_name(Path(input_file).name) or {}
+    try:
+        TractCatalog(output_path.parent).register(
+            output_path, source.get("experiment_id"), source.get("metric") or "density", "filtered",
+            shape=vol_data.shape, spacing=res)
+    except Exception as e:
+        print(f"[WARN] Could not update tract catalog: {e}")
     print(f"[SUCCESS] Done! File saved: {output_path.name}")
     return output_path
 
@@ -0,0 +1,145 @@
+"""
+Background job system for the viewer GUI.
+
+Jobs run on a worker thread pool. Progress, results and errors are queued and
+delivered on the GUI thread by poll(), so callbacks can safely touch DearPyGui.
+Only the most recent job of each kind may deliver a result: a cancelled or
+superseded job is discarded even if it finishes afterwards.
+"""
+import itertools
+import queue
+import threading
+import traceback
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, field
+from typing import Callable, Dict, Optional
+
+from src.common.cancellation import Cancelled
+
+class JobCancelled(Cancelled):
+    pass
+
+class JobContext:
+    """Handed to the job function as its first argument."""
+    def __init__(self, job_id: int, kind: str, events: queue.Queue):
+        self.job_id = job_id
+        self.kind = kind
+        self.cancel_event = threading.Event()
+        self._events = events
+
+    @property
+    def cancelled(self) -> bool:
+        return self.cancel_event.is_set()
+
+    def check_cancelled(self):
+        if self.cancelled:
+            raise JobCancelled(f"{self.kind} job {self.job_id} cancelled")
+
+    def progress(self, message: str, fraction: Optional[float] = None):
+        self.check_cancelled()
+        self._events.put(("progress", self.job_id, (message, fraction)))
+
+@dataclass
+class Job:
+    job_id: int
+    kind: str
+    context: JobContext
+    on_done: Optional[Callable] = None
+    on_error: Optional[Callable] = None
+    on_progress: Optional[Callable] = None
+    future: object = field(default=None, repr=False)
+
+class JobManager:
+    def __init__(self, max_workers: int = 2):
+        self._pool = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="viewer-job")
+        self._events = queue.Queue()
+        self._ids = itertools.count(1)
+        self._jobs: Dict[int, Job] = {}
+        self._latest: Dict[str, int] = {}
+        self._lock = threading.Lock()
+
+    def submit(self, kind: str, fn: Callable, *args, on_done=None, on_error=None, on_progress=None, **kwargs) -> int:
+        """
+        Runs fn(context, *args, **kwargs) in the background. A running job of the
+        same kind is cancelled: the newest submission always wins.
+        """
+        job_id = next(self._ids)
+        job = Job(job_id, kind, JobContext(job_id, kind, self._events), on_done, on_error, on_progress)
+
+        with self._lock:
+            previous = self._latest.get(kind)
+            if previous in self._jobs:
+                self._jobs[previous].context.cancel_event.set()
+            self._jobs[job_id] = job
+            self._latest[kind] = job_id
+
+        job.future = self._pool.submit(self._run, job, fn, args, kwargs)
+        return job_id
+
+    def _run(self, job: Job, fn, args, kwargs):
+        try:
+            result = fn(job.context, *args, **kwargs)
+            status = "cancelled" if job.context.cancelled else "done"
+            self._events.put((status, job.job_id, result))
+        except Cancelled: # Also raised by pipeline code (e.g. FilterCancelled)
+            self._events.put(("cancelled", job.job_id, None))
+        except Exception as e:
+            traceback.print_exc()
+            status = "cancelled" if job.context.cancelled else "error"
+            self._events.put((status, job.job_id, e))
+
+    def cancel(self, kind: str) -> bool:
+        """Requests cancellation of the latest job of this kind. Returns False if none is running."""
+        with self._lock:
+            job = self._jobs.get(self._latest.get(kind))
+        if job is None or job.future.done():
+            return False
+        job.context.cancel_event.set()
+        return True
+
+    def is_running(self, kind: str) -> bool:
+        with self._lock:
+            job = self._jobs.get(self._latest.get(kind))
+        return job is not None and not job.future.done()
+
+    def is_current(self, job: Job) -> bool:
+        with self._lock:
+            latest = self._latest.get(job.kind)
+        return latest == job.job_id and not job.context.cancelled
+
+    def poll(self) -> int:
+        """Delivers queued events on the calling (GUI) thread. Returns the number handled."""
+        handled = 0
+        while True:
+            try:
+                status, job_id, payload = self._events.get_nowait()
+            except queue.Empty:
+                return handled
+            handled += 1
+
+            with self._lock:
+                job = self._jobs.get(job_id)
+            if job is None:
+                continue
+
+            if status == "progress":
+                if job.on_progress and self.is_current(job):
+                    job.on_progress(*payload)
+                continue
+
+            # Terminal event: the job is finished, forget it
+            with self._lock:
+                self._jobs.pop(job_id, None)
+
+            if status == "cancelled" or not self.is_current(job):
+                print(f"[JOBS] Discarding result of {job.kind} job {job_id} (cancelled or superseded).")
+            elif status == "done" and job.on_done:
+                job.on_done(payload)
+            elif status == "error" and job.on_error:
+                job.on_error(payload)
+
+    def shutdown(self):
+        with self._lock:
+            for job in self._jobs.values():
+                job.context.cancel_event.set()
+        self._pool.shutdown(wait=False, cancel_futures=True)
@@ -2,12 +2,14 @@
 Pure business logic for region loading/validation, CSV parsing and color mapping.
 """
 import json
+import numpy as np
 import pandas as pd
+import matplotlib
 import matplotlib.colors as mcolors
-import matplotlib.pyplot as plt
 from dataclasses import dataclass
+from functools import lru_cache
 from pathlib import Path
-from typing import List, Tuple
+from typing import Dict, List, Optional, Tuple
 
 # --- Models ---
 @dataclass(frozen=True)
@@ -54,58 +56,176 @@ def hex_to_rgb(hex_str: str) -> List[int]:
     h = hex_str.lstrip('#')
     return [int(h[i:i+2], 16) for i in (0, 2, 4)]
 
-def process_csv_data(file_path: str, colormap_name="viridis") -> Tuple[List[dict], float, float]:
+# --- Vectorized Color Engine ---
+# Values are normalized per column, mapped to a precomputed hex LUT and looked up in
+# bulk. For "linear" the result is identical to cmap(Normalize(v)) + to_hex per row.
+
+NORMALIZATIONS = ("linear", "log", "quantile")
+SEED_COLOR = "#000000" # Nero puro
+CATEGORY_COLUMN = "cluster" # CSVs with this column are colored by category (e.g. clustering.py labels)
+CATEGORICAL_COLORMAP = "tab20"
+UNCATEGORIZED_COLOR = "#bebebe" # Rows with an empty category
+
+@lru_cache(maxsize=32)
+def get_hex_lut(colormap_name: str) -> np.ndarray:
+    """Hex strings for the N colormap entries (256 for the standard maps), then under, over, bad."""
+    cmap = matplotlib.colormaps[colormap_name]
+    rgba = np.vstack([cmap(np.arange(cmap.N)), [cmap.get_under(), cmap.get_over(), cmap.get_bad()]])
+    return np.array([mcolors.to_hex(c) for c in rgba])
+
+def normalize_values(values: np.ndarray, reference: np.ndarray, method: str = "linear") -> Tuple[np.ndarray, float, float]:
+    """
+    Scales values to [0, 1] using the reference values (the targets) for the range.
+    Returns (normalized, v_min, v_max). Out-of-range results map to the under/over colors.
+    """
+    if method not in NORMALIZATIONS:
+        raise ValueError(f"Unknown normalization '{method}'. Options: {', '.join(NORMALIZATIONS)}")
+
+    values = np.asarray(values, dtype=float)
+    reference = np.asarray(reference, dtype=float)
+    reference = reference[~np.isnan(reference)]
+
+    if method == "log":
+        reference = reference[reference > 0]
+    if len(reference) == 0:
+        return (values - 0.0) / 1.0, 0.0, 1.0
+
+    v_min, v_max = float(reference.min()), float(reference.max())
+
+    if method == "linear":
+        if v_min == v_max:
+            normed = np.where(np.isnan(values), np.nan, 0.0)
+        else:
+            normed = (values - v_min) / (v_max - v_min)
+    elif method == "log":
+        with np.errstate(divide="ignore", invalid="ignore"):
+            logs = np.log(values)
+        if v_min == v_max:
+            normed = np.zeros_like(values)
+        else:
+            normed = (logs - np.log(v_min)) / (np.log(v_max) - np.log(v_min))
+        normed[values <= 0] = -1.0 # Under color
+    else: # quantile: mid-rank of each value among the sorted reference values
+        ref = np.sort(reference)
+        if len(ref) == 1:
+            normed = np.zeros_like(values)
+        else:
+            lo = np.searchsorted(ref, values, side="left")
+            hi = np.searchsorted(ref, values, side="right")
+            normed = np.clip((lo + hi - 1) / 2.0, 0, None) / (len(ref) - 1)
+        normed[np.isnan(values)] = np.nan
+
+    return normed, v_min, v_max
+
+def colors_from_normalized(normed: np.ndarray, colormap_name="viridis") -> np.ndarray:
+    """Maps normalized values to hex strings, reproducing matplotlib's float -> LUT index rule."""
+    lut = get_hex_lut(colormap_name)
+    n = len(lut) - 3
+    xa = np.asarray(normed, dtype=float) * n
+    xa[xa == n] = n - 1
+    mask_under = xa < 0
+    mask_over = xa >= n
+    mask_bad = np.isnan(xa)
+    with np.errstate(invalid="ignore"):
+        idx = xa.astype(int)
+    idx[mask_under] = n
+    idx[mask_over] = n + 1
+    idx[mask_bad] = n + 2
+    return lut.take(idx, mode="clip")
+
+def categorical_colors(labels, colormap_name=CATEGORICAL_COLORMAP) -> np.ndarray:
+    """One color per distinct label (in sorted order), cycling through a qualitative colormap."""
+    codes, _ = pd.factorize(pd.Series(labels), sort=True)
+    lut = get_hex_lut(colormap_name)[:-3]
+    return np.where(codes >= 0, lut[codes % len(lut)], UNCATEGORIZED_COLOR)
+
+def _has_categories(df: pd.DataFrame, category_column: Optional[str]) -> bool:
+    return bool(category_column) and category_column in df.columns and df[category_column].notna().any()
+
+def _prepare_frame(df: pd.DataFrame) -> pd.DataFrame:
+    # Check columns (supportiamo anche la nuova colonna is_seed opzionale)
+    if 'acronym' not in df.columns or 'value' not in df.columns:
+        raise ValueError("CSV must have 'acronym' and 'value' columns")
+    # Se is_seed non esiste (vecchi CSV), crealo come False
+    if 'is_seed' not in df.columns:
+        df = df.assign(is_seed=False)
+    return df
+
+def _frame_normalized(df: pd.DataFrame, normalization: str):
+    values = df['value'].to_numpy(dtype=float)
+    is_seed = df['is_seed'].fillna(False).to_numpy(dtype=bool)
+    # Normalize against targets only: the seed (very high value) would squash everything to zero
+    normed, v_min, v_max = normalize_values(values, values[~is_seed], method=normalization)
+    return normed, is_seed, v_min, v_max
+
+def _build_results(df: pd.DataFrame, colors: np.ndarray, is_seed: np.ndarray) -> List[dict]:
+    colors = np.where(is_seed, SEED_COLOR, colors)
+    # Seed first so it appears at the top of the GUI list (stable: target order is kept)
+    order = np.argsort(~is_seed, kind="stable")
+    acronyms = df['acronym'].astype(str).to_numpy()
+    return [
+        {"acronym": acronyms[i], "color": str(colors[i]), "is_seed": bool(is_seed[i])}
+        for i in order
+    ]
+
+def process_csv_frame(df: pd.DataFrame, colormap_name="viridis", normalization="linear",
+                      category_column: Optional[str] = CATEGORY_COLUMN) -> Tuple[List[dict], float, float]:
+    """Same as process_csv_data, for an already loaded DataFrame."""
+    df = _prepare_frame(df)
+    normed, is_seed, v_min, v_max = _frame_normalized(df, normalization)
+    if _has_categories(df, category_column):
+        colors = categorical_colors(df[category_column])
+    else:
+        colors = colors_from_normalized(normed, colormap_name)
+    return _build_results(df, colors, is_seed), v_min, v_max
+
+def process_csv_data(file_path: str, colormap_name="viridis", normalization="linear",
+                     category_column: Optional[str] = CATEGORY_COLUMN) -> Tuple[List[dict], float, float]:
+    """
+    Regions and colors of a viewer CSV (acronym, value, optional is_seed). Colors follow
+    the value through the colormap, or the category column (cluster labels) if the CSV
+    has one; pass category_column=None to always color by value.
+    """
     try:
-        df = pd.read_csv(file_path)
-        # Check columns (supportiamo anche la nuova colonna is_seed opzionale)
-        if 'acronym' not in df.columns or 'value' not in df.columns:
-            raise ValueError("CSV must have 'acronym' and 'value' columns")
-            
-        # Se is_seed non esiste (vecchi CSV), crealo come False
-        if 'is_seed' not in df.columns:
-            df['is_seed'] = False
-            
+        df = _prepare_frame(pd.read_csv(file_path))
     except Exception as e:
         print(f"CSV Load Error: {e}")
-        return []
+        return [], 0.0, 1.0
+    return process_csv_frame(df, colormap_name=colormap_name, normalization=normalization,
+                             category_column=category_column)
 
-    # 1. Normalize Values (Escludendo il seed per non sballare la scala!)
-    # Normalizziamo solo i target, altrimenti il seed (che ha valore altissimo) schiaccia tutti gli altri a zero.
-    target_values = df[df['is_seed'] == False]['value'].values
-    
-    if len(target_values) > 0:
-        v_min, v_max = target_values.min(), target_values.max()
-        norm = mcolors.Normalize(vmin=v_min, vmax=v_max)
-    else:
-        v_min, v_max = 0.0, 1.0
-        norm = mcolors.Normalize(vmin=0, vmax=1)
-    
-    cmap = plt.get_cmap(colormap_name)
-    
-    results = []
-    for _, row in df.iterrows():
-        
-        if row['is_seed']:
-            # --- SPECIAL COLOR FOR SEED ---
-            hex_color = "#000000" # Nero puro
-            # O un grigio scuro se preferisci: "#333333"
-        else:
-            rgba = cmap(norm(row['value'])) 
-            hex_color = mcolors.to_hex(rgba)
-        
-        results.append({
-            "acronym": str(row['acronym']),
-            "color": hex_color,
-            "is_seed": bool(row['is_seed'])
-        })
-        
-    # Mettiamo il SEED in cima alla lista così appare per primo nella GUI
-    results.sort(key=lambda x: x['is_seed'], reverse=True)
-        
-    # Mettiamo il SEED in cima alla lista così appare per primo nella GUI
-    results.sort(key=lambda x: x['is_seed'], reverse=True)
-        
-    return results, v_min, v_max
+def process_csv_batch(file_paths: List[str], colormap_name="viridis", normalization="linear",
+                      category_column: Optional[str] = CATEGORY_COLUMN) -> Dict[str, Tuple[List[dict], float, float]]:
+    """
+    Processes many CSVs in one call: each file keeps its own value range, but all
+    normalized values go through a single LUT lookup. Unreadable files map to ([], 0.0, 1.0).
+    """
+    frames, parts = {}, []
+    for path in file_paths:
+        try:
+            df = _prepare_frame(pd.read_csv(path))
+        except Exception as e:
+            print(f"CSV Load Error ({path}): {e}")
+            continue
+        normed, is_seed, v_min, v_max = _frame_normalized(df, normalization)
+        frames[str(path)] = (df, is_seed, v_min, v_max)
+        parts.append(normed)
+
+    colors = colors_from_normalized(np.concatenate(parts), colormap_name) if parts else np.array([])
+
+    results, offset = {}, 0
+    for path in file_paths:
+        key = str(path)
+        if key not in frames:
+            results[key] = ([], 0.0, 1.0)
+            continue
+        df, is_seed, v_min, v_max = frames[key]
+        chunk = colors[offset:offset + len(df)]
+        offset += len(df)
+        if _has_categories(df, category_column):
+            chunk = categorical_colors(df[category_column])
+        results[key] = (_build_results(df, chunk, is_seed), v_min, v_max)
+    return results
 
 def get_descendants(parent_acronym: str, atlas_name="allen_mouse_25um") -> List[str]:
     """
@@ -130,4 +250,86 @@ def get_descendants(parent_acronym: str, atlas_name="allen_mouse_25um") -> List[
         return descendant_acronyms
     except Exception as e:
         print(f"[LOGIC] Failed to get descendants for {parent_acronym}: {e}")
-        return []
\ No newline at end of file
+        return []
+
+
+# --- Tract File Resolution ---
+# Written by scripts/fix_volume_metadata.py next to its {stem}_fixed.vtk meshes
+FIX_STAMPS_NAME = ".fix_volume_stamps.json"
+FIX_DEFAULTS = {"spacing": [25.0, 25.0, 25.0], "threshold": 0.05}
+
+def fixed_mesh_params(fixed_path: Path) -> dict:
+    """Spacing and threshold fraction a {stem}_fixed.vtk mesh was built with (its stamp, else the defaults)."""
+    fixed_path = Path(fixed_path)
+    stem = fixed_path.name[:-len("_fixed.vtk")]
+    try:
+        stamps = json.loads((fixed_path.parent / FIX_STAMPS_NAME).read_text())
+    except (OSError, ValueError):
+        stamps = {}
+    for suffix in (".nrrd", ".mhd"):
+        stamp = stamps.get(stem + suffix)
+        if stamp:
+            return {**FIX_DEFAULTS, **stamp.get("params", {})}
+    return dict(FIX_DEFAULTS)
+
+def fixed_mesh_matches(fixed_path: Path, threshold_fraction: Optional[float]) -> bool:
+    """True if the fixed mesh shows this threshold (None: any threshold will do)."""
+    if threshold_fraction is None:
+        return True
+    return abs(fixed_mesh_params(fixed_path)["threshold"] - threshold_fraction) < 1e-6
+
+def resolve_tract_file(tracts_dir: Path, tract_id, viz_mode: str, metric: str = "density", catalog=None,
+                       threshold_fraction: Optional[float] = None) -> Optional[Path]:
+    """
+    Returns the tract file to render for a visualization mode, or None if missing.
+    Density (Raw) prefers the fixed mesh when it was built at threshold_fraction, then
+    the raw NRRD, then the legacy {id}.nrrd (then a fixed mesh at another threshold);
+    Density (Points) and Density (Voxels) need the raw volume itself.
+    With a TractCatalog the lookup is indexed, and a filtered mesh is only returned if it
+    was made from this experiment (or its origin is unknown).
+    """
+    tracts_dir = Path(tracts_dir)
+
+    if viz_mode == "None":
+        return None
+
+    if catalog is not None and tract_id:
+        if viz_mode == "Density (Raw)":
+            fixed = catalog.lookup(tract_id, metric, "fixed")
+            if fixed is not None and fixed_mesh_matches(fixed, threshold_fraction):
+                return fixed
+            return catalog.lookup(tract_id, metric, "raw") or fixed
+        if viz_mode in ("Density (Points)", "Density (Voxels)"):
+            return catalog.lookup(tract_id, metric, "raw")
+        if viz_mode == "Density (Filtered)":
+            return catalog.lookup(tract_id, metric, "filtered") or catalog.lookup(None, metric, "filtered")
+        if viz_mode in ("Streamlines (Tubes)", "Streamlines (Filtered)"):
+            return catalog.lookup(tract_id, kind="streamlines")
+        return None
+
+    if viz_mode == "Density (Raw)":
+        fixed = tracts_dir / f"{tract_id}_{metric}_fixed.vtk"
+        candidates = [tracts_dir / f"{tract_id}_{metric}.nrrd"]
+        if metric == "density":
+            candidates.append(tracts_dir / f"{tract_id}.nrrd")
+        if fixed.exists() and fixed_mesh_matches(fixed, threshold_fraction):
+            candidates.insert(0, fixed)
+        else:
+            candidates.append(fixed)
+    elif viz_mode in ("Density (Points)", "Density (Voxels)"):
+        candidates = [tracts_dir / f"{tract_id}_{metric}.nrrd"]
+        if metric == "density":
+            candidates.append(tracts_dir / f"{tract_id}.nrrd")
+    elif viz_mode == "Density (Filtered)":
+        candidates = [tracts_dir / f"filtered_{metric}.vtk"]
+    elif viz_mode in ("Streamlines (Tubes)", "Streamlines (Filtered)"):
+        if not tract_id:
+            return None
+        candidates = [tracts_dir / f"{tract_id}_streamlines.json"]
+    else:
+        return None
+
+    for path in candidates:
+        if path.exists():
+            return path
+    return None
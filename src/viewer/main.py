@@ -1,4 +1,8 @@
+import time
+_T0 = time.perf_counter() # Startup reference for time-to-first-window/render
+
 import dearpygui.dearpygui as dpg
+import numpy as np
 import sys
 import yaml
 from pathlib import Path
@@ -8,29 +12,60 @@ from datetime import datetime
 sys.path.append(str(Path(__file__).parent.parent.parent))
 
 from src.viewer import logic
-from src.viewer import rendering
-from src.viewer import filter_tracts
+from src.viewer import startup
+from src.viewer import threshold
+from src.viewer.jobs import JobManager
+from src.viewer.data_manager import DataManager
+from src.viewer.region_table import RegionTableModel
+from src.viewer.region_search import RegionSearchIndex
+from src.viewer.region_stats import RegionStatsIndex
+from src.common.tract_catalog import TractCatalog
 
 CONFIG_PATH = Path("configs/regions.json")
 DEFAULT_ALPHA = 0.8
+ATLAS_NAME = "allen_mouse_25um"
+ROWS_PER_PAGE = 40 # Widgets are only created for one page of rows
+SEARCH_RESULTS = 12
+VIZ_MODES = ["None", "Density (Raw)", "Density (Points)", "Density (Voxels)", "Density (Filtered)",
+             "Streamlines (Tubes)", "Streamlines (Filtered)"]
 
 class ViewerApp:
     def __init__(self):
-        self.rows = [] 
+        self.table = RegionTableModel(page_size=ROWS_PER_PAGE)
+        self.selected_row = None
         self.mapping = [] 
         self.choices = []
         self.acronym_lookup = {} 
+        self.search_index = None
+        self.search_matches = []
         self.engine = None 
+        self.jobs = JobManager(max_workers=2)
+        self.timer = startup.StartupTimer(_T0)
+        self.pending_render = False
         
         # Variable to track the current 3D volume ID
         self.current_tract_id = None
         self.current_scalar_min = 0.0
         self.current_scalar_max = 1.0
+        self.histogram = None # Voxel histogram of the current raw volume (threshold slider)
+        self.slices = None # SliceEngine of the 2D slice panel
+        self.slice_generation = 0
+        self.region_stats = None # Click-to-info stats of the loaded CSV (and its full-analysis table)
         
         self.root_dir = Path(__file__).resolve().parent.parent.parent
         self.json_file = self.root_dir / CONFIG_PATH
         self.scenes_dir = self.root_dir / "scenes"
         self.tracts_dir = self.root_dir / "data" / "processed" / "tracts"
+        self.catalog = TractCatalog(self.tracts_dir)
+        self.catalog_retries = [] # Actions to re-run once the background catalog sync finishes
+        self.catalog_retrying = False
+        self.analysis_dir = self.root_dir / "analysis" / "data"
+        self.data = DataManager(self.root_dir / "data" / "processed", colormap_name="viridis")
+        self.current_csv = None
+        # Local viewer state (not scenes/, which only holds what the user saves)
+        self.state_dir = self.root_dir / ".viewer"
+        self.session_file = self.state_dir / "last_session.json"
+        self.startup_log = self.state_dir / "startup_times.jsonl"
         
         self.load_data()
 
@@ -39,39 +74,242 @@ class ViewerApp:
         self.mapping = logic.load_regions_config(str(self.json_file))
         self.choices = [x.display for x in self.mapping]
         self.acronym_lookup = {x.acronym: x.display for x in self.mapping}
+        self.search_index = RegionSearchIndex(self.mapping)
 
     def get_lazy_engine(self):
-        if self.engine is None:
-            dpg.set_value("status_text", "Status: Loading Atlas... (Wait)")
-            self.engine = rendering.RenderEngine()
-            dpg.set_value("status_text", "Status: Atlas Loaded.")
+        """Returns the engine if loaded, otherwise starts loading the atlas in the background and returns None."""
+        if self.engine is None and not self.jobs.is_running("engine"):
+            self.start_prewarm()
         return self.engine
 
+    def start_prewarm(self):
+        """Loads the rendering stack, atlas and last-used region meshes in the background."""
+        regions = startup.load_last_regions(self.session_file)
+        dpg.set_value("status_text", "Status: Loading Atlas in background...")
+        self.jobs.submit("engine", startup.prewarm_engine, ATLAS_NAME, regions, self.timer,
+                         on_done=self.on_engine_loaded, on_error=self.on_job_error,
+                         on_progress=self.on_job_progress)
+
+    def on_engine_loaded(self, engine):
+        self.engine = engine
+        dpg.set_value("status_text", "Status: Atlas Loaded.")
+        if self.pending_render:
+            self.pending_render = False
+            self.run_render()
+
+    def on_job_progress(self, stage, fraction=None):
+        pct = f" ({int(fraction * 100)}%)" if fraction is not None else ""
+        dpg.set_value("status_text", f"Status: {stage}...{pct}")
+
+    def start_catalog_sync(self):
+        """Registers tract files that were added or changed outside the pipeline."""
+        self.jobs.submit("catalog", lambda ctx: self.catalog.sync(),
+                         on_done=self.on_catalog_synced, on_error=self.on_catalog_sync_error)
+
+    def sync_catalog_then(self, retry):
+        """Rescans the tracts directory in the background, then calls retry() once on the GUI thread."""
+        if retry not in self.catalog_retries:
+            self.catalog_retries.append(retry)
+        dpg.set_value("status_text", "Status: Looking for new tract files...")
+        self.start_catalog_sync()
+
+    def on_catalog_synced(self, changes):
+        counts = {k: len(v) for k, v in changes.items()}
+        print(f"[GUI] Tract catalog synced: {len(self.catalog)} artifacts {counts}")
+        retries, self.catalog_retries = self.catalog_retries, []
+        # Retried actions see the fresh catalog and must not start another sync
+        self.catalog_retrying = True
+        try:
+            for retry in retries:
+                retry()
+        finally:
+            self.catalog_retrying = False
+
+    def on_catalog_sync_error(self, error):
+        self.catalog_retries = []
+        self.on_job_error(error)
+
+    # --- Threshold ---
+    def threshold_fraction(self):
+        return dpg.get_value("slider_threshold") / 100.0
+
+    def start_histogram(self):
+        """Sorts the raw volume's voxel values in the background so the slider can count instantly."""
+        self.histogram = None
+        raw_path = self.catalog.lookup(self.current_tract_id, "density", "raw") if self.current_tract_id else None
+        if raw_path is None:
+            dpg.set_value("threshold_count_text", "")
+            return
+        dpg.set_value("threshold_count_text", "(counting voxels...)")
+        self.jobs.submit("histogram", lambda ctx: threshold.load_histogram(raw_path),
+                         on_done=self.on_histogram_ready, on_error=self.on_job_error)
+
+    def on_histogram_ready(self, histogram):
+        self.histogram = histogram
+        self.on_threshold_change()
+
+    def on_threshold_change(self, sender=None, app_data=None):
+        if self.histogram is None:
+            return
+        fraction = self.threshold_fraction()
+        count = int(self.histogram.count_at(fraction))
+        volume = float(self.histogram.volume_at(fraction))
+        dpg.set_value("threshold_count_text", f"{count:,} voxels ({volume:.2f} mm3)")
+
+    # --- Region Stats (click-to-info) ---
+    def start_region_stats(self):
+        """Indexes the loaded CSV and the seed's {seed}_full_analysis.csv (if present) in the background."""
+        self.region_stats = None
+        seed, _ = self.get_current_seed_info()
+        csv_path = self.current_csv
+        analysis_path = self.analysis_dir / f"{seed}_full_analysis.csv"
+        self.jobs.submit("region_stats", lambda ctx: RegionStatsIndex.load(csv_path, analysis_path),
+                         on_done=self.on_region_stats_ready, on_error=self.on_job_error)
+
+    def on_region_stats_ready(self, index):
+        self.region_stats = index
+
+    # --- Similar Experiments ---
+    def open_similarity_window(self):
+        """Query panel of the similarity index: by experiment ID (default: the loaded tract) or seed."""
+        if dpg.does_item_exist("similarity_window"):
+            dpg.focus_item("similarity_window")
+            return
+        seed, is_seed = self.get_current_seed_info()
+        default = str(self.current_tract_id) if self.current_tract_id else (seed if is_seed else "")
+        with dpg.window(label="Similar Experiments", tag="similarity_window", width=420, height=360):
+            with dpg.group(horizontal=True):
+                dpg.add_input_text(tag="input_similar_query", default_value=default, width=150,
+                                   hint="Experiment ID or seed")
+                dpg.add_input_int(tag="input_similar_k", default_value=10, min_value=1, min_clamped=True, width=90)
+                dpg.add_combo(items=["cosine", "correlation"], default_value="cosine", width=100,
+                              tag="combo_similarity")
+            dpg.add_button(label="Find", width=100, callback=self.find_similar)
+            dpg.add_text("", tag="similarity_text")
+
+    def find_similar(self, sender=None, app_data=None):
+        query = dpg.get_value("input_similar_query").strip()
+        if not query:
+            return
+        k = dpg.get_value("input_similar_k")
+        similarity = dpg.get_value("combo_similarity")
+        analysis_dir = self.analysis_dir
+
+        def job(ctx):
+            # Cached index of analysis/data, rebuilt first if a full-analysis CSV changed
+            from src.analysis.similarity import load_similarity_index
+            return similarity, query, load_similarity_index(analysis_dir, similarity=similarity).query(query, k=k)
+
+        dpg.set_value("similarity_text", f"Searching neighbors of {query}...")
+        self.jobs.submit("similarity", job, on_done=self.on_similar_ready, on_error=self.on_similarity_error)
+
+    def on_similar_ready(self, outcome):
+        similarity, query, result = outcome
+        if result.empty:
+            dpg.set_value("similarity_text", f"No other experiments to compare {query} with.")
+            return
+        lines = [f"{r.rank:>3}. {r.experiment_id:<12} {r.seed:<10} {r.similarity:.3f}" for r in result.itertuples()]
+        dpg.set_value("similarity_text", f"{similarity} neighbors of {query}:\n" + "\n".join(lines))
+
+    def on_similarity_error(self, error):
+        message = str(error.args[0]) if error.args else str(error) # KeyError: without the quotes
+        dpg.set_value("similarity_text", message)
+        print(f"[GUI] Similarity query failed: {message}")
+
+    def on_job_error(self, error):
+        dpg.set_value("status_text", f"Error: {error}")
+        print(f"[GUI] Job failed: {error}")
+
+    # --- Region List (virtualized: one pool of widgets for the visible page) ---
+    def build_row_slots(self):
+        for slot in range(ROWS_PER_PAGE):
+            with dpg.group(horizontal=True, parent="rows_container", tag=f"slot_{slot}", show=False):
+                dpg.add_selectable(label="", width=300, tag=f"slot_{slot}_label", callback=self.select_slot, user_data=slot)
+                dpg.add_color_edit(tag=f"slot_{slot}_color", no_inputs=True, no_label=True, width=25, callback=self.edit_slot_color, user_data=slot)
+                dpg.add_button(label="-", width=20, callback=self.delete_slot, user_data=slot)
+
+    def row_display(self, row):
+        if not row.acronym:
+            return "(click, then choose a region above)"
+        full_display = self.acronym_lookup.get(row.acronym, f"{row.acronym} | Unknown Region")
+        return f"[SEED] {full_display}" if row.is_seed else full_display
+
+    def refresh_rows(self):
+        start, end = self.table.visible_range()
+        for slot in range(ROWS_PER_PAGE):
+            idx = start + slot
+            if idx < end:
+                row = self.table.rows[idx]
+                dpg.configure_item(f"slot_{slot}_label", label=self.row_display(row))
+                dpg.set_value(f"slot_{slot}_label", idx == self.selected_row)
+                dpg.set_value(f"slot_{slot}_color", logic.hex_to_rgb(row.color_hex) + [255])
+                dpg.configure_item(f"slot_{slot}", show=True)
+            else:
+                dpg.configure_item(f"slot_{slot}", show=False)
+        dpg.set_value("page_text", f"Page {self.table.page + 1}/{self.table.page_count} ({len(self.table)} regions)")
+
+    def change_page(self, sender, app_data, user_data):
+        self.table.set_page(self.table.page + user_data)
+        self.refresh_rows()
+
+    def select_slot(self, sender, app_data, user_data):
+        start, _ = self.table.visible_range()
+        self.selected_row = start + user_data
+        row = self.table.rows[self.selected_row]
+        dpg.set_value("combo_region_picker", self.acronym_lookup.get(row.acronym, ""))
+        self.refresh_rows()
+
+    def pick_region(self, sender, app_data):
+        """Shared picker: assigns the chosen region to the selected row (or a new one)."""
+        acronym = app_data.split("|")[0].strip()
+        if self.selected_row is None or self.selected_row >= len(self.table):
+            self.selected_row = self.table.add(acronym=acronym)
+            self.table.goto_row(self.selected_row)
+        else:
+            self.table.set_acronym(self.selected_row, acronym)
+        self.refresh_rows()
+
+    # --- Type-ahead Search ---
+    def on_search_input(self, sender, app_data):
+        self.search_matches = self.search_index.search(app_data, limit=None)
+        shown = [x.display for x in self.search_matches[:SEARCH_RESULTS]]
+        dpg.configure_item("list_search_results", items=shown)
+        more = len(self.search_matches) - len(shown)
+        dpg.set_value("search_count_text", f"{len(self.search_matches)} matches" + (f" (+{more} not shown)" if more > 0 else ""))
+
+    def on_search_pick(self, sender, app_data):
+        dpg.set_value("combo_region_picker", app_data)
+        self.pick_region(sender, app_data)
+
+    def add_all_search_matches(self):
+        present = {r.acronym for r in self.table.rows}
+        new = [{"acronym": x.acronym, "color": None} for x in self.search_matches if x.acronym not in present]
+        self.table.extend(new)
+        self.table.goto_row(len(self.table) - 1)
+        self.refresh_rows()
+        dpg.set_value("status_text", f"Status: Added {len(new)} regions from search.")
+
+    def edit_slot_color(self, sender, app_data, user_data):
+        start, _ = self.table.visible_range()
+        col_rgba = dpg.get_value(sender)
+        col_hex = "#{:02x}{:02x}{:02x}".format(int(col_rgba[0]), int(col_rgba[1]), int(col_rgba[2]))
+        self.table.set_color(start + user_data, col_hex)
+
+    def delete_slot(self, sender, app_data, user_data):
+        start, _ = self.table.visible_range()
+        self.table.remove(start + user_data)
+        self.selected_row = None
+        self.refresh_rows()
+
     def add_row(self, acronym=None, color_hex=None, is_seed=False):
-        idx = len(self.rows)
-        row_tag = f"row_{idx}"
-        
-        def_combo_val = ""
-        def_color_rgb = logic.hex_to_rgb(logic.get_preset_hex(idx)) + [255]
-
-        if acronym and color_hex:
-            full_display = self.acronym_lookup.get(acronym, f"{acronym} | Unknown Region")
-            if is_seed: full_display = f"[SEED] {full_display}"
-            def_combo_val = full_display
-            def_color_rgb = logic.hex_to_rgb(color_hex) + [255]
-
-        with dpg.group(horizontal=True, parent="rows_container", tag=row_tag):
-            dpg.add_combo(items=self.choices, width=300, tag=f"{row_tag}_combo", default_value=def_combo_val)
-            dpg.add_color_edit(default_value=def_color_rgb, tag=f"{row_tag}_color", no_inputs=True, no_label=True, width=25)
-            dpg.add_button(label="-", width=20, callback=lambda: self.delete_row(row_tag))
-        self.rows.append(row_tag)
-
-    def delete_row(self, tag):
-        dpg.delete_item(tag)
-        if tag in self.rows: self.rows.remove(tag)
-            
+        self.selected_row = self.table.add(acronym=acronym, color_hex=color_hex, is_seed=is_seed)
+        self.table.goto_row(self.selected_row)
+        self.refresh_rows()
+
     def clear_all_rows(self):
-        for row in list(self.rows): self.delete_row(row)
+        self.table.clear()
+        self.selected_row = None
+        self.refresh_rows()
 
     def open_csv_dialog(self):
         with dpg.file_dialog(directory_selector=False, show=True, callback=self.process_csv_selection, width=600, height=400):
@@ -82,51 +320,37 @@ class ViewerApp:
         file_path = app_data['file_path_name']
         dpg.set_value("status_text", f"Status: Loading {Path(file_path).name}...")
         
-        # Load data with pandas here to extract metadata (tract_id)
-        # Note: logic.process_csv_data returns only the visual list, so we read the raw df
-        import pandas as pd
-        try:
-            df = pd.read_csv(file_path)
-            # Look for the magic column added by the Miner
-            if 'tract_experiment_id' in df.columns:
-                self.current_tract_id = int(df['tract_experiment_id'].iloc[0])
-                print(f"[GUI] Found linked tractography ID: {self.current_tract_id}")
-                dpg.configure_item("combo_viz_mode", label=f"Viz Mode (ID: {self.current_tract_id})")
-            else:
-                self.current_tract_id = None
-                dpg.configure_item("combo_viz_mode", label="Viz Mode (No ID)")
-        except Exception as e:
-            print(f"Metadata read error: {e}")
-            self.current_tract_id = None
-
-        data, v_min, v_max = logic.process_csv_data(file_path, colormap_name="viridis")
-        
-        # Store metadata for rendering
-        self.current_scalar_min = v_min
-        self.current_scalar_max = v_max
-        if not data:
+        # Single read: regions, colors, value range and tract ID come from one cached parse
+        csv_data = self.data.load(file_path)
+        if not csv_data or not csv_data.regions:
             dpg.set_value("status_text", "Error: Could not read CSV or empty data.")
             return
-            
-        self.clear_all_rows()
-        limit = 500 
-        count = 0
-        for item in data:
-            if count >= limit: break
-            self.add_row(acronym=item['acronym'], color_hex=item['color'], is_seed=item.get('is_seed', False))
-            count += 1
-        dpg.set_value("status_text", f"Loaded {count} regions from CSV.")
+        self.current_csv = csv_data.path
+
+        self.current_tract_id = csv_data.tract_id
+        if self.current_tract_id:
+            print(f"[GUI] Found linked tractography ID: {self.current_tract_id}")
+            dpg.configure_item("combo_viz_mode", label=f"Viz Mode (ID: {self.current_tract_id})")
+        else:
+            dpg.configure_item("combo_viz_mode", label="Viz Mode (No ID)")
+        self.start_histogram()
+
+        # Store metadata for rendering
+        self.current_scalar_min = csv_data.v_min
+        self.current_scalar_max = csv_data.v_max
+        data = csv_data.regions
+
+        self.table.replace(data)
+        self.selected_row = None
+        self.refresh_rows()
+        self.start_region_stats()
+        dpg.set_value("status_text", f"Loaded {len(self.table)} regions from CSV.")
 
     def get_current_seed_info(self):
-        seed_acronym = "ManualSelection"
-        found_seed = False
-        for row in self.rows:
-            combo_val = dpg.get_value(f"{row}_combo")
-            if combo_val and "[SEED]" in combo_val:
-                seed_acronym = combo_val.replace("[SEED] ", "").split("|")[0].strip()
-                found_seed = True
-                break
-        return seed_acronym, found_seed
+        seed_acronym = self.table.seed_acronym()
+        if seed_acronym:
+            return seed_acronym, True
+        return "ManualSelection", False
 
     def open_group_dialog(self):
         with dpg.window(label="Add Region Group", modal=True, show=True, tag="group_dialog", width=300, height=150):
@@ -152,22 +376,31 @@ class ViewerApp:
             return
             
         # Add them to the list
-        count = 0
-        for acr in descendants:
-            # Only add if we have it in our mapping (i.e., it exists in the atlas config we loaded)
-            # Or we can just try to add it and if it's not in the combo it might be weird
-            if acr in self.acronym_lookup:
-                self.add_row(acronym=acr, color_hex="#CCCCCC") # Default gray for group add
-                count += 1
+        # Only add if we have it in our mapping (i.e., it exists in the atlas config we loaded)
+        known = [{"acronym": acr, "color": "#CCCCCC"} for acr in descendants if acr in self.acronym_lookup] # Default gray for group add
+        self.table.extend(known)
+        self.refresh_rows()
+        count = len(known)
         
         dpg.set_value("status_text", f"Status: Added {count} regions from group {parent}.")
         print(f"[GUI] Added {count} regions.")
 
     def scan_csv_files(self):
         """Scans data/processed for CSV files."""
-        csv_dir = self.root_dir / "data" / "processed"
-        if not csv_dir.exists(): return []
-        return [f.name for f in csv_dir.glob("*.csv")]
+        self.data.scan()
+        return self.data.files
+
+    def watch_csv_files(self):
+        """Called every frame: refreshes the CSV combo when files appear, change or disappear."""
+        changes = self.data.poll()
+        if not changes:
+            return
+        dpg.configure_item("combo_csv", items=self.data.files)
+        if changes.added:
+            dpg.set_value("status_text", f"Status: New data available: {', '.join(changes.added)}")
+        if self.current_csv and self.current_csv.name in changes.changed:
+            dpg.set_value("status_text", f"Status: {self.current_csv.name} changed on disk. Reselect it to reload.")
+        print(f"[DATA] CSV folder changed: +{changes.added} ~{changes.changed} -{changes.removed}")
 
     def process_manual_action(self, sender, app_data):
         action = app_data
@@ -177,6 +410,12 @@ class ViewerApp:
             self.open_group_dialog()
         elif action == "Filter Tracts":
             self.run_filter_callback()
+        elif action == "Cancel Filter":
+            self.cancel_filter_callback()
+        elif action == "2D Slices":
+            self.open_slice_viewer()
+        elif action == "Similar Experiments":
+            self.open_similarity_window()
         
         # Reset combo
         dpg.set_value("combo_manual", "Select Action...")
@@ -207,7 +446,8 @@ class ViewerApp:
             with dpg.group(horizontal=True):
                 # Manual Actions
                 dpg.add_text("Manual:")
-                dpg.add_combo(items=["Add Region (+)", "Add Group (+)", "Filter Tracts"], 
+                dpg.add_combo(items=["Add Region (+)", "Add Group (+)", "Filter Tracts", "Cancel Filter", "2D Slices",
+                                     "Similar Experiments"], 
                               default_value="Select Action...", width=200, 
                               callback=self.process_manual_action, tag="combo_manual")
                 
@@ -224,8 +464,24 @@ class ViewerApp:
             # --- MIDDLE (Rows) ---
             # Use a child window that stretches but leaves room for bottom bar
             # height=-60 leaves 60px at the bottom
-            with dpg.child_window(tag="rows_container", border=False, height=-60):
-                self.add_row()
+            with dpg.group(horizontal=True):
+                dpg.add_text("Region:")
+                dpg.add_combo(items=self.choices, width=300, tag="combo_region_picker", callback=self.pick_region)
+                dpg.add_button(label="<", width=20, callback=self.change_page, user_data=-1)
+                dpg.add_text("", tag="page_text")
+                dpg.add_button(label=">", width=20, callback=self.change_page, user_data=1)
+
+            with dpg.group(horizontal=True):
+                dpg.add_text("Search:")
+                dpg.add_input_text(tag="input_search", width=300, hint="Acronym or name (e.g. VISp, raphe)",
+                                   callback=self.on_search_input)
+                dpg.add_button(label="Add All Matches", callback=self.add_all_search_matches)
+                dpg.add_text("", tag="search_count_text")
+            dpg.add_listbox(items=[], tag="list_search_results", width=300, num_items=4, callback=self.on_search_pick)
+
+            with dpg.child_window(tag="rows_container", border=False, height=-90):
+                self.build_row_slots()
+            self.add_row()
 
             # --- BOTTOM BAR ---
             dpg.add_separator()
@@ -237,15 +493,113 @@ class ViewerApp:
                 
                 # Viz Mode (Large)
                 dpg.add_text("Viz Mode:")
-                dpg.add_combo(items=["None", "Density (Raw)", "Density (Filtered)", "Streamlines (Tubes)"], 
+                dpg.add_combo(items=VIZ_MODES, 
                               tag="combo_viz_mode", default_value="Density (Raw)", width=250)
 
+            with dpg.group(horizontal=True):
+                dpg.add_text("Threshold:")
+                dpg.add_slider_float(tag="slider_threshold", default_value=threshold.DEFAULT_FRACTION * 100,
+                                     min_value=threshold.STEP * 100, max_value=threshold.MAX_FRACTION * 100,
+                                     format="%.1f%% of max", width=250, callback=self.on_threshold_change)
+                dpg.add_text("", tag="threshold_count_text")
+
         dpg.setup_dearpygui()
         dpg.show_viewport()
         dpg.set_primary_window("Primary Window", True)
-        dpg.start_dearpygui()
+        # Manual render loop: deliver background job events on the GUI thread every frame
+        first_frame = True
+        while dpg.is_dearpygui_running():
+            self.jobs.poll()
+            self.watch_csv_files()
+            dpg.render_dearpygui_frame()
+            if first_frame:
+                first_frame = False
+                self.timer.mark("first_window")
+                self.get_lazy_engine() # Prewarm once the window is up
+                self.start_catalog_sync()
+        self.jobs.shutdown()
+        self.timer.save(self.startup_log)
         dpg.destroy_context()
 
+    # --- 2D Slices ---
+    def open_slice_viewer(self):
+        """Opens the slice panel on the current raw volume, with region boundaries once the atlas is loaded."""
+        from src.viewer.slices import VIEWS, SliceEngine
+
+        raw_path = self.catalog.lookup(self.current_tract_id, "density", "raw") if self.current_tract_id else None
+        annotation = self.engine.atlas.annotation if self.engine is not None else None
+        if raw_path is None and annotation is None:
+            dpg.set_value("status_text", "Error: No raw volume loaded and atlas not ready yet.")
+            return
+        try:
+            self.slices = SliceEngine.from_file(raw_path, annotation)
+        except Exception as e:
+            dpg.set_value("status_text", f"Error: Cannot open volume for slicing: {e}")
+            return
+
+        # Textures depend on the volume shape: new ones for every volume (DearPyGui frees
+        # deleted textures lazily, so their tags cannot be reused right away)
+        if dpg.does_item_exist("slice_window"):
+            dpg.delete_item("slice_window")
+        if dpg.does_item_exist("slice_textures"):
+            dpg.delete_item("slice_textures")
+        self.slice_generation += 1
+        with dpg.texture_registry(tag="slice_textures"):
+            for view in VIEWS:
+                width, height = self.slices.image_size(view)
+                dpg.add_dynamic_texture(width, height, np.zeros(width * height * 4, dtype=np.float32),
+                                        tag=self.slice_texture(view))
+        source = raw_path.name if raw_path else "atlas annotation"
+        with dpg.window(label=f"2D Slices - {source}", tag="slice_window", width=580, height=660):
+            with dpg.group(horizontal=True):
+                dpg.add_combo(items=list(VIEWS), default_value="Coronal", width=120, tag="combo_slice_view",
+                              callback=self.on_slice_view_change)
+                dpg.add_slider_int(tag="slider_slice", width=300, callback=self.update_slice)
+            dpg.add_text("", tag="slice_info_text")
+            dpg.add_image(self.slice_texture("Coronal"), tag="slice_image")
+        if not dpg.does_item_exist("slice_mouse_handler"):
+            with dpg.handler_registry(tag="slice_mouse_handler"):
+                dpg.add_mouse_move_handler(callback=self.on_slice_hover)
+        self.on_slice_view_change()
+
+    def slice_texture(self, view):
+        return f"slice_texture_{view}_{self.slice_generation}"
+
+    def on_slice_view_change(self, sender=None, app_data=None):
+        view = dpg.get_value("combo_slice_view")
+        n = self.slices.n_slices(view)
+        width, height = self.slices.image_size(view)
+        dpg.configure_item("slider_slice", min_value=0, max_value=n - 1)
+        dpg.set_value("slider_slice", n // 2)
+        dpg.configure_item("slice_image", texture_tag=self.slice_texture(view), width=width, height=height)
+        self.update_slice()
+
+    def update_slice(self, sender=None, app_data=None):
+        view = dpg.get_value("combo_slice_view")
+        index = dpg.get_value("slider_slice")
+        image = self.slices.render(view, index) # Cached: scrubbing back is free
+        dpg.set_value(self.slice_texture(view), image.ravel())
+        dpg.set_value("slice_info_text", f"{view} {index + 1}/{self.slices.n_slices(view)}")
+
+    def on_slice_hover(self, sender=None, app_data=None):
+        """Shows the region under the mouse in the slice panel."""
+        if self.slices is None or self.engine is None or not dpg.does_item_exist("slice_image"):
+            return
+        if not dpg.is_item_hovered("slice_image"):
+            return
+        view, index = dpg.get_value("combo_slice_view"), dpg.get_value("slider_slice")
+        x0, y0 = dpg.get_item_rect_min("slice_image")
+        mx, my = dpg.get_mouse_pos(local=False)
+        sid = self.slices.structure_at(view, index, int(my - y0), int(mx - x0))
+        if not sid:
+            return
+        try:
+            structure = self.engine.atlas.structures[sid]
+            label = f"{structure['acronym']} - {structure['name']}"
+        except KeyError:
+            label = f"id {sid}"
+        dpg.set_value("slice_info_text", f"{view} {index + 1}/{self.slices.n_slices(view)}  |  {label}")
+
     def run_filter_callback(self):
         if not self.current_tract_id:
             dpg.set_value("status_text", "Error: No tractography ID loaded (Load CSV first).")
@@ -254,52 +608,56 @@ class ViewerApp:
         # metric = dpg.get_value("radio_metric").lower() # density or energy
         metric = "density" # Hardcoded for now
         
-        # Construct path to raw NRRD
-        # Expecting {id}_density.nrrd or {id}_energy.nrrd
-        raw_filename = f"{self.current_tract_id}_{metric}.nrrd"
-        raw_path = self.tracts_dir / raw_filename
-        
-        # Fallback for legacy files (just ID.nrrd -> assume density)
-        if not raw_path.exists() and metric == "density":
-             legacy_path = self.tracts_dir / f"{self.current_tract_id}.nrrd"
-             if legacy_path.exists():
-                 raw_path = legacy_path
-                 print(f"[GUI] Using legacy density file: {raw_path.name}")
-
-        if not raw_path.exists():
-             dpg.set_value("status_text", f"Error: Raw file not found: {raw_path.name}")
+        # Raw volume from the catalog: {id}_{metric}.nrrd, or legacy {id}.nrrd for density
+        raw_path = self.catalog.lookup(self.current_tract_id, metric, "raw")
+        if raw_path is None and not self.catalog_retrying:
+            # File may have been dropped in since the last sync: rescan off the GUI thread, then retry
+            self.sync_catalog_then(self.run_filter_callback)
+            return
+        if raw_path is None:
+             dpg.set_value("status_text", f"Error: Raw file not found: {self.current_tract_id}_{metric}.nrrd")
              return
 
-        dpg.set_value("status_text", f"Status: Filtering {metric.capitalize()}... (Please Wait)")
+        dpg.set_value("status_text", f"Status: Filtering {metric.capitalize()} in background...")
         print(f"[GUI] Starting Filter Process for {metric}...")
         
         # Output specific to metric
         output_filename = f"filtered_{metric}.vtk"
         output_path = self.tracts_dir / output_filename
 
-        try:
-            output = filter_tracts.run_filter(input_path=raw_path, output_path=output_path)
-            if output and output.exists():
-                dpg.set_value("status_text", f"Status: Filtered {metric} ready!")
-                dpg.set_value("combo_viz_mode", "Density (Filtered)")
-                print(f"[GUI] Filter success: {output}")
-            else:
-                dpg.set_value("status_text", "Error: Filtering failed (check console).")
-        except Exception as e:
-             dpg.set_value("status_text", f"Error during filtering: {e}")
-             print(f"[GUI] Exception: {e}")
+        # A filter already running is cancelled: only the newest one may write its result
+        self.jobs.submit("filter", self.filter_job, raw_path, output_path, self.threshold_fraction(),
+                         on_done=self.on_filter_done, on_error=self.on_job_error,
+                         on_progress=self.on_job_progress)
+
+    def filter_job(self, ctx, raw_path, output_path, threshold_fraction=threshold.DEFAULT_FRACTION):
+        from src.viewer import filter_tracts
+        return filter_tracts.run_filter(input_path=raw_path, output_path=output_path,
+                                        progress_callback=ctx.progress, cancel_event=ctx.cancel_event,
+                                        threshold_fraction=threshold_fraction)
+
+    def on_filter_done(self, output):
+        if output and output.exists():
+            dpg.set_value("status_text", f"Status: Filtered data ready!")
+            dpg.set_value("combo_viz_mode", "Density (Filtered)")
+            print(f"[GUI] Filter success: {output}")
+        else:
+            dpg.set_value("status_text", "Error: Filtering failed (check console).")
+
+    def cancel_filter_callback(self):
+        if self.jobs.cancel("filter"):
+            dpg.set_value("status_text", "Status: Cancelling filter...")
+        else:
+            dpg.set_value("status_text", "Status: No filter running.")
 
     def run_render(self):
         engine = self.get_lazy_engine()
-        selection = []
-        for row in self.rows:
-            combo_val = dpg.get_value(f"{row}_combo")
-            if not combo_val or "|" not in combo_val: continue
-            clean_val = combo_val.replace("[SEED] ", "")
-            acronym = clean_val.split("|")[0].strip()
-            col_rgba = dpg.get_value(f"{row}_color")
-            col_hex = "#{:02x}{:02x}{:02x}".format(int(col_rgba[0]), int(col_rgba[1]), int(col_rgba[2]))
-            selection.append({"acronym": acronym, "color": col_hex})
+        if engine is None:
+            # Render resumes in on_engine_loaded once the atlas is ready
+            self.pending_render = True
+            return
+
+        selection = self.table.selection()
 
         if not selection:
             dpg.set_value("status_text", "Error: No valid regions selected.")
@@ -308,56 +666,26 @@ class ViewerApp:
         # --- TRACTOGRAPHY MANAGEMENT (STRICT MODES) ---
         viz_mode = dpg.get_value("combo_viz_mode")
         metric = "density" # Hardcoded for now
-        tract_path = None
-        
+        tract_path = logic.resolve_tract_file(self.tracts_dir, self.current_tract_id, viz_mode, metric=metric, catalog=self.catalog,
+                                              threshold_fraction=self.threshold_fraction())
+        if tract_path is None and viz_mode != "None" and self.current_tract_id and not self.catalog_retrying:
+            # File for this ID may have been dropped in since the last sync: rescan off the GUI thread, then retry
+            self.sync_catalog_then(self.run_render)
+            return
+
         if viz_mode == "None":
-            tract_path = None
             print("[GUI] Viz Mode: None (Tracts hidden)")
-
-        elif viz_mode == "Density (Raw)":
-            # 1. Check for FIXED metadata file (Native Workflow)
-            # Now using .vtk (Mesh) to ensure consistency with Filtered mode
-            fixed_path = self.tracts_dir / f"{self.current_tract_id}_{metric}_fixed.vtk"
-            
-            # 2. Fallback to Raw NRRD
-            raw_path = self.tracts_dir / f"{self.current_tract_id}_{metric}.nrrd"
-            
-            # 3. Legacy fallback
-            legacy_path = self.tracts_dir / f"{self.current_tract_id}.nrrd"
-
-            if fixed_path.exists():
-                tract_path = fixed_path
-                print(f"[GUI] Using FIXED {metric} (Mesh): {fixed_path.name}")
-            elif raw_path.exists():
-                tract_path = raw_path
-                print(f"[GUI] Using RAW {metric}: {raw_path.name}")
-            elif legacy_path.exists() and metric == "density":
-                tract_path = legacy_path
-                print(f"[GUI] Using LEGACY {metric}: {legacy_path.name}")
-            else:
-                print(f"[GUI] Raw file not found: {raw_path.name}")
-                dpg.set_value("status_text", "Error: Raw density file not found.")
-
+        elif tract_path:
+            print(f"[GUI] Using {viz_mode} {metric}: {tract_path.name}")
+        elif viz_mode in ("Density (Raw)", "Density (Points)", "Density (Voxels)"):
+            print(f"[GUI] Raw file not found for ID {self.current_tract_id}")
+            dpg.set_value("status_text", "Error: Raw density file not found.")
         elif viz_mode == "Density (Filtered)":
-            # Force Filtered VTK
-            filtered_path = self.tracts_dir / f"filtered_{metric}.vtk"
-            if filtered_path.exists():
-                tract_path = filtered_path
-                print(f"[GUI] Using FILTERED {metric}: {filtered_path.name}")
-            else:
-                print(f"[GUI] Filtered file not found. Run 'Filter Tracts' first.")
-                dpg.set_value("status_text", "Error: No filtered data. Click 'Filter Tracts' first.")
-
-        elif viz_mode == "Streamlines (Tubes)":
-            # Look for streamlines JSON
-            if self.current_tract_id:
-                stream_path = self.tracts_dir / f"{self.current_tract_id}_streamlines.json"
-                if stream_path.exists():
-                    tract_path = stream_path
-                    print(f"[GUI] Found Streamlines: {stream_path.name}")
-                else:
-                    print(f"[GUI] Streamlines file not found: {stream_path.name}")
-                    dpg.set_value("status_text", "Warning: No streamlines data found for this ID.")
+            print(f"[GUI] Filtered file not found. Run 'Filter Tracts' first.")
+            dpg.set_value("status_text", "Error: No filtered data. Click 'Filter Tracts' first.")
+        elif viz_mode in ("Streamlines (Tubes)", "Streamlines (Filtered)"):
+            print(f"[GUI] Streamlines file not found for ID {self.current_tract_id}")
+            dpg.set_value("status_text", "Warning: No streamlines data found for this ID.")
 
         seed_name, is_csv_seed = self.get_current_seed_info()
         timestamp = datetime.now().strftime("%Y-%m-%d_%H-%M-%S")
@@ -383,14 +711,21 @@ class ViewerApp:
             "targets_rendered": [s['acronym'] for s in selection if s['acronym'] != seed_name],
             "targets_rendered": [s['acronym'] for s in selection if s['acronym'] != seed_name],
             "alpha_used": DEFAULT_ALPHA,
+            "threshold_fraction": self.threshold_fraction(),
             "scalar_min": self.current_scalar_min,
             "scalar_max": self.current_scalar_max
         }
 
         dpg.set_value("status_text", "Rendering... Press 'S' to save scene.")
+        startup.save_last_regions(self.session_file, [s['acronym'] for s in selection])
         
+        # Raw volume behind a fixed mesh, for the threshold slider (the GUI histogram was built from it)
+        raw_path = self.catalog.lookup(self.current_tract_id, metric, "raw") if self.current_tract_id else None
         # Rendering call
-        engine.render_scene(selection, tract_file=tract_path, alpha=DEFAULT_ALPHA, output_dir=session_save_path, metadata=metadata, visualization_mode=viz_mode)
+        engine.render_scene(selection, tract_file=tract_path, alpha=DEFAULT_ALPHA, output_dir=session_save_path, metadata=metadata, visualization_mode=viz_mode,
+                            on_first_frame=lambda: self.timer.mark("first_render"),
+                            threshold_fraction=self.threshold_fraction(), target_regions=metadata["targets_rendered"],
+                            region_stats=self.region_stats, volume_file=raw_path, histogram=self.histogram)
         
         dpg.set_value("status_text", f"Status: Last session saved in scenes/{session_folder_name}")
 
@@ -0,0 +1,101 @@
+"""
+Point-cloud preview of density volumes.
+
+Every voxel above the threshold becomes one point (vectorized NumPy, no meshing), and
+large clouds are importance-subsampled to a point budget so dense projection targets
+keep more points than faint ones. Uncompressed volumes are read through a memory map.
+"""
+from pathlib import Path
+
+import numpy as np
+
+from src.common.volume_header import VolumeHeaderError, read_volume_array, read_volume_header
+
+DEFAULT_POINT_BUDGET = 300_000
+POINT_SIZE = 3
+
+def load_volume(path):
+    """(data, spacing, origin) of a volume file, memory-mapped when the format allows it."""
+    try:
+        header = read_volume_header(path)
+        return read_volume_array(header), header.spacing, header.origin
+    except (VolumeHeaderError, OSError):
+        from vedo import Volume
+        vol = Volume(str(path))
+        return vol.tonumpy(), tuple(vol.spacing()), tuple(vol.origin())
+
+def _memory_order(data: np.ndarray) -> str:
+    return "F" if data.flags.f_contiguous and not data.flags.c_contiguous else "C"
+
+def above_threshold(data: np.ndarray, threshold: float, mask: np.ndarray = None):
+    """Flat indices (in the array's memory order) and values of the voxels above threshold."""
+    # Memory order: one pass over the (possibly memory-mapped) buffer, no transposed copy
+    order = _memory_order(data)
+    flat = data.ravel(order=order)
+    keep = flat > threshold
+    if mask is not None:
+        keep &= mask.ravel(order=order).astype(bool, copy=False)
+    idx = np.flatnonzero(keep)
+    return idx, flat[idx]
+
+def importance_subsample(values: np.ndarray, budget: int, seed: int = 0) -> np.ndarray:
+    """
+    Indices of `budget` samples drawn without replacement with probability proportional
+    to value (Efraimidis-Spirakis keys, O(n)). Returns all indices if under budget.
+    """
+    n = len(values)
+    if budget is None or n <= budget:
+        return np.arange(n)
+    rng = np.random.default_rng(seed)
+    weights = np.maximum(values.astype(np.float32), np.finfo(np.float32).tiny)
+    keys = np.log1p(-rng.random(n, dtype=np.float32)) / weights # log(u), u in (0, 1]; larger is better
+    return np.sort(np.argpartition(keys, n - budget)[n - budget:])
+
+def point_cloud(data: np.ndarray, spacing, origin, threshold: float, budget: int = DEFAULT_POINT_BUDGET,
+                mask: np.ndarray = None, seed: int = 0):
+    """World coordinates (float32) and values of the above-threshold voxels, within budget."""
+    idx, values = above_threshold(data, threshold, mask)
+    keep = importance_subsample(values, budget, seed)
+    idx, values = idx[keep], values[keep]
+    ijk = np.stack(np.unravel_index(idx, data.shape, order=_memory_order(data)), axis=1)
+    points = ijk * np.asarray(spacing, dtype=np.float32) + np.asarray(origin, dtype=np.float32)
+    return points.astype(np.float32, copy=False), values
+
+def to_vertex_polydata(points: np.ndarray, values: np.ndarray, name: str = "density"):
+    """vtkPolyData with one vertex cell per point, built from numpy buffers (vedo's list path is slow)."""
+    import vtk
+    from vtk.util import numpy_support
+
+    poly = vtk.vtkPolyData()
+    vtk_points = vtk.vtkPoints()
+    vtk_points.SetData(numpy_support.numpy_to_vtk(np.ascontiguousarray(points, dtype=np.float32), deep=True))
+    poly.SetPoints(vtk_points)
+
+    n = len(points)
+    verts = vtk.vtkCellArray()
+    verts.SetData(numpy_support.numpy_to_vtkIdTypeArray(np.arange(n + 1, dtype=np.int64), deep=True),
+                  numpy_support.numpy_to_vtkIdTypeArray(np.arange(n, dtype=np.int64), deep=True))
+    poly.SetVerts(verts)
+
+    scalars = numpy_support.numpy_to_vtk(np.ascontiguousarray(values, dtype=np.float32), deep=True)
+    scalars.SetName(name)
+    poly.GetPointData().SetScalars(scalars)
+    return poly
+
+def point_cloud_actor(path, threshold_fraction: float, budget: int = DEFAULT_POINT_BUDGET, seed: int = 0):
+    """vedo Points colored by density (viridis, threshold..max), or None if nothing is above threshold."""
+    from vedo import Points
+
+    data, spacing, origin = load_volume(Path(path))
+    dmax = float(data.max())
+    if dmax <= 0:
+        return None
+    threshold = dmax * threshold_fraction
+    points, values = point_cloud(data, spacing, origin, threshold, budget, seed=seed)
+    print(f"[POINTS] {len(points):,} points above {threshold:.4f} (budget {budget:,})")
+    if len(points) == 0:
+        return None
+
+    actor = Points(to_vertex_polydata(points, values)).point_size(POINT_SIZE)
+    actor.cmap("viridis", "density", vmin=threshold, vmax=dmax)
+    return actor
@@ -0,0 +1,140 @@
+"""
+Prebuilt search index over region acronyms and names for the GUI region picker.
+
+Acronyms go into a flattened prefix trie over every suffix (each prefix maps directly
+to the regions below it), so exact, prefix and infix matches ("bfd" -> "SSp-bfd") are
+single dict lookups. Names go into a sorted token list: query tokens are matched as
+token prefixes with bisect and intersected.
+
+Only when nothing matches, acronyms and name tokens that share most of their trigrams
+with the query are tried, which absorbs typos ("hipocampus" -> "Hippocampal"). Words are
+indexed by trigram, so only words sharing one with the query are scored.
+"""
+import heapq
+import re
+from bisect import bisect_left
+from collections import Counter, defaultdict
+from typing import Dict, Iterable, List, Set, Tuple
+
+from src.viewer.logic import RegionItem
+
+TOKEN_RE = re.compile(r"[a-z0-9]+")
+
+def normalize(text: str) -> str:
+    """Lowercase and drop separators, so 'frp23' finds 'FRP2/3'."""
+    return "".join(TOKEN_RE.findall(text.lower()))
+
+def trigrams(word: str) -> Set[str]:
+    return {word[i:i + 3] for i in range(len(word) - 2)}
+
+# Ranking tiers (lower is better)
+EXACT, PREFIX, INFIX, NAME, FUZZY = 0, 1, 2, 3, 4
+MIN_FUZZY_LEN = 4 # Shorter words share too few trigrams to compare
+MIN_SIMILARITY = 0.5 # Dice coefficient of the trigram sets
+
+class RegionSearchIndex:
+    def __init__(self, items: List[RegionItem]):
+        self.items = list(items)
+        self._acronyms = [normalize(x.acronym) for x in self.items]
+
+        # prefix -> {item id: earliest offset of the matching suffix}
+        trie: Dict[str, Dict[int, int]] = defaultdict(dict)
+        for idx, key in enumerate(self._acronyms):
+            for offset in range(len(key)):
+                suffix = key[offset:]
+                for end in range(1, len(suffix) + 1):
+                    hits = trie[suffix[:end]]
+                    if idx not in hits:
+                        hits[idx] = offset
+        self._trie = dict(trie)
+
+        token_ids = defaultdict(set)
+        for idx, item in enumerate(self.items):
+            for token in TOKEN_RE.findall(item.name.lower()):
+                token_ids[token].add(idx)
+        self._tokens = sorted(token_ids)
+        self._token_ids = [frozenset(token_ids[t]) for t in self._tokens]
+
+        # trigram -> words containing it (typo fallback)
+        self._acronym_trigrams = self._trigram_index(self._acronyms)
+        self._token_trigrams = self._trigram_index(self._tokens)
+        self._acronym_ids = defaultdict(set)
+        for idx, key in enumerate(self._acronyms):
+            self._acronym_ids[key].add(idx)
+        self._token_index = {t: i for i, t in enumerate(self._tokens)}
+
+    @staticmethod
+    def _trigram_index(words: Iterable[str]) -> Dict[str, Set[str]]:
+        index = defaultdict(set)
+        for word in words:
+            if len(word) >= MIN_FUZZY_LEN:
+                for gram in trigrams(word):
+                    index[gram].add(word)
+        return dict(index)
+
+    @staticmethod
+    def _similar(word: str, trigram_index: Dict[str, Set[str]]) -> Dict[str, float]:
+        """Indexed words whose trigram similarity to word is at least MIN_SIMILARITY."""
+        if len(word) < MIN_FUZZY_LEN:
+            return {}
+        grams = trigrams(word)
+        shared = Counter(w for gram in grams for w in trigram_index.get(gram, ()))
+        scores = {w: 2 * n / (len(grams) + len(w) - 2) for w, n in shared.items()}
+        return {w: s for w, s in scores.items() if s >= MIN_SIMILARITY}
+
+    def __len__(self):
+        return len(self.items)
+
+    def _name_matches(self, query_tokens: List[str], fuzzy: bool = False) -> set:
+        result = None
+        for qt in query_tokens:
+            ids = set()
+            i = bisect_left(self._tokens, qt)
+            while i < len(self._tokens) and self._tokens[i].startswith(qt):
+                ids |= self._token_ids[i]
+                i += 1
+            if fuzzy:
+                for token in self._similar(qt, self._token_trigrams):
+                    ids |= self._token_ids[self._token_index[token]]
+            result = ids if result is None else result & ids
+            if not result:
+                return set()
+        return result or set()
+
+    def search(self, query: str, limit: int = 50) -> List[RegionItem]:
+        """
+        Returns regions ranked: exact acronym, acronym prefix, acronym infix, then name
+        tokens. With no match at all, acronyms and names similar to the query (typos).
+        """
+        # Accept a full display string ("ACR | Name") as well
+        query = query.split("|")[0].strip()
+        key = normalize(query)
+        if not key:
+            return []
+
+        ranked: Dict[int, Tuple[int, int]] = {}
+        for idx, offset in self._trie.get(key, {}).items():
+            if offset > 0:
+                ranked[idx] = (INFIX, offset)
+            elif self._acronyms[idx] == key:
+                ranked[idx] = (EXACT, 0)
+            else:
+                ranked[idx] = (PREFIX, 0)
+
+        query_tokens = TOKEN_RE.findall(query.lower())
+        for idx in self._name_matches(query_tokens):
+            ranked.setdefault(idx, (NAME, 0))
+
+        if not ranked:
+            for acronym, score in self._similar(key, self._acronym_trigrams).items():
+                for idx in self._acronym_ids[acronym]:
+                    ranked[idx] = (FUZZY, -score)
+            for idx in self._name_matches(query_tokens, fuzzy=True):
+                ranked.setdefault(idx, (FUZZY, 0))
+
+        rank_key = lambda i: (ranked[i], len(self._acronyms[i]), self.items[i].acronym)
+        if limit is None:
+            order = sorted(ranked, key=rank_key)
+        else:
+            order = heapq.nsmallest(limit, ranked, key=rank_key)
+        return [self.items[i] for i in order]
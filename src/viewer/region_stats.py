@@ -0,0 +1,147 @@
+"""
+Per-region statistics index for click-to-info.
+
+Built once (pandas groupby) from the full-analysis table written by miner_analysis.py
+({seed}_full_analysis.csv: one row per experiment, structure and hemisphere) and/or
+the viewer CSV (acronym, value, is_seed). Every lookup afterwards is a dict access,
+so the viewer can query it on every click or mouse move.
+"""
+import math
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Dict, Optional
+
+import pandas as pd
+
+DEFAULT_METRIC = "projection_density"
+BOTH_HEMISPHERES = 3 # Allen hemisphere_id: 1 Left, 2 Right, 3 both
+
+@dataclass(frozen=True)
+class RegionStats:
+    acronym: str
+    mean: float = math.nan
+    std: float = math.nan
+    n_experiments: int = 0
+    lateralization: float = math.nan # (ipsi - contra) / (ipsi + contra), in [-1, 1]
+    value: float = math.nan # Value in the loaded viewer CSV
+    is_seed: bool = False
+
+    def summary(self, name: str = None) -> str:
+        """Multi-line text for the on-screen overlay."""
+        lines = [f"{self.acronym} | {name}" if name else self.acronym]
+        if self.is_seed:
+            lines.append("Seed region")
+        if not math.isnan(self.value):
+            lines.append(f"CSV value: {self.value:.4g}")
+        if self.n_experiments:
+            std = "" if math.isnan(self.std) else f" +/- {self.std:.4g}"
+            lines.append(f"Mean: {self.mean:.4g}{std} (n={self.n_experiments} experiments)")
+        if not math.isnan(self.lateralization):
+            side = "ipsi" if self.lateralization > 0 else "contra" if self.lateralization < 0 else "balanced"
+            lines.append(f"Lateralization: {self.lateralization:+.2f} ({side})")
+        return "\n".join(lines)
+
+class RegionStatsIndex:
+    def __init__(self, stats: Dict[str, RegionStats] = None):
+        self.stats = stats or {}
+
+    def __len__(self):
+        return len(self.stats)
+
+    def __contains__(self, acronym):
+        return acronym in self.stats
+
+    def get(self, acronym: str) -> Optional[RegionStats]:
+        return self.stats.get(acronym)
+
+    def lookup(self, structure_id: int, structures) -> Optional[RegionStats]:
+        """
+        Stats of an atlas structure ID, or of its closest ancestor with stats (a click on
+        a cortical layer reports the area when only the area is in the table).
+        structures is the atlas' structures dict (ID -> {"acronym", "structure_id_path"}).
+        """
+        structure = structures.get(int(structure_id)) if structure_id else None
+        if structure is None:
+            return None
+        for ancestor in reversed(structure.get("structure_id_path") or [structure_id]):
+            stats = self.stats.get(structures[ancestor]["acronym"])
+            if stats is not None:
+                return stats
+        return None
+
+    # --- Construction ---
+
+    @classmethod
+    def from_tables(cls, analysis: pd.DataFrame = None, csv: pd.DataFrame = None, metric: str = DEFAULT_METRIC):
+        """Index of the analysis table stats, with the viewer CSV values merged in."""
+        columns = {}
+        if analysis is not None and len(analysis):
+            columns.update(analysis_stats(analysis, metric))
+        if csv is not None and len(csv):
+            rows = csv.drop_duplicates("acronym", keep="first").set_index("acronym")
+            columns["value"] = rows["value"].astype(float)
+            if "is_seed" in rows:
+                columns["is_seed"] = rows["is_seed"].fillna(False).astype(bool)
+        if not columns:
+            return cls()
+
+        table = pd.DataFrame(columns)
+        defaults = {"mean": math.nan, "std": math.nan, "n_experiments": 0,
+                    "lateralization": math.nan, "value": math.nan, "is_seed": False}
+        for column, default in defaults.items():
+            table[column] = table[column].fillna(default) if column in table else default
+        stats = {
+            str(acronym): RegionStats(str(acronym), float(row.mean), float(row.std), int(row.n_experiments),
+                                      float(row.lateralization), float(row.value), bool(row.is_seed))
+            for acronym, row in zip(table.index, table.itertuples(index=False))
+        }
+        return cls(stats)
+
+    @classmethod
+    def load(cls, csv_path=None, analysis_path=None, metric: str = DEFAULT_METRIC):
+        """From files; missing or unreadable ones are skipped."""
+        frames = {}
+        for key, path in (("csv", csv_path), ("analysis", analysis_path)):
+            if path and Path(path).exists():
+                try:
+                    frames[key] = pd.read_csv(path)
+                except Exception as e:
+                    print(f"[STATS] Cannot read {Path(path).name}: {e}")
+        index = cls.from_tables(frames.get("analysis"), frames.get("csv"), metric=metric)
+        print(f"[STATS] Region stats index: {len(index)} regions")
+        return index
+
+def analysis_stats(analysis: pd.DataFrame, metric: str = DEFAULT_METRIC) -> pd.DataFrame:
+    """
+    Per-acronym mean, std and number of experiments of the metric over the whole
+    structure (both hemispheres), plus lateralization from the per-hemisphere rows.
+    Injection-site rows are left out.
+    """
+    df = analysis
+    if "is_injection" in df.columns:
+        df = df[~df["is_injection"].astype(bool)]
+    if "hemisphere_id" in df.columns:
+        whole = df[df["hemisphere_id"] == BOTH_HEMISPHERES]
+    else:
+        whole = df
+    experiment = "experiment_id" if "experiment_id" in df.columns else None
+
+    # One value per experiment and structure
+    keys = ["acronym", experiment] if experiment else ["acronym"]
+    per_experiment = whole.groupby(keys)[metric].mean()
+    grouped = per_experiment.groupby(level="acronym")
+    table = pd.DataFrame({
+        "mean": grouped.mean(),
+        "std": grouped.std(),
+        "n_experiments": grouped.size() if experiment else 0,
+    })
+
+    if "lateralization" in df.columns:
+        sides = df[df["lateralization"].isin(["Ipsilateral", "Contralateral"])]
+        totals = sides.pivot_table(index="acronym", columns="lateralization", values=metric, aggfunc="sum", fill_value=0.0)
+        ipsi = totals.get("Ipsilateral", 0.0)
+        contra = totals.get("Contralateral", 0.0)
+        total = ipsi + contra
+        table = table.reindex(table.index.union(totals.index))
+        table["lateralization"] = (ipsi - contra) / total.where(total > 0)
+    return table
@@ -0,0 +1,84 @@
+"""
+Plain data model behind the GUI region list.
+
+Rows live here, not in DearPyGui widgets: the GUI only instantiates a fixed pool of
+widgets for the visible page and rebinds them when the page changes.
+"""
+from dataclasses import dataclass, asdict
+from typing import Iterable, List, Optional, Tuple
+
+from src.viewer import logic
+
+@dataclass
+class RegionRow:
+    acronym: str = ""
+    color_hex: str = "#4682B4"
+    is_seed: bool = False
+
+class RegionTableModel:
+    def __init__(self, page_size: int = 50):
+        self.page_size = page_size
+        self.rows: List[RegionRow] = []
+        self.page = 0
+
+    def __len__(self):
+        return len(self.rows)
+
+    # --- Editing ---
+    def add(self, acronym: str = None, color_hex: str = None, is_seed: bool = False) -> int:
+        color = color_hex or logic.get_preset_hex(len(self.rows))
+        self.rows.append(RegionRow(acronym or "", color, is_seed))
+        return len(self.rows) - 1
+
+    def extend(self, items: Iterable[dict]):
+        """Bulk add from dicts with 'acronym', 'color' and optional 'is_seed' (process_csv_data output)."""
+        self.rows.extend(
+            RegionRow(str(item["acronym"]), item.get("color") or logic.get_preset_hex(i), bool(item.get("is_seed", False)))
+            for i, item in enumerate(items, start=len(self.rows))
+        )
+
+    def replace(self, items: Iterable[dict]):
+        self.rows = []
+        self.page = 0
+        self.extend(items)
+
+    def remove(self, index: int):
+        if 0 <= index < len(self.rows):
+            del self.rows[index]
+        self.page = min(self.page, self.page_count - 1)
+
+    def clear(self):
+        self.rows = []
+        self.page = 0
+
+    def set_acronym(self, index: int, acronym: str):
+        self.rows[index].acronym = acronym
+
+    def set_color(self, index: int, color_hex: str):
+        self.rows[index].color_hex = color_hex
+
+    # --- Paging ---
+    @property
+    def page_count(self) -> int:
+        return max(1, -(-len(self.rows) // self.page_size))
+
+    def visible_range(self) -> Tuple[int, int]:
+        start = self.page * self.page_size
+        return start, min(start + self.page_size, len(self.rows))
+
+    def set_page(self, page: int):
+        self.page = max(0, min(page, self.page_count - 1))
+
+    def goto_row(self, index: int):
+        self.set_page(index // self.page_size)
+
+    # --- Queries ---
+    def seed_acronym(self) -> Optional[str]:
+        return next((r.acronym for r in self.rows if r.is_seed and r.acronym), None)
+
+    def selection(self) -> List[dict]:
+        """Rows ready for RenderEngine.render_scene (empty rows skipped)."""
+        return [{"acronym": r.acronym, "color": r.color_hex} for r in self.rows if r.acronym]
+
+    def to_dicts(self) -> List[dict]:
+        return [asdict(r) for r in self.rows]
@@ -1,3 +1,4 @@
+import threading
 import traceback
 import yaml
 import numpy as np
@@ -7,6 +8,10 @@ from brainglobe_atlasapi import BrainGlobeAtlas
 from brainrender import Scene, settings, actors
 from vedo import Text2D, Sphere, Volume
 
+from src.common.region_geometry import load_region_geometry
+from src.viewer import logic
+from src.viewer import threshold as thr
+
 # --- AESTHETIC CONFIGURATION ---
 settings.SHOW_AXES = False
 settings.WHOLE_SCREEN = False
@@ -28,6 +33,21 @@ ROTATE_X = 0
 ROTATE_Y = 90
 ROTATE_Z = 0
 
+# --- CAMERA VIEWS ---
+# Raw distance used to direct the camera away from the brain center.
+CAMERA_OFFSET = 20000
+# Position offset (from center) and view-up vector for each named view.
+CAMERA_VIEWS = {
+    "top":   ((0, -CAMERA_OFFSET, 0), (0, 0, -1)),   # Dorsal (Z key)
+    "side":  ((0, 0, CAMERA_OFFSET), (0, -1, 0)),    # Sagittal (X key)
+    "front": ((-CAMERA_OFFSET, 0, 0), (0, -1, 0)),   # Coronal (Y key)
+}
+DEFAULT_CENTER = [6500, 3800, 5600]
+STREAMLINE_RADIUS = 10 # Tube radius (microns), as brainrender's Streamlines
+# Click-to-info: a surface pick lands on a region's border, so the annotation is also
+# probed this many voxels further along the view direction.
+PICK_PROBES = (0, 1, 2)
+
 class RenderEngine:
     def __init__(self, atlas_name="allen_mouse_25um"):
         print(f"Initializing Atlas: {atlas_name}...")
@@ -36,9 +56,23 @@ class RenderEngine:
         
         self.root_dir = Path(__file__).resolve().parent.parent.parent
         self.default_scenes_dir = self.root_dir / "scenes"
+        self.tract_actor = None
+        self.tract_volume = None
+        self.tract_volume_path = None
+        self.root_actor = None
+        self.region_stats = None # RegionStatsIndex shown by click-to-info
+        self.picked_structure = None # Last clicked structure ID (F focuses the camera on it)
+        self._geometry = None
 
-    def render_scene(self, region_config: list, tract_file: Path = None, alpha=0.5, output_dir: Path = None, metadata: dict = None, visualization_mode="density"):
+    def build_scene(self, region_config: list, tract_file: Path = None, alpha=0.5, visualization_mode="density",
+                    threshold_fraction=thr.DEFAULT_FRACTION, target_regions=None):
+        """
+        Creates the Scene with root, regions and tractography, without rendering it.
+        target_regions (default: every region) are the acronyms filtered streamlines must cross.
+        """
         scene = Scene(atlas_name=self.atlas_name, title="")
+        self.tract_actor = None
+        self.tract_volume = None
         
         # --- 0. CONTEXT (ROOT) ---
         self.root_actor = None
@@ -84,16 +118,44 @@ class RenderEngine:
                         tract_actor.name = "Tractography (Filtered)" # Name it!
                         print("[RENDER] Loaded mesh directly.")
 
-                # CASE B: Streamlines JSON (.json)
-                elif tract_file.suffix == ".json" and "Streamlines" in visualization_mode:
-                    from brainrender.actors import Streamlines
+                # CASE B: Streamlines JSON (.json, cached as .npz)
+                elif tract_file.suffix in (".json", ".npz") and "Streamlines" in visualization_mode:
+                    from src.viewer.streamlines import DEFAULT_MAX_POINTS, StreamlineStore
                     print(f"[RENDER] Loading Streamlines from {tract_file.name}")
-                    # Brainrender Streamlines actor can load from file path
-                    tract_actor = Streamlines(str(tract_file))
-                    tract_actor.alpha(0.6)
-                    tract_actor.name = "Streamlines"
+                    store = StreamlineStore.load(tract_file)
+                    if "Filtered" in visualization_mode:
+                        targets = target_regions if target_regions is not None else [r['acronym'] for r in region_config]
+                        keep = store.through_regions(self.atlas.annotation, self.region_ids(targets), self.atlas.resolution)
+                        print(f"[RENDER] {int(keep.sum())}/{store.n_fibers} fibers pass through {targets}")
+                        store = store.select(keep)
+                    n_fibers = store.n_fibers
+                    store = store.subsample(max_points=DEFAULT_MAX_POINTS)
+                    if store.n_fibers < n_fibers:
+                        print(f"[RENDER] Showing {store.n_fibers}/{n_fibers} fibers ({store.n_points:,} point budget)")
+                    if store.n_fibers:
+                        # All fibers in one tube mesh (brainrender makes one Tube per fiber)
+                        tract_actor = store.actor(radius=STREAMLINE_RADIUS)
+                        tract_actor.c("salmon").alpha(0.6)
+                        tract_actor.name = "Streamlines"
                     
-                # CASE C: Raw Volume (.nrrd)
+                # CASE C: Point-cloud preview of the raw volume (no meshing)
+                elif "Points" in visualization_mode:
+                    from src.viewer.point_cloud import point_cloud_actor
+                    tract_actor = point_cloud_actor(tract_file, threshold_fraction)
+                    if tract_actor:
+                        tract_actor.alpha(0.6)
+                        tract_actor.name = "Tractography (Points)"
+
+                # CASE D: Voxel ("Lego") blocks of the raw volume
+                elif "Voxels" in visualization_mode:
+                    from src.viewer.point_cloud import load_volume, point_cloud
+                    data, spacing, origin = load_volume(tract_file)
+                    dmax = float(data.max())
+                    coords, values = point_cloud(data, spacing, origin, dmax * threshold_fraction, budget=None)
+                    tract_actor = self.voxel_actor(coords, values, voxel_size=spacing,
+                                                   vmin=dmax * threshold_fraction, vmax=dmax)
+
+                # CASE E: Raw Volume (.nrrd)
                 else:
                     print(f"[DEBUG] Attempting to load Volume: {tract_file}")
                     vol = Volume(str(tract_file))
@@ -101,23 +163,13 @@ class RenderEngine:
                     print(f"[RENDER] Volume Range: {dmin:.4f} - {dmax:.4f}")
                     
                     if dmax > 0:
-                        # Thresholding logic
-                        # visualization_mode is now "Density (Raw)" or "Density (Filtered)"
-                        threshold_val = dmax * 0.10 # Default 10%
-                        
-                        if "Raw" in visualization_mode:
-                            threshold_val = dmax * 0.05 # Lower threshold for raw to ensure visibility
-                        elif "Filtered" in visualization_mode:
-                            threshold_val = dmax * 0.05
-                            
-                        print(f"[DEBUG] Thresholding at {threshold_val:.4f} (Mode: {visualization_mode})")
+                        threshold_val = dmax * threshold_fraction
+                        print(f"[DEBUG] Thresholding at {threshold_val:.4f} ({threshold_fraction:.1%} of max, Mode: {visualization_mode})")
 
                         tract_actor = vol.isosurface(value=threshold_val)
-                        
-                        # Apply Viridis Colormap
-                        tract_actor.cmap("viridis", vmin=threshold_val, vmax=dmax)
-                        tract_actor.alpha(0.6)
-                        tract_actor.name = "Tractography (Density)"
+                        self.style_density_actor(tract_actor, threshold_val, dmax)
+                        self.tract_volume = vol
+                        self.tract_volume_path = tract_file
                         
                         # Add Scalar Bar (Legend) - DISABLED FOR DEBUGGING
                         # tract_actor.add_scalarbar(
@@ -130,45 +182,8 @@ class RenderEngine:
 
                 # Apply Transformations
                 if tract_actor:
-                    # --- NATIVE ALIGNMENT ---
-                    # The input file is expected to be correctly registered (spacing/origin).
-                    
-                    # Define a FIXED pivot point for rotations.
-                    # CRITICAL: We use the Center of Mass of the RAW data as the pivot.
-                    # This ensures that:
-                    # 1. The Raw cloud rotates around itself (preserving the user's manual alignment).
-                    # 2. The Filtered cloud rotates around the BRAIN CENTER (not its own center), keeping it aligned.
-                    # CoM extracted from logs: [5778, 4066, 5975]
-                    pivot_point = [5778, 4066, 5975]
-
-                    # Legacy Rotation (Disabled)
-                    if ROTATION_MODE == "final_y_270":
-                        tract_actor.rotate(270, axis=(0,1,0), point=pivot_point)
-                    
-                    # Apply Manual Rotations (Fine Tuning)
-                    if ROTATE_X != 0 or ROTATE_Y != 0 or ROTATE_Z != 0:
-                        # center = tract_actor.center_of_mass() # OLD: caused misalignment for partial clouds
-                        print(f"[ALIGN] Applying Manual Rotation: X={ROTATE_X}, Y={ROTATE_Y}, Z={ROTATE_Z}")
-                        print(f"[ALIGN] Pivot Point: {pivot_point}")
-                        
-                        if ROTATE_X != 0: tract_actor.rotate(ROTATE_X, axis=(1,0,0), point=pivot_point)
-                        if ROTATE_Y != 0: tract_actor.rotate(ROTATE_Y, axis=(0,1,0), point=pivot_point)
-                        if ROTATE_Z != 0: tract_actor.rotate(ROTATE_Z, axis=(0,0,1), point=pivot_point)
-
-                    # Apply Manual Fine Tuning
-                    print(f"[ALIGN] Applying Manual Shift: {SHIFT_X}, {SHIFT_Y}, {SHIFT_Z}")
-                    
-                    com_before = tract_actor.center_of_mass()
-                    print(f"[DEBUG] CoM Before: {com_before}")
-                    
-                    tract_actor.shift(SHIFT_X, SHIFT_Y, SHIFT_Z)
-                    
-                    com_after = tract_actor.center_of_mass()
-                    print(f"[DEBUG] CoM After:  {com_after}")
-                    
-                    # Sanity check: Did it move?
-                    diff = np.array(com_after) - np.array(com_before)
-                    print(f"[DEBUG] Actual Movement: {diff}")
+                    self.align_tract_actor(tract_actor)
+                    self.tract_actor = tract_actor
                         
                 scene.add(tract_actor)
 
@@ -176,9 +191,318 @@ class RenderEngine:
                 print(f"[ERROR] Tract render failed: {e}")
                 traceback.print_exc()
 
+        return scene
+
+    def region_ids(self, acronyms):
+        """Atlas structure IDs of the acronyms and all their descendants."""
+        ids = set()
+        for acronym in acronyms:
+            try:
+                ids.add(self.atlas.structures[acronym]['id'])
+                for child in self.atlas.get_structure_descendants(acronym):
+                    ids.add(self.atlas.structures[child]['id'])
+            except KeyError:
+                print(f"[WARN] Region '{acronym}' not found in atlas.")
+        return ids
+
+    @property
+    def geometry(self):
+        """Region geometry index of the atlas (built once, then read from data/processed/atlas)."""
+        if self._geometry is None:
+            self._geometry = load_region_geometry(self.atlas, self.atlas_name)
+        return self._geometry
+
+    def region_bounds(self, key):
+        """Scene bounds [x0, x1, y0, y1, z0, z1] of a structure (ID or acronym), or None."""
+        try:
+            bounds = self.geometry.bounds(key)
+        except KeyError:
+            return None
+        if bounds and self.root_actor is not None and self.root_actor.bounds()[5] <= 0:
+            # brainrender mirrored the ML axis of the rendered actors
+            bounds[4], bounds[5] = -bounds[5], -bounds[4]
+        return bounds
+
+    def style_density_actor(self, tract_actor, threshold_val, dmax):
+        # Apply Viridis Colormap
+        tract_actor.cmap("viridis", vmin=threshold_val, vmax=dmax)
+        tract_actor.alpha(0.6)
+        tract_actor.name = "Tractography (Density)"
+
+    def voxel_actor(self, coords, values, voxel_size=25, max_voxels=None, cmap="viridis", alpha=1.0, vmin=None, vmax=None):
+        """
+        Lego-style actor: one cube per (x, y, z) coordinate, colored by value, built as a
+        single mesh of the outer cube faces (see voxels.py). Above max_voxels the grid is
+        coarsened. Returns None for an empty set.
+        """
+        from src.viewer.voxels import DEFAULT_MAX_VOXELS, voxel_mesh
+        if len(coords) == 0:
+            print("[WARNING] No voxels to render.")
+            return None
+        mesh, factor = voxel_mesh(coords, values, voxel_size, max_voxels or DEFAULT_MAX_VOXELS)
+        if factor > 1:
+            print(f"[RENDER] {len(coords):,} voxels over the cap: merged into {factor}x{factor}x{factor} blocks")
+        print(f"[RENDER] Voxel actor: {mesh.ncells:,} visible faces")
+        values = np.asarray(values)
+        mesh.cmap(cmap, "value", on="cells",
+                  vmin=values.min() if vmin is None else vmin, vmax=values.max() if vmax is None else vmax)
+        mesh.alpha(alpha)
+        mesh.name = "Voxels"
+        return mesh
+
+    def align_tract_actor(self, tract_actor):
+        """Moves a tract actor (in volume coordinates) into the atlas frame."""
+        # --- NATIVE ALIGNMENT ---
+        # The input file is expected to be correctly registered (spacing/origin).
+
+        # Define a FIXED pivot point for rotations.
+        # CRITICAL: We use the Center of Mass of the RAW data as the pivot.
+        # This ensures that:
+        # 1. The Raw cloud rotates around itself (preserving the user's manual alignment).
+        # 2. The Filtered cloud rotates around the BRAIN CENTER (not its own center), keeping it aligned.
+        # CoM extracted from logs: [5778, 4066, 5975]
+        pivot_point = [5778, 4066, 5975]
+
+        # Legacy Rotation (Disabled)
+        if ROTATION_MODE == "final_y_270":
+            tract_actor.rotate(270, axis=(0,1,0), point=pivot_point)
+
+        # Apply Manual Rotations (Fine Tuning)
+        if ROTATE_X != 0 or ROTATE_Y != 0 or ROTATE_Z != 0:
+            # center = tract_actor.center_of_mass() # OLD: caused misalignment for partial clouds
+            print(f"[ALIGN] Applying Manual Rotation: X={ROTATE_X}, Y={ROTATE_Y}, Z={ROTATE_Z}")
+            print(f"[ALIGN] Pivot Point: {pivot_point}")
+
+            if ROTATE_X != 0: tract_actor.rotate(ROTATE_X, axis=(1,0,0), point=pivot_point)
+            if ROTATE_Y != 0: tract_actor.rotate(ROTATE_Y, axis=(0,1,0), point=pivot_point)
+            if ROTATE_Z != 0: tract_actor.rotate(ROTATE_Z, axis=(0,0,1), point=pivot_point)
+
+        # Apply Manual Fine Tuning
+        print(f"[ALIGN] Applying Manual Shift: {SHIFT_X}, {SHIFT_Y}, {SHIFT_Z}")
+
+        com_before = tract_actor.center_of_mass()
+        print(f"[DEBUG] CoM Before: {com_before}")
+
+        tract_actor.shift(SHIFT_X, SHIFT_Y, SHIFT_Z)
+
+        com_after = tract_actor.center_of_mass()
+        print(f"[DEBUG] CoM After:  {com_after}")
+
+        # Sanity check: Did it move?
+        diff = np.array(com_after) - np.array(com_before)
+        print(f"[DEBUG] Actual Movement: {diff}")
+
+    def voxel_index(self, point):
+        """Annotation voxel (i, j, k) under a scene point (microns), or None outside the volume."""
+        p = np.array(point[:3], dtype=float)
+        p[2] = abs(p[2]) # brainrender mirrors the ML axis of the actors it renders (z -> -z)
+        ijk = np.floor(p / np.asarray(self.atlas.resolution, dtype=float)).astype(int)
+        if np.any(ijk < 0) or np.any(ijk >= self.atlas.annotation.shape):
+            return None
+        return tuple(ijk)
+
+    def structure_at(self, point, direction=None):
+        """
+        Atlas structure ID at a picked point (0 if none): a direct lookup into the annotation,
+        repeated PICK_PROBES voxels deeper along direction (the camera's) if the point is unlabelled.
+        """
+        step = np.zeros(3)
+        if direction is not None:
+            norm = np.linalg.norm(direction)
+            if norm > 0:
+                step = np.asarray(direction, dtype=float) / norm * float(np.min(self.atlas.resolution))
+        for depth in PICK_PROBES:
+            ijk = self.voxel_index(np.asarray(point[:3], dtype=float) + depth * step)
+            if ijk is not None and self.atlas.annotation[ijk]:
+                return int(self.atlas.annotation[ijk])
+        return 0
+
+    def region_info(self, point, direction=None) -> str:
+        """Overlay text for a picked point: region name and its statistics."""
+        structure_id = self.structure_at(point, direction)
+        if not structure_id:
+            return "Outside the brain"
+        structure = self.atlas.structures[structure_id]
+        stats = self.region_stats.lookup(structure_id, self.atlas.structures) if self.region_stats else None
+        if stats is None:
+            return f"{structure['acronym']} | {structure['name']}\nNo statistics loaded"
+        if stats.acronym != structure["acronym"]:
+            return f"{structure['acronym']} | {structure['name']}\nin {stats.summary()}"
+        return stats.summary(structure["name"])
+
+    def add_region_picking(self, scene):
+        """
+        Click-to-info: left click shows the region under the cursor and its statistics in an
+        overlay; 'I' toggles the same on mouse hover. Returns the keypress handler for 'i'.
+        """
+        overlay = Text2D("", pos="top-left", s=0.9, c="black", bg="white", alpha=0.7, font="Calco")
+        scene.add(overlay)
+        hover = {"id": None}
+
+        def show(event):
+            if event.picked3d is None:
+                return
+            direction = scene.plotter.camera.GetDirectionOfProjection()
+            self.picked_structure = self.structure_at(event.picked3d, direction) or None
+            overlay.text(self.region_info(event.picked3d, direction))
+            scene.plotter.render()
+
+        def toggle_hover():
+            if hover["id"] is None:
+                hover["id"] = scene.plotter.add_callback("MouseMove", show)
+                print("[PICK] Hover info: ON")
+            else:
+                scene.plotter.remove_callback(hover["id"])
+                hover["id"] = None
+                overlay.text("")
+                print("[PICK] Hover info: OFF")
+
+        scene.plotter.add_callback("LeftButtonPress", show)
+        return toggle_hover
+
+    def get_view_center(self):
+        if self.root_actor:
+            return self.root_actor.center_of_mass()
+        try:
+            center = self.geometry.center("root")
+        except Exception as e:
+            print(f"[WARN] Region geometry unavailable: {e}")
+            center = None
+        return center or DEFAULT_CENTER
+
+    def set_camera_view(self, scene, view: str, region=None):
+        """Points the camera at the brain center (or a region's bounding box) from one of CAMERA_VIEWS."""
+        offset, view_up = CAMERA_VIEWS[view]
+        bounds = self.region_bounds(region) if region else None
+        center = bounds_center(bounds) if bounds else self.get_view_center()
+
+        cam = scene.plotter.camera
+        cam.SetPosition(center[0] + offset[0], center[1] + offset[1], center[2] + offset[2])
+        cam.SetFocalPoint(center[0], center[1], center[2])
+        cam.SetViewUp(*view_up)
+        if bounds:
+            scene.plotter.renderer.ResetCamera(*bounds)
+        else:
+            scene.plotter.reset_camera()
+
+    def focus_region(self, scene, region=None):
+        """Zooms on a region's bounding box keeping the view direction (whole scene if None)."""
+        bounds = self.region_bounds(region) if region else None
+        if bounds:
+            scene.plotter.renderer.ResetCamera(*bounds)
+            print(f"[CAMERA] Focus: {self.geometry.get(region)['acronym']}")
+        else:
+            scene.plotter.reset_camera()
+
+    def render_to_file(self, region_config: list, output_path: Path, view="top", tract_file: Path = None, alpha=0.5, visualization_mode="density", scale=1,
+                       threshold_fraction=thr.DEFAULT_FRACTION):
+        """Renders the scene offscreen from a fixed view and saves it as an image."""
+        scene = self.build_scene(region_config, tract_file=tract_file, alpha=alpha, visualization_mode=visualization_mode,
+                                 threshold_fraction=threshold_fraction)
+        try:
+            scene.render(interactive=False)
+            self.set_camera_view(scene, view)
+            scene.plotter.render()
+
+            output_path = Path(output_path)
+            output_path.parent.mkdir(parents=True, exist_ok=True)
+            scene.screenshot(name=str(output_path), scale=scale)
+            print(f"[SAVE] PNG saved: {output_path}")
+        finally:
+            scene.close()
+        return output_path
+
+    def attach_fixed_volume(self, volume_file: Path, fixed_file: Path):
+        """
+        Loads the raw volume behind a {stem}_fixed.vtk mesh, in the geometry the mesh was
+        built with (explicit spacing, zero origin), so the threshold slider can replace it.
+        """
+        params = logic.fixed_mesh_params(fixed_file)
+        data = Volume(str(volume_file)).tonumpy()
+        self.tract_volume = Volume(data, spacing=params["spacing"], origin=(0, 0, 0))
+        self.tract_volume_path = Path(volume_file)
+
+    def add_threshold_slider(self, scene, threshold_fraction, histogram=None):
+        """
+        Live threshold slider for the density surface. Surfaces are computed off the render
+        thread (coarse first, then full resolution) and swapped in by a timer as they arrive;
+        steps already visited come straight from the cache. Voxel counts come from the
+        histogram the GUI already built, or from one built in the background.
+        """
+        meshes = thr.ThresholdMeshes.from_volume(self.tract_volume)
+        shown = {"index": thr.quantize(threshold_fraction), "level": thr.FULL}
+        counts = {"histogram": histogram, "titled": histogram is not None}
+
+        def slider_title(index):
+            fraction = index * thr.STEP
+            histogram = counts["histogram"]
+            if histogram is None:
+                return f"Threshold {fraction:.1%} of max (counting voxels...)"
+            return f"Threshold {fraction:.1%} of max: {histogram.count_at(fraction):,} voxels"
+
+        def show(index, level):
+            new_actor = meshes.mesh(index, level)
+            self.style_density_actor(new_actor, meshes.threshold(index), meshes.vmax)
+            self.align_tract_actor(new_actor)
+            scene.plotter.remove(self.tract_actor)
+            scene.plotter.add(new_actor)
+            self.tract_actor = new_actor
+            shown.update(index=index, level=level)
+            scene.plotter.render()
+
+        def on_slider(widget, event):
+            index = meshes.request(widget.value)
+            widget.title = slider_title(index)
+            level = meshes.best(index)
+            if level is not None and (index, level) != (shown["index"], shown["level"]):
+                show(index, level)
+
+        def on_timer(event):
+            for index, level in meshes.poll():
+                if index == meshes.wanted and (index != shown["index"] or level > shown["level"]):
+                    show(index, level)
+            if not counts["titled"] and counts["histogram"] is not None:
+                counts["titled"] = True
+                slider.title = slider_title(meshes.wanted or shown["index"])
+
+        slider = scene.plotter.add_slider(on_slider, xmin=thr.STEP, xmax=thr.MAX_FRACTION, value=threshold_fraction,
+                                          title=slider_title(shown["index"]), pos=[(0.55, 0.06), (0.95, 0.06)], show_value=False)
+        scene.plotter.add_callback("timer", on_timer, enable_picking=False)
+        scene.plotter.timer_callback("start", dt=100)
+        if histogram is None:
+            # Counted off the render thread; on_timer puts the counts in the title when ready
+            def load_histogram(path=self.tract_volume_path):
+                counts["histogram"] = thr.load_histogram(path)
+            threading.Thread(target=load_histogram, name="threshold-histogram", daemon=True).start()
+        return meshes
+
+    def render_scene(self, region_config: list, tract_file: Path = None, alpha=0.5, output_dir: Path = None, metadata: dict = None, visualization_mode="density", on_first_frame=None,
+                     threshold_fraction=thr.DEFAULT_FRACTION, target_regions=None, region_stats=None,
+                     volume_file: Path = None, histogram=None):
+        """
+        volume_file: raw volume behind a fixed mesh (Density (Raw)), so the threshold slider
+        also works on it; histogram: its VoxelHistogram, if the caller already has one.
+        """
+        self.region_stats = region_stats
+        scene = self.build_scene(region_config, tract_file=tract_file, alpha=alpha, visualization_mode=visualization_mode,
+                                 threshold_fraction=threshold_fraction, target_regions=target_regions)
+        meshes = None
+        if (self.tract_volume is None and self.tract_actor is not None and volume_file is not None
+                and visualization_mode == "Density (Raw)" and tract_file.name.endswith("_fixed.vtk")):
+            try:
+                self.attach_fixed_volume(volume_file, tract_file)
+            except Exception as e:
+                print(f"[WARN] Could not load {Path(volume_file).name} for the threshold slider: {e}")
+        if self.tract_volume is not None:
+            try:
+                meshes = self.add_threshold_slider(scene, threshold_fraction, histogram=histogram)
+            except Exception as e:
+                print(f"[WARN] Threshold slider unavailable: {e}")
+
         # --- 3. HUD & LEGEND ---
-        hud = Text2D("S: Save | K: Style | X/Y/Z: Views", pos="bottom-left", s=0.9, c="black", font="Calco")
+        hud = Text2D("S: Save | K: Style | X/Y/Z: Views | Click: Region info | I: Hover info | F: Focus", pos="bottom-left", s=0.9, c="black", font="Calco")
         scene.add(hud)
+        toggle_hover = self.add_region_picking(scene)
 
         # Add Region Scalar Bar (Separate Window)
         if metadata and "scalar_min" in metadata and "scalar_max" in metadata:
@@ -202,37 +526,17 @@ class RenderEngine:
             key = event.keypress
             if not key: return
             
-            cam = scene.plotter.camera
-            
-            # Calculate dynamic center
-            if self.root_actor:
-                center = self.root_actor.center_of_mass()
-            else:
-                center = [6500, 3800, 5600] 
-
-            # Raw distance to direct the camera
-            OFFSET = 20000 
-
             if key == 'z': # TOP (Dorsal)
                 print("View: Top (Z)")
-                cam.SetPosition(center[0], center[1] - OFFSET, center[2])
-                cam.SetFocalPoint(center[0], center[1], center[2])
-                cam.SetViewUp(0, 0, -1) 
-                scene.plotter.reset_camera()
+                self.set_camera_view(scene, "top")
 
             elif key == 'x': # SIDE (Sagittal)
                 print("View: Side (X)")
-                cam.SetPosition(center[0], center[1], center[2] + OFFSET)
-                cam.SetFocalPoint(center[0], center[1], center[2])
-                cam.SetViewUp(0, -1, 0)
-                scene.plotter.reset_camera()
+                self.set_camera_view(scene, "side")
 
             elif key == 'y': # FRONT (Coronal)
                 print("View: Front (Y)")
-                cam.SetPosition(center[0] - OFFSET, center[1], center[2])
-                cam.SetFocalPoint(center[0], center[1], center[2])
-                cam.SetViewUp(0, -1, 0)
-                scene.plotter.reset_camera()
+                self.set_camera_view(scene, "front")
             
             elif key == 's': # SAVE
                 save_dir = output_dir if output_dir else self.default_scenes_dir
@@ -253,11 +557,35 @@ class RenderEngine:
                     pass
                 print("[STYLE] Style toggle not fully implemented yet, preserving keybind.")
 
+            elif key == 'i': # HOVER INFO
+                toggle_hover()
+
+            elif key == 'f': # FOCUS on the clicked region (pressed again: whole brain)
+                region = self.picked_structure
+                self.picked_structure = None
+                self.focus_region(scene, region)
+
             # Force render update
             scene.plotter.render()
 
         scene.plotter.add_callback('keypress', on_keypress)
 
+        # Startup instrumentation: fire once when the window draws its first frame
+        if on_first_frame:
+            first_frame_done = []
+            def on_render(event):
+                if not first_frame_done:
+                    first_frame_done.append(True)
+                    on_first_frame()
+            scene.plotter.add_callback('RenderEvent', on_render)
+
         print("\n--- RENDER LOOP ---")
-        scene.render()
-        return []
\ No newline at end of file
+        try:
+            scene.render()
+        finally:
+            if meshes:
+                meshes.shutdown()
+        return []
+
+def bounds_center(bounds):
+    return [(bounds[0] + bounds[1]) / 2, (bounds[2] + bounds[3]) / 2, (bounds[4] + bounds[5]) / 2]
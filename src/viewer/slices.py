@@ -0,0 +1,148 @@
+"""
+2D orthogonal slices of a density volume with atlas region boundaries.
+
+Planes are read straight out of memory-mapped arrays (read_volume_array), so a slice
+costs one plane of I/O whatever the volume size. Each rendered slice (density through
+a colormap, region boundaries drawn on top) is an RGBA float32 image kept in a small
+LRU cache, so scrubbing back and forth only renders new planes once.
+
+Axes follow the atlas annotation (AP, DV, ML for allen_mouse_25um).
+"""
+from collections import OrderedDict
+from typing import Dict, Optional, Tuple
+
+import numpy as np
+
+from src.common.volume_header import read_volume_array, read_volume_header
+
+# name -> (array axis, transpose so the image rows are the first remaining axis listed)
+VIEWS: Dict[str, Tuple[int, bool]] = {
+    "Coronal": (0, False),    # rows DV, columns ML
+    "Horizontal": (1, False), # rows AP, columns ML
+    "Sagittal": (2, True),    # rows DV, columns AP
+}
+CACHE_PLANES = 64
+BOUNDARY_RGBA = (1.0, 1.0, 1.0, 1.0)
+BACKGROUND_RGBA = (0.0, 0.0, 0.0, 1.0)
+
+def permutation_to(shape, target) -> Optional[Tuple[int, ...]]:
+    """Axis order that turns an array of `shape` into `target` (None if not a permutation)."""
+    if tuple(shape) == tuple(target):
+        return (0, 1, 2)
+    if sorted(shape) != sorted(target):
+        return None
+    # Prefer reversing the axes (the raw volumes are stored ML, DV, AP)
+    if tuple(shape) == tuple(reversed(target)):
+        return tuple(reversed(range(len(shape))))
+    remaining, perm = list(range(len(shape))), []
+    for size in target:
+        axis = next(i for i in remaining if shape[i] == size)
+        remaining.remove(axis)
+        perm.append(axis)
+    return tuple(perm)
+
+def boundaries(labels: np.ndarray) -> np.ndarray:
+    """Pixels whose label differs from the pixel below or to the right."""
+    edge = np.zeros(labels.shape, dtype=bool)
+    edge[:-1, :] |= labels[:-1, :] != labels[1:, :]
+    edge[:, :-1] |= labels[:, :-1] != labels[:, 1:]
+    return edge
+
+def colormap_lut(name: str = "viridis", n: int = 256) -> np.ndarray:
+    """(n, 4) float32 RGBA table."""
+    try:
+        from matplotlib import colormaps
+        return colormaps[name](np.linspace(0, 1, n)).astype(np.float32)
+    except Exception:
+        ramp = np.linspace(0, 1, n, dtype=np.float32)
+        return np.stack([ramp, ramp, ramp, np.ones(n, dtype=np.float32)], axis=1)
+
+class SliceEngine:
+    def __init__(self, volume: np.ndarray = None, annotation: np.ndarray = None, vmax: float = None,
+                 cmap: str = "viridis", cache_planes: int = CACHE_PLANES):
+        if volume is None and annotation is None:
+            raise ValueError("SliceEngine needs a volume, an annotation or both")
+        self.annotation = annotation
+        if volume is not None and annotation is not None:
+            perm = permutation_to(volume.shape, annotation.shape)
+            if perm is None:
+                print(f"[SLICES] Volume {volume.shape} does not match annotation {annotation.shape}: boundaries off")
+                self.annotation = None
+            elif perm != (0, 1, 2):
+                volume = volume.transpose(perm) # View: the memory map is not copied
+        self.volume = volume
+        self.shape = (volume if volume is not None else annotation).shape
+        self.vmax = vmax
+        self.lut = colormap_lut(cmap)
+        self.cache_planes = cache_planes
+        self._cache = OrderedDict()
+
+    @classmethod
+    def from_file(cls, volume_path, annotation: np.ndarray = None, **kwargs):
+        """Memory-maps an uncompressed .nrrd/.mhd (compressed payloads are decoded once)."""
+        volume = read_volume_array(read_volume_header(volume_path)) if volume_path else None
+        return cls(volume, annotation, **kwargs)
+
+    def n_slices(self, view: str) -> int:
+        return self.shape[VIEWS[view][0]]
+
+    def image_size(self, view: str) -> Tuple[int, int]:
+        """(width, height) of the images of a view."""
+        axis, transpose = VIEWS[view]
+        rows, cols = [n for i, n in enumerate(self.shape) if i != axis]
+        return (rows, cols) if transpose else (cols, rows)
+
+    def _plane(self, array: np.ndarray, view: str, index: int) -> np.ndarray:
+        axis, transpose = VIEWS[view]
+        plane = array[(slice(None),) * axis + (index,)] # View: only this plane is read
+        return plane.T if transpose else plane
+
+    def density(self, view: str, index: int) -> Optional[np.ndarray]:
+        if self.volume is None:
+            return None
+        return np.asarray(self._plane(self.volume, view, index), dtype=np.float32)
+
+    def labels(self, view: str, index: int) -> Optional[np.ndarray]:
+        if self.annotation is None:
+            return None
+        return np.asarray(self._plane(self.annotation, view, index))
+
+    def _scale(self) -> float:
+        if self.vmax is None:
+            # Volume max, computed once (one streaming pass over the map)
+            self.vmax = float(self.volume.max()) if self.volume is not None else 1.0
+        return self.vmax or 1.0
+
+    def render(self, view: str, index: int) -> np.ndarray:
+        """(height, width, 4) float32 RGBA image of one slice, cached."""
+        index = int(np.clip(index, 0, self.n_slices(view) - 1))
+        key = (view, index)
+        if key in self._cache:
+            self._cache.move_to_end(key)
+            return self._cache[key]
+
+        width, height = self.image_size(view)
+        density = self.density(view, index)
+        if density is not None:
+            level = np.clip(density / self._scale(), 0, 1)
+            image = self.lut[(level * (len(self.lut) - 1)).astype(np.intp)]
+            image[density <= 0] = BACKGROUND_RGBA
+        else:
+            image = np.empty((height, width, 4), dtype=np.float32)
+            image[:] = BACKGROUND_RGBA
+
+        labels = self.labels(view, index)
+        if labels is not None:
+            image[boundaries(labels)] = BOUNDARY_RGBA
+
+        self._cache[key] = image
+        if len(self._cache) > self.cache_planes:
+            self._cache.popitem(last=False)
+        return image
+
+    def structure_at(self, view: str, index: int, row: int, col: int) -> Optional[int]:
+        """Annotation label under an image pixel."""
+        labels = self.labels(view, index)
+        if labels is None or not (0 <= row < labels.shape[0] and 0 <= col < labels.shape[1]):
+            return None
+        return int(labels[row, col])
@@ -0,0 +1,81 @@
+"""
+Viewer startup helpers: timing instrumentation and background prewarming.
+
+Nothing here imports brainrender/vedo/brainglobe at module level, so the GUI can
+show its window before the heavy rendering stack is loaded.
+"""
+import json
+import time
+from datetime import datetime
+from pathlib import Path
+from typing import List
+
+class StartupTimer:
+    """Records named milestones (seconds since t0) and appends them to a JSONL log."""
+    def __init__(self, t0: float = None):
+        self.t0 = t0 if t0 is not None else time.perf_counter()
+        self.marks = {}
+
+    def mark(self, name: str) -> float:
+        if name in self.marks:
+            return self.marks[name]
+        elapsed = time.perf_counter() - self.t0
+        self.marks[name] = round(elapsed, 3)
+        print(f"[STARTUP] {name}: {elapsed:.2f}s")
+        return self.marks[name]
+
+    def save(self, log_path: Path):
+        if not self.marks:
+            return
+        log_path = Path(log_path)
+        log_path.parent.mkdir(parents=True, exist_ok=True)
+        entry = {"timestamp": datetime.now().isoformat(timespec="seconds"), **self.marks}
+        with open(log_path, "a") as f:
+            f.write(json.dumps(entry) + "\n")
+
+# --- Last Session ---
+
+def load_last_regions(session_file: Path) -> List[str]:
+    try:
+        return list(json.loads(Path(session_file).read_text())["regions"])
+    except Exception:
+        return []
+
+def save_last_regions(session_file: Path, regions: List[str]):
+    session_file = Path(session_file)
+    session_file.parent.mkdir(parents=True, exist_ok=True)
+    session_file.write_text(json.dumps({"regions": list(regions)}, indent=4))
+
+# --- Prewarm ---
+
+def prewarm_engine(ctx, atlas_name: str, regions: List[str], timer: StartupTimer = None):
+    """
+    Job function (see jobs.JobManager): imports the rendering stack, loads the atlas
+    and ontology, and reads the meshes of the given regions so the first render
+    hits a warm disk cache. Returns the RenderEngine.
+    """
+    ctx.progress("Importing rendering libraries", 0.0)
+    from src.viewer import rendering
+    if timer:
+        timer.mark("heavy_imports")
+
+    ctx.progress("Loading atlas", 0.3)
+    engine = rendering.RenderEngine(atlas_name)
+
+    ctx.progress("Loading ontology", 0.5)
+    structures = engine.atlas.structures
+    if timer:
+        timer.mark("atlas_loaded")
+
+    # Scene builds its own Atlas instance, so the mesh objects cannot be shared:
+    # reading the files is what makes the first add_brain_region fast.
+    regions = [r for r in dict.fromkeys(["root", *regions]) if r in structures]
+    for i, acronym in enumerate(regions):
+        ctx.progress(f"Prewarming meshes ({i + 1}/{len(regions)})", 0.6 + 0.4 * i / len(regions))
+        try:
+            Path(engine.atlas.meshfile_from_structure(acronym)).read_bytes()
+        except Exception as e:
+            print(f"[PREWARM] Could not read mesh for {acronym}: {e}")
+    if timer:
+        timer.mark("prewarm_done")
+    return engine
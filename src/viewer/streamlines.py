@@ -0,0 +1,186 @@
+"""
+Compact streamline store.
+
+The Allen streamline JSON ({id}_streamlines.json: {"lines": [[{"x", "y", "z"}, ...], ...]})
+is parsed once and cached next to it as {id}_streamlines.npz: every fiber's points in one
+float32 (N, 3) array plus an int64 offsets array (fiber i is points[offsets[i]:offsets[i+1]]).
+All operations (subsampling, region filtering, building the actor) work on those flat
+arrays, and the whole set is rendered as one polyline (or tube) mesh.
+"""
+import json
+from pathlib import Path
+
+import numpy as np
+
+DEFAULT_MAX_POINTS = 500_000
+CACHE_VERSION = 1
+
+class StreamlineStore:
+    def __init__(self, points: np.ndarray, offsets: np.ndarray):
+        self.points = np.ascontiguousarray(points, dtype=np.float32).reshape(-1, 3)
+        self.offsets = np.asarray(offsets, dtype=np.int64)
+
+    # --- Construction ---
+
+    @classmethod
+    def from_lines(cls, lines):
+        """From a list of (n_i, 3) point sequences."""
+        arrays = [np.asarray(line, dtype=np.float32).reshape(-1, 3) for line in lines]
+        lengths = [len(a) for a in arrays]
+        offsets = np.concatenate([[0], np.cumsum(lengths, dtype=np.int64)])
+        points = np.concatenate(arrays) if arrays else np.zeros((0, 3), dtype=np.float32)
+        return cls(points, offsets)
+
+    @classmethod
+    def from_json(cls, path):
+        """Parses the Allen streamline JSON (points as {"x","y","z"} dicts or [x, y, z] lists)."""
+        with open(path) as f:
+            data = json.load(f)
+        lines = data["lines"] if isinstance(data, dict) else data
+        # Some exports wrap the fiber list in one more list
+        if len(lines) == 1 and lines[0] and not _is_point(lines[0][0]):
+            lines = lines[0]
+        parsed = []
+        for line in lines:
+            if line and isinstance(line[0], dict):
+                parsed.append([(p["x"], p["y"], p["z"]) for p in line])
+            else:
+                parsed.append(line)
+        return cls.from_lines(parsed)
+
+    @classmethod
+    def load(cls, path):
+        """Loads the .npz cache of a JSON file, (re)building it when missing or older than the JSON."""
+        path = Path(path)
+        if path.suffix == ".npz":
+            return cls._read_npz(path)
+        cache = cache_path_for(path)
+        if cache.exists() and cache.stat().st_mtime_ns >= path.stat().st_mtime_ns:
+            try:
+                return cls._read_npz(cache)
+            except Exception as e:
+                print(f"[STREAMLINES] Ignoring unreadable cache {cache.name}: {e}")
+        store = cls.from_json(path)
+        try:
+            store.save(cache)
+            print(f"[STREAMLINES] Cached {store.n_fibers} fibers ({store.n_points:,} points) in {cache.name}")
+        except OSError as e:
+            print(f"[STREAMLINES] Could not write cache: {e}")
+        return store
+
+    @classmethod
+    def _read_npz(cls, path):
+        with np.load(path) as npz:
+            if int(npz["version"]) != CACHE_VERSION:
+                raise ValueError(f"cache version {int(npz['version'])}")
+            return cls(npz["points"], npz["offsets"])
+
+    def save(self, path):
+        """Atomic write of the uncompressed .npz (loads with no parsing)."""
+        path = Path(path)
+        tmp = path.with_name(f".{path.stem}.tmp.npz")
+        np.savez(tmp, points=self.points, offsets=self.offsets, version=CACHE_VERSION)
+        tmp.replace(path)
+
+    # --- Queries ---
+
+    @property
+    def n_fibers(self) -> int:
+        return len(self.offsets) - 1
+
+    @property
+    def n_points(self) -> int:
+        return len(self.points)
+
+    @property
+    def lengths(self) -> np.ndarray:
+        """Points per fiber."""
+        return np.diff(self.offsets)
+
+    def fiber(self, i: int) -> np.ndarray:
+        return self.points[self.offsets[i]:self.offsets[i + 1]]
+
+    def fiber_index(self) -> np.ndarray:
+        """Fiber number of every point."""
+        return np.repeat(np.arange(self.n_fibers), self.lengths)
+
+    def select(self, fibers) -> "StreamlineStore":
+        """New store with the given fibers (indices or boolean mask), in that order."""
+        fibers = np.asarray(fibers)
+        if fibers.dtype == bool:
+            fibers = np.flatnonzero(fibers)
+        lengths = self.lengths[fibers]
+        offsets = np.concatenate([[0], np.cumsum(lengths, dtype=np.int64)])
+        # Gather all points in one go: start of each fiber + position within it
+        within = np.arange(offsets[-1]) - np.repeat(offsets[:-1], lengths)
+        return StreamlineStore(self.points[np.repeat(self.offsets[fibers], lengths) + within], offsets)
+
+    def subsample(self, fraction: float = None, max_points: int = None, seed: int = 0) -> "StreamlineStore":
+        """
+        Random subset of whole fibers: a fraction of them, and/or as many as fit in
+        max_points. The kept fibers stay in their original order.
+        """
+        order = np.random.default_rng(seed).permutation(self.n_fibers)
+        if fraction is not None:
+            order = order[:int(round(self.n_fibers * fraction))]
+        if max_points is not None:
+            order = order[np.cumsum(self.lengths[order]) <= max_points]
+        return self.select(np.sort(order))
+
+    def through_regions(self, annotation: np.ndarray, structure_ids, resolution=25.0, origin=(0, 0, 0)) -> np.ndarray:
+        """
+        Boolean mask of the fibers with at least one point in a voxel labelled with one of
+        structure_ids. Points are in the annotation's microns (same axis order); points
+        outside the volume count as unlabelled.
+        """
+        if self.n_points == 0:
+            return np.zeros(self.n_fibers, dtype=bool)
+        ijk = np.floor((self.points - np.asarray(origin, dtype=np.float32)) / np.asarray(resolution, dtype=np.float32)).astype(np.int64)
+        inside = np.all((ijk >= 0) & (ijk < annotation.shape), axis=1)
+        hit = np.zeros(self.n_points, dtype=bool)
+        labels = annotation[tuple(ijk[inside].T)]
+        hit[inside] = np.isin(labels, np.asarray(list(structure_ids)))
+        counts = np.bincount(self.fiber_index(), weights=hit, minlength=self.n_fibers)
+        return counts > 0
+
+    # --- Rendering ---
+
+    def to_polydata(self):
+        """One vtkPolyData with a polyline cell per fiber."""
+        import vtk
+        from vtk.util import numpy_support
+
+        poly = vtk.vtkPolyData()
+        vtk_points = vtk.vtkPoints()
+        vtk_points.SetData(numpy_support.numpy_to_vtk(self.points, deep=True))
+        poly.SetPoints(vtk_points)
+
+        lines = vtk.vtkCellArray()
+        lines.SetData(numpy_support.numpy_to_vtkIdTypeArray(self.offsets, deep=True),
+                      numpy_support.numpy_to_vtkIdTypeArray(np.arange(self.n_points, dtype=np.int64), deep=True))
+        poly.SetLines(lines)
+        return poly
+
+    def actor(self, radius: float = None, sides: int = 6):
+        """vedo Mesh of all fibers: polylines, or tubes of the given radius (one filter pass)."""
+        import vedo
+        import vtk
+
+        poly = self.to_polydata()
+        if radius:
+            tubes = vtk.vtkTubeFilter()
+            tubes.SetInputData(poly)
+            tubes.SetRadius(radius)
+            tubes.SetNumberOfSides(sides)
+            tubes.CappingOff()
+            tubes.Update()
+            return vedo.Mesh(tubes.GetOutput()).phong()
+        return vedo.Mesh(poly)
+
+def _is_point(item) -> bool:
+    return isinstance(item, dict) or (isinstance(item, (list, tuple)) and len(item) == 3
+                                      and not isinstance(item[0], (list, tuple, dict)))
+
+def cache_path_for(path) -> Path:
+    path = Path(path)
+    return path.with_suffix(".npz")
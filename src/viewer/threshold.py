@@ -0,0 +1,179 @@
+"""
+Threshold control for density volumes.
+
+VoxelHistogram sorts the nonzero voxel values once, so the number of voxels above any
+threshold is a binary search. ThresholdMeshes caches isosurfaces per slider step and
+computes them on a background thread, a 2x downsampled (coarse) surface first and
+then the full-resolution one, so a slider can show something immediately and refine.
+"""
+import functools
+import threading
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+import numpy as np
+
+from src.common.isosurface import DEFAULT_FRACTION, isosurface_arrays, to_mesh
+
+STEP = 0.005 # Slider resolution (fraction of max)
+MAX_FRACTION = 0.5
+COARSE_FACTOR = 2
+COARSE, FULL = 0, 1
+MAX_CACHE_BYTES = 512 << 20 # Cached isosurface arrays (LRU)
+
+def quantize(fraction: float, step: float = STEP) -> int:
+    """Slider step index of a threshold fraction (at least 1: 0 would contour the background)."""
+    return max(1, int(round(fraction / step)))
+
+def downsample(data: np.ndarray, factor: int = COARSE_FACTOR) -> np.ndarray:
+    """Block mean over factor^3 voxels (trailing voxels that do not fill a block are dropped)."""
+    if factor <= 1:
+        return data
+    nx, ny, nz = (n // factor for n in data.shape)
+    block = data[:nx * factor, :ny * factor, :nz * factor]
+    return block.reshape(nx, factor, ny, factor, nz, factor).mean(axis=(1, 3, 5), dtype=np.float32)
+
+class VoxelHistogram:
+    """Sorted nonzero voxel values of a volume: voxel counts above any threshold in O(log n)."""
+    def __init__(self, data: np.ndarray, spacing=(1.0, 1.0, 1.0)):
+        values = np.asarray(data).ravel()
+        self.values = np.sort(values[values > 0])
+        self.n_voxels = values.size
+        self.vmax = float(self.values[-1]) if len(self.values) else 0.0
+        self.voxel_volume = float(np.prod(spacing)) * 1e-9 # um^3 -> mm^3
+
+    @classmethod
+    def from_volume(cls, volume):
+        return cls(volume.tonumpy(), volume.spacing())
+
+    def count_above(self, threshold):
+        """Voxels strictly above threshold (scalar or array of thresholds)."""
+        return len(self.values) - np.searchsorted(self.values, threshold, side="right")
+
+    def threshold(self, fraction: float) -> float:
+        return self.vmax * fraction
+
+    def count_at(self, fraction):
+        return self.count_above(self.vmax * np.asarray(fraction))
+
+    def volume_at(self, fraction):
+        """Volume (mm^3) above the threshold fraction."""
+        return self.count_at(fraction) * self.voxel_volume
+
+    def fraction_for_count(self, n: int) -> float:
+        """Smallest threshold fraction leaving at most n voxels above it."""
+        if n >= len(self.values) or self.vmax == 0:
+            return 0.0
+        return float(self.values[len(self.values) - n - 1]) / self.vmax
+
+@functools.lru_cache(maxsize=4)
+def _load_histogram(path: str, mtime_ns: int) -> VoxelHistogram:
+    from vedo import Volume
+    print(f"[THRESHOLD] Building voxel histogram: {Path(path).name}")
+    return VoxelHistogram.from_volume(Volume(path))
+
+def load_histogram(path) -> VoxelHistogram:
+    """Histogram of a volume file, computed once per file version."""
+    path = Path(path)
+    return _load_histogram(str(path), path.stat().st_mtime_ns)
+
+class ThresholdMeshes:
+    """
+    Isosurfaces of one volume cached per (step, level). request() queues the coarse and
+    full surfaces of a step on a single background thread (dropping queued work for steps
+    the slider already left); poll() collects finished results on the caller's thread.
+    """
+    def __init__(self, data: np.ndarray, spacing, origin, step: float = STEP,
+                 coarse_factor: int = COARSE_FACTOR, max_bytes: int = MAX_CACHE_BYTES):
+        self.step = step
+        self.vmax = float(data.max()) if data.size else 0.0
+        spacing = np.asarray(spacing, dtype=np.float64)
+        origin = np.asarray(origin, dtype=np.float64)
+        coarse = downsample(data, coarse_factor)
+        # Block means sit at the center of their block
+        self.levels = {
+            COARSE: (coarse, spacing * coarse_factor, origin + spacing * (coarse_factor - 1) / 2),
+            FULL: (data, spacing, origin),
+        }
+        self.max_bytes = max_bytes
+        self.cache = OrderedDict()
+        self.pending = {}
+        self.wanted = None
+        self._lock = threading.Lock()
+        self._pool = ThreadPoolExecutor(max_workers=1, thread_name_prefix="threshold-mesh")
+
+    @classmethod
+    def from_volume(cls, volume, **kwargs):
+        return cls(volume.tonumpy(), volume.spacing(), volume.origin(), **kwargs)
+
+    def threshold(self, index: int) -> float:
+        return self.vmax * index * self.step
+
+    def _compute(self, key):
+        index, level = key
+        data = self.levels[level][0]
+        return isosurface_arrays(data, self.threshold(index), workers=1) # One pass: no process pool per slider step
+
+    def request(self, fraction: float) -> int:
+        """Makes the step of fraction the wanted one and queues whatever it still lacks."""
+        index = quantize(fraction, self.step)
+        with self._lock:
+            self.wanted = index
+            for key, future in list(self.pending.items()):
+                if key[0] != index and future.cancel():
+                    del self.pending[key]
+            for level in (COARSE, FULL):
+                key = (index, level)
+                if key not in self.cache and key not in self.pending:
+                    self.pending[key] = self._pool.submit(self._compute, key)
+        return index
+
+    def best(self, index: int):
+        """Highest cached level of a step, or None."""
+        for level in (FULL, COARSE):
+            if (index, level) in self.cache:
+                self.cache.move_to_end((index, level))
+                return level
+        return None
+
+    def poll(self):
+        """Moves finished surfaces into the cache; returns their (index, level) keys."""
+        done = []
+        with self._lock:
+            for key, future in list(self.pending.items()):
+                if future.done():
+                    del self.pending[key]
+                    if not future.cancelled() and future.exception() is None:
+                        self.cache[key] = future.result()
+                        done.append(key)
+                    elif not future.cancelled():
+                        print(f"[THRESHOLD] Isosurface failed at step {key[0]}: {future.exception()}")
+            self._evict()
+        return done
+
+    def _evict(self):
+        def nbytes(piece):
+            return sum(a.nbytes for a in piece)
+        total = sum(nbytes(p) for p in self.cache.values())
+        while total > self.max_bytes and len(self.cache) > 1:
+            _, piece = self.cache.popitem(last=False)
+            total -= nbytes(piece)
+
+    def wait(self, timeout=None):
+        """Blocks until the queued work is done (scripts and tests)."""
+        for future in list(self.pending.values()):
+            try:
+                future.result(timeout)
+            except Exception:
+                pass
+        return self.poll()
+
+    def mesh(self, index: int, level: int):
+        """vedo Mesh of a cached step, in world coordinates."""
+        points, faces, normals = self.cache[(index, level)]
+        _, spacing, origin = self.levels[level]
+        return to_mesh(points, faces, normals, self.threshold(index), spacing, origin, (0.0, self.vmax))
+
+    def shutdown(self):
+        self._pool.shutdown(wait=False, cancel_futures=True)
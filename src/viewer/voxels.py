@@ -0,0 +1,120 @@
+"""
+Voxel ("Lego") geometry for dense voxel sets.
+
+All cubes become one polydata: only the faces between an occupied and an empty cell
+are emitted (internal faces are never generated), cube corners are shared, and each
+face carries its voxel's value as cell scalar. A compact blob of 10^6 voxels is then a
+few hundred thousand quads instead of 6 * 10^6. Sets above the voxel cap are coarsened
+on the grid (k^3 blocks become one bigger voxel holding their max), which keeps the
+Lego look without the holes random thinning would leave.
+"""
+import numpy as np
+
+DEFAULT_MAX_VOXELS = 1_000_000
+
+def to_grid(coords: np.ndarray, voxel_size):
+    """Integer cell indices of voxel centers (N, 3) and the world position of cell 0."""
+    voxel_size = np.broadcast_to(np.asarray(voxel_size, dtype=np.float64), (3,))
+    coords = np.asarray(coords, dtype=np.float64)
+    origin = coords.min(axis=0) if len(coords) else np.zeros(3)
+    ijk = np.rint((coords - origin) / voxel_size).astype(np.int64)
+    return ijk, origin, voxel_size
+
+def coarsen(ijk: np.ndarray, values: np.ndarray, factor: int):
+    """Merges factor^3 blocks of cells into one cell holding the block max."""
+    if factor <= 1:
+        return ijk, values
+    blocks = ijk // factor
+    lo = blocks.min(axis=0)
+    dims = blocks.max(axis=0) - lo + 1
+    keys = np.ravel_multi_index((blocks - lo).T, dims)
+    order = np.argsort(keys, kind="stable")
+    keys, sorted_values = keys[order], values[order]
+    starts = np.flatnonzero(np.r_[True, keys[1:] != keys[:-1]])
+    merged = np.maximum.reduceat(sorted_values, starts)
+    cells = np.stack(np.unravel_index(keys[starts], dims), axis=1) + lo
+    return cells, merged
+
+def cap_voxels(ijk: np.ndarray, values: np.ndarray, max_voxels: int = DEFAULT_MAX_VOXELS):
+    """Smallest integer coarsening factor that brings the set under max_voxels."""
+    factor = 1
+    while max_voxels and len(ijk) > max_voxels:
+        factor += 1
+        cells, merged = coarsen(ijk, values, factor)
+        if len(cells) <= max_voxels:
+            return cells, merged, factor
+    return ijk, values, factor
+
+def exposed_faces(ijk: np.ndarray, values: np.ndarray):
+    """
+    Corner lattice points (P, 3), quads (F, 4) and per-quad values of the cube faces
+    that touch empty space. Quads are wound counter-clockwise seen from outside.
+    """
+    if len(ijk) == 0:
+        return np.zeros((0, 3), dtype=np.int64), np.zeros((0, 4), dtype=np.int64), values[:0]
+    lo = ijk.min(axis=0)
+    ijk = ijk - lo + 1 # One empty cell of padding on every side
+    shape = tuple(ijk.max(axis=0) + 2)
+    occupied = np.zeros(shape, dtype=bool)
+    occupied[ijk[:, 0], ijk[:, 1], ijk[:, 2]] = True
+
+    eye = np.eye(3, dtype=np.int64)
+    corners, face_values = [], []
+    for axis in range(3):
+        u, v = eye[(axis + 1) % 3], eye[(axis + 2) % 3]
+        for sign in (1, -1):
+            nb = ijk + sign * eye[axis]
+            open_side = ~occupied[nb[:, 0], nb[:, 1], nb[:, 2]]
+            base = ijk[open_side] + (eye[axis] if sign > 0 else 0)
+            # base, +u, +u+v, +v has normal u x v = +axis; reversed for the -axis side
+            quad = (base, base + u, base + u + v, base + v) if sign > 0 else (base, base + v, base + u + v, base + u)
+            corners.append(np.stack(quad, axis=1))
+            face_values.append(values[open_side])
+
+    corners = np.concatenate(corners) # (F, 4, 3)
+    # Share cube corners: one lattice point per distinct (i, j, k)
+    dims = np.asarray(shape, dtype=np.int64) + 1
+    keys = np.ravel_multi_index(corners.reshape(-1, 3).T, dims)
+    unique_keys, inverse = np.unique(keys, return_inverse=True)
+    points = np.stack(np.unravel_index(unique_keys, dims), axis=1) - 1 + lo
+    return points, inverse.reshape(-1, 4), np.concatenate(face_values)
+
+def to_quad_polydata(points: np.ndarray, quads: np.ndarray, values: np.ndarray, name: str = "value"):
+    """vtkPolyData of quads with one scalar per cell, built from numpy buffers."""
+    import vtk
+    from vtk.util import numpy_support
+
+    poly = vtk.vtkPolyData()
+    vtk_points = vtk.vtkPoints()
+    vtk_points.SetData(numpy_support.numpy_to_vtk(np.ascontiguousarray(points, dtype=np.float32), deep=True))
+    poly.SetPoints(vtk_points)
+
+    cells = vtk.vtkCellArray()
+    offsets = np.arange(0, 4 * len(quads) + 1, 4, dtype=np.int64)
+    cells.SetData(numpy_support.numpy_to_vtkIdTypeArray(offsets, deep=True),
+                  numpy_support.numpy_to_vtkIdTypeArray(np.ascontiguousarray(quads.ravel(), dtype=np.int64), deep=True))
+    poly.SetPolys(cells)
+
+    scalars = numpy_support.numpy_to_vtk(np.ascontiguousarray(values, dtype=np.float32), deep=True)
+    scalars.SetName(name)
+    poly.GetCellData().SetScalars(scalars)
+    return poly
+
+def voxel_mesh(coords: np.ndarray, values: np.ndarray, voxel_size=25.0, max_voxels: int = DEFAULT_MAX_VOXELS):
+    """
+    One vedo Mesh of cubes centered on coords (N, 3, world units) with the "value" cell
+    scalar. Returns (mesh, factor): factor > 1 means the set was coarsened to fit max_voxels.
+    """
+    import vedo
+
+    values = np.asarray(values)
+    ijk, origin, size = to_grid(coords, voxel_size)
+    ijk, values, factor = cap_voxels(ijk, values, max_voxels)
+    points, quads, face_values = exposed_faces(ijk, values)
+
+    block = size * factor
+    # Coarse cell c spans fine cells c*factor .. c*factor+factor-1; corners sit half a fine voxel outside
+    world = points * block + origin - size / 2
+    mesh = vedo.Mesh(to_quad_polydata(world, quads, face_values), c=None).flat()
+    mesh.metadata["voxel_factor"] = factor
+    return mesh, factor
@@ -0,0 +1,68 @@
+import pytest
+import sys
+from pathlib import Path
+import numpy as np
+import pandas as pd
+
+# Add src to path
+sys.path.append(str(Path(__file__).resolve().parent.parent.parent))
+
+from src.analysis.bootstrap import bootstrap, bootstrap_table, resample_counts, _nan_percentiles
+
+def make_matrix(seed=1, regions=30, experiments=8):
+    rng = np.random.default_rng(seed)
+    return rng.gamma(2.0, 0.1, size=(regions, experiments))
+
+def test_counts_match_a_loop_over_resamples():
+    X = make_matrix()
+    counts = resample_counts(np.random.default_rng(3), X.shape[1], 50)
+    assert counts.shape == (50, 8) and (counts.sum(axis=1) == 8).all()
+
+    rng = np.random.default_rng(3) # Same draws, one resample at a time
+    idx = rng.integers(0, 8, size=(50, 8))
+    for b in range(50):
+        sample = X[:, idx[b]]
+        assert np.allclose(X @ counts[b] / 8, sample.mean(axis=1))
+
+    values = np.array([[1.0, np.nan, 3.0, 2.0], [np.nan] * 4])
+    assert np.allclose(_nan_percentiles(values, [0, 50, 100])[:, 0], np.nanpercentile(values[0], [0, 50, 100]))
+    assert np.isnan(_nan_percentiles(values, [50])[0, 1])
+
+def test_reproducible_and_independent_of_workers():
+    X = make_matrix()
+    a = bootstrap(X, n_boot=600, seed=7, workers=1, block_size=128)
+    b = bootstrap(X, n_boot=600, seed=7, workers=3, block_size=128)
+    c = bootstrap(X, n_boot=600, seed=8, workers=1, block_size=128)
+    for name in ("mean", "std", "cv"):
+        assert np.array_equal(a[name][1], b[name][1]) and np.array_equal(a[name][2], b[name][2])
+    assert not np.array_equal(a["mean"][1], c["mean"][1])
+
+def test_estimates_and_intervals():
+    X = make_matrix()
+    result = bootstrap(X, n_boot=1000, seed=0)
+    mean, low, high = result["mean"]
+    assert np.allclose(mean, X.mean(axis=1))
+    assert np.allclose(result["std"][0], X.std(axis=1, ddof=1))
+    assert np.allclose(result["cv"][0], X.std(axis=1, ddof=1) / X.mean(axis=1))
+    assert (low <= mean).all() and (mean <= high).all() and (low < high).all()
+    narrow = bootstrap(X, n_boot=1000, seed=0, ci=50)["mean"]
+    assert (narrow[1] >= low).all() and (narrow[2] <= high).all()
+
+def test_table_with_missing_experiments():
+    rows = []
+    for exp in range(5):
+        rows.append({"experiment_id": exp, "acronym": "MOp", "hemisphere_id": 3, "is_injection": False,
+                     "projection_density": 0.1 * (exp + 1)})
+        rows.append({"experiment_id": exp, "acronym": "SSp", "hemisphere_id": 3, "is_injection": exp == 0,
+                     "projection_density": 0.5}) # Injection row of experiment 0 left out
+        rows.append({"experiment_id": exp, "acronym": "MOp", "hemisphere_id": 1, "is_injection": False,
+                     "projection_density": 9.0}) # Other hemisphere left out
+    rows.append({"experiment_id": 0, "acronym": "TH", "hemisphere_id": 3, "is_injection": False,
+                 "projection_density": 0.2})
+    table = bootstrap_table(pd.DataFrame(rows), n_boot=200, seed=0)
+
+    assert table["n_experiments"].to_dict() == {"MOp": 5, "SSp": 4, "TH": 1}
+    assert table.loc["MOp", "mean"] == pytest.approx(0.3)
+    assert table.loc["SSp", "std"] == 0 and table.loc["SSp", "mean_low"] == pytest.approx(0.5)
+    assert table.loc["TH", "mean"] == pytest.approx(0.2)
+    assert np.isnan(table.loc["TH", "mean_low"]) and np.isnan(table.loc["TH", "std"])
@@ -0,0 +1,55 @@
+import pytest
+import sys
+from pathlib import Path
+import numpy as np
+import pandas as pd
+from scipy.spatial.distance import pdist
+
+# Add src to path
+sys.path.append(str(Path(__file__).resolve().parent.parent.parent))
+
+from src.analysis.clustering import add_cluster_column, cluster_matrix, cluster_regions, pairwise_distances
+
+@pytest.mark.parametrize("metric", ["correlation", "cosine", "euclidean"])
+def test_blocked_distances_match_pdist(metric):
+    X = np.random.default_rng(0).random((37, 6))
+    # 8 rows per block: several blocks, the last one partial
+    assert np.allclose(pairwise_distances(X, metric, block_bytes=8 * 8 * 37), pdist(X, metric))
+
+def test_clusters_follow_leaf_order():
+    rng = np.random.default_rng(1)
+    base = rng.random((3, 10))
+    order = rng.permutation(12)
+    X = np.vstack([base[i] + rng.normal(scale=0.01, size=(4, 10)) for i in range(3)])[order]
+    source = np.repeat([0, 1, 2], 4)[order]
+
+    labels, leaves, Z = cluster_matrix(X, n_clusters=3)
+    assert sorted(leaves) == list(range(12)) and len(Z) == 11
+    assert labels[leaves].tolist() == sorted(labels.tolist()) # Numbered top to bottom of the ordering
+    groups = {tuple(np.flatnonzero(labels == c)) for c in (1, 2, 3)}
+    truth = {tuple(np.flatnonzero(source == i)) for i in range(3)}
+    assert groups == truth
+
+    threshold_labels, _, _ = cluster_matrix(X, threshold=0.5)
+    assert threshold_labels.max() == 3
+    with pytest.raises(ValueError):
+        cluster_matrix(X, n_clusters=2, metric="cosine", method="ward")
+
+def test_regions_table_and_viewer_column(tmp_path):
+    profiles = {"MOp": [1, 2, 3, 4], "MOs": [2, 4, 6, 8], "TH": [4, 3, 2, 1], "LGd": [8, 6, 4, 2], "CA1": [0, 0, 0, 0]}
+    df = pd.DataFrame([{"experiment_id": e, "acronym": a, "hemisphere_id": 3, "is_injection": False,
+                        "projection_density": v / 10} for a, values in profiles.items() for e, v in enumerate(values)])
+    clusters = cluster_regions(df, n_clusters=2)
+
+    assert "CA1" not in clusters.index # Mean 0: left out
+    assert clusters["leaf_order"].tolist() == [0, 1, 2, 3]
+    assert clusters.loc["MOp", "cluster"] == clusters.loc["MOs", "cluster"] != clusters.loc["TH", "cluster"]
+    assert clusters.loc["TH", "cluster"] == clusters.loc["LGd", "cluster"]
+    assert clusters.loc["MOs", "mean"] == pytest.approx(0.5) and (clusters["n_experiments"] == 4).all()
+
+    viewer_csv = tmp_path / "DR.csv"
+    viewer_csv.write_text("acronym,value,is_seed\nDR,0.9,True\nMOp,0.1,False\nTH,0.3,False\n")
+    add_cluster_column(viewer_csv, clusters)
+    written = pd.read_csv(viewer_csv)
+    assert written["cluster"].isna().tolist() == [True, False, False]
+    assert written.loc[1, "cluster"] == clusters.loc["MOp", "cluster"]
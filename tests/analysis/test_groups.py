@@ -0,0 +1,91 @@
+import pytest
+import sys
+import itertools
+from pathlib import Path
+import numpy as np
+import pandas as pd
+
+# Add src to path
+sys.path.append(str(Path(__file__).resolve().parent.parent.parent))
+
+from src.analysis.groups import compare_groups, compare_paired, fdr_bh, group_table
+
+def welch(a, b):
+    return (a.mean() - b.mean()) / np.sqrt(a.var(ddof=1) / len(a) + b.var(ddof=1) / len(b))
+
+def test_fdr_bh():
+    p = np.array([0.01, 0.04, np.nan, 0.03, 0.5])
+    q = fdr_bh(p)
+    assert np.allclose(q[[0, 1, 3, 4]], [0.04, 0.16 / 3, 0.16 / 3, 0.5])
+    assert np.isnan(q[2])
+
+def test_exact_permutations_match_a_loop():
+    rng = np.random.default_rng(0)
+    X = rng.normal(size=(5, 7))
+    X[0, :3] += 3.0 # Group A clearly higher in the first region
+    X[4, 6] = np.nan
+    labels = np.arange(7) < 3
+    result = compare_groups(X, labels, n_perm=1000)
+    assert result["exact"]
+
+    for r in range(4): # Complete rows: brute force over the 35 relabellings
+        observed = welch(X[r, labels], X[r, ~labels])
+        assert result["t"][r] == pytest.approx(observed)
+        stats = [welch(X[r, list(c)], X[r, [i for i in range(7) if i not in c]])
+                 for c in itertools.combinations(range(7), 3)]
+        assert result["p_value"][r] == pytest.approx(np.mean(np.abs(stats) >= abs(observed) - 1e-12))
+    assert result["p_value"][0] == pytest.approx(1 / 35) # Only the observed labelling
+    assert result["n_a"][4] == 3 and result["n_b"][4] == 3
+    a, b = X[0, :3], X[0, 3:]
+    pooled = np.sqrt((2 * a.var(ddof=1) + 3 * b.var(ddof=1)) / 5)
+    assert result["effect_size"][0] == pytest.approx((a.mean() - b.mean()) / pooled * (1 - 3 / 19))
+
+def test_sampled_permutations_are_seeded():
+    rng = np.random.default_rng(1)
+    X = rng.normal(size=(40, 30))
+    X[:5, :15] += 2.0
+    labels = np.arange(30) < 15
+    a = compare_groups(X, labels, n_perm=2000, seed=3, workers=1, block_size=300)
+    b = compare_groups(X, labels, n_perm=2000, seed=3, workers=4, block_size=300)
+    assert not a["exact"]
+    assert np.array_equal(a["p_value"], b["p_value"])
+    assert (a["p_value"][:5] < 0.01).all() and np.median(a["p_value"][5:]) > 0.1
+    assert a["p_value"].min() >= 1 / 2001 # Observed labelling counted once
+
+def test_paired_sign_flips():
+    rng = np.random.default_rng(2)
+    A = rng.normal(size=(3, 6))
+    B = A - np.array([[1.0], [0.0], [0.1]]) + rng.normal(scale=0.1, size=(3, 6))
+    result = compare_paired(A, B)
+    assert result["exact"]
+    d = A - B
+    for r in range(3):
+        t = lambda x: x.mean() / (x.std(ddof=1) / np.sqrt(len(x)))
+        flips = [t(d[r] * np.array(s)) for s in itertools.product([1, -1], repeat=6)]
+        assert result["p_value"][r] == pytest.approx(np.mean(np.abs(flips) >= abs(t(d[r])) - 1e-12))
+    assert result["p_value"][0] == pytest.approx(2 / 64)
+
+def test_ranked_table_from_analysis_rows():
+    rows = []
+    genders = ["M", "M", "M", "F", "F", "F"]
+    noise = [0.03, 0.01, 0.02, 0.02, 0.03, 0.01] # Same values in both groups
+    for exp, gender in enumerate(genders):
+        for acronym, value in (("MOp", 1.0 if gender == "M" else 0.2), ("SSp", 0.5), ("TH", 0.1 * exp)):
+            for hemi, lat, scale in ((3, "Midline", 1.0), (2, "Ipsilateral", 1.5), (1, "Contralateral", 0.5)):
+                rows.append({"experiment_id": 100 + exp, "acronym": acronym, "hemisphere_id": hemi,
+                             "lateralization": lat, "is_injection": False, "gender": gender,
+                             "strain": "C57BL/6J", "projection_density": value * scale + noise[exp]})
+    df = pd.DataFrame(rows)
+
+    table = group_table(df, by="gender", groups=["M", "F"], n_perm=100)
+    assert table.index[0] == "MOp" and table["rank"].tolist() == [1, 2, 3]
+    assert table.loc["MOp", "group_a"] == "M" and table.loc["MOp", "difference"] > 0
+    assert table.loc["MOp", "p_value"] == pytest.approx(1 / 10) # Exact: 20 relabellings, 2 as extreme
+    assert table.loc["SSp", "p_value"] > 0.5
+    assert table["q_value"].tolist() == sorted(table["q_value"])
+
+    paired = group_table(df, by="hemisphere")
+    assert (paired["group_a"] == "Ipsilateral").all() and (paired.loc["MOp", "difference"] > 0)
+    assert paired.loc["SSp", "p_value"] == pytest.approx(2 / 64)
+    with pytest.raises(ValueError):
+        group_table(df, by="strain")
@@ -0,0 +1,87 @@
+import pytest
+import os
+import sys
+from pathlib import Path
+import numpy as np
+import pandas as pd
+
+# Add src to path
+sys.path.append(str(Path(__file__).resolve().parent.parent.parent))
+
+from src.analysis.similarity import (LSHIndex, SimilarityIndex, cache_path_for, exact_search,
+                                     load_similarity_index, normalize)
+
+def analysis_rows(experiments):
+    """Full-analysis rows of {experiment_id: {acronym: projection_density}}."""
+    return pd.DataFrame([{"experiment_id": exp, "acronym": acronym, "hemisphere_id": 3, "is_injection": False,
+                          "projection_density": value}
+                         for exp, profile in experiments.items() for acronym, value in profile.items()])
+
+TABLES = {
+    "DR": analysis_rows({1: {"MOp": 1.0, "TH": 0.2}, 2: {"MOp": 1.0, "TH": 0.3}}),
+    "VISp": analysis_rows({3: {"VISl": 1.0, "LGd": 0.5}, 4: {"VISl": 1.0, "LGd": 0.9},
+                           5: {"VISl": 0.1, "LGd": 0.1, "MOp": 1.0}}), # 5 projects like DR
+}
+
+def test_normalize_and_exact_search():
+    rng = np.random.default_rng(0)
+    X = rng.normal(size=(50, 12))
+    corr = normalize(X, "correlation")
+    assert corr[0] @ corr[1] == pytest.approx(np.corrcoef(X[0], X[1])[0, 1], abs=1e-5)
+    assert not normalize(np.zeros((1, 3))).any()
+
+    V = normalize(X)
+    queries = V[:3]
+    idx, scores = exact_search(queries, V, k=5, exclude=[0, 7], block_rows=8)
+    brute = queries @ V.T
+    brute[:, [0, 7]] = -np.inf
+    assert np.array_equal(idx, np.argsort(-brute, axis=1)[:, :5])
+    assert np.allclose(scores, np.sort(brute, axis=1)[:, ::-1][:, :5])
+
+def test_neighbors_by_experiment_and_seed():
+    index = SimilarityIndex.from_tables(TABLES)
+    assert len(index) == 5 and sorted(index.acronyms) == ["LGd", "MOp", "TH", "VISl"]
+
+    result = index.neighbors(3, k=2)
+    assert result["experiment_id"].tolist() == [4, 5]
+    assert result["similarity"].is_monotonic_decreasing and 3 not in result["experiment_id"].tolist()
+    assert index.query("1", k=1)["experiment_id"].tolist() == [2] # Digits: experiment ID
+
+    by_seed = index.query("DR", k=3)
+    assert set(by_seed["seed"]) == {"VISp"} # Own experiments left out
+    assert by_seed["experiment_id"].iloc[0] == 5 # The VISp experiment projecting to MOp
+    with pytest.raises(KeyError):
+        index.query(999)
+    with pytest.raises(KeyError):
+        index.query("CA1")
+
+def test_lsh_finds_the_exact_neighbors_of_clusters():
+    rng = np.random.default_rng(1)
+    centers = rng.normal(size=(20, 64))
+    X = np.repeat(centers, 50, axis=0) + rng.normal(scale=0.05, size=(1000, 64))
+    V = normalize(X)
+    lsh = LSHIndex(V, n_tables=6, n_bits=12)
+    idx, scores = lsh.search(V[:10], k=5, exclude=[0])
+    exact_idx, exact_scores = exact_search(V[:10], V, k=5, exclude=[0])
+    assert 0 not in idx[0]
+    recall = np.mean([len(set(a) & set(b)) / 5 for a, b in zip(idx, exact_idx)])
+    assert recall >= 0.9
+    assert np.allclose(np.nan_to_num(scores), np.nan_to_num(exact_scores), atol=0.05)
+
+    index = SimilarityIndex(V, np.arange(1000), ["S"] * 1000, [f"R{i}" for i in range(64)])
+    assert (index.neighbors(0, k=5, method="lsh")["similarity"] > 0.9).all()
+
+def test_cache_is_rebuilt_when_analysis_files_change(tmp_path):
+    for seed, df in TABLES.items():
+        df.to_csv(tmp_path / f"{seed}_full_analysis.csv", index=False)
+    built = load_similarity_index(tmp_path, similarity="correlation")
+    path = cache_path_for("projection_density", "correlation", tmp_path)
+    assert path.exists() and len(built) == 5 and built.similarity == "correlation"
+
+    cached = load_similarity_index(tmp_path, similarity="correlation")
+    assert np.array_equal(cached.vectors, built.vectors) and cached.seeds.tolist() == built.seeds.tolist()
+
+    TABLES["DR"].iloc[:2].to_csv(tmp_path / "DR_full_analysis.csv", index=False) # Experiment 2 removed
+    stat = (tmp_path / "DR_full_analysis.csv").stat()
+    os.utime(tmp_path / "DR_full_analysis.csv", ns=(stat.st_atime_ns, stat.st_mtime_ns + 10**9))
+    assert len(load_similarity_index(tmp_path, similarity="correlation")) == 4
@@ -0,0 +1,86 @@
+import pytest
+import sys
+from pathlib import Path
+import numpy as np
+
+# Add src to path
+sys.path.append(str(Path(__file__).resolve().parent.parent.parent))
+
+vedo = pytest.importorskip("vedo")
+
+from src.common.isosurface import SeamMismatch, _slab_piece, isosurface_arrays, parallel_isosurface, slab_bounds, stitch
+
+def blobs(shape=(40, 30, 50)):
+    x, y, z = np.ogrid[tuple(slice(0, n) for n in shape)]
+    big = np.exp(-((x - 20) ** 2 + (y - 15) ** 2 + (z - 25) ** 2) / 120.0)
+    small = 0.4 * np.exp(-((x - 6) ** 2 + (y - 6) ** 2 + (z - 42) ** 2) / 15.0)
+    return (big + small).astype(np.float32)
+
+def steps(shape=(30, 24, 40), seed=0):
+    """Non-smooth volume with a few levels: the isovalue hits voxel values exactly, so
+    several edge vertices coincide on grid points (distinct vertices in a single pass)."""
+    return np.random.default_rng(seed).integers(0, 4, size=shape).astype(np.float32)
+
+def same_triangles(a, b, tol=1e-3):
+    """Every triangle of one mesh has a twin in the other (up to float32 rounding), whatever the corner order."""
+    from scipy.spatial import cKDTree
+
+    # Symmetric in the corners: centroid and mean squared coordinates
+    sig_a, sig_b = ([tri.mean(axis=1), (tri ** 2).mean(axis=1)] for tri in (a[0][a[1]], b[0][b[1]]))
+    sig_a, sig_b = np.hstack(sig_a), np.hstack(sig_b)
+    return (cKDTree(sig_b).query(sig_a)[0].max() < tol) and (cKDTree(sig_a).query(sig_b)[0].max() < tol)
+
+def test_slab_bounds_share_planes():
+    bounds = slab_bounds(50, 4)
+    assert bounds[0][0] == 0 and bounds[-1][1] == 49
+    assert all(a[1] == b[0] for a, b in zip(bounds, bounds[1:]))
+    assert slab_bounds(3, 10) == [(0, 1), (1, 2)]
+
+@pytest.mark.parametrize("data,value", [(blobs(), 0.2), (steps(), 2.0)], ids=["smooth", "steps"])
+@pytest.mark.parametrize("workers,n_slabs", [(1, 2), (1, 5), (1, 13), (2, 3)])
+def test_slabs_match_single_pass(data, value, workers, n_slabs):
+    ref = isosurface_arrays(data, value, workers=1, n_slabs=1)
+    points, faces, normals = isosurface_arrays(data, value, workers=workers, n_slabs=n_slabs)
+
+    # Same vertices (coincident ones are not merged) and the same triangles
+    assert len(points) == len(ref[0])
+    assert len(faces) == len(ref[1])
+    assert same_triangles((points, faces), ref)
+    assert len(normals) == len(points)
+
+def test_matches_vedo_on_non_smooth_data():
+    vol = vedo.Volume(steps(), spacing=(25, 20, 30), origin=(100, 0, -50))
+    ref = vol.isosurface(value=2.0, flying_edges=True)
+    for n_slabs in (1, 3, 7):
+        mesh = parallel_isosurface(vol, 2.0, workers=1, n_slabs=n_slabs)
+        assert (mesh.npoints, mesh.ncells) == (ref.npoints, ref.ncells)
+        assert np.allclose(mesh.bounds(), ref.bounds(), atol=1e-3)
+
+def test_mesh_is_watertight_and_aligned():
+    vol = vedo.Volume(blobs(), spacing=(25, 20, 30), origin=(100, 0, -50))
+    mesh = parallel_isosurface(vol, 0.2, workers=1, n_slabs=4)
+    ref = vol.isosurface(value=0.2, flying_edges=True)
+
+    assert mesh.is_closed()
+    assert mesh.ncells == ref.ncells
+    assert mesh.area() == pytest.approx(ref.area(), rel=1e-4)
+    assert np.allclose(mesh.bounds(), ref.bounds(), atol=1e-3)
+    assert mesh.metadata["isovalue"][0] == 0.2
+
+def test_one_worker_is_vedo_single_pass():
+    vol = vedo.Volume(steps())
+    mesh = parallel_isosurface(vol, 2.0, workers=1)
+    ref = vol.isosurface(value=2.0, flying_edges=True)
+    assert (mesh.npoints, mesh.ncells) == (ref.npoints, ref.ncells)
+
+def test_mismatched_seam_is_detected():
+    block = np.asfortranarray(steps())
+    lower, upper = _slab_piece(block, 0, 20, 2.0), _slab_piece(block, 20, 39, 2.0)
+    stitch([lower, upper])
+    broken = (*lower[:3], lower[3][1:], lower[4])
+    with pytest.raises(SeamMismatch):
+        stitch([broken, upper])
+
+def test_empty_volume():
+    vol = vedo.Volume(np.zeros((10, 10, 10), dtype=np.float32))
+    assert parallel_isosurface(vol, 0.5, workers=1, n_slabs=3).npoints == 0
@@ -0,0 +1,73 @@
+import pytest
+import sys
+from pathlib import Path
+import numpy as np
+import pandas as pd
+
+# Add src to path
+sys.path.append(str(Path(__file__).resolve().parent.parent.parent))
+
+from src.common.ontology import Ontology
+
+# root -> CTX -> MO -> (MOp, MOs); CTX -> SS; root -> TH
+STRUCTURES = [
+    {"id": 997, "acronym": "root", "name": "root", "structure_id_path": [997]},
+    {"id": 1, "acronym": "CTX", "name": "Cortex", "structure_id_path": [997, 1]},
+    {"id": 2, "acronym": "MO", "name": "Motor", "structure_id_path": [997, 1, 2]},
+    {"id": 3, "acronym": "MOp", "name": "Primary motor", "structure_id_path": [997, 1, 2, 3]},
+    {"id": 4, "acronym": "MOs", "name": "Secondary motor", "structure_id_path": "/997/1/2/4/"}, # allensdk style
+    {"id": 5, "acronym": "SS", "name": "Somatosensory", "structure_id_path": [997, 1, 5]},
+    {"id": 6, "acronym": "TH", "name": "Thalamus", "structure_id_path": [997, 6]},
+]
+
+@pytest.fixture
+def ontology():
+    return Ontology.from_structures(STRUCTURES)
+
+def test_tree_arrays(ontology, tmp_path):
+    depth = dict(zip(ontology.acronyms, ontology.depth))
+    assert depth == {"CTX": 1, "MO": 2, "MOp": 3, "MOs": 3, "SS": 2, "TH": 1, "root": 0}
+    assert sorted(ontology.acronyms[ontology.subtree("MO")]) == ["MO", "MOp", "MOs"]
+    assert ontology.rows(["MOs", "nope", "TH"]).tolist()[1] == -1
+    assert ontology.rows([4]).tolist() == ontology.rows(["MOs"]).tolist()
+
+    path = tmp_path / "structures.csv"
+    ontology.save_csv(path)
+    loaded = Ontology.from_csv(path)
+    assert loaded.acronyms.tolist() == ontology.acronyms.tolist()
+    assert loaded.parent.tolist() == ontology.parent.tolist()
+
+def test_roll_up_to_every_ancestor(ontology):
+    table = pd.DataFrame({"acronym": ["MOp", "MOs", "SS", "TH", "XX"], "value": [1.0, 3.0, 2.0, 5.0, 9.0],
+                          "volume": [1.0, 3.0, 4.0, 1.0, 1.0]})
+    result = ontology.roll_up(table, weight="volume")
+
+    assert result.loc["MO", "sum"] == 4.0 and result.loc["MO", "max"] == 3.0 and result.loc["MO", "n"] == 2
+    assert result.loc["MO", "mean"] == pytest.approx((1 * 1 + 3 * 3) / 4) # Volume-weighted
+    assert result.loc["CTX", "sum"] == 6.0 and result.loc["CTX", "n"] == 3
+    assert result.loc["root", "sum"] == 11.0 and result.loc["root", "max"] == 5.0 # Unknown XX skipped
+    assert result.loc["TH", "mean"] == 5.0
+    assert ontology.roll_up(table).loc["MO", "mean"] == 2.0 # Unweighted
+
+def test_parents_in_the_table_are_not_double_counted(ontology):
+    # Unionize-style table: MO already covers MOp and MOs
+    table = pd.DataFrame({"acronym": ["MO", "MOp", "MOs", "SS"], "value": [4.0, 1.0, 3.0, 2.0]})
+    result = ontology.roll_up(table)
+    assert result.loc["MO", "sum"] == 4.0 and result.loc["MO", "n"] == 1
+    assert result.loc["CTX", "sum"] == 6.0
+    assert result.loc["MOp", "sum"] == 1.0
+
+def test_cuts_and_groups(ontology):
+    table = pd.DataFrame({"experiment_id": [7, 7, 8], "acronym": ["MOp", "SS", "MOs"], "value": [1.0, 2.0, 3.0]})
+
+    by_depth = ontology.roll_up(table, depth=2, by="experiment_id")
+    assert list(zip(by_depth["experiment_id"], by_depth.index, by_depth["sum"])) == [
+        (7, "MO", 1.0), (7, "SS", 2.0), (8, "MO", 3.0)]
+
+    areas = ontology.roll_up(table, areas=["MO", "CTX"])
+    assert areas["sum"].to_dict() == {"CTX": 6.0, "MO": 4.0}
+
+    assert ontology.cut(["MOp", "SS", "TH", "root", "nope"], depth=2).tolist() == ["MO", "SS", None, None, None]
+    assert ontology.cut(["MOp", "SS", "TH"], areas=["CTX", "MO"]).tolist() == ["MO", "CTX", None] # Most specific
+    with pytest.raises(ValueError):
+        ontology.cut(["MOp"])
@@ -0,0 +1,85 @@
+import pytest
+import threading
+import sys
+from pathlib import Path
+
+# Add src to path
+sys.path.append(str(Path(__file__).resolve().parent.parent.parent))
+
+from src.common.pipeline import BUILT, FAILED, SKIPPED, STALE, UP_TO_DATE, Node, Pipeline, PipelineError
+
+def make_chain(tmp_path, calls, params=None, raw_text="raw"):
+    """raw -> mesh, where mesh copies raw. Returns the pipeline."""
+    raw, mesh = tmp_path / "raw.txt", tmp_path / "mesh.txt"
+
+    def build_raw():
+        calls.append("raw")
+        raw.write_text(raw_text)
+
+    def build_mesh():
+        calls.append("mesh")
+        mesh.write_text(raw.read_text().upper())
+
+    pipeline = Pipeline(tmp_path / "state.json")
+    pipeline.add(Node("raw", build_raw, [raw], params=params or {}))
+    pipeline.add(Node("mesh", build_mesh, [mesh], deps=["raw"]))
+    return pipeline
+
+def test_second_run_is_up_to_date(tmp_path):
+    calls = []
+    assert make_chain(tmp_path, calls).run() == {"raw": BUILT, "mesh": BUILT}
+    assert make_chain(tmp_path, calls).run() == {"raw": UP_TO_DATE, "mesh": UP_TO_DATE}
+    assert calls == ["raw", "mesh"]
+
+def test_param_change_rebuilds_downstream(tmp_path):
+    calls = []
+    make_chain(tmp_path, calls, params={"threshold": 0.05}).run()
+    status = make_chain(tmp_path, calls, params={"threshold": 0.1}, raw_text="new").run()
+    assert status == {"raw": BUILT, "mesh": BUILT}
+
+def test_identical_rebuild_cuts_off_downstream(tmp_path):
+    calls = []
+    make_chain(tmp_path, calls, params={"a": 1}).run()
+    # Param changes but raw comes out byte-identical: mesh stays current
+    status = make_chain(tmp_path, calls, params={"a": 2}).run()
+    assert status == {"raw": BUILT, "mesh": UP_TO_DATE}
+
+def test_external_modification_is_detected(tmp_path):
+    calls = []
+    make_chain(tmp_path, calls).run()
+    (tmp_path / "mesh.txt").write_text("overwritten by a manual run")
+
+    pipeline = make_chain(tmp_path, calls)
+    assert pipeline.plan() == {"raw": UP_TO_DATE, "mesh": STALE}
+    assert pipeline.run() == {"raw": UP_TO_DATE, "mesh": BUILT}
+    assert (tmp_path / "mesh.txt").read_text() == "RAW"
+
+def test_failure_skips_dependents(tmp_path):
+    def boom():
+        raise RuntimeError("download failed")
+
+    pipeline = Pipeline(tmp_path / "state.json")
+    pipeline.add(Node("fetch", boom, [tmp_path / "a"]))
+    pipeline.add(Node("mesh", lambda: None, [tmp_path / "b"], deps=["fetch"]))
+    assert pipeline.run() == {"fetch": FAILED, "mesh": SKIPPED}
+
+def test_independent_nodes_run_in_parallel(tmp_path):
+    barrier = threading.Barrier(2, timeout=5) # Deadlocks (BrokenBarrierError) if run one at a time
+
+    def branch(name):
+        def fn():
+            barrier.wait()
+            (tmp_path / name).write_text(name)
+        return fn
+
+    pipeline = Pipeline(tmp_path / "state.json", max_workers=2)
+    pipeline.add(Node("left", branch("left"), [tmp_path / "left"]))
+    pipeline.add(Node("right", branch("right"), [tmp_path / "right"]))
+    assert pipeline.run() == {"left": BUILT, "right": BUILT}
+
+def test_targets_and_unknown_deps(tmp_path):
+    calls = []
+    pipeline = make_chain(tmp_path, calls)
+    assert pipeline.run(["raw"]) == {"raw": BUILT}
+    with pytest.raises(PipelineError):
+        pipeline.add(Node("render", lambda: None, [], deps=["missing"]))
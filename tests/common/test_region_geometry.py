@@ -0,0 +1,72 @@
+import pytest
+import sys
+from pathlib import Path
+from types import SimpleNamespace
+import numpy as np
+
+# Add src to path
+sys.path.append(str(Path(__file__).resolve().parent.parent.parent))
+
+from src.common.region_geometry import RegionGeometry, cache_path_for, load_region_geometry
+
+# root (997) -> MOp (500) -> MOp5 (648); root -> SSp (322)
+STRUCTURES = {
+    997: {"id": 997, "acronym": "root", "structure_id_path": [997]},
+    500: {"id": 500, "acronym": "MOp", "structure_id_path": [997, 500]},
+    648: {"id": 648, "acronym": "MOp5", "structure_id_path": [997, 500, 648]},
+    322: {"id": 322, "acronym": "SSp", "structure_id_path": [997, 322]},
+}
+
+def make_annotation():
+    annotation = np.zeros((6, 4, 5), dtype=np.uint32)
+    annotation[0:2, 0:2, 0:2] = 500  # 8 voxels
+    annotation[2, 1, 1] = 648        # 1 voxel
+    annotation[4:6, 3, 2:5] = 322    # 6 voxels
+    annotation[5, 0, 0] = 12345      # Not in the ontology: ignored
+    return annotation
+
+def test_counts_centroids_and_boxes_roll_up():
+    geometry = RegionGeometry.build(make_annotation(), STRUCTURES, (10, 10, 20), slab_planes=4)
+
+    assert geometry.get("MOp5")["voxel_count"] == 1
+    mop = geometry.get(500)
+    assert mop["voxel_count"] == 9 and geometry.own_voxels[geometry.row("MOp")] == 8
+    assert mop["volume_mm3"] == pytest.approx(9 * 2000 / 1e9)
+    # Voxel centers: (index + 0.5) * resolution, MOp5 included
+    expected = (np.array([[i, j, k] for i in range(2) for j in range(2) for k in range(2)] + [[2, 1, 1]]) + 0.5).mean(axis=0) * [10, 10, 20]
+    assert np.allclose(mop["centroid"], expected)
+    assert mop["bounds"] == [0, 30, 0, 20, 0, 40]
+    assert geometry.slices("SSp") == (slice(4, 6), slice(3, 4), slice(2, 5))
+
+    assert geometry.get("root")["voxel_count"] == 15
+    assert geometry.bounds("root") == [0, 60, 0, 40, 0, 100]
+
+def test_mask_and_subtree():
+    annotation = make_annotation()
+    geometry = RegionGeometry.build(annotation, STRUCTURES, (25, 25, 25))
+
+    assert sorted(geometry.subtree_ids("MOp")) == [500, 648]
+    assert sorted(geometry.subtree_ids("root")) == [322, 500, 648, 997]
+    mask = geometry.mask(annotation, ["MOp", "unknown"])
+    assert np.array_equal(mask, np.isin(annotation, [500, 648]))
+    assert geometry.mask(annotation, ["root"]).sum() == 15
+
+def test_empty_structure():
+    structures = {**STRUCTURES, 1: {"id": 1, "acronym": "VISp", "structure_id_path": [997, 1]}}
+    geometry = RegionGeometry.build(make_annotation(), structures, (25, 25, 25))
+    assert geometry.get("VISp")["voxel_count"] == 0
+    assert geometry.center("VISp") is None and geometry.bounds("VISp") is None
+    assert not geometry.mask(make_annotation(), ["VISp"]).any()
+
+def test_cache_is_reused_and_rebuilt_on_mismatch(tmp_path):
+    atlas = SimpleNamespace(annotation=make_annotation(), structures=STRUCTURES, resolution=(25, 25, 25))
+    built = load_region_geometry(atlas, "test_atlas", cache_dir=tmp_path)
+    path = cache_path_for("test_atlas", tmp_path)
+    assert path.exists()
+
+    cached = load_region_geometry(atlas, "test_atlas", cache_dir=tmp_path)
+    assert np.array_equal(cached.voxel_count, built.voxel_count)
+    assert list(cached.acronyms) == list(built.acronyms)
+
+    atlas.annotation = np.zeros((3, 3, 3), dtype=np.uint32) # Different atlas volume
+    assert load_region_geometry(atlas, "test_atlas", cache_dir=tmp_path).shape == (3, 3, 3)
@@ -0,0 +1,100 @@
+import pytest
+import os
+import sys
+from pathlib import Path
+
+# Add src to path
+sys.path.append(str(Path(__file__).resolve().parent.parent.parent))
+
+from src.common.tract_catalog import TractCatalog, parse_artifact_name
+from src.viewer import logic
+
+def touch(path: Path, content=b"data", mtime=None):
+    path.write_bytes(content)
+    if mtime is not None:
+        os.utime(path, (mtime, mtime))
+    return path
+
+def test_parse_artifact_name():
+    assert parse_artifact_name("123_density.nrrd") == {"experiment_id": 123, "metric": "density", "kind": "raw"}
+    assert parse_artifact_name("123.nrrd") == {"experiment_id": 123, "metric": "density", "kind": "raw"}
+    assert parse_artifact_name("123_energy_fixed.vtk")["kind"] == "fixed"
+    assert parse_artifact_name("filtered_density.vtk") == {"experiment_id": None, "metric": "density", "kind": "filtered"}
+    assert parse_artifact_name("123_streamlines.json")["kind"] == "streamlines"
+    assert parse_artifact_name("catalog.sqlite") is None
+
+def test_register_and_lookup(tmp_path):
+    catalog = TractCatalog(tmp_path)
+    nrrd = touch(tmp_path / "100_density.nrrd")
+    row = catalog.register(nrrd, 100, "density", "raw", shape=(456, 320, 528), spacing=(25, 25, 25))
+
+    assert len(row["sha256"]) == 64
+    assert catalog.lookup(100, "density", "raw") == nrrd
+    assert catalog.lookup(100, "energy", "raw") is None
+    assert catalog.get("100_density.nrrd")["shape"] == [456, 320, 528]
+
+def test_lookup_prefers_canonical_name(tmp_path):
+    catalog = TractCatalog(tmp_path)
+    canonical = touch(tmp_path / "100_density.nrrd", mtime=1000)
+    legacy = touch(tmp_path / "100.nrrd", mtime=2000)
+    catalog.sync()
+
+    assert catalog.lookup(100, "density", "raw") == canonical
+    canonical.unlink()
+    assert catalog.lookup(100, "density", "raw") == legacy
+    assert catalog.get("100_density.nrrd") is None # Dropped on lookup
+
+def test_sync_tracks_folder(tmp_path):
+    catalog = TractCatalog(tmp_path)
+    touch(tmp_path / "1_density.nrrd")
+    touch(tmp_path / "notes.txt")
+
+    assert catalog.sync() == {"added": ["1_density.nrrd"], "updated": [], "removed": []}
+    assert catalog.sync() == {"added": [], "updated": [], "removed": []}
+
+    (tmp_path / "1_density.nrrd").unlink()
+    assert catalog.sync()["removed"] == ["1_density.nrrd"]
+    assert len(catalog) == 0
+
+def test_sync_keeps_producer_metadata(tmp_path):
+    catalog = TractCatalog(tmp_path)
+    mesh = touch(tmp_path / "filtered_density.vtk", mtime=1000)
+    catalog.register(mesh, 42, "density", "filtered")
+
+    touch(mesh, b"new mesh", mtime=2000)
+    assert catalog.sync()["updated"] == ["filtered_density.vtk"]
+    assert catalog.get("filtered_density.vtk")["experiment_id"] == 42
+
+def test_resolve_filtered_ignores_other_experiment(tmp_path):
+    catalog = TractCatalog(tmp_path)
+    mesh = touch(tmp_path / "filtered_density.vtk")
+    catalog.register(mesh, 42, "density", "filtered")
+
+    assert logic.resolve_tract_file(tmp_path, 42, "Density (Filtered)", catalog=catalog) == mesh
+    assert logic.resolve_tract_file(tmp_path, 7, "Density (Filtered)", catalog=catalog) is None
+
+def test_resolve_raw_prefers_fixed(tmp_path):
+    catalog = TractCatalog(tmp_path)
+    touch(tmp_path / "5_density.nrrd")
+    fixed = touch(tmp_path / "5_density_fixed.vtk")
+    catalog.sync()
+
+    assert logic.resolve_tract_file(tmp_path, 5, "Density (Raw)", catalog=catalog) == fixed
+
+def test_resolve_raw_skips_fixed_mesh_at_another_threshold(tmp_path):
+    raw = touch(tmp_path / "5_density.nrrd")
+    fixed = touch(tmp_path / "5_density_fixed.vtk")
+    catalog = TractCatalog(tmp_path)
+    catalog.sync()
+
+    # Unstamped fixed meshes were built at the fix_volume_metadata default (5%)
+    for cat in (catalog, None):
+        assert logic.resolve_tract_file(tmp_path, 5, "Density (Raw)", catalog=cat, threshold_fraction=0.05) == fixed
+        assert logic.resolve_tract_file(tmp_path, 5, "Density (Raw)", catalog=cat, threshold_fraction=0.2) == raw
+
+    (tmp_path / logic.FIX_STAMPS_NAME).write_text('{"5_density.nrrd": {"params": {"spacing": [10, 10, 10], "threshold": 0.2}}}')
+    assert logic.fixed_mesh_params(fixed) == {"spacing": [10, 10, 10], "threshold": 0.2}
+    assert logic.resolve_tract_file(tmp_path, 5, "Density (Raw)", catalog=catalog, threshold_fraction=0.2) == fixed
+
+    raw.unlink() # Without the raw volume, a mesh at another threshold beats nothing
+    assert logic.resolve_tract_file(tmp_path, 5, "Density (Raw)", threshold_fraction=0.05) == fixed
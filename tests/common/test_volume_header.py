@@ -0,0 +1,75 @@
+import pytest
+import gzip
+import zlib
+import sys
+from pathlib import Path
+import numpy as np
+
+# Add src to path
+sys.path.append(str(Path(__file__).resolve().parent.parent.parent))
+
+from src.common.volume_header import VolumeHeaderError, read_volume_array, read_volume_header, scalar_range
+
+# z, y, x in C order -> x is the fastest axis, as NRRD 'sizes: 4 3 2' expects
+DATA = np.arange(24, dtype=np.float32).reshape(2, 3, 4) - 5.0
+
+def write_nrrd(path, encoding="raw", payload=None, extra=""):
+    payload = payload if payload is not None else DATA.tobytes()
+    if encoding == "gzip":
+        payload = gzip.compress(payload)
+    header = (
+        "NRRD0004\n# Complete NRRD file format specification at:\n"
+        "type: float\ndimension: 3\nspace: left-posterior-superior\nsizes: 4 3 2\n"
+        "space directions: (25,0,0) (0,25,0) (0,0,50)\nendian: little\n"
+        f"encoding: {encoding}\nspace origin: (10,20,30)\n{extra}\n"
+    )
+    path.write_bytes(header.encode() + payload)
+    return path
+
+def test_nrrd_geometry_from_header(tmp_path):
+    header = read_volume_header(write_nrrd(tmp_path / "1_density.nrrd"))
+
+    assert header.sizes == (4, 3, 2)
+    assert header.spacing == (25.0, 25.0, 50.0)
+    assert header.origin == (10.0, 20.0, 30.0)
+    assert header.bounds == (10.0, 85.0, 20.0, 70.0, 30.0, 80.0)
+    assert header.dtype == np.dtype("<f4")
+
+def test_header_does_not_need_payload(tmp_path):
+    # Truncated payload: geometry is still readable, voxel statistics are not
+    header = read_volume_header(write_nrrd(tmp_path / "big.nrrd", payload=b"\x00" * 8))
+    assert header.n_voxels == 24
+    with pytest.raises(ValueError):
+        scalar_range(header)
+
+@pytest.mark.parametrize("encoding", ["raw", "gzip"])
+def test_nrrd_scalar_range(tmp_path, encoding):
+    header = read_volume_header(write_nrrd(tmp_path / "v.nrrd", encoding=encoding))
+    assert scalar_range(header) == (-5.0, 18.0)
+
+@pytest.mark.parametrize("encoding", ["raw", "gzip"])
+def test_read_volume_array_is_xyz(tmp_path, encoding):
+    header = read_volume_header(write_nrrd(tmp_path / "v.nrrd", encoding=encoding))
+    data = read_volume_array(header)
+    assert data.shape == (4, 3, 2)
+    assert np.array_equal(data, DATA.transpose(2, 1, 0))
+    assert isinstance(data.base, np.memmap) == (encoding == "raw")
+
+def test_mhd_detached_zlib(tmp_path):
+    (tmp_path / "v.zraw").write_bytes(zlib.compress(DATA.astype(">i2").tobytes()))
+    (tmp_path / "v.mhd").write_text(
+        "ObjectType = Image\nNDims = 3\nBinaryDataByteOrderMSB = True\nCompressedData = True\n"
+        "Offset = 1 2 3\nElementSpacing = 25 25 25\nDimSize = 4 3 2\nElementType = MET_SHORT\n"
+        "ElementDataFile = v.zraw\n"
+    )
+    header = read_volume_header(tmp_path / "v.mhd")
+
+    assert header.sizes == (4, 3, 2)
+    assert header.origin == (1.0, 2.0, 3.0)
+    assert header.encoding == "zlib"
+    assert scalar_range(header) == (-5.0, 18.0)
+
+def test_unsupported_format(tmp_path):
+    (tmp_path / "v.tif").write_bytes(b"II*\x00")
+    with pytest.raises(VolumeHeaderError):
+        read_volume_header(tmp_path / "v.tif")
@@ -0,0 +1,126 @@
+import pytest
+import sys
+import threading
+import time
+from pathlib import Path
+import numpy as np
+
+# Add src to path
+sys.path.append(str(Path(__file__).resolve().parent.parent.parent))
+
+from src.miner import gene_miner
+
+# root -> CTX -> (MOp, SSp); root -> TH
+STRUCTURES = [
+    {"id": 997, "acronym": "root", "structure_id_path": [997]},
+    {"id": 1, "acronym": "CTX", "structure_id_path": [997, 1]},
+    {"id": 2, "acronym": "MOp", "structure_id_path": [997, 1, 2]},
+    {"id": 3, "acronym": "SSp", "structure_id_path": [997, 1, 3]},
+    {"id": 4, "acronym": "TH", "structure_id_path": [997, 4]},
+]
+GRID = (4, 3, 2) # Expression grid (AP, DV, ML) at 200 um
+
+def make_annotation():
+    """100 um annotation of the grid (8 x 6 x 4): AP planes 0-1 MOp, 2 SSp, 3 TH."""
+    annotation = np.zeros((8, 6, 4), dtype=np.uint32)
+    annotation[0:4] = 2
+    annotation[4:6] = 3
+    annotation[6:8] = 4
+    annotation[:, 4:6, :] = 0 # Bottom DV row of the grid outside the brain
+    return annotation
+
+class FakeGeneApi:
+    """Local stand-in for the Allen API: data sets, expression grids and the annotation."""
+    def __init__(self, volumes, datasets=None, delay=0.0):
+        self.volumes = volumes # gene -> grid
+        self.datasets = datasets or {gene: [{"id": 100 + i, "plane": "coronal"}]
+                                     for i, gene in enumerate(volumes)}
+        self.delay = delay
+        self.downloads = []
+        self.in_flight = 0
+        self.max_in_flight = 0
+        self.lock = threading.Lock()
+
+    def find_datasets(self, gene):
+        return self.datasets.get(gene, [])
+
+    def download_grid(self, dataset_id, volume_type):
+        with self.lock:
+            self.in_flight += 1
+            self.max_in_flight = max(self.max_in_flight, self.in_flight)
+            self.downloads.append(dataset_id)
+        time.sleep(self.delay)
+        with self.lock:
+            self.in_flight -= 1
+        gene = next(g for g, sets in self.datasets.items() if any(d["id"] == dataset_id for d in sets))
+        if gene == "Broken":
+            raise IOError("connection reset")
+        return self.volumes[gene], (200.0, 200.0, 200.0)
+
+    def annotation(self):
+        return make_annotation(), 100.0, STRUCTURES
+
+def gene_volume(mop, ssp, th):
+    volume = np.empty(GRID, dtype=np.float32)
+    volume[0:2], volume[2], volume[3] = mop, ssp, th
+    volume[:, 2, :] = 99.0 # Outside the brain: never counted
+    return volume
+
+def test_nrrd_round_trip_and_dataset_choice(tmp_path):
+    volume = np.random.default_rng(0).random(GRID).astype(np.float32)
+    for encoding in ("gzip", "raw"):
+        path = tmp_path / f"v_{encoding}.nrrd"
+        gene_miner.write_nrrd(path, volume, (200, 200, 200), encoding=encoding)
+        assert np.array_equal(gene_miner.read_gene_volume(path), volume)
+
+    datasets = [{"id": 5, "plane": "sagittal"}, {"id": 3, "plane": "coronal"}, {"id": 4, "plane": "coronal"}]
+    assert gene_miner.choose_dataset(datasets, "coronal")["id"] == 4
+    assert gene_miner.choose_dataset(datasets[:1], "coronal")["id"] == 5
+    assert gene_miner.choose_dataset([], "coronal") is None
+
+def test_sample_annotation_on_the_grid():
+    grid = gene_miner.sample_annotation(make_annotation(), 100.0, (5, 3, 2), (200, 200, 200))
+    assert grid[:, 0, 0].tolist() == [2, 2, 3, 4, 0] # AP plane 4 is past the annotation
+    assert (grid[:, 2, :] == 0).all()
+
+def test_fetch_is_concurrent_cached_and_reports_failures(tmp_path):
+    volumes = {f"G{i}": gene_volume(i, 0, 0) for i in range(6)}
+    volumes["Broken"] = gene_volume(0, 0, 0)
+    api = FakeGeneApi(volumes, delay=0.05)
+    records = gene_miner.fetch_genes(api, list(volumes) + ["Nope", "G0"], workers=4, out_dir=tmp_path)
+
+    assert [r["gene"] for r in records] == list(volumes) + ["Nope"] # Duplicates dropped, order kept
+    status = {r["gene"]: r["status"] for r in records}
+    assert status["G3"] == "ok" and status["Broken"] == "error" and status["Nope"] == "missing"
+    assert api.max_in_flight > 1
+    assert (tmp_path / "g3" / "G3_energy.nrrd").exists() and (tmp_path / "g3" / "G3_energy.json").exists()
+
+    again = gene_miner.fetch_genes(api, ["G3"], out_dir=tmp_path)
+    assert again[0]["status"] == "cached" and again[0]["dataset_id"] == 103
+    assert api.downloads.count(103) == 1
+
+def test_gene_by_structure_matrix(tmp_path):
+    volumes = {"Tph2": gene_volume(1.0, 3.0, 10.0), "Slc6a4": gene_volume(2.0, -1.0, 4.0)} # -1: no data in SSp
+    api = FakeGeneApi(volumes)
+    records, matrix = gene_miner.mine_genes(api, ["Tph2", "Slc6a4"], out_dir=tmp_path)
+    assert [r["status"] for r in records] == ["ok", "ok"]
+    frame = matrix.to_frame()
+
+    assert frame.loc["Tph2", "MOp"] == 1.0 and frame.loc["Tph2", "SSp"] == 3.0 and frame.loc["Tph2", "TH"] == 10.0
+    # Parents average their whole subtree, voxel-weighted: CTX = 8 MOp voxels + 4 SSp voxels
+    assert frame.loc["Tph2", "CTX"] == pytest.approx((8 * 1.0 + 4 * 3.0) / 12)
+    assert np.isnan(frame.loc["Slc6a4", "SSp"])
+    assert frame.loc["Slc6a4", "CTX"] == 2.0 # Only MOp has data
+    assert frame.loc["Slc6a4", "root"] == pytest.approx((8 * 2.0 + 4 * 4.0) / 12)
+    voxels = dict(zip(matrix.acronyms, matrix.voxels[0]))
+    assert voxels["root"] == 16 and voxels["MOp"] == 8 # On the 200 um grid
+
+    loaded = gene_miner.ExpressionMatrix.load(gene_miner.matrix_path("energy", tmp_path))
+    assert loaded.genes.tolist() == ["Tph2", "Slc6a4"]
+    assert np.array_equal(loaded.mean, matrix.mean, equal_nan=True)
+
+    # Genes reduced in several blocks give the same matrix
+    grid = gene_miner.sample_annotation(make_annotation(), 100.0, GRID)
+    ontology = gene_miner.Ontology.from_structures(STRUCTURES)
+    blocked = gene_miner.expression_matrix(volumes, grid, ontology, gene_block=1)
+    assert np.array_equal(blocked.mean, matrix.mean, equal_nan=True)
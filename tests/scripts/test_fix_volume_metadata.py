@@ -0,0 +1,106 @@
+import pytest
+import json
+import os
+import sys
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+# Add src to path
+sys.path.append(str(Path(__file__).resolve().parent.parent.parent))
+
+from scripts import fix_volume_metadata as fvm
+
+DEFAULTS = {"spacing": [25.0, 25.0, 25.0], "threshold": fvm.DEFAULT_THRESHOLD}
+
+def make_file(path, content=b"volume", mtime=None):
+    path.write_bytes(content)
+    if mtime is not None:
+        os.utime(path, ns=(mtime, mtime))
+    return path
+
+def test_collect_inputs_expands_dirs_and_globs(tmp_path):
+    a = make_file(tmp_path / "a.nrrd")
+    b = make_file(tmp_path / "b.mhd")
+    make_file(tmp_path / "notes.txt")
+    sub = tmp_path / "sub"
+    sub.mkdir()
+    c = make_file(sub / "c.nrrd")
+
+    assert fvm.collect_inputs([str(tmp_path)]) == [a.resolve(), b.resolve()]
+    assert fvm.collect_inputs([str(sub / "*.nrrd")]) == [c.resolve()]
+    # Duplicates are dropped, first occurrence kept
+    assert fvm.collect_inputs([str(c), str(tmp_path / "*.nrrd"), str(a)]) == [c.resolve(), a.resolve()]
+    assert fvm.collect_inputs([str(tmp_path / "missing*.nrrd")]) == []
+
+def test_is_up_to_date(tmp_path):
+    path = make_file(tmp_path / "1_density.nrrd", mtime=1_000_000_000)
+    params = dict(DEFAULTS)
+    assert not fvm.is_up_to_date(path, params, {}, default_params=DEFAULTS) # No output yet
+
+    output = make_file(fvm.output_path_for(path), b"mesh", mtime=2_000_000_000)
+    # Unstamped output from an older run: current if newer than the input and built with the defaults
+    assert fvm.is_up_to_date(path, params, {}, default_params=DEFAULTS)
+    assert not fvm.is_up_to_date(path, {**params, "threshold": 0.1}, {}, default_params=DEFAULTS)
+    os.utime(output, ns=(500_000_000, 500_000_000))
+    assert not fvm.is_up_to_date(path, params, {}, default_params=DEFAULTS)
+
+    stamps = {path.name: fvm.input_stamp(path, params, use_hash=True)}
+    assert fvm.is_up_to_date(path, params, stamps)
+    assert not fvm.is_up_to_date(path, {**params, "threshold": 0.1}, stamps)
+
+    os.utime(path, ns=(3_000_000_000, 3_000_000_000)) # Touched, same content
+    assert not fvm.is_up_to_date(path, params, stamps)
+    assert fvm.is_up_to_date(path, params, stamps, use_hash=True)
+
+    make_file(path, b"new volume") # Changed content
+    assert not fvm.is_up_to_date(path, params, stamps, use_hash=True)
+
+def test_plan_workers_fits_memory_budget(tmp_path, monkeypatch):
+    paths = [make_file(tmp_path / f"{i}.nrrd") for i in range(4)]
+    monkeypatch.setattr(fvm, "estimate_job_memory", lambda p: 1000)
+
+    assert fvm.plan_workers([], max_workers=8, memory_budget=10**9) == 0
+    assert fvm.plan_workers(paths, max_workers=8, memory_budget=10**9) == 4 # One per file
+    assert fvm.plan_workers(paths, max_workers=3, memory_budget=10**9) == 3
+    assert fvm.plan_workers(paths, max_workers=8, memory_budget=2500) == 2
+    assert fvm.plan_workers(paths, max_workers=8, memory_budget=10) == 1 # Always at least one
+
+def test_run_batch_skips_current_outputs(tmp_path, monkeypatch, capsys):
+    calls = []
+
+    def fake_fix_volume(path, target_spacing, threshold_fraction, stats):
+        calls.append(Path(path).name)
+        if Path(path).name.startswith("bad"):
+            stats["error"] = "unreadable"
+            return None
+        output = fvm.output_path_for(path)
+        output.write_text("mesh")
+        stats["triangles"] = 12
+        return output
+
+    monkeypatch.setattr(fvm, "fix_volume", fake_fix_volume)
+    monkeypatch.setattr(fvm, "ProcessPoolExecutor", ThreadPoolExecutor) # The stub is not visible to child processes
+    monkeypatch.setattr(fvm, "estimate_job_memory", lambda p: 1)
+    for name in ("1_density.nrrd", "2_density.nrrd", "bad.nrrd"):
+        make_file(tmp_path / name)
+    summary_path = tmp_path / "summary.json"
+
+    summary = fvm.run_batch([str(tmp_path)], workers=2, summary_path=summary_path)
+    assert summary["counts"] == {"fixed": 2, "up-to-date": 0, "failed": 1}
+    assert [r["file"] for r in summary["files"]] == ["1_density.nrrd", "2_density.nrrd", "bad.nrrd"]
+    assert summary["files"][0]["triangles"] == 12
+    assert json.loads(summary_path.read_text())["counts"] == summary["counts"]
+    stamps = json.loads((tmp_path / fvm.STAMPS_NAME).read_text())
+    assert sorted(stamps) == ["1_density.nrrd", "2_density.nrrd"] # Failures are not stamped
+
+    calls.clear()
+    summary = fvm.run_batch([str(tmp_path)], workers=2)
+    assert calls == ["bad.nrrd"]
+    assert summary["counts"] == {"fixed": 0, "up-to-date": 2, "failed": 1}
+    assert "2 up to date, 1 to fix" in capsys.readouterr().out
+
+    calls.clear()
+    summary = fvm.run_batch([str(tmp_path / "1_*.nrrd")], threshold_fraction=0.2, workers=2) # New params: rebuilt
+    assert calls == ["1_density.nrrd"]
+    assert summary["params"]["threshold"] == 0.2
+    assert fvm.run_batch([str(tmp_path / "1_*.nrrd")], threshold_fraction=0.2)["counts"]["up-to-date"] == 1
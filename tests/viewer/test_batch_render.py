@@ -0,0 +1,76 @@
+import pytest
+import json
+from unittest.mock import MagicMock, patch
+import sys
+from pathlib import Path
+
+# Add src to path
+sys.path.append(str(Path(__file__).resolve().parent.parent.parent))
+
+from src.common.tract_catalog import TractCatalog
+from src.viewer import batch_render
+
+CSV_CONTENT = "acronym,value,is_seed,tract_experiment_id\nDR,0.9,True,480074702\nMOp,0.02,False,480074702\nVISp,0.01,False,480074702\n"
+
+def test_plan_jobs(tmp_path):
+    csv_file = tmp_path / "DR_connectivity.csv"
+    csv_file.write_text(CSV_CONTENT)
+
+    jobs = batch_render.plan_jobs([csv_file], views=["top", "side"], output_dir=tmp_path / "out")
+
+    assert len(jobs) == 2
+    assert jobs[0].tract_id == 480074702
+    assert Path(jobs[0].output_path).name == "DR_connectivity_top.png"
+    assert Path(jobs[1].output_path).name == "DR_connectivity_side.png"
+
+def test_plan_jobs_without_tract_id(tmp_path):
+    csv_file = tmp_path / "manual.csv"
+    csv_file.write_text("acronym,value\nMOp,0.5\n")
+
+    jobs = batch_render.plan_jobs([csv_file], views=["front"], output_dir=tmp_path)
+    assert jobs[0].tract_id is None
+
+def test_plan_jobs_invalid_view(tmp_path):
+    csv_file = tmp_path / "manual.csv"
+    csv_file.write_text("acronym,value\nMOp,0.5\n")
+
+    with pytest.raises(ValueError, match="Unknown view"):
+        batch_render.plan_jobs([csv_file], views=["diagonal"], output_dir=tmp_path)
+
+def test_run_job_writes_metadata(tmp_path):
+    csv_file = tmp_path / "DR_connectivity.csv"
+    csv_file.write_text(CSV_CONTENT)
+    job = batch_render.plan_jobs([csv_file], views=["top"], viz_mode="None", output_dir=tmp_path / "out")[0]
+
+    mock_engine = MagicMock()
+    with patch.object(batch_render, "_ENGINE", mock_engine):
+        record = batch_render._run_job(job, alpha=0.8, tracts_dir=tmp_path)
+
+    assert record["status"] == "ok"
+    mock_engine.render_to_file.assert_called_once()
+    assert mock_engine.render_to_file.call_args.kwargs["view"] == "top"
+
+    metadata = json.loads((tmp_path / "out" / "DR_connectivity_top.json").read_text())
+    assert metadata["experiment_seed"] == "DR"
+    assert metadata["targets_rendered"] == ["MOp", "VISp"]
+    assert metadata["tract_file_used"] == "None"
+
+def test_run_job_resolves_through_catalog(tmp_path):
+    csv_file = tmp_path / "DR_connectivity.csv"
+    csv_file.write_text(CSV_CONTENT)
+    job = batch_render.plan_jobs([csv_file], views=["top"], viz_mode="Density (Filtered)", output_dir=tmp_path / "out")[0]
+    tracts_dir = tmp_path / "tracts"
+    tracts_dir.mkdir()
+    other = tracts_dir / "filtered_density.vtk"
+    other.write_text("mesh")
+    catalog = TractCatalog(tracts_dir)
+    catalog.register(other, experiment_id=111, compute_hash=False) # Filtered from another experiment
+
+    mock_engine = MagicMock()
+    with patch.object(batch_render, "_ENGINE", mock_engine), patch.object(batch_render, "_CATALOG", catalog):
+        record = batch_render._run_job(job, alpha=0.8, tracts_dir=tracts_dir, threshold_fraction=0.1)
+
+    assert record["status"] == "ok"
+    kwargs = mock_engine.render_to_file.call_args.kwargs
+    assert kwargs["tract_file"] is None # Not the global filtered mesh
+    assert kwargs["threshold_fraction"] == 0.1
@@ -0,0 +1,66 @@
+import pytest
+import os
+from unittest.mock import patch
+import sys
+from pathlib import Path
+
+# Add src to path
+sys.path.append(str(Path(__file__).resolve().parent.parent.parent))
+
+from src.viewer.data_manager import DataManager
+
+CSV_CONTENT = "acronym,value,is_seed,tract_experiment_id\nDR,0.9,True,480074702\nMOp,0.02,False,480074702\n"
+
+def test_load_single_read_and_cache(tmp_path):
+    csv_file = tmp_path / "DR.csv"
+    csv_file.write_text(CSV_CONTENT)
+    manager = DataManager(tmp_path)
+
+    with patch("src.viewer.data_manager.pd.read_csv", wraps=__import__("pandas").read_csv) as mock_read:
+        first = manager.load(csv_file)
+        second = manager.load(csv_file)
+
+    assert mock_read.call_count == 1
+    assert first is second
+    assert first.tract_id == 480074702
+    assert first.regions[0]["acronym"] == "DR"
+    assert (first.v_min, first.v_max) == (0.02, 0.02)
+
+def test_load_invalidated_by_mtime(tmp_path):
+    csv_file = tmp_path / "DR.csv"
+    csv_file.write_text(CSV_CONTENT)
+    manager = DataManager(tmp_path)
+    first = manager.load(csv_file)
+
+    csv_file.write_text("acronym,value\nVISp,0.5\n")
+    os.utime(csv_file, ns=(first.mtime_ns + 10**9, first.mtime_ns + 10**9))
+
+    second = manager.load(csv_file)
+    assert second is not first
+    assert second.tract_id is None
+    assert [r["acronym"] for r in second.regions] == ["VISp"]
+
+def test_load_bad_file(tmp_path):
+    bad = tmp_path / "bad.csv"
+    bad.write_text("foo,bar\n1,2\n")
+    manager = DataManager(tmp_path)
+
+    assert manager.load(bad) is None
+    assert manager.load(tmp_path / "missing.csv") is None
+
+def test_scan_reports_changes(tmp_path):
+    manager = DataManager(tmp_path, poll_interval=0)
+    (tmp_path / "a.csv").write_text(CSV_CONTENT)
+    (tmp_path / "notes.txt").write_text("ignored")
+
+    changes = manager.scan()
+    assert changes.added == ["a.csv"]
+    assert manager.files == ["a.csv"]
+    assert manager.poll() is None # Nothing changed
+
+    (tmp_path / "b.csv").write_text(CSV_CONTENT)
+    (tmp_path / "a.csv").unlink()
+    changes = manager.poll()
+    assert changes.added == ["b.csv"]
+    assert changes.removed == ["a.csv"]
+    assert manager.files == ["b.csv"]
@@ -0,0 +1,99 @@
+import pytest
+import threading
+import time
+import sys
+from pathlib import Path
+
+# Add src to path
+sys.path.append(str(Path(__file__).resolve().parent.parent.parent))
+
+from src.common.cancellation import Cancelled
+from src.viewer.jobs import JobCancelled, JobManager
+
+def poll_until(manager, predicate, timeout=5.0):
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        manager.poll()
+        if predicate():
+            return True
+        time.sleep(0.01)
+    return False
+
+@pytest.fixture
+def manager():
+    m = JobManager(max_workers=2)
+    yield m
+    m.shutdown()
+
+def test_result_and_progress_delivered(manager):
+    results, progress = [], []
+
+    def work(ctx, x):
+        ctx.progress("Halfway", 0.5)
+        return x * 2
+
+    manager.submit("calc", work, 21, on_done=results.append, on_progress=lambda m, f: progress.append((m, f)))
+
+    assert poll_until(manager, lambda: results)
+    assert results == [42]
+    assert progress == [("Halfway", 0.5)]
+
+def test_cancel_running_job(manager):
+    started = threading.Event()
+    results, errors = [], []
+
+    def work(ctx):
+        started.set()
+        while True:
+            ctx.progress("Looping")
+            time.sleep(0.01)
+
+    manager.submit("filter", work, on_done=results.append, on_error=errors.append)
+    started.wait(2)
+    assert manager.cancel("filter")
+
+    assert poll_until(manager, lambda: not manager.is_running("filter"))
+    manager.poll()
+    assert results == [] and errors == []
+
+def test_superseded_job_result_is_discarded(manager):
+    release = threading.Event()
+    results = []
+
+    def slow(ctx):
+        release.wait(2)
+        return "old"
+
+    manager.submit("filter", slow, on_done=results.append)
+    manager.submit("filter", lambda ctx: "new", on_done=results.append)
+
+    assert poll_until(manager, lambda: results)
+    release.set()
+    time.sleep(0.1)
+    manager.poll()
+    assert results == ["new"]
+
+def test_error_callback(manager):
+    errors = []
+
+    def fail(ctx):
+        raise RuntimeError("boom")
+
+    manager.submit("filter", fail, on_error=errors.append)
+    assert poll_until(manager, lambda: errors)
+    assert str(errors[0]) == "boom"
+
+def test_cancellation_subclass_is_quiet(manager, capsys):
+    class StageCancelled(Cancelled): # As filter_tracts.FilterCancelled
+        pass
+    errors = []
+
+    def work(ctx):
+        raise StageCancelled("Masking")
+
+    manager.submit("filter", work, on_error=errors.append)
+    assert poll_until(manager, lambda: not manager.is_running("filter"))
+    manager.poll()
+    assert errors == []
+    assert "Traceback" not in capsys.readouterr().err
+    assert issubclass(JobCancelled, Cancelled)
@@ -41,3 +41,69 @@ def test_process_csv_data(tmp_path):
     assert data[0]['acronym'] == 'MOs' # Sorted by density descending usually? 
     # Actually logic.process_csv_data sorts by density descending.
     assert data[0]['value'] == 0.8
+
+def test_linear_colors_match_matplotlib(tmp_path):
+    import numpy as np
+    import matplotlib
+    import matplotlib.colors as mcolors
+
+    rng = np.random.default_rng(0)
+    values = np.concatenate([rng.random(200) * 0.05, [0.0, 0.05]])
+    csv_file = tmp_path / "data.csv"
+    rows = ["acronym,value,is_seed", "SEED,0.99,True"] + [f"R{i},{v},False" for i, v in enumerate(values)]
+    csv_file.write_text("\n".join(rows))
+
+    data, v_min, v_max = logic.process_csv_data(str(csv_file), colormap_name="viridis")
+
+    norm = mcolors.Normalize(vmin=values.min(), vmax=values.max())
+    cmap = matplotlib.colormaps["viridis"]
+    expected = [mcolors.to_hex(cmap(norm(v))) for v in values]
+
+    assert data[0] == {"acronym": "SEED", "color": "#000000", "is_seed": True}
+    assert [d["color"] for d in data[1:]] == expected
+    assert (v_min, v_max) == (values.min(), values.max())
+
+def test_normalize_values_log_and_quantile():
+    import numpy as np
+
+    values = np.array([1.0, 10.0, 100.0, 0.0])
+    normed, v_min, v_max = logic.normalize_values(values, values, method="log")
+    assert np.allclose(normed[:3], [0.0, 0.5, 1.0])
+    assert normed[3] < 0 # Non-positive values fall to the under color
+    assert (v_min, v_max) == (1.0, 100.0)
+
+    normed, _, _ = logic.normalize_values(values, values, method="quantile")
+    assert np.allclose(normed, [1 / 3, 2 / 3, 1.0, 0.0])
+
+    with pytest.raises(ValueError):
+        logic.normalize_values(values, values, method="sqrt")
+
+def test_process_csv_batch(tmp_path):
+    a = tmp_path / "a.csv"
+    a.write_text("acronym,value\nVISp,0.1\nMOp,0.2\n")
+    b = tmp_path / "b.csv"
+    b.write_text("acronym,value,is_seed\nDR,0.9,True\nACA,5.0\nPL,10.0\n")
+    missing = tmp_path / "missing.csv"
+
+    results = logic.process_csv_batch([str(a), str(b), str(missing)])
+
+    assert results[str(a)] == logic.process_csv_data(str(a))
+    assert results[str(b)] == logic.process_csv_data(str(b))
+    assert results[str(missing)] == ([], 0.0, 1.0)
+
+def test_cluster_column_gives_categorical_colors(tmp_path):
+    csv_file = tmp_path / "clusters.csv"
+    csv_file.write_text("acronym,value,is_seed,cluster\nDR,0.9,True,1\nACA,0.1,False,2\nPL,0.5,False,2\n"
+                        "MOp,0.2,False,1\nVISp,0.3,False,\n")
+    data, v_min, v_max = logic.process_csv_data(str(csv_file))
+    colors = {row["acronym"]: row["color"] for row in data}
+    tab20 = logic.get_hex_lut("tab20")
+
+    assert colors["DR"] == logic.SEED_COLOR
+    assert colors["MOp"] == tab20[0] and colors["ACA"] == colors["PL"] == tab20[1]
+    assert colors["VISp"] == logic.UNCATEGORIZED_COLOR
+    assert (v_min, v_max) == (0.1, 0.5) # Value range still from the targets
+    assert logic.process_csv_batch([str(csv_file)])[str(csv_file)] == (data, v_min, v_max)
+
+    by_value, _, _ = logic.process_csv_data(str(csv_file), category_column=None)
+    assert by_value != data
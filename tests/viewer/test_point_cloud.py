@@ -0,0 +1,59 @@
+import pytest
+import sys
+from pathlib import Path
+import numpy as np
+
+# Add src to path
+sys.path.append(str(Path(__file__).resolve().parent.parent.parent))
+
+from src.viewer import logic
+from src.viewer.point_cloud import above_threshold, importance_subsample, point_cloud, point_cloud_actor
+
+def volume(order="F"):
+    rng = np.random.default_rng(1)
+    data = rng.random((12, 9, 7), dtype=np.float32)
+    return np.asfortranarray(data) if order == "F" else np.ascontiguousarray(data)
+
+@pytest.mark.parametrize("order", ["F", "C"])
+def test_points_are_the_voxels_above_threshold(order):
+    data = volume(order)
+    points, values = point_cloud(data, spacing=(25, 20, 10), origin=(100, 0, 0), threshold=0.7, budget=None)
+
+    expected = np.argwhere(data > 0.7)
+    assert len(points) == len(expected)
+    got = np.round((points - [100, 0, 0]) / [25, 20, 10]).astype(int)
+    assert set(map(tuple, got)) == set(map(tuple, expected))
+    assert np.array_equal(values, data[tuple(got.T)])
+
+def test_mask_limits_points():
+    data = volume()
+    mask = np.zeros(data.shape, dtype=bool)
+    mask[:6] = True
+    idx, values = above_threshold(data, 0.5, mask)
+    assert len(values) == np.count_nonzero((data > 0.5) & mask)
+
+def test_importance_subsample_prefers_dense_voxels():
+    values = np.concatenate([np.full(10_000, 0.01), np.full(10_000, 1.0)]).astype(np.float32)
+    keep = importance_subsample(values, 1_000, seed=0)
+    assert len(keep) == len(np.unique(keep)) == 1_000
+    assert np.mean(values[keep] == 1.0) > 0.95
+    assert np.array_equal(importance_subsample(values, 1_000, seed=0), keep) # Seeded
+    assert len(importance_subsample(values[:10], 1_000)) == 10
+
+def test_actor_from_raw_nrrd(tmp_path):
+    pytest.importorskip("vedo")
+    data = volume()
+    header = ("NRRD0004\ntype: float\ndimension: 3\nsizes: 12 9 7\n"
+              "space directions: (25,0,0) (0,25,0) (0,0,25)\nendian: little\nencoding: raw\nspace origin: (0,0,0)\n\n")
+    path = tmp_path / "1_density.nrrd"
+    path.write_bytes(header.encode() + data.tobytes(order="F"))
+
+    actor = point_cloud_actor(path, threshold_fraction=0.5, budget=50)
+    assert actor.npoints == 50
+    assert actor.pointdata["density"].min() > data.max() * 0.5
+
+def test_points_mode_resolves_raw_volume(tmp_path):
+    (tmp_path / "42_density_fixed.vtk").write_text("")
+    (tmp_path / "42_density.nrrd").write_text("")
+    assert logic.resolve_tract_file(tmp_path, 42, "Density (Points)").name == "42_density.nrrd"
+    assert logic.resolve_tract_file(tmp_path, 42, "Density (Raw)").name == "42_density_fixed.vtk"
@@ -0,0 +1,68 @@
+import pytest
+import time
+import sys
+from pathlib import Path
+
+# Add src to path
+sys.path.append(str(Path(__file__).resolve().parent.parent.parent))
+
+from src.viewer import logic
+from src.viewer.logic import RegionItem
+from src.viewer.region_search import RegionSearchIndex
+
+REGIONS_JSON = Path(__file__).resolve().parent.parent.parent / "configs" / "regions.json"
+
+@pytest.fixture
+def index():
+    return RegionSearchIndex([
+        RegionItem("VIS", "Visual areas"),
+        RegionItem("VISp", "Primary visual area"),
+        RegionItem("VISpm", "posteromedial visual area"),
+        RegionItem("SSp-bfd", "Primary somatosensory area, barrel field"),
+        RegionItem("FRP2/3", "Frontal pole, layer 2/3"),
+        RegionItem("DR", "Dorsal nucleus raphe"),
+    ])
+
+def acronyms(results):
+    return [x.acronym for x in results]
+
+def test_exact_before_prefix(index):
+    assert acronyms(index.search("VISp")) == ["VISp", "VISpm"]
+    assert acronyms(index.search("vis"))[0] == "VIS"
+
+def test_infix_and_separator_insensitive(index):
+    assert acronyms(index.search("bfd")) == ["SSp-bfd"]
+    assert acronyms(index.search("frp23")) == ["FRP2/3"]
+
+def test_name_tokens(index):
+    assert acronyms(index.search("raphe")) == ["DR"]
+    assert acronyms(index.search("primary vis")) == ["VISp"]
+
+def test_display_string_and_empty_query(index):
+    assert acronyms(index.search("DR | Dorsal nucleus raphe")) == ["DR"]
+    assert index.search("  ") == []
+
+def test_typo_fallback(index):
+    assert acronyms(index.search("somatosenory")) == ["SSp-bfd"]
+    assert acronyms(index.search("primary visul")) == ["VISp"]
+    assert acronyms(index.search("VISpn")) == ["VISp", "VISpm"] # Acronym typo, most similar first
+    assert index.search("xyzw") == []
+
+def test_typo_fallback_only_without_matches(index):
+    # "visual" matches name tokens directly, so near misses of other words stay out
+    assert acronyms(index.search("visual")) == ["VIS", "VISp", "VISpm"]
+
+def test_limit(index):
+    assert len(index.search("v", limit=2)) == 2
+
+@pytest.mark.skipif(not REGIONS_JSON.exists(), reason="regions.json not found")
+def test_lookup_is_sub_millisecond():
+    index = RegionSearchIndex(logic.load_regions_config(str(REGIONS_JSON)))
+    queries = ["s", "vis", "VISp", "raphe", "dorsal nuc"]
+
+    t0 = time.perf_counter()
+    for _ in range(20):
+        for q in queries:
+            index.search(q)
+    per_query = (time.perf_counter() - t0) / (20 * len(queries))
+    assert per_query < 0.001
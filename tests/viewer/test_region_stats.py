@@ -0,0 +1,59 @@
+import pytest
+import math
+import sys
+from pathlib import Path
+import pandas as pd
+
+# Add src to path
+sys.path.append(str(Path(__file__).resolve().parent.parent.parent))
+
+from src.viewer.region_stats import RegionStatsIndex, analysis_stats
+
+def make_analysis():
+    # Two experiments, one structure: per-hemisphere rows (1 Left/contra, 2 Right/ipsi, 3 both)
+    rows = []
+    for exp, (left, right, both) in {1: (0.1, 0.3, 0.2), 2: (0.1, 0.5, 0.4)}.items():
+        for hemi, side, value in ((1, "Contralateral", left), (2, "Ipsilateral", right), (3, "Midline", both)):
+            rows.append({"experiment_id": exp, "acronym": "MOp", "hemisphere_id": hemi, "lateralization": side,
+                         "projection_density": value, "is_injection": False})
+    rows.append({"experiment_id": 1, "acronym": "DR", "hemisphere_id": 3, "lateralization": "Midline",
+                 "projection_density": 0.9, "is_injection": True}) # Injection site: left out
+    return pd.DataFrame(rows)
+
+def test_analysis_stats():
+    table = analysis_stats(make_analysis())
+    assert list(table.index) == ["MOp"]
+    row = table.loc["MOp"]
+    assert row["mean"] == pytest.approx(0.3)
+    assert row["std"] == pytest.approx(math.sqrt(0.02))
+    assert row["n_experiments"] == 2
+    assert row["lateralization"] == pytest.approx((0.8 - 0.2) / 1.0)
+
+def test_index_merges_csv_values():
+    csv = pd.DataFrame({"acronym": ["DR", "MOp"], "value": [0.9, 0.3], "is_seed": [True, False]})
+    index = RegionStatsIndex.from_tables(make_analysis(), csv)
+
+    assert len(index) == 2 and "MOp" in index
+    assert index.get("DR").is_seed and index.get("DR").n_experiments == 0
+    mop = index.get("MOp")
+    assert (mop.value, mop.n_experiments) == (0.3, 2)
+    assert mop.summary("Primary motor area").splitlines() == [
+        "MOp | Primary motor area", "CSV value: 0.3", "Mean: 0.3 +/- 0.1414 (n=2 experiments)", "Lateralization: +0.60 (ipsi)"]
+
+def test_lookup_walks_up_the_ontology():
+    index = RegionStatsIndex.from_tables(csv=pd.DataFrame({"acronym": ["MOp"], "value": [0.3]}))
+    structures = {
+        1: {"acronym": "root", "structure_id_path": [1]},
+        2: {"acronym": "MOp", "structure_id_path": [1, 2]},
+        3: {"acronym": "MOp5", "structure_id_path": [1, 2, 3]},
+        4: {"acronym": "SSp", "structure_id_path": [1, 4]},
+    }
+    assert index.lookup(3, structures).acronym == "MOp"
+    assert index.lookup(4, structures) is None
+    assert index.lookup(0, structures) is None
+
+def test_load_skips_missing_files(tmp_path):
+    csv_path = tmp_path / "DR_connectivity.csv"
+    pd.DataFrame({"acronym": ["ACA"], "value": [0.1], "is_seed": [False]}).to_csv(csv_path, index=False)
+    index = RegionStatsIndex.load(csv_path, tmp_path / "DR_full_analysis.csv")
+    assert math.isnan(index.get("ACA").mean) and index.get("ACA").value == 0.1
@@ -0,0 +1,57 @@
+import pytest
+import time
+import sys
+from pathlib import Path
+
+# Add src to path
+sys.path.append(str(Path(__file__).resolve().parent.parent.parent))
+
+from src.viewer.region_table import RegionTableModel
+
+def make_items(n):
+    return [{"acronym": f"R{i}", "color": "#123456", "is_seed": i == 0} for i in range(n)]
+
+def test_replace_has_no_row_cap():
+    table = RegionTableModel(page_size=40)
+    table.replace(make_items(1300))
+
+    assert len(table) == 1300
+    assert table.page_count == 33
+    assert table.seed_acronym() == "R0"
+
+def test_paging():
+    table = RegionTableModel(page_size=40)
+    table.replace(make_items(100))
+
+    assert table.visible_range() == (0, 40)
+    table.set_page(2)
+    assert table.visible_range() == (80, 100)
+    table.set_page(99)
+    assert table.page == 2
+
+    table.goto_row(45)
+    assert table.page == 1
+
+def test_remove_clamps_page():
+    table = RegionTableModel(page_size=10)
+    table.replace(make_items(11))
+    table.set_page(1)
+
+    table.remove(10)
+    assert table.page == 0
+    assert len(table) == 10
+
+def test_selection_skips_empty_rows():
+    table = RegionTableModel()
+    table.add(acronym="VISp", color_hex="#ff0000")
+    table.add()
+
+    assert table.selection() == [{"acronym": "VISp", "color": "#ff0000"}]
+    assert table.seed_acronym() is None
+
+def test_bulk_load_is_fast():
+    table = RegionTableModel(page_size=40)
+    t0 = time.perf_counter()
+    table.replace(make_items(1300))
+    table.selection()
+    assert time.perf_counter() - t0 < 0.1
@@ -38,3 +38,30 @@ def test_render_scene_logic(mock_scene, mock_atlas):
     mock_scene_instance.add_brain_region.assert_any_call('root', alpha=0.05, color='grey')
     mock_scene_instance.add_brain_region.assert_any_call('VISp', alpha=0.5, color='#FF0000')
     mock_scene_instance.render.assert_called()
+
+@patch('src.viewer.rendering.BrainGlobeAtlas')
+def test_region_info_looks_up_annotation(mock_atlas):
+    import numpy as np
+    import pandas as pd
+    from src.viewer.region_stats import RegionStatsIndex
+
+    engine = rendering.RenderEngine()
+    annotation = np.zeros((4, 4, 4), dtype=np.uint32)
+    annotation[2:, :, :] = 2
+    annotation[3, 0, 0] = 3
+    engine.atlas.annotation = annotation
+    engine.atlas.resolution = (25, 25, 25)
+    engine.atlas.structures = {
+        2: {"acronym": "MOp", "name": "Primary motor area", "structure_id_path": [997, 2]},
+        3: {"acronym": "MOp5", "name": "Primary motor area, Layer 5", "structure_id_path": [997, 2, 3]},
+        997: {"acronym": "root", "name": "root", "structure_id_path": [997]},
+    }
+    engine.region_stats = RegionStatsIndex.from_tables(csv=pd.DataFrame({"acronym": ["MOp"], "value": [0.25]}))
+
+    assert engine.voxel_index([60, 10, -10]) == (2, 0, 0) # Mirrored ML axis
+    assert engine.voxel_index([60, 10, 500]) is None
+    assert engine.structure_at([40, 10, 10]) == 0
+    assert engine.structure_at([40, 10, 10], direction=(1, 0, 0)) == 2 # Probed one voxel deeper
+    assert engine.region_info([60, 10, 10]).startswith("MOp | Primary motor area\nCSV value: 0.25")
+    assert engine.region_info([80, 10, 10]).startswith("MOp5 | Primary motor area, Layer 5\nin MOp") # Ancestor stats
+    assert engine.region_info([0, 0, 0]) == "Outside the brain"
@@ -2,6 +2,7 @@ import pytest
 from unittest.mock import MagicMock, patch
 from pathlib import Path
 import sys
+import time
 
 # Add src to path
 sys.path.append(str(Path(__file__).resolve().parent.parent.parent))
@@ -66,3 +67,38 @@ def test_render_none_mode(engine, mock_scene):
     # Verify no actors were loaded (implicit check)
     # In a real scenario we'd check scene.add calls, but mocking Scene is complex.
     # This mainly ensures no crash.
+
+def test_raw_mode_slider_over_fixed_mesh(engine, mock_scene, tmp_path, monkeypatch):
+    """Density (Raw) on a fixed mesh still gets a live slider from the raw volume, counting in the background."""
+    vedo = pytest.importorskip("vedo")
+    import numpy as np
+    from src.viewer import threshold as thr
+    monkeypatch.setattr(rendering, "Volume", vedo.Volume) # test_rendering.py imports rendering with vedo mocked
+
+    data = np.zeros((12, 10, 8), dtype=np.float32)
+    data[3:9, 3:7, 2:6] = 1.0
+    raw = tmp_path / "5_density.nrrd"
+    header = ("NRRD0004\ntype: float\ndimension: 3\nsizes: 12 10 8\n"
+              "space directions: (1,0,0) (0,1,0) (0,0,1)\nendian: little\nencoding: raw\nspace origin: (0,0,0)\n\n")
+    raw.write_bytes(header.encode() + data.tobytes(order="F"))
+    fixed = tmp_path / "5_density_fixed.vtk"
+    vedo.Volume(data, spacing=(25, 25, 25)).isosurface(0.05).write(str(fixed))
+
+    scene = mock_scene.return_value
+    with patch.object(engine, "add_region_picking"):
+        engine.render_scene(region_config=[], tract_file=fixed, visualization_mode="Density (Raw)",
+                            threshold_fraction=0.05, volume_file=raw)
+
+    assert engine.tract_volume_path == raw
+    assert list(engine.tract_volume.spacing()) == [25.0, 25.0, 25.0] # Geometry of the fixed mesh, not the raw header
+    assert "counting voxels" in scene.plotter.add_slider.call_args.kwargs["title"]
+
+    thr.load_histogram(raw) # Wait for the histogram (cached per file)
+    on_timer = next(c.args[1] for c in scene.plotter.add_callback.call_args_list if c.args[0] == "timer")
+    slider = scene.plotter.add_slider.return_value
+    for _ in range(100):
+        on_timer(None)
+        if isinstance(slider.title, str):
+            break
+        time.sleep(0.01)
+    assert slider.title == f"Threshold 5.0% of max: {int((data > 0).sum()):,} voxels"
@@ -0,0 +1,68 @@
+import pytest
+import sys
+from pathlib import Path
+import numpy as np
+
+# Add src to path
+sys.path.append(str(Path(__file__).resolve().parent.parent.parent))
+
+from src.viewer.slices import BOUNDARY_RGBA, SliceEngine, boundaries, permutation_to
+
+SHAPE = (6, 4, 5) # AP, DV, ML
+
+def annotation():
+    labels = np.ones(SHAPE, dtype=np.uint32)
+    labels[:, :, 3:] = 2 # Region 2 on the ML side
+    return labels
+
+def write_raw_nrrd(path, data_xyz):
+    sizes = " ".join(str(n) for n in data_xyz.shape)
+    header = (f"NRRD0004\ntype: float\ndimension: 3\nsizes: {sizes}\n"
+              "space directions: (25,0,0) (0,25,0) (0,0,25)\nendian: little\nencoding: raw\n\n")
+    path.write_bytes(header.encode() + data_xyz.astype(np.float32).tobytes(order="F"))
+    return path
+
+def test_permutation_to():
+    assert permutation_to((6, 4, 5), SHAPE) == (0, 1, 2)
+    assert permutation_to((5, 4, 6), SHAPE) == (2, 1, 0)
+    assert permutation_to((4, 6, 5), SHAPE) == (1, 0, 2)
+    assert permutation_to((6, 4, 4), SHAPE) is None
+
+def test_boundaries():
+    labels = np.array([[1, 1, 2], [1, 1, 2], [3, 3, 3]])
+    assert boundaries(labels).tolist() == [[False, True, False], [True, True, True], [False, False, False]]
+
+def test_slices_read_memory_mapped_volume(tmp_path):
+    volume = np.arange(np.prod(SHAPE), dtype=np.float32).reshape(SHAPE)
+    # Stored ML, DV, AP like the raw downloads: the engine transposes the map back
+    path = write_raw_nrrd(tmp_path / "1_density.nrrd", volume.transpose(2, 1, 0))
+    engine = SliceEngine.from_file(path, annotation())
+
+    assert isinstance(engine.volume, np.memmap) # Transposed view of the map, not a copy
+    assert np.array_equal(engine.density("Coronal", 2), volume[2])
+    assert np.array_equal(engine.density("Sagittal", 1), volume[:, :, 1].T)
+    assert engine.image_size("Coronal") == (5, 4)
+    assert engine.image_size("Sagittal") == (6, 4)
+
+def test_render_draws_boundaries_and_caches():
+    volume = np.zeros(SHAPE, dtype=np.float32)
+    volume[3, 1, 1] = 2.0
+    engine = SliceEngine(volume, annotation(), cache_planes=2)
+
+    image = engine.render("Coronal", 3)
+    assert image.shape == (4, 5, 4)
+    assert tuple(image[0, 2]) == BOUNDARY_RGBA # Column 2 borders region 2
+    assert tuple(image[0, 0]) == (0.0, 0.0, 0.0, 1.0) # Empty voxel: background
+    assert np.allclose(image[1, 1], engine.lut[-1]) # Max density: top of the colormap
+    assert engine.render("Coronal", 3) is image
+
+    engine.render("Coronal", 4)
+    engine.render("Coronal", 5)
+    assert engine.render("Coronal", 3) is not image # Evicted (LRU of 2)
+    assert engine.structure_at("Coronal", 0, 0, 4) == 2
+
+def test_annotation_only():
+    engine = SliceEngine(None, annotation())
+    assert engine.render("Horizontal", 0).shape == (6, 5, 4)
+    with pytest.raises(ValueError):
+        SliceEngine(None, None)
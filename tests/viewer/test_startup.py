@@ -0,0 +1,49 @@
+import pytest
+import json
+from unittest.mock import MagicMock, patch
+import sys
+from pathlib import Path
+
+# Add src to path
+sys.path.append(str(Path(__file__).resolve().parent.parent.parent))
+
+from src.viewer import startup
+
+def test_timer_marks_once_and_saves(tmp_path):
+    timer = startup.StartupTimer(t0=0.0)
+    first = timer.mark("first_window")
+    assert timer.mark("first_window") == first
+
+    log = tmp_path / "startup_times.jsonl"
+    timer.save(log)
+    timer.save(log)
+    lines = log.read_text().splitlines()
+    assert len(lines) == 2
+    assert "first_window" in json.loads(lines[0])
+
+def test_last_regions_roundtrip(tmp_path):
+    session = tmp_path / "state" / "last_session.json"
+    assert startup.load_last_regions(session) == []
+
+    startup.save_last_regions(session, ["VISp", "MOp"])
+    assert startup.load_last_regions(session) == ["VISp", "MOp"]
+
+def test_prewarm_reads_meshes(tmp_path):
+    mesh_file = tmp_path / "385.obj"
+    mesh_file.write_text("v 0 0 0\n")
+
+    mock_rendering = MagicMock()
+    engine = mock_rendering.RenderEngine.return_value
+    engine.atlas.structures = {"root": {}, "VISp": {}}
+    engine.atlas.meshfile_from_structure.return_value = mesh_file
+
+    ctx = MagicMock()
+    import src.viewer
+    with patch.dict(sys.modules, {"src.viewer.rendering": mock_rendering}), \
+         patch.object(src.viewer, "rendering", mock_rendering, create=True):
+        result = startup.prewarm_engine(ctx, "test_atlas", ["VISp", "UNKNOWN"])
+
+    assert result is engine
+    read = [c.args[0] for c in engine.atlas.meshfile_from_structure.call_args_list]
+    assert read == ["root", "VISp"]
+    ctx.progress.assert_called()
@@ -0,0 +1,66 @@
+import pytest
+import json
+import os
+import sys
+from pathlib import Path
+import numpy as np
+
+# Add src to path
+sys.path.append(str(Path(__file__).resolve().parent.parent.parent))
+
+from src.viewer.streamlines import StreamlineStore, cache_path_for
+
+def make_lines():
+    # Three fibers along x at y = 0, 100, 200 (microns), 2-4 points each
+    return [
+        [[0, 0, 0], [25, 0, 0]],
+        [[0, 100, 0], [25, 100, 0], [50, 100, 0]],
+        [[0, 200, 0], [25, 200, 0], [50, 200, 0], [75, 200, 0]],
+    ]
+
+def write_allen_json(path, lines):
+    data = {"lines": [[{"x": x, "y": y, "z": z} for x, y, z in line] for line in lines], "injection_sites": []}
+    path.write_text(json.dumps(data))
+    return path
+
+def test_json_is_flattened_and_cached(tmp_path):
+    path = write_allen_json(tmp_path / "42_streamlines.json", make_lines())
+    store = StreamlineStore.load(path)
+
+    assert store.n_fibers == 3 and store.n_points == 9
+    assert store.offsets.tolist() == [0, 2, 5, 9]
+    assert store.points.dtype == np.float32
+    assert np.array_equal(store.fiber(1)[:, 1], [100, 100, 100])
+
+    cache = cache_path_for(path)
+    assert cache.exists()
+    path.write_text("not json anymore") # Cache is newer: the JSON is not parsed again
+    os.utime(path, ns=(cache.stat().st_mtime_ns - 1, cache.stat().st_mtime_ns - 1))
+    assert StreamlineStore.load(path).offsets.tolist() == [0, 2, 5, 9]
+
+def test_select_and_subsample():
+    store = StreamlineStore.from_lines(make_lines())
+    picked = store.select([2, 0])
+    assert picked.offsets.tolist() == [0, 4, 6]
+    assert np.array_equal(picked.fiber(1), store.fiber(0))
+
+    assert store.subsample(fraction=2 / 3).n_fibers == 2
+    budget = store.subsample(max_points=5)
+    assert budget.n_points <= 5 and budget.n_fibers >= 1
+    assert store.subsample(max_points=100).n_fibers == 3
+
+def test_region_filter_uses_voxel_labels():
+    store = StreamlineStore.from_lines(make_lines())
+    annotation = np.zeros((4, 10, 2), dtype=np.int32)
+    annotation[2, 4, 0] = 7 # Voxel (50, 100, 0) um at 25 um: only fiber 1 reaches it
+    annotation[:, 8, :] = 9 # y = 200 row
+    assert store.through_regions(annotation, {7}, resolution=25).tolist() == [False, True, False]
+    assert store.through_regions(annotation, {7, 9}, resolution=25).tolist() == [False, True, True]
+
+def test_single_actor():
+    pytest.importorskip("vedo")
+    store = StreamlineStore.from_lines(make_lines())
+    lines = store.actor()
+    assert lines.npoints == 9 and lines.ncells == 3
+    tubes = store.actor(radius=5, sides=6)
+    assert tubes.npoints == 9 * 6
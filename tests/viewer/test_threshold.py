@@ -0,0 +1,65 @@
+import pytest
+import sys
+from pathlib import Path
+import numpy as np
+
+# Add src to path
+sys.path.append(str(Path(__file__).resolve().parent.parent.parent))
+
+from src.viewer import threshold as thr
+
+def blob(shape=(40, 36, 30)):
+    x, y, z = np.ogrid[tuple(slice(0, n) for n in shape)]
+    return np.exp(-((x - 20) ** 2 + (y - 18) ** 2 + (z - 15) ** 2) / 60.0).astype(np.float32)
+
+def test_histogram_counts_match_brute_force():
+    data = blob()
+    data[data < 0.01] = 0
+    hist = thr.VoxelHistogram(data, spacing=(25, 25, 25))
+
+    for fraction in (0.0, 0.05, 0.3, 0.99, 1.0):
+        assert hist.count_at(fraction) == np.count_nonzero(data > data.max() * fraction)
+    counts = hist.count_at(np.array([0.1, 0.5]))
+    assert list(counts) == [np.count_nonzero(data > data.max() * f) for f in (0.1, 0.5)]
+    assert hist.volume_at(0.0) == pytest.approx(np.count_nonzero(data) * 25 ** 3 * 1e-9)
+
+def test_fraction_for_count_inverts_count():
+    hist = thr.VoxelHistogram(np.arange(1, 101, dtype=np.float32))
+    fraction = hist.fraction_for_count(10)
+    assert hist.count_at(fraction) == 10
+    assert hist.fraction_for_count(1000) == 0.0
+
+def test_quantize_and_downsample():
+    assert thr.quantize(0.05) == 10
+    assert thr.quantize(0.0) == 1
+    data = np.arange(5 * 4 * 4, dtype=np.float32).reshape(5, 4, 4)
+    small = thr.downsample(data, 2)
+    assert small.shape == (2, 2, 2)
+    assert small[0, 0, 0] == data[:2, :2, :2].mean()
+
+def test_meshes_refine_and_cache():
+    pytest.importorskip("vedo")
+    meshes = thr.ThresholdMeshes(blob(), spacing=(25, 25, 25), origin=(0, 0, 0))
+    index = meshes.request(0.3)
+    assert meshes.wait(timeout=30)
+    assert meshes.best(index) == thr.FULL
+    assert (index, thr.COARSE) in meshes.cache
+
+    full = meshes.mesh(index, thr.FULL)
+    coarse = meshes.mesh(index, thr.COARSE)
+    assert full.npoints > coarse.npoints
+    # Both levels land in the same place in world space
+    assert np.allclose(full.center_of_mass(), coarse.center_of_mass(), atol=25)
+
+    # Cached steps queue nothing
+    meshes.request(0.3)
+    assert not meshes.pending
+    meshes.shutdown()
+
+def test_cache_is_bounded():
+    meshes = thr.ThresholdMeshes(blob(), spacing=(1, 1, 1), origin=(0, 0, 0), max_bytes=1)
+    for fraction in (0.2, 0.4):
+        meshes.request(fraction)
+        meshes.wait(timeout=30)
+    assert len(meshes.cache) == 1
+    meshes.shutdown()
@@ -0,0 +1,48 @@
+import pytest
+import sys
+from pathlib import Path
+import numpy as np
+
+# Add src to path
+sys.path.append(str(Path(__file__).resolve().parent.parent.parent))
+
+from src.viewer.voxels import cap_voxels, coarsen, exposed_faces, voxel_mesh
+
+def test_single_cube():
+    points, quads, values = exposed_faces(np.array([[5, 7, 9]]), np.array([2.0]))
+    assert len(points) == 8 and len(quads) == 6
+    assert points.min(axis=0).tolist() == [5, 7, 9]
+    assert points.max(axis=0).tolist() == [6, 8, 10]
+    assert values.tolist() == [2.0] * 6
+
+def test_internal_faces_are_dropped():
+    block = np.argwhere(np.ones((3, 3, 3), dtype=bool))
+    points, quads, values = exposed_faces(block, np.arange(27, dtype=np.float32))
+    assert len(quads) == 6 * 9 # Only the outer skin of the 3x3x3 block
+    assert len(points) == 4 ** 3 - 2 ** 3 # Lattice corners minus the 8 hidden inside
+
+    # Two touching cubes share one face: 10 faces, 12 corners
+    _, quads, _ = exposed_faces(np.array([[0, 0, 0], [1, 0, 0]]), np.ones(2))
+    assert len(quads) == 10
+
+def test_coarsen_keeps_block_max():
+    ijk = np.array([[0, 0, 0], [1, 1, 1], [2, 0, 0], [3, 1, 0]])
+    cells, values = coarsen(ijk, np.array([1.0, 5.0, 2.0, 3.0]), 2)
+    assert cells.tolist() == [[0, 0, 0], [1, 0, 0]]
+    assert values.tolist() == [5.0, 3.0]
+
+    cells, values, factor = cap_voxels(np.argwhere(np.ones((8, 8, 8), dtype=bool)), np.ones(512), max_voxels=100)
+    assert factor == 2 and len(cells) == 64
+
+def test_voxel_mesh_is_closed_and_in_world_units():
+    vedo = pytest.importorskip("vedo")
+    coords = np.argwhere(np.ones((3, 2, 2), dtype=bool)) * 25.0 + [1000, 0, 0]
+    mesh, factor = voxel_mesh(coords, np.linspace(0, 1, len(coords)), voxel_size=25)
+
+    assert factor == 1
+    assert mesh.ncells == 2 * (3 * 2 + 3 * 2 + 2 * 2)
+    assert np.allclose(mesh.bounds(), [987.5, 1062.5, -12.5, 37.5, -12.5, 37.5])
+    tri = mesh.clone().triangulate()
+    assert tri.is_closed()
+    assert tri.volume() == pytest.approx(12 * 25 ** 3) # Outward winding
+    assert len(mesh.celldata["value"]) == mesh.ncells